@@ -3,13 +3,19 @@ Servidor Flask para Audio Summarizer
 Este servidor proporciona una API REST para transcribir y resumir archivos de audio
 """
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, Response, stream_with_context
 from flask_cors import CORS
 import os
+import json
 from pathlib import Path
 import uuid
+import mimetypes
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestEntityTooLarge
+import glob
 import logging
+import queue
+from concurrent.futures import CancelledError
 
 # Cargar variables de entorno desde backend/.env
 try:
@@ -23,12 +29,35 @@ except ImportError:
 # Importar las funciones de los scripts existentes desde backend/
 import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
-from transcription_service import transcribir_audio_service, procesar_transcripcion_para_texto, extraer_resumen_speechmatics, procesar_transcripcion_estructurada
+from transcription_service import transcribir_audio_service, procesar_transcripcion_completa, extraer_resumen_speechmatics, enviar_trabajo_transcripcion, clave_cache_transcripcion
+from transcription_cache import obtener_transcripcion_cache, get_cache_stats, calcular_hash_audio
 from summary_service import generar_resumen_completo, chat_con_gemini, editar_resumen_con_gemini, generar_resumen_con_agente
-from video_service import extraer_audio_de_video, es_archivo_video, verificar_es_video_real
+from summary_service import chat_con_gemini_stream, editar_resumen_con_gemini_stream, generar_resumen_con_agente_stream
+from ai_stream import ErrorStream
+from hierarchical_summary import get_chunk_cache_stats
+from retrieval_index import registrar_transcripcion, obtener_indice, get_index_stats
+from video_service import es_archivo_video, verificar_es_video_real
+from media_pool import start_media_pool, run_media_task, cancel_media_task, get_media_pool_stats
 from system_Audio import esta_disponible_grabacion_sistema, iniciar_grabacion_sistema, detener_grabacion_sistema, esta_grabando_sistema
 from auth_service import authenticate_user, get_user_by_id, change_password
-from database import test_connection
+from persistence_service import persist_recording, find_persisted_transcription, get_persistence_stats, start_persistence
+from recording_service import get_recording_with_content
+from permission_service import can_access_recording
+from access_cache import get_access_cache_stats
+from search_service import search_recordings, semantic_search_recordings, DEFAULT_SEARCH_LIMIT
+from vector_index import get_vector_index_stats
+from media_probe import inspeccionar_medio, get_media_probe_stats
+from blob_store import (guardar_archivo, crear_handle, registrar_audio_derivado, buscar_audio_derivado,
+                        liberar_archivo)
+from upload_service import (recibir_archivo, iniciar_subida, recibir_fragmento, estado_subida,
+                            finalizar_subida, cancelar_subida, UPLOAD_MAX_FILE_SIZE,
+                            UPLOAD_RESUMABLE_CHUNK_SIZE, SubidaCerrada)
+from database import test_connection, get_pool_stats, get_prepared_stats
+from job_service import (enqueue_job, update_job_progress, get_job, get_job_status,
+                         get_queue_stats, JOB_QUEUED, JOB_COMPLETED, JOB_FAILED, DEFERRED)
+from notification_service import (is_notification_enabled, get_notification_auth_header,
+                                  verify_notification_auth, register_pending_transcription,
+                                  handle_notification, NOTIFICATION_URL)
 from agents.agents_service import (create_agent, get_agent_by_id, get_agents_by_user, 
                            update_agent, delete_agent, hard_delete_agent)
 
@@ -49,7 +78,7 @@ app = Flask(__name__)
 CORS(app)  # Permitir CORS para el frontend
 
 # Configuración
-app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB máximo
+app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB máximo por petición (archivos mayores: /api/uploads por fragmentos)
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['ALLOWED_EXTENSIONS'] = {
     # Formatos de audio
@@ -73,6 +102,16 @@ def generate_unique_filename(original_filename):
     unique_name = f"{uuid.uuid4().hex}.{ext}"
     return unique_name
 
+def _nombre_destino_upload(filename):
+    """Valida el nombre de un archivo subido y genera el nombre con el que se guarda"""
+    if filename == '':
+        raise ValueError('No file selected')
+    
+    if not allowed_file(filename):
+        raise ValueError('Invalid file type. Allowed types: ' + ', '.join(app.config['ALLOWED_EXTENSIONS']))
+    
+    return generate_unique_filename(secure_filename(filename))
+
 def serialize_agent(agent):
     """Convierte campos datetime de un agente a cadenas ISO 8601."""
     if not agent:
@@ -84,6 +123,257 @@ def serialize_agent(agent):
             agent_dict[field] = value.isoformat()
     return agent_dict
 
+def _preparar_persistencia(file_path, language, user_id, original_filename=None):
+    """
+    Datos para guardar el resultado de un audio en la base de datos
+    
+    Args:
+        file_path (str): Ruta al archivo subido
+        language (str): Código del idioma
+        user_id (int): ID del usuario (sin usuario no se guarda nada)
+        original_filename (str): Nombre original del archivo (opcional)
+    
+    Returns:
+        dict: Datos de persistencia o None si no hay usuario
+    """
+    if not user_id:
+        return None
+    
+    content_key = clave_cache_transcripcion(file_path, language)
+    if not content_key:
+        return None
+    
+    return {
+        'user_id': int(user_id),
+        'language': language,
+        'original_filename': original_filename,
+        'content_key': content_key
+    }
+
+def _persistir_resultado(persistencia, file_path, file_size, texto_transcrito, dialogos, resumen_speechmatics):
+    """
+    Encola el resultado para guardarlo en la base de datos en segundo plano
+    
+    Returns:
+        str: persist_id o None si no se guarda
+    """
+    if not persistencia:
+        return None
+    
+    return persist_recording(
+        user_id=persistencia['user_id'],
+        filename=os.path.basename(file_path),
+        file_path=file_path,
+        file_size=file_size,
+        content_key=persistencia['content_key'],
+        language=persistencia['language'],
+        transcription_text=texto_transcrito,
+        dialogues=dialogos,
+        summary=resumen_speechmatics['content'] if resumen_speechmatics else None,
+        original_filename=persistencia['original_filename'],
+        mimetype=mimetypes.guess_type(file_path)[0]
+    )
+
+def _resultado_guardado(persistencia, use_cache=True):
+    """
+    Busca en la base de datos una transcripción ya guardada del mismo audio
+    
+    Returns:
+        dict: Transcripción guardada o None
+    """
+    if not persistencia or not use_cache:
+        return None
+    
+    return find_persisted_transcription(persistencia['user_id'], persistencia['content_key'])
+
+def _resumen_speechmatics_guardado(guardado):
+    """Reconstruye speechmatics_summary a partir del resumen guardado"""
+    if not guardado.get('summary'):
+        return None
+    
+    return {
+        'content': guardado['summary'],
+        'summary_type': 'bullets',
+        'summary_length': 'detailed'
+    }
+
+def _construir_respuesta_proceso(file_path, resultado_transcripcion, texto_transcrito, dialogos, persistencia=None):
+    """
+    Construye la respuesta de /api/process a partir de una transcripción ya procesada
+    
+    Args:
+        file_path (str): Ruta al archivo subido (se libera al terminar salvo que se guarde el resultado)
+        resultado_transcripcion (dict): Resultado JSON de Speechmatics
+        texto_transcrito (str): Texto plano de la transcripción
+        dialogos (list): Diálogos estructurados por hablante
+        persistencia (dict): Datos para guardar el resultado en la base de datos (opcional)
+    
+    Returns:
+        dict: Contenido de la respuesta
+    """
+    # Extraer resumen de Speechmatics (si está disponible)
+    resumen_speechmatics = extraer_resumen_speechmatics(resultado_transcripcion)
+    
+    # Generar resumen básico
+    resumen = generar_resumen_completo(texto_transcrito, resultado_transcripcion)
+    
+    file_size = None
+    if os.path.exists(file_path):
+        file_size = os.path.getsize(file_path)
+        # Si el resultado se guarda, la grabación conserva el archivo (recordings.file_path)
+        if not persistencia:
+            liberar_archivo(file_path)
+    response_data = {
+        'success': True,
+        'transcription': texto_transcrito,
+        'dialogues': dialogos,
+        'summary': resumen['resumen_basico'],
+        'transcript_id': registrar_transcripcion(dialogos=dialogos, transcripcion=texto_transcrito)
+    }
+    
+    # Agregar resumen de Speechmatics si está disponible
+    if resumen_speechmatics:
+        response_data['speechmatics_summary'] = resumen_speechmatics
+    
+    # Guardar en la base de datos sin retrasar la respuesta
+    persist_id = _persistir_resultado(
+        persistencia, file_path, file_size, texto_transcrito, dialogos, resumen_speechmatics
+    )
+    if persist_id:
+        response_data['persist_id'] = persist_id
+    
+    return response_data
+
+def _construir_respuesta_guardada(file_path, guardado):
+    """
+    Construye la respuesta de /api/process a partir de una transcripción ya
+    guardada en la base de datos (sin volver a transcribir)
+    
+    Args:
+        file_path (str): Ruta al archivo subido (se libera al terminar)
+        guardado (dict): Resultado de find_persisted_transcription
+    
+    Returns:
+        dict: Contenido de la respuesta
+    """
+    texto_transcrito = guardado['transcription_text'] or ''
+    dialogos = guardado['dialogues'] or []
+    
+    # La grabación guardada ya tiene su propio handle del mismo blob
+    liberar_archivo(file_path)
+    response_data = {
+        'success': True,
+        'transcription': texto_transcrito,
+        'dialogues': dialogos,
+        'summary': generar_resumen_completo(texto_transcrito, None)['resumen_basico'],
+        'transcript_id': registrar_transcripcion(dialogos=dialogos, transcripcion=texto_transcrito),
+        'from_database': True
+    }
+    
+    if guardado['recording_id']:
+        response_data['recording_id'] = guardado['recording_id']
+    
+    resumen_speechmatics = _resumen_speechmatics_guardado(guardado)
+    if resumen_speechmatics:
+        response_data['speechmatics_summary'] = resumen_speechmatics
+    
+    return response_data
+
+def _procesar_audio_job(job_id, file_path, api_key, language, use_cache=True, num_segmentos=None,
+                        user_id=None, original_filename=None):
+    """
+    Tarea ejecutada por el pool de trabajos: transcribe y procesa un audio
+    Si las notificaciones de Speechmatics están configuradas, el worker solo envía
+    el trabajo y queda libre; notification_service completa el trabajo al recibir
+    la notificación (o por polling de respaldo)
+    
+    Args:
+        job_id (str): ID del trabajo (para reportar progreso)
+        file_path (str): Ruta al archivo de audio
+        api_key (str): API key de Speechmatics
+        language (str): Código del idioma
+        use_cache (bool): Reutilizar transcripciones previas del mismo audio
+        num_segmentos (int): Segmentos a transcribir en paralelo (opcional)
+        user_id (int): ID del usuario; si se indica, el resultado se guarda en la
+                       base de datos y se reutiliza si el mismo audio ya estaba guardado
+        original_filename (str): Nombre original del archivo (opcional)
+    
+    Returns:
+        dict: Mismo contenido que devolvía /api/process de forma síncrona,
+              o DEFERRED si el trabajo se completará por notificación
+    """
+    # Un audio ya transcrito y guardado se lee de la base de datos
+    persistencia = _preparar_persistencia(file_path, language, user_id, original_filename)
+    guardado = _resultado_guardado(persistencia, use_cache)
+    
+    if guardado:
+        update_job_progress(job_id, 'parsing')
+        return _construir_respuesta_guardada(file_path, guardado)
+    
+    update_job_progress(job_id, 'transcribing')
+    
+    # Las notificaciones solo se usan con un único trabajo de Speechmatics
+    if is_notification_enabled() and not (num_segmentos and num_segmentos > 1):
+        # Buscar primero en la caché para no enviar un trabajo nuevo
+        if not use_cache:
+            clave_cache = None
+        elif persistencia:
+            clave_cache = persistencia['content_key']
+        else:
+            clave_cache = clave_cache_transcripcion(file_path, language)
+        resultado_cache = obtener_transcripcion_cache(clave_cache) if clave_cache else None
+        
+        if resultado_cache:
+            update_job_progress(job_id, 'parsing')
+            procesado = procesar_transcripcion_completa(resultado_cache)
+            return _construir_respuesta_proceso(
+                file_path, resultado_cache, procesado['texto'], procesado['dialogos'], persistencia
+            )
+        
+        def _al_completar(resultado, texto, dialogos):
+            return _construir_respuesta_proceso(file_path, resultado, texto, dialogos, persistencia)
+        
+        speechmatics_job_id = enviar_trabajo_transcripcion(
+            archivo_audio=file_path,
+            api_key=api_key,
+            idioma=language,
+            notification_url=NOTIFICATION_URL,
+            notification_auth_header=get_notification_auth_header()
+        )
+        
+        if not speechmatics_job_id:
+            raise RuntimeError('Transcription failed')
+        
+        register_pending_transcription(
+            speechmatics_job_id,
+            job_id,
+            api_key,
+            on_complete=_al_completar,
+            clave_cache=clave_cache
+        )
+        return DEFERRED
+    
+    # Transcribir con Speechmatics
+    resultado_transcripcion = transcribir_audio_service(
+        archivo_audio=file_path,
+        api_key=api_key,
+        idioma=language,
+        use_cache=use_cache,
+        num_segmentos=num_segmentos
+    )
+    
+    if not resultado_transcripcion:
+        raise RuntimeError('Transcription failed')
+    
+    update_job_progress(job_id, 'parsing')
+    
+    # Procesar transcripción en una sola pasada: texto limpio y diálogos por hablante
+    procesado = procesar_transcripcion_completa(resultado_transcripcion)
+    
+    return _construir_respuesta_proceso(
+        file_path, resultado_transcripcion, procesado['texto'], procesado['dialogos'], persistencia
+    )
+
 # ENDPOINTS
 @app.route('/')
 def index():
@@ -100,7 +390,10 @@ def api_info():
         'version': '1.0.0',
         'endpoints': {
             'upload': '/api/upload',
+            'resumable_upload': '/api/uploads',
             'process': '/api/process',
+            'jobs': '/api/jobs/<job_id>',
+            'media_pool': '/api/media-pool',
             'health': '/api/health',
             'login': '/api/login'
         }
@@ -114,9 +407,44 @@ def health_check():
         'message': 'Server is running',
         'system_audio_available': esta_disponible_grabacion_sistema(),
         'system_audio_recording': esta_grabando_sistema(),
-        'database_connected': test_connection()
+        'database_connected': test_connection(),
+        'database_pool': get_pool_stats(),
+        'prepared_statements': get_prepared_stats(),
+        'jobs': get_queue_stats(),
+        'persistence': get_persistence_stats(),
+        'access_cache': get_access_cache_stats(),
+        'transcription_cache': get_cache_stats(),
+        'summary_chunk_cache': get_chunk_cache_stats(),
+        'chat_index': get_index_stats(),
+        'vector_index': get_vector_index_stats(),
+        'media_probe': get_media_probe_stats(),
+        'media_pool': get_media_pool_stats()
     })
 
+@app.route('/api/media-pool', methods=['GET'])
+def media_pool_stats():
+    """
+    Endpoint con las métricas del pool de procesos de medios
+    
+    Retorna:
+        - workers, busy, queued, max_queue: ocupación del pool
+        - running: tareas en ejecución con sus segundos
+        - tiempos medios y máximos de espera y ejecución recientes
+        - contadores: completed, failed, timeouts, cancelled, rejected, worker_restarts
+    """
+    return jsonify({
+        'success': True,
+        **get_media_pool_stats()
+    }), 200
+
+@app.route('/api/media-pool/tasks/<task_id>', methods=['DELETE'])
+def cancel_media_pool_task(task_id):
+    """Endpoint para cancelar una tarea del pool de medios (en cola o en ejecución)"""
+    if not cancel_media_task(task_id):
+        return jsonify({'error': 'Task not found'}), 404
+    
+    return jsonify({'success': True}), 200
+
 @app.route('/api/login', methods=['POST'])
 def login():
     """
@@ -298,6 +626,113 @@ def stop_system_recording():
         logger.error(f"Error al detener grabación del sistema: {str(e)}")
         return jsonify({'error': f'Error stopping system audio recording: {str(e)}'}), 500
 
+def _preparar_archivo_subido(recibido):
+    """
+    Completa una subida (/api/upload o por fragmentos): guarda el archivo en el
+    almacén de blobs, si es un video extrae su audio (salvo que ya se extrajera
+    del mismo video) y construye la respuesta con el file_id definitivo
+    
+    Args:
+        recibido (dict): Archivo guardado ('path', 'file_id', 'filename', 'sha256')
+    
+    Returns:
+        tuple: (respuesta JSON, código HTTP)
+    """
+    original_filename = secure_filename(recibido['filename'])
+    unique_filename = recibido['file_id']
+    file_path = recibido['path']
+    sha256 = recibido['sha256']
+    deduplicated = False
+    
+    # Verificar si es un archivo de video (primero por extensión, luego por contenido)
+    podria_ser_video = es_archivo_video(original_filename)
+    is_video = False
+    
+    if podria_ser_video:
+        # El mismo video ya se subió: usar el audio extraído entonces
+        derivado = buscar_audio_derivado(sha256)
+        handle = crear_handle(derivado['sha256'], derivado['extension'], app.config['UPLOAD_FOLDER']) if derivado else None
+        
+        if handle:
+            logger.info(f"Video {original_filename} ya procesado, se reutiliza su audio")
+            liberar_archivo(file_path)
+            return jsonify({
+                'success': True,
+                'file_id': handle['file_id'],
+                'filename': original_filename,
+                'size': os.path.getsize(handle['path']),
+                'sha256': derivado['sha256'],
+                'is_video': True,
+                'deduplicated': True,
+                'message': 'Audio extracted from video successfully'
+            }), 200
+        
+        # Verificar realmente si es un video inspeccionando el contenido
+        is_video = verificar_es_video_real(file_path)
+        if not is_video:
+            logger.info(f"Archivo {original_filename} tiene extensión de video pero no contiene pista de video, tratando como audio")
+    
+    if is_video:
+        logger.info(f"Archivo de video detectado: {original_filename}. Extrayendo audio...")
+        
+        # Extraer audio del video en el pool de medios (fuera del thread HTTP); la
+        # inspección hecha al verificarlo se envía al worker para no repetirla
+        try:
+            audio_path = run_media_task('extraer_audio', file_path, info=inspeccionar_medio(file_path))
+        except queue.Full:
+            liberar_archivo(file_path)
+            return jsonify({'error': 'Media processing queue is full, please try again later'}), 503
+        except (TimeoutError, CancelledError) as e:
+            # El worker se mató a mitad: borrar el video y el audio a medio escribir (mismo nombre base)
+            for resto in glob.glob(f"{glob.escape(os.path.splitext(file_path)[0])}.*"):
+                liberar_archivo(resto)
+            if isinstance(e, TimeoutError):
+                return jsonify({'error': 'Audio extraction took too long and was stopped'}), 504
+            return jsonify({'error': 'Audio extraction was cancelled'}), 409
+        except RuntimeError as e:
+            logger.error(f"Error en el worker al extraer audio: {e}")
+            audio_path = None
+        
+        # El video no se conserva: solo su audio
+        liberar_archivo(file_path)
+        
+        if audio_path is None:
+            return jsonify({'error': 'Failed to extract audio from video. Make sure the video has an audio track.'}), 500
+        
+        # Mover el audio extraído al nombre único original
+        audio_ext = audio_path.rsplit('.', 1)[1].lower()
+        unique_audio_filename = f"{uuid.uuid4().hex}.{audio_ext}"
+        final_audio_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_audio_filename)
+        os.rename(audio_path, final_audio_path)
+        
+        file_path = final_audio_path
+        unique_filename = unique_audio_filename
+        
+        video_sha256 = sha256
+        sha256 = calcular_hash_audio(file_path)
+        deduplicated = guardar_archivo(file_path, sha256)
+        registrar_audio_derivado(video_sha256, sha256, audio_ext)
+    else:
+        deduplicated = guardar_archivo(file_path, sha256)
+    
+    # Obtener tamaño del archivo
+    file_size = os.path.getsize(file_path)
+    
+    response_data = {
+        'success': True,
+        'file_id': unique_filename,
+        'filename': original_filename,
+        'size': file_size,
+        'sha256': sha256,
+        'deduplicated': deduplicated
+    }
+    
+    if is_video:
+        response_data['is_video'] = True
+        response_data['message'] = 'Audio extracted from video successfully'
+    
+    return jsonify(response_data), 200
+
 @app.route('/api/upload', methods=['POST'])
 def upload_audio():
     """
@@ -311,98 +746,176 @@ def upload_audio():
         - file_id: ID único del archivo
         - filename: nombre original del archivo
         - size: tamaño del archivo
+        - sha256: hash del contenido del archivo (en videos, del audio extraído)
+        - deduplicated: el mismo contenido ya estaba guardado (no ocupa espacio extra)
         - is_video: indica si era un archivo de video (opcional)
     """
     try:
-        # Verificar que se envió un archivo
-        if 'audio' not in request.files:
-            return jsonify({'error': 'No audio file provided'}), 400
-        
-        file = request.files['audio']
+        # Leer el cuerpo en streaming: el archivo se escribe directamente en
+        # uploads/ y su SHA-256 se calcula mientras llega (sin request.files)
+        recibido = recibir_archivo(
+            request.stream,
+            request.headers.get('Content-Type'),
+            app.config['UPLOAD_FOLDER'],
+            _nombre_destino_upload
+        )
         
-        # Verificar que se seleccionó un archivo
-        if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
+        return _preparar_archivo_subido(recibido)
         
-        # Verificar extensión
-        if not allowed_file(file.filename):
-            return jsonify({'error': 'Invalid file type. Allowed types: ' + ', '.join(app.config['ALLOWED_EXTENSIONS'])}), 400
+    except RequestEntityTooLarge:
+        return jsonify({'error': f'File too large. Maximum size: {UPLOAD_MAX_FILE_SIZE} bytes'}), 413
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error al subir archivo: {str(e)}")
+        return jsonify({'error': f'Error uploading file: {str(e)}'}), 500
+
+@app.route('/api/uploads', methods=['POST'])
+def init_resumable_upload():
+    """
+    Endpoint para iniciar una subida por fragmentos (archivos grandes, conexiones inestables)
+    
+    Espera:
+        - filename: nombre original del archivo
+        - size: tamaño total en bytes (hasta UPLOAD_RESUMABLE_MAX_SIZE)
+    
+    Retorna:
+        - upload_id: ID de la subida
+        - chunk_size: tamaño de fragmento recomendado
+        - received: rangos recibidos ([] al empezar)
+    """
+    try:
+        data = request.get_json()
         
-        # Guardar archivo con nombre único
-        original_filename = secure_filename(file.filename)
-        unique_filename = generate_unique_filename(original_filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
+        if not data or 'filename' not in data or 'size' not in data:
+            return jsonify({'error': 'filename and size are required'}), 400
         
-        file.save(file_path)
+        estado = iniciar_subida(data['filename'], data['size'], _nombre_destino_upload)
         
-        # Verificar si es un archivo de video (primero por extensión, luego por contenido)
-        podria_ser_video = es_archivo_video(original_filename)
-        is_video = False
+        return jsonify({
+            'success': True,
+            **estado,
+            'chunk_size': UPLOAD_RESUMABLE_CHUNK_SIZE,
+            'upload_url': f"/api/uploads/{estado['upload_id']}"
+        }), 201
         
-        if podria_ser_video:
-            # Verificar realmente si es un video inspeccionando el contenido
-            is_video = verificar_es_video_real(file_path)
-            if not is_video:
-                logger.info(f"Archivo {original_filename} tiene extensión de video pero no contiene pista de video, tratando como audio")
+    except RequestEntityTooLarge as e:
+        return jsonify({'error': e.description}), 413
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error al iniciar subida por fragmentos: {str(e)}", exc_info=True)
+        return jsonify({'error': f'Error starting upload: {str(e)}'}), 500
+
+@app.route('/api/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    """
+    Endpoint para enviar un fragmento de una subida
+    
+    Espera:
+        - offset (query): posición del primer byte del fragmento
+        - cuerpo: bytes del fragmento (application/octet-stream)
+    
+    Retorna:
+        - received: rangos recibidos hasta ahora
+        - received_bytes / complete
+    """
+    try:
+        offset = request.args.get('offset')
+        if offset is None:
+            return jsonify({'error': 'offset is required'}), 400
         
-        if is_video:
-            logger.info(f"Archivo de video detectado: {original_filename}. Extrayendo audio...")
-            
-            # Extraer audio del video
-            audio_path = extraer_audio_de_video(file_path)
-            
-            if audio_path is None:
-                # Limpiar archivo de video
-                os.remove(file_path)
-                return jsonify({'error': 'Failed to extract audio from video. Make sure the video has an audio track.'}), 500
-            
-            # Reemplazar el archivo de video con el audio extraído
-            os.remove(file_path)
-            
-            # Mover el audio extraído al nombre único original
-            audio_ext = audio_path.rsplit('.', 1)[1].lower()
-            unique_audio_filename = f"{uuid.uuid4().hex}.{audio_ext}"
-            final_audio_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_audio_filename)
-            os.rename(audio_path, final_audio_path)
-            
-            file_path = final_audio_path
-            unique_filename = unique_audio_filename
+        estado = recibir_fragmento(upload_id, offset, request.stream)
         
-        # Obtener tamaño del archivo
-        file_size = os.path.getsize(file_path)
+        return jsonify({'success': True, **estado}), 200
         
-        response_data = {
-            'success': True,
-            'file_id': unique_filename,
-            'filename': original_filename,
-            'size': file_size
-        }
+    except KeyError:
+        return jsonify({'error': 'Upload not found'}), 404
+    except SubidaCerrada:
+        return jsonify({'error': 'Upload is being finalized or cancelled'}), 409
+    except RequestEntityTooLarge:
+        return jsonify({'error': f"Chunk too large. Maximum size: {app.config['MAX_CONTENT_LENGTH']} bytes"}), 413
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error al recibir fragmento de {upload_id}: {str(e)}", exc_info=True)
+        return jsonify({'error': f'Error receiving chunk: {str(e)}'}), 500
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def resumable_upload_status(upload_id):
+    """
+    Endpoint para consultar los rangos recibidos de una subida (para reanudarla)
+    
+    Retorna:
+        - size, received ([[inicio, fin), ...]), received_bytes, complete
+    """
+    try:
+        return jsonify({'success': True, **estado_subida(upload_id)}), 200
+    except KeyError:
+        return jsonify({'error': 'Upload not found'}), 404
+
+@app.route('/api/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_resumable_upload(upload_id):
+    """
+    Endpoint para completar una subida por fragmentos
+    El archivo pasa a uploads/ sin copiarse y sigue el mismo camino que
+    /api/upload (detección de video y extracción de audio)
+    
+    Espera:
+        - sha256: hash del archivo para verificarlo (opcional)
+    
+    Retorna:
+        - Lo mismo que /api/upload
+    """
+    try:
+        data = request.get_json(silent=True) or {}
         
-        if is_video:
-            response_data['is_video'] = True
-            response_data['message'] = 'Audio extracted from video successfully'
+        recibido = finalizar_subida(upload_id, app.config['UPLOAD_FOLDER'], data.get('sha256'))
         
-        return jsonify(response_data), 200
+        return _preparar_archivo_subido(recibido)
         
+    except KeyError:
+        return jsonify({'error': 'Upload not found'}), 404
+    except SubidaCerrada:
+        return jsonify({'error': 'Upload is already being finalized or cancelled'}), 409
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        logger.error(f"Error al subir archivo: {str(e)}")
-        return jsonify({'error': f'Error uploading file: {str(e)}'}), 500
+        logger.error(f"Error al finalizar subida {upload_id}: {str(e)}", exc_info=True)
+        return jsonify({'error': f'Error finalizing upload: {str(e)}'}), 500
+
+@app.route('/api/uploads/<upload_id>', methods=['DELETE'])
+def cancel_resumable_upload(upload_id):
+    """Endpoint para cancelar una subida por fragmentos y borrar lo recibido"""
+    try:
+        if not cancelar_subida(upload_id):
+            return jsonify({'error': 'Upload not found'}), 404
+        return jsonify({'success': True}), 200
+    except KeyError:
+        return jsonify({'error': 'Upload not found'}), 404
+    except SubidaCerrada:
+        return jsonify({'error': 'Upload is being finalized'}), 409
 
 @app.route('/api/process', methods=['POST'])
 def process_audio():
     """
     Endpoint para procesar un archivo de audio (transcribir y resumir)
+    El procesamiento se encola en el pool de trabajos y la respuesta es inmediata
     
     Espera:
         - file_id: ID del archivo previamente subido
         - language: código del idioma (opcional, por defecto 'es')
         - api_key: API key de Speechmatics (opcional si está configurada)
+        - bypass_cache: si es true, transcribe de nuevo aunque el audio esté en caché (opcional)
+        - parallel_segments: segmentos a transcribir en paralelo en grabaciones largas (opcional)
+        - user_id: ID del usuario; si se indica, el resultado se guarda en la base de datos (opcional)
+        - filename: nombre original del archivo (opcional)
     
     Retorna:
-        - transcription: texto transcrito completo (con marcadores de hablantes)
-        - dialogues: array de diálogos estructurados por hablante [{speaker: str, text: str}]
-        - summary: resumen básico
-        - speechmatics_summary: resumen generado por Speechmatics (si disponible)
+        - job_id: ID del trabajo encolado
+        - status: estado inicial del trabajo ('queued')
+        - status_url: endpoint para consultar el progreso
+        - result_url: endpoint para obtener el resultado
     """
     try:
         data = request.get_json()
@@ -423,97 +936,283 @@ def process_audio():
         if not api_key:
             return jsonify({'error': 'Speechmatics API key is required'}), 400
         
-        # Transcribir con Speechmatics
-        resultado_transcripcion = transcribir_audio_service(
-            archivo_audio=file_path,
+        # Encolar el trabajo de transcripción
+        job_id = enqueue_job(
+            _procesar_audio_job,
+            job_type='process',
+            file_path=file_path,
             api_key=api_key,
-            idioma=language
+            language=language,
+            use_cache=not data.get('bypass_cache', False),
+            num_segmentos=int(data['parallel_segments']) if data.get('parallel_segments') else None,
+            user_id=int(data['user_id']) if data.get('user_id') else None,
+            original_filename=data.get('filename')
         )
         
-        if not resultado_transcripcion:
-            return jsonify({'error': 'Transcription failed'}), 500
-        
-        # Procesar transcripción para obtener texto limpio
-        texto_transcrito = procesar_transcripcion_para_texto(resultado_transcripcion)
-        
-        # Procesar transcripción estructurada por hablantes
-        dialogos = procesar_transcripcion_estructurada(resultado_transcripcion)
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'status': JOB_QUEUED,
+            'status_url': f'/api/jobs/{job_id}',
+            'result_url': f'/api/jobs/{job_id}/result'
+        }), 202
         
-        # Extraer resumen de Speechmatics (si está disponible)
-        resumen_speechmatics = extraer_resumen_speechmatics(resultado_transcripcion)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid value: {str(e)}'}), 400
+    except Exception as e:
+        logger.error(f"Error al encolar procesamiento de audio: {str(e)}", exc_info=True)
+        return jsonify({'error': f'Error processing audio: {str(e)}'}), 500
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_status_endpoint(job_id):
+    """
+    Endpoint para consultar el estado de un trabajo de procesamiento
+    
+    Retorna:
+        - status: 'queued', 'processing', 'completed' o 'failed'
+        - progress: etapa actual del trabajo
+        - error: mensaje de error (si falló)
+    """
+    status = get_job_status(job_id)
+    
+    if status is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify({
+        'success': True,
+        **status
+    }), 200
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def get_job_result_endpoint(job_id):
+    """
+    Endpoint para obtener el resultado de un trabajo de procesamiento
+    
+    Retorna:
+        - 200 con el mismo contenido que devolvía /api/process si el trabajo terminó
+        - 202 con el estado si el trabajo sigue en curso
+        - 500 con el error si el trabajo falló
+    """
+    job = get_job(job_id)
+    
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    if job['status'] == JOB_FAILED:
+        return jsonify({
+            'success': False,
+            'status': job['status'],
+            'error': job['error']
+        }), 500
+    
+    if job['status'] != JOB_COMPLETED:
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'status': job['status'],
+            'progress': job['progress']
+        }), 202
+    
+    return jsonify(job['result']), 200
+
+@app.route('/api/speechmatics/notifications', methods=['POST'])
+def speechmatics_notification():
+    """
+    Endpoint que recibe las notificaciones de finalización de Speechmatics
+    Speechmatics añade a la URL los parámetros 'id' (ID del trabajo) y 'status'.
+    El cuerpo se ignora: la transcripción se descarga de Speechmatics
+    
+    Retorna:
+        - matched: true si la notificación corresponde a un trabajo pendiente
+    """
+    try:
+        if not verify_notification_auth(request.headers.get('Authorization')):
+            return jsonify({'error': 'Unauthorized'}), 401
         
-        # Generar resumen básico
-        resumen = generar_resumen_completo(texto_transcrito, resultado_transcripcion)
+        speechmatics_job_id = request.args.get('id')
+        status = request.args.get('status', 'success')
         
-        # Generar resumen con IA (Gemini)
-        # resumen_ia = None
-        # gemini_api_key = data.get('gemini_api_key', os.environ.get('GEMINI_API_KEY'))
+        if not speechmatics_job_id:
+            return jsonify({'error': 'id is required'}), 400
         
-        # if gemini_api_key:
-        #     resumen_ia = generar_resumen_con_gemini(texto_transcrito, gemini_api_key)
-        # else:
-        #     logger.warning("GEMINI_API_KEY no configurada, saltando resumen con IA")
+        matched = handle_notification(speechmatics_job_id, status)
         
-        os.remove(file_path) # Limpiar el archivo subido
-        response_data = {
+        # Responder 200 siempre para que Speechmatics no reintente notificaciones desconocidas
+        return jsonify({
             'success': True,
-            'transcription': texto_transcrito,
-            'dialogues': dialogos,
-            'summary': resumen['resumen_basico']
-        }
-        
-        # Agregar resumen de Speechmatics si está disponible
-        if resumen_speechmatics:
-            response_data['speechmatics_summary'] = resumen_speechmatics
-        
-        # # Agregar resumen de IA (Gemini) si está disponible
-        # if resumen_ia:
-        #     response_data['ai_summary'] = resumen_ia
-        
-        return jsonify(response_data), 200
+            'matched': matched
+        }), 200
         
     except Exception as e:
-        logger.error(f"Error al procesar audio: {str(e)}", exc_info=True)
-        return jsonify({'error': f'Error processing audio: {str(e)}'}), 500
+        logger.error(f"Error al procesar notificación de Speechmatics: {str(e)}", exc_info=True)
+        return jsonify({'error': f'Error processing notification: {str(e)}'}), 500
+
+def _preparar_chat(data):
+    """
+    Valida una petición de chat y obtiene el contexto a enviar al modelo
+    
+    Args:
+        data (dict): Cuerpo de la petición
+    
+    Returns:
+        tuple: (parámetros, None) o (None, (respuesta de error, código))
+    """
+    if not data or 'message' not in data:
+        return None, (jsonify({'error': 'message is required'}), 400)
+    
+    transcript_id = data.get('transcript_id')
+    context = data.get('context')
+    
+    if not transcript_id and not context:
+        return None, (jsonify({'error': 'context (transcription) or transcript_id is required'}), 400)
+    
+    gemini_api_key = data.get('gemini_api_key', os.environ.get('GEMINI_API_KEY'))
+    
+    if not gemini_api_key:
+        return None, (jsonify({
+            'error': 'Gemini API key is required. Please configure GEMINI_API_KEY environment variable or provide it in the request.'
+        }), 400)
+    
+    indice = obtener_indice(transcript_id) if transcript_id else None
+    
+    if indice is None:
+        if not context:
+            # El índice expiró o el servidor se reinició: el cliente debe reenviar context
+            return None, (jsonify({
+                'error': 'Transcript not found, context is required',
+                'transcript_id': transcript_id
+            }), 404)
+        
+        transcript_id = registrar_transcripcion(transcripcion=context)
+        indice = obtener_indice(transcript_id)
+    
+    if indice is None:
+        return None, (jsonify({'error': 'context (transcription) is required'}), 400)
+    
+    # Turnos relevantes; si la pregunta no coincide con ninguno, la transcripción completa
+    extracto = indice.extracto(data['message'])
+    if extracto:
+        contexto_chat = extracto
+    else:
+        contexto_chat = "\n\n".join(f"[SPEAKER_{d['speaker']}] {d['text']}" for d in indice.dialogos)
+    
+    return {
+        'mensaje': data['message'],
+        'contexto_transcripcion': contexto_chat,
+        'api_key': gemini_api_key,
+        'es_extracto': bool(extracto),
+        'transcript_id': transcript_id
+    }, None
+
+def _preparar_edicion(data):
+    """
+    Valida una petición de edición de resumen
+    
+    Args:
+        data (dict): Cuerpo de la petición
+    
+    Returns:
+        tuple: (parámetros, None) o (None, (respuesta de error, código))
+    """
+    if not data or 'instruction' not in data:
+        return None, (jsonify({'error': 'instruction is required'}), 400)
+    
+    if 'current_summary' not in data or not data['current_summary']:
+        return None, (jsonify({'error': 'current_summary is required'}), 400)
+    
+    if 'context' not in data or not data['context']:
+        return None, (jsonify({'error': 'context (transcription) is required'}), 400)
+    
+    gemini_api_key = data.get('gemini_api_key', os.environ.get('GEMINI_API_KEY'))
+    
+    if not gemini_api_key:
+        return None, (jsonify({
+            'error': 'Gemini API key is required. Please configure GEMINI_API_KEY environment variable or provide it in the request.'
+        }), 400)
+    
+    return {
+        'instruccion': data['instruction'],
+        'resumen_actual': data['current_summary'],
+        'contexto_transcripcion': data['context'],
+        'api_key': gemini_api_key
+    }, None
+
+def _evento_sse(datos, evento=None):
+    """
+    Serializa un evento Server-Sent Events
+    
+    Args:
+        datos (dict): Contenido del evento (se envía como JSON)
+        evento (str): Nombre del evento (opcional, 'message' por defecto)
+    
+    Returns:
+        str: Evento en formato SSE
+    """
+    cabecera = f"event: {evento}\n" if evento else ""
+    return f"{cabecera}data: {json.dumps(datos, ensure_ascii=False)}\n\n"
+
+def _respuesta_sse(fragmentos, datos_fin=None):
+    """
+    Crea una respuesta SSE a partir de un generador de fragmentos de texto
+    Cada fragmento se envía como {"text": ...}; al terminar se envía el evento 'done'.
+    Los errores "Error: ..." se envían como evento 'error', igual que el 500 de
+    los endpoints sin streaming
+    
+    Args:
+        fragmentos (iterable): Fragmentos de texto (ErrorStream si hay error)
+        datos_fin (dict): Datos adicionales del evento 'done' (opcional)
+    
+    Returns:
+        Response: Respuesta text/event-stream
+    """
+    def generar():
+        try:
+            for fragmento in fragmentos:
+                if isinstance(fragmento, ErrorStream) and fragmento.startswith("Error:"):
+                    yield _evento_sse({'success': False, 'error': str(fragmento)}, 'error')
+                    return
+                yield _evento_sse({'text': str(fragmento)})
+            
+            yield _evento_sse(dict(datos_fin or {}, success=True), 'done')
+        
+        except Exception as e:
+            logger.error(f"Error en respuesta en streaming: {str(e)}", exc_info=True)
+            yield _evento_sse({'success': False, 'error': f"Error: {str(e)}"}, 'error')
+    
+    return Response(
+        stream_with_context(generar()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 @app.route('/api/chat', methods=['POST'])
 def chat_with_ai():
     """
     Endpoint para chat con IA (Gemini) sobre la transcripción
+    Solo se envían al modelo los turnos de hablante relevantes para la pregunta
+    (índice BM25 por transcripción, guardado en el servidor)
     
     Espera:
         - message: mensaje del usuario
-        - context: contexto de la transcripción (requerido)
+        - transcript_id: ID de la transcripción indexada (devuelto por /api/process)
+        - context: contexto de la transcripción (requerido si no hay transcript_id
+                   o si el servidor ya no lo tiene indexado)
         - gemini_api_key: API key de Gemini (opcional si está en variables de entorno)
     
     Retorna:
         - response: respuesta de Gemini
+        - transcript_id: ID para las siguientes preguntas (sin reenviar context)
         - success: true/false
     """
     try:
-        data = request.get_json()
+        params, error = _preparar_chat(request.get_json())
+        if error:
+            return error
         
-        if not data or 'message' not in data:
-            return jsonify({'error': 'message is required'}), 400
-        
-        if 'context' not in data or not data['context']:
-            return jsonify({'error': 'context (transcription) is required'}), 400
-        
-        message = data['message']
-        context = data['context']
-        gemini_api_key = data.get('gemini_api_key', os.environ.get('GEMINI_API_KEY'))
-        
-        if not gemini_api_key:
-            return jsonify({
-                'error': 'Gemini API key is required. Please configure GEMINI_API_KEY environment variable or provide it in the request.'
-            }), 400
+        transcript_id = params.pop('transcript_id')
         
         # Llamar a Gemini para procesar la pregunta
-        respuesta = chat_con_gemini(
-            mensaje=message,
-            contexto_transcripcion=context,
-            api_key=gemini_api_key
-        )
+        respuesta = chat_con_gemini(**params)
         
         if respuesta.startswith("Error:"):
             return jsonify({
@@ -523,13 +1222,43 @@ def chat_with_ai():
         
         return jsonify({
             'success': True,
-            'response': respuesta
+            'response': respuesta,
+            'transcript_id': transcript_id
         }), 200
         
     except Exception as e:
         logger.error(f"Error en chat: {str(e)}", exc_info=True)
         return jsonify({'error': f'Error in chat: {str(e)}'}), 500
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_with_ai_stream():
+    """
+    Igual que /api/chat, pero devuelve la respuesta en streaming (Server-Sent Events)
+    
+    Espera:
+        - mismos campos que /api/chat
+    
+    Retorna (text/event-stream):
+        - eventos sin nombre con {"text": fragmento}
+        - evento 'done' con {"success": true, "transcript_id": ...}
+        - evento 'error' con {"success": false, "error": "Error: ..."}
+    """
+    try:
+        params, error = _preparar_chat(request.get_json())
+        if error:
+            return error
+        
+        transcript_id = params.pop('transcript_id')
+        
+        return _respuesta_sse(
+            chat_con_gemini_stream(**params),
+            datos_fin={'transcript_id': transcript_id}
+        )
+        
+    except Exception as e:
+        logger.error(f"Error en chat: {str(e)}", exc_info=True)
+        return jsonify({'error': f'Error in chat: {str(e)}'}), 500
+
 @app.route('/api/edit-summary', methods=['POST'])
 def edit_summary():
     """
@@ -546,34 +1275,12 @@ def edit_summary():
         - success: true/false
     """
     try:
-        data = request.get_json()
-        
-        if not data or 'instruction' not in data:
-            return jsonify({'error': 'instruction is required'}), 400
-        
-        if 'current_summary' not in data or not data['current_summary']:
-            return jsonify({'error': 'current_summary is required'}), 400
-        
-        if 'context' not in data or not data['context']:
-            return jsonify({'error': 'context (transcription) is required'}), 400
-        
-        instruction = data['instruction']
-        current_summary = data['current_summary']
-        context = data['context']
-        gemini_api_key = data.get('gemini_api_key', os.environ.get('GEMINI_API_KEY'))
-        
-        if not gemini_api_key:
-            return jsonify({
-                'error': 'Gemini API key is required. Please configure GEMINI_API_KEY environment variable or provide it in the request.'
-            }), 400
+        params, error = _preparar_edicion(request.get_json())
+        if error:
+            return error
         
         # Llamar a Gemini para editar el resumen
-        nuevo_resumen = editar_resumen_con_gemini(
-            instruccion=instruction,
-            resumen_actual=current_summary,
-            contexto_transcripcion=context,
-            api_key=gemini_api_key
-        )
+        nuevo_resumen = editar_resumen_con_gemini(**params)
         
         if nuevo_resumen.startswith("Error:"):
             return jsonify({
@@ -590,6 +1297,30 @@ def edit_summary():
         logger.error(f"Error al editar resumen: {str(e)}", exc_info=True)
         return jsonify({'error': f'Error editing summary: {str(e)}'}), 500
 
+@app.route('/api/edit-summary/stream', methods=['POST'])
+def edit_summary_stream():
+    """
+    Igual que /api/edit-summary, pero devuelve el resumen en streaming (Server-Sent Events)
+    
+    Espera:
+        - mismos campos que /api/edit-summary
+    
+    Retorna (text/event-stream):
+        - eventos sin nombre con {"text": fragmento}
+        - evento 'done' con {"success": true}
+        - evento 'error' con {"success": false, "error": "Error: ..."}
+    """
+    try:
+        params, error = _preparar_edicion(request.get_json())
+        if error:
+            return error
+        
+        return _respuesta_sse(editar_resumen_con_gemini_stream(**params))
+        
+    except Exception as e:
+        logger.error(f"Error al editar resumen: {str(e)}", exc_info=True)
+        return jsonify({'error': f'Error editing summary: {str(e)}'}), 500
+
 # ENDPOINTS DE AGENTES PERSONALIZADOS
 @app.route('/api/agents', methods=['POST'])
 def create_custom_agent():
@@ -845,6 +1576,103 @@ def delete_custom_agent(agent_id):
         return jsonify({'error': f'Error deleting agent: {str(e)}'}), 500
 
 
+def _resolver_agente(data):
+    """
+    Obtiene el agente de una petición: configuración local o agente de la base de datos
+    
+    Args:
+        data (dict): Cuerpo de la petición
+    
+    Returns:
+        tuple: (agente, None) o (None, (respuesta de error, código))
+    """
+    # CASO 1: Agente Local (enviado completo desde frontend)
+    if 'agent_config' in data:
+        logger.info("Usando configuración de agente local proporcionada en la petición")
+        agent = data['agent_config']
+        # Validar campos mínimos del agente local
+        if 'provider' not in agent or 'prompt_template' not in agent:
+            return None, (jsonify({'error': 'Invalid local agent config: provider and prompt_template are required'}), 400)
+        return agent, None
+    
+    # CASO 2: Agente de Base de Datos (búsqueda por ID)
+    if 'agent_id' in data and 'user_id' in data:
+        agent_id = int(data['agent_id'])
+        user_id = int(data['user_id'])
+        agent = get_agent_by_id(agent_id, user_id=user_id)
+        
+        if not agent:
+            return None, (jsonify({'error': 'Agent not found in database'}), 404)
+        
+        if not agent.get('is_active'):
+            return None, (jsonify({'error': 'Agent is not active'}), 400)
+        return agent, None
+    
+    return None, (jsonify({'error': 'Either agent_config OR (agent_id AND user_id) must be provided'}), 400)
+
+@app.route('/api/agents/generate/stream', methods=['POST'])
+def generate_agent_summary_stream():
+    """
+    Endpoint para generar en streaming (Server-Sent Events) el resumen de un agente
+    sobre una transcripción ya procesada
+    
+    Espera:
+        - agent_config: Configuración completa del agente (para modo local)
+             OR
+        - agent_id y user_id: agente de la base de datos
+        
+        - transcription: texto de la transcripción
+             OR
+        - transcript_id: ID de la transcripción indexada (devuelto por /api/process)
+        - gemini_api_key: API key de Gemini (opcional)
+        - openai_api_key: API key de OpenAI (opcional)
+    
+    Retorna (text/event-stream):
+        - eventos sin nombre con {"text": fragmento}
+        - evento 'done' con {"success": true}
+        - evento 'error' con {"success": false, "error": "Error: ..."}
+    """
+    try:
+        data = request.get_json()
+        
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+        
+        agent, error = _resolver_agente(data)
+        if error:
+            return error
+        
+        transcription = data.get('transcription')
+        if not transcription and data.get('transcript_id'):
+            indice = obtener_indice(data['transcript_id'])
+            if indice is None:
+                return jsonify({'error': 'Transcript not found, transcription is required'}), 404
+            transcription = "\n\n".join(f"[SPEAKER_{d['speaker']}]{d['text']}" for d in indice.dialogos)
+        
+        if not transcription:
+            return jsonify({'error': 'transcription or transcript_id is required'}), 400
+        
+        gemini_api_key = data.get('gemini_api_key', os.environ.get('GEMINI_API_KEY'))
+        openai_api_key = data.get('openai_api_key', os.environ.get('OPENAI_API_KEY'))
+        
+        # Verificar que la API key del proveedor esté disponible
+        provider = agent.get('provider', '').lower()
+        if provider == 'gemini' and not gemini_api_key:
+            return jsonify({'error': 'Gemini API key is required for this agent'}), 400
+        elif provider == 'openai' and not openai_api_key:
+            return jsonify({'error': 'OpenAI API key is required for this agent'}), 400
+        
+        return _respuesta_sse(generar_resumen_con_agente_stream(
+            transcription=transcription,
+            agent_config=agent,
+            gemini_api_key=gemini_api_key,
+            openai_api_key=openai_api_key
+        ))
+        
+    except Exception as e:
+        logger.error(f"Error al generar resumen con agente: {str(e)}", exc_info=True)
+        return jsonify({'error': f'Error generating agent summary: {str(e)}'}), 500
+
 @app.route('/api/process-with-agent', methods=['POST'])
 def process_audio_with_agent():
     """
@@ -855,12 +1683,16 @@ def process_audio_with_agent():
         - agent_config: Configuración completa del agente (para modo local)
              OR
         - agent_id: ID del agente a usar (para modo DB)
-        - user_id: ID del usuario (para verificar propiedad del agente en modo DB)
+        - user_id: ID del usuario (para verificar propiedad del agente en modo DB);
+                   si se indica, la transcripción se guarda en la base de datos
+        - filename: nombre original del archivo (opcional)
         
         - language: código del idioma (opcional, por defecto 'es')
         - speechmatics_api_key: API key de Speechmatics (opcional)
         - gemini_api_key: API key de Gemini (opcional)
         - openai_api_key: API key de OpenAI (opcional)
+        - bypass_cache: si es true, transcribe de nuevo aunque el audio esté en caché (opcional)
+        - parallel_segments: segmentos a transcribir en paralelo en grabaciones largas (opcional)
     
     Retorna:
         - transcription: texto transcrito completo
@@ -883,30 +1715,9 @@ def process_audio_with_agent():
         openai_api_key = data.get('openai_api_key', os.environ.get('OPENAI_API_KEY'))
         
         # Determinar el agente (Local vs DB)
-        agent = None
-        
-        # CASO 1: Agente Local (enviado completo desde frontend)
-        if 'agent_config' in data:
-            logger.info("Usando configuración de agente local proporcionada en la petición")
-            agent = data['agent_config']
-            # Validar campos mínimos del agente local
-            if 'provider' not in agent or 'prompt_template' not in agent:
-                 return jsonify({'error': 'Invalid local agent config: provider and prompt_template are required'}), 400
-                 
-        # CASO 2: Agente de Base de Datos (búsqueda por ID)
-        elif 'agent_id' in data and 'user_id' in data:
-            agent_id = int(data['agent_id'])
-            user_id = int(data['user_id'])
-            agent = get_agent_by_id(agent_id, user_id=user_id)
-            
-            if not agent:
-                return jsonify({'error': 'Agent not found in database'}), 404
-            
-            if not agent.get('is_active'):
-                return jsonify({'error': 'Agent is not active'}), 400
-        else:
-            return jsonify({'error': 'Either agent_config OR (agent_id AND user_id) must be provided'}), 400
-        
+        agent, error = _resolver_agente(data)
+        if error:
+            return error
         
         # Verificar que existe el archivo
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], file_id)
@@ -924,23 +1735,37 @@ def process_audio_with_agent():
         elif provider == 'openai' and not openai_api_key:
             return jsonify({'error': 'OpenAI API key is required for this agent'}), 400
         
-        # Transcribir con Speechmatics
-        resultado_transcripcion = transcribir_audio_service(
-            archivo_audio=file_path,
-            api_key=speechmatics_api_key,
-            idioma=language
-        )
-        
-        if not resultado_transcripcion:
-            return jsonify({'error': 'Transcription failed'}), 500
-        
-        # Procesar transcripción
-        texto_transcrito = procesar_transcripcion_para_texto(resultado_transcripcion)
-        dialogos = procesar_transcripcion_estructurada(resultado_transcripcion)
-        resumen_speechmatics = extraer_resumen_speechmatics(resultado_transcripcion)
+        use_cache = not data.get('bypass_cache', False)
+        persistencia = _preparar_persistencia(file_path, language, data.get('user_id'), data.get('filename'))
+        guardado = _resultado_guardado(persistencia, use_cache)
         
-        # Generar resumen básico
-        resumen = generar_resumen_completo(texto_transcrito, resultado_transcripcion)
+        if guardado:
+            # El audio ya se transcribió y guardó: no se vuelve a transcribir
+            texto_transcrito = guardado['transcription_text'] or ''
+            dialogos = guardado['dialogues'] or []
+            resumen_speechmatics = _resumen_speechmatics_guardado(guardado)
+            resumen = generar_resumen_completo(texto_transcrito, None)
+        else:
+            # Transcribir con Speechmatics
+            resultado_transcripcion = transcribir_audio_service(
+                archivo_audio=file_path,
+                api_key=speechmatics_api_key,
+                idioma=language,
+                use_cache=use_cache,
+                num_segmentos=int(data['parallel_segments']) if data.get('parallel_segments') else None
+            )
+            
+            if not resultado_transcripcion:
+                return jsonify({'error': 'Transcription failed'}), 500
+            
+            # Procesar transcripción
+            procesado = procesar_transcripcion_completa(resultado_transcripcion)
+            texto_transcrito = procesado['texto']
+            dialogos = procesado['dialogos']
+            resumen_speechmatics = extraer_resumen_speechmatics(resultado_transcripcion)
+            
+            # Generar resumen básico
+            resumen = generar_resumen_completo(texto_transcrito, resultado_transcripcion)
         
         # Generar resumen con el agente personalizado
         resumen_agente = generar_resumen_con_agente(
@@ -950,8 +1775,10 @@ def process_audio_with_agent():
             openai_api_key=openai_api_key
         )
         
-        # Limpiar el archivo subido
-        os.remove(file_path)
+        # Liberar el archivo subido salvo que lo conserve la grabación que se va a guardar
+        file_size = os.path.getsize(file_path)
+        if guardado or not persistencia:
+            liberar_archivo(file_path)
         
         response_data = {
             'success': True,
@@ -959,6 +1786,7 @@ def process_audio_with_agent():
             'dialogues': dialogos,
             'summary': resumen['resumen_basico'],
             'agent_summary': resumen_agente,
+            'transcript_id': registrar_transcripcion(dialogos=dialogos, transcripcion=texto_transcrito),
             'agent_used': {
                 'id': agent.get('id', 'local'),
                 'name': agent.get('name', 'Local Agent'),
@@ -970,6 +1798,18 @@ def process_audio_with_agent():
         if resumen_speechmatics:
             response_data['speechmatics_summary'] = resumen_speechmatics
         
+        if guardado:
+            response_data['from_database'] = True
+            if guardado['recording_id']:
+                response_data['recording_id'] = guardado['recording_id']
+        else:
+            # Se guarda la transcripción; el resumen del agente no sustituye al de Speechmatics
+            persist_id = _persistir_resultado(
+                persistencia, file_path, file_size, texto_transcrito, dialogos, resumen_speechmatics
+            )
+            if persist_id:
+                response_data['persist_id'] = persist_id
+        
         return jsonify(response_data), 200
         
     except ValueError as e:
@@ -978,6 +1818,167 @@ def process_audio_with_agent():
         logger.error(f"Error al procesar audio con agente: {str(e)}", exc_info=True)
         return jsonify({'error': f'Error processing audio with agent: {str(e)}'}), 500
 
+# ==================== GRABACIONES GUARDADAS ====================
+
+@app.route('/api/recordings/<int:recording_id>', methods=['GET'])
+def get_saved_recording(recording_id):
+    """
+    Endpoint para reabrir una grabación guardada (lectura de la base de datos,
+    sin volver a transcribir)
+    
+    Parámetros de query:
+        - user_id: ID del usuario que la solicita
+    
+    Retorna:
+        - recording: grabación con transcripción, diálogos y resumen
+        - transcript_id: ID para usar la transcripción en /api/chat
+    """
+    try:
+        user_id = request.args.get('user_id')
+        if not user_id:
+            return jsonify({'error': 'user_id is required'}), 400
+        
+        user = get_user_by_id(int(user_id))
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        if not can_access_recording(user['id'], user['role'], recording_id):
+            return jsonify({'error': 'Access denied'}), 403
+        
+        recording = get_recording_with_content(recording_id)
+        if not recording:
+            return jsonify({'error': 'Recording not found'}), 404
+        
+        for campo, valor in recording.items():
+            if hasattr(valor, 'isoformat'):
+                recording[campo] = valor.isoformat()
+        
+        return jsonify({
+            'success': True,
+            'recording': recording,
+            'transcript_id': registrar_transcripcion(
+                dialogos=recording.get('dialogues') or [],
+                transcripcion=recording.get('transcription_text') or ''
+            )
+        }), 200
+        
+    except ValueError:
+        return jsonify({'error': 'Invalid user_id'}), 400
+    except Exception as e:
+        logger.error(f"Error al obtener grabación {recording_id}: {str(e)}", exc_info=True)
+        return jsonify({'error': f'Error getting recording: {str(e)}'}), 500
+
+@app.route('/api/search', methods=['GET'])
+def search_saved_recordings():
+    """
+    Endpoint para buscar grabaciones guardadas por el texto de la transcripción
+    y del resumen, ordenadas por relevancia
+    
+    Parámetros de query:
+        - user_id: ID del usuario que busca (solo ve las grabaciones a las que tiene acceso)
+        - q: texto a buscar (admite "frase exacta", -excluir y OR)
+        - language: idioma de la búsqueda (opcional)
+        - limit: resultados por página (opcional, por defecto 20)
+        - offset: desplazamiento (opcional)
+    
+    Retorna:
+        - results: grabaciones con rank, summary_snippet y transcription_snippet
+          (las coincidencias van marcadas con <mark>)
+    """
+    try:
+        user_id = request.args.get('user_id')
+        texto = request.args.get('q', '').strip()
+        
+        if not user_id:
+            return jsonify({'error': 'user_id is required'}), 400
+        if not texto:
+            return jsonify({'error': 'q is required'}), 400
+        
+        user = get_user_by_id(int(user_id))
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        results = search_recordings(
+            user['id'],
+            user['role'],
+            texto,
+            language=request.args.get('language'),
+            limit=int(request.args.get('limit', DEFAULT_SEARCH_LIMIT)),
+            offset=int(request.args.get('offset', 0))
+        )
+        
+        if results is None:
+            return jsonify({'error': 'Search failed'}), 500
+        
+        for recording in results:
+            if recording.get('upload_date'):
+                recording['upload_date'] = recording['upload_date'].isoformat()
+        
+        return jsonify({
+            'success': True,
+            'results': results,
+            'count': len(results)
+        }), 200
+        
+    except ValueError:
+        return jsonify({'error': 'Invalid user_id, limit or offset'}), 400
+    except Exception as e:
+        logger.error(f"Error al buscar grabaciones: {str(e)}", exc_info=True)
+        return jsonify({'error': f'Error searching recordings: {str(e)}'}), 500
+
+@app.route('/api/semantic-search', methods=['GET'])
+def semantic_search_saved_recordings():
+    """
+    Endpoint para buscar grabaciones guardadas por significado (embeddings de
+    los turnos de la transcripción en el índice vectorial local)
+    
+    Parámetros de query:
+        - user_id: ID del usuario que busca (solo ve las grabaciones a las que tiene acceso)
+        - q: texto a buscar
+        - limit: número máximo de grabaciones (opcional, por defecto 20)
+    
+    Retorna:
+        - results: grabaciones con score y matches (turnos más parecidos a la búsqueda)
+    """
+    try:
+        user_id = request.args.get('user_id')
+        texto = request.args.get('q', '').strip()
+        
+        if not user_id:
+            return jsonify({'error': 'user_id is required'}), 400
+        if not texto:
+            return jsonify({'error': 'q is required'}), 400
+        
+        user = get_user_by_id(int(user_id))
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        results = semantic_search_recordings(
+            user['id'],
+            user['role'],
+            texto,
+            limit=int(request.args.get('limit', DEFAULT_SEARCH_LIMIT))
+        )
+        
+        if results is None:
+            return jsonify({'error': 'Search failed'}), 500
+        
+        for recording in results:
+            if recording.get('upload_date'):
+                recording['upload_date'] = recording['upload_date'].isoformat()
+        
+        return jsonify({
+            'success': True,
+            'results': results,
+            'count': len(results)
+        }), 200
+        
+    except ValueError:
+        return jsonify({'error': 'Invalid user_id or limit'}), 400
+    except Exception as e:
+        logger.error(f"Error en la búsqueda semántica: {str(e)}", exc_info=True)
+        return jsonify({'error': f'Error searching recordings: {str(e)}'}), 500
+
 # SERVIR ARCHIVOS DE UPLOADS
 @app.route('/uploads/<path:filename>')
 def serve_upload(filename):
@@ -1028,6 +2029,15 @@ if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     debug_mode = os.environ.get('DEBUG', 'True').lower() == 'true'
 
+    # Servicios en segundo plano solo en el proceso que atiende las peticiones:
+    # con el recargador de Werkzeug app.py también se ejecuta en el proceso padre.
+    # Sin arrancarlos aquí (otro servidor WSGI, tests) se inician con su primer uso
+    if not debug_mode or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        # Escritura de los resultados (recupera los pendientes en disco)
+        start_persistence()
+        # Workers del pool de medios (arrancan ya para no pagar su inicio en la primera subida)
+        start_media_pool()
+
     print(f"\n{'='*60}")
     print(f"  Audio Summarizer - Server Running")
     print(f"{'='*60}")
@@ -0,0 +1,135 @@
+"""
+Caché del grafo de acceso supervisor -> miembros de sus equipos
+Las verificaciones de permisos consultan un set en memoria en lugar de hacer
+un JOIN entre teams y team_members en cada llamada. team_service invalida las
+entradas afectadas cada vez que cambia un equipo o sus miembros; el tiempo de
+vida cubre los cambios hechos fuera de este proceso (otros workers o SQL directo).
+"""
+
+import os
+import time
+import logging
+import threading
+from database import execute_query
+
+logger = logging.getLogger(__name__)
+
+# Tiempo de vida de cada entrada (segundos)
+ACCESS_CACHE_TTL = float(os.environ.get('ACCESS_CACHE_TTL', 300))
+
+# supervisor_id -> (set de team_ids, frozenset de user_ids, fecha de carga)
+_supervisores = {}
+# Se incrementa con cada invalidación para no guardar cargas que empezaron antes
+_generacion = 0
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+_lock = threading.Lock()
+
+
+def _cargar(supervisor_id):
+    """
+    Lee de la base de datos los equipos de un supervisor y sus miembros
+
+    Returns:
+        tuple: (set de team_ids, frozenset de user_ids) o None si falla
+    """
+    query = """
+        SELECT t.id AS team_id, tm.user_id
+        FROM teams t
+        LEFT JOIN team_members tm ON tm.team_id = t.id
+        WHERE t.supervisor_id = %s
+    """
+    results = execute_query(query, (supervisor_id,), fetch_all=True)
+
+    if results is None:
+        return None
+
+    team_ids = {r['team_id'] for r in results}
+    user_ids = frozenset(r['user_id'] for r in results if r['user_id'] is not None)
+    return team_ids, user_ids
+
+
+def get_supervised_user_ids(supervisor_id):
+    """
+    Obtiene los usuarios que pertenecen a algún equipo del supervisor
+
+    Args:
+        supervisor_id (int): ID del supervisor
+
+    Returns:
+        frozenset: IDs de los usuarios o None si no se pudo consultar
+    """
+    with _lock:
+        entrada = _supervisores.get(supervisor_id)
+        if entrada is not None and time.monotonic() - entrada[2] < ACCESS_CACHE_TTL:
+            _stats['hits'] += 1
+            return entrada[1]
+        _stats['misses'] += 1
+        generacion = _generacion
+
+    cargado = _cargar(supervisor_id)
+
+    if cargado is None:
+        return None
+
+    team_ids, user_ids = cargado
+
+    with _lock:
+        if generacion == _generacion:
+            _supervisores[supervisor_id] = (team_ids, user_ids, time.monotonic())
+
+    return user_ids
+
+
+def invalidate_supervisor(supervisor_id):
+    """
+    Descarta la entrada de un supervisor (equipo creado o reasignado)
+
+    Args:
+        supervisor_id (int): ID del supervisor
+    """
+    global _generacion
+
+    with _lock:
+        _generacion += 1
+        _stats['invalidations'] += 1
+        _supervisores.pop(supervisor_id, None)
+
+
+def invalidate_team(team_id):
+    """
+    Descarta las entradas de los supervisores que incluyen un equipo
+    (miembros agregados o removidos, equipo actualizado o eliminado)
+
+    Args:
+        team_id (int): ID del equipo
+    """
+    global _generacion
+
+    with _lock:
+        _generacion += 1
+        _stats['invalidations'] += 1
+        for supervisor_id in [s for s, entrada in _supervisores.items() if team_id in entrada[0]]:
+            del _supervisores[supervisor_id]
+
+
+def clear():
+    """Descarta todas las entradas"""
+    global _generacion
+
+    with _lock:
+        _generacion += 1
+        _stats['invalidations'] += 1
+        _supervisores.clear()
+
+
+def get_access_cache_stats():
+    """
+    Obtiene los contadores de la caché de acceso
+
+    Returns:
+        dict: Supervisores en caché, aciertos, fallos e invalidaciones
+    """
+    with _lock:
+        stats = dict(_stats)
+        stats['supervisors'] = len(_supervisores)
+    return stats
@@ -5,17 +5,33 @@ Soporta: Gemini y OpenAI
 
 import logging
 import os
-from database import execute_query
+from database import execute_query, register_prepared_statement, execute_prepared
+from hierarchical_summary import condensar_transcripcion
+from ai_stream import ErrorStream
 
 # Importar servicios específicos de proveedores
-from .gemini_service import generate_with_gemini
-from .openai_service import generate_with_openai
+from .gemini_service import generate_with_gemini, generate_with_gemini_stream
+from .openai_service import generate_with_openai, generate_with_openai_stream
 
 logger = logging.getLogger(__name__)
 
 SYSTEM_PROMPT_PATH = os.path.join(os.path.dirname(__file__), "SystemPrompt.xml")
 _SYSTEM_PROMPT_CACHE = None
 
+# Consultas de get_agent_by_id (sentencias preparadas en el servidor)
+_AGENT_BY_ID = register_prepared_statement('agents_get_by_id', """
+    SELECT id, user_id, name, description, provider, prompt_template,
+           model_name, is_active, created_at, updated_at
+    FROM agents
+    WHERE id = %s
+""")
+_AGENT_BY_ID_AND_USER = register_prepared_statement('agents_get_by_id_and_user', """
+    SELECT id, user_id, name, description, provider, prompt_template,
+           model_name, is_active, created_at, updated_at
+    FROM agents
+    WHERE id = %s AND user_id = %s
+""")
+
 
 def _get_system_prompt():
     """
@@ -38,9 +54,34 @@ def _get_system_prompt():
 
     return _SYSTEM_PROMPT_CACHE
 
-def generate_with_agent(agent_config, transcription, gemini_api_key=None, openai_api_key=None):
+def _get_provider_generator(provider, model_name, gemini_api_key=None, openai_api_key=None):
     """
-    Genera resumen usando un agente personalizado
+    Crea la función de generación usada para resumir bloques de transcripciones largas
+    
+    Args:
+        provider (str): Proveedor de IA ('gemini' o 'openai')
+        model_name (str): Nombre del modelo
+        gemini_api_key (str): API key de Gemini (opcional)
+        openai_api_key (str): API key de OpenAI (opcional)
+        
+    Returns:
+        callable: generar(prompt) -> str, que lanza RuntimeError si el proveedor falla
+    """
+    def generar(prompt):
+        if provider == 'gemini':
+            texto = generate_with_gemini(prompt=prompt, model_name=model_name, api_key=gemini_api_key)
+        else:
+            texto = generate_with_openai(prompt=prompt, model_name=model_name, api_key=openai_api_key)
+        
+        if texto is None or texto.startswith("Error"):
+            raise RuntimeError(texto or "Respuesta vacía del proveedor")
+        return texto
+    
+    return generar
+
+def _build_agent_prompts(agent_config, transcription, gemini_api_key=None, openai_api_key=None):
+    """
+    Construye el prompt del sistema y el del usuario para un agente
     
     Args:
         agent_config (dict): Configuración del agente (de la base de datos)
@@ -49,20 +90,27 @@ def generate_with_agent(agent_config, transcription, gemini_api_key=None, openai
         openai_api_key (str): API key de OpenAI (opcional)
         
     Returns:
-        str: Resumen generado por el agente
+        tuple: (provider, model_name, system_prompt, user_prompt)
     """
-    try:
-        provider = agent_config.get('provider', '').lower()
-        # El prompt_template aquí son las "Reglas del Usuario"
-        user_rules = (agent_config.get('prompt_template', '')).strip()
-        model_name = agent_config.get('model_name')
-        if not user_rules:
-            user_rules = "<rule>No se proporcionaron instrucciones personalizadas.</rule>"
+    provider = agent_config.get('provider', '').lower()
+    # El prompt_template aquí son las "Reglas del Usuario"
+    user_rules = (agent_config.get('prompt_template', '')).strip()
+    model_name = agent_config.get('model_name')
+    if not user_rules:
+        user_rules = "<rule>No se proporcionaron instrucciones personalizadas.</rule>"
 
-        system_prompt = _get_system_prompt()
+    system_prompt = _get_system_prompt()
+    
+    # Transcripciones que no caben en el contexto se resumen por bloques
+    if provider in ('gemini', 'openai'):
+        transcription = condensar_transcripcion(
+            transcription,
+            _get_provider_generator(provider, model_name, gemini_api_key, openai_api_key),
+            clave_modelo=f"{provider}:{model_name}"
+        )
 
-        # Construir el Prompt Estructurado en XML (solo para la sección del usuario)
-        user_prompt = f"""
+    # Construir el Prompt Estructurado en XML (solo para la sección del usuario)
+    user_prompt = f"""
 <user_rules>
 {user_rules}
 </user_rules>
@@ -71,6 +119,26 @@ def generate_with_agent(agent_config, transcription, gemini_api_key=None, openai
 {transcription}
 </transcription>
 """.strip()
+    
+    return provider, model_name, system_prompt, user_prompt
+
+def generate_with_agent(agent_config, transcription, gemini_api_key=None, openai_api_key=None):
+    """
+    Genera resumen usando un agente personalizado
+    
+    Args:
+        agent_config (dict): Configuración del agente (de la base de datos)
+        transcription (str): Texto de la transcripción
+        gemini_api_key (str): API key de Gemini (opcional)
+        openai_api_key (str): API key de OpenAI (opcional)
+        
+    Returns:
+        str: Resumen generado por el agente
+    """
+    try:
+        provider, model_name, system_prompt, user_prompt = _build_agent_prompts(
+            agent_config, transcription, gemini_api_key, openai_api_key
+        )
         
         # Generar según el proveedor
         if provider == 'gemini':
@@ -97,6 +165,48 @@ def generate_with_agent(agent_config, transcription, gemini_api_key=None, openai
         return f"Error: {str(e)}"
 
 
+def generate_with_agent_stream(agent_config, transcription, gemini_api_key=None, openai_api_key=None):
+    """
+    Genera resumen usando un agente personalizado, en streaming
+    
+    Args:
+        agent_config (dict): Configuración del agente (de la base de datos)
+        transcription (str): Texto de la transcripción
+        gemini_api_key (str): API key de Gemini (opcional)
+        openai_api_key (str): API key de OpenAI (opcional)
+        
+    Yields:
+        str: Fragmentos del resumen (ErrorStream si falla)
+    """
+    try:
+        provider, model_name, system_prompt, user_prompt = _build_agent_prompts(
+            agent_config, transcription, gemini_api_key, openai_api_key
+        )
+        
+        if provider == 'gemini':
+            yield from generate_with_gemini_stream(
+                prompt=user_prompt,
+                system_prompt=system_prompt,
+                model_name=model_name,
+                api_key=gemini_api_key
+            )
+        
+        elif provider == 'openai':
+            yield from generate_with_openai_stream(
+                prompt=user_prompt,
+                system_prompt=system_prompt,
+                model_name=model_name,
+                api_key=openai_api_key
+            )
+        
+        else:
+            yield ErrorStream(f"Error: Proveedor '{provider}' no soportado")
+    
+    except Exception as e:
+        logger.error(f"Error generando con agente: {str(e)}")
+        yield ErrorStream(f"Error: {str(e)}")
+
+
 # CRUD de Agentes en Base de Datos
 def create_agent(user_id, name, description, provider, prompt_template, 
                 model_name=None):
@@ -160,21 +270,9 @@ def get_agent_by_id(agent_id, user_id=None):
     """
     try:
         if user_id:
-            query = """
-                SELECT id, user_id, name, description, provider, prompt_template,
-                       model_name, is_active, created_at, updated_at
-                FROM agents
-                WHERE id = %s AND user_id = %s
-            """
-            agent = execute_query(query, (agent_id, user_id), fetch_one=True)
+            agent = execute_prepared(_AGENT_BY_ID_AND_USER, (agent_id, user_id), fetch_one=True)
         else:
-            query = """
-                SELECT id, user_id, name, description, provider, prompt_template,
-                       model_name, is_active, created_at, updated_at
-                FROM agents
-                WHERE id = %s
-            """
-            agent = execute_query(query, (agent_id,), fetch_one=True)
+            agent = execute_prepared(_AGENT_BY_ID, (agent_id,), fetch_one=True)
         
         if agent:
             return dict(agent)
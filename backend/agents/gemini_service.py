@@ -1,5 +1,6 @@
 import logging
 import os
+from ai_stream import ErrorStream, textos_gemini
 
 logger = logging.getLogger(__name__)
 
@@ -47,6 +48,25 @@ def _get_gemini_client(api_key):
     return True
 
 
+def _build_final_prompt(prompt, system_prompt):
+    """
+    Une el prompt del sistema y el del usuario en un solo texto
+    
+    Args:
+        prompt (str): Prompt del usuario
+        system_prompt (str): Prompt principal
+        
+    Returns:
+        str: Prompt final
+    """
+    prompt_sections = []
+    if system_prompt:
+        prompt_sections.append(system_prompt.strip())
+    if prompt:
+        prompt_sections.append(prompt.strip())
+    return "\n\n".join(section for section in prompt_sections if section)
+
+
 def generate_with_gemini(prompt, model_name=None, api_key=None, system_prompt=None):
     """
     Genera texto usando Google Gemini con manejo robusto de errores
@@ -73,12 +93,7 @@ def generate_with_gemini(prompt, model_name=None, api_key=None, system_prompt=No
         model_name = model_name or DEFAULT_GEMINI_MODEL
         model = genai.GenerativeModel(model_name)
 
-        prompt_sections = []
-        if system_prompt:
-            prompt_sections.append(system_prompt.strip())
-        if prompt:
-            prompt_sections.append(prompt.strip())
-        final_prompt = "\n\n".join(section for section in prompt_sections if section)
+        final_prompt = _build_final_prompt(prompt, system_prompt)
 
         generation_config = genai.types.GenerationConfig(
             temperature=DEFAULT_GEMINI_TEMPERATURE
@@ -114,4 +129,45 @@ def generate_with_gemini(prompt, model_name=None, api_key=None, system_prompt=No
     
     except Exception as e:
         logger.error(f"Error en generación con Gemini: {str(e)}")
-        return f"Error: {str(e)}"
\ No newline at end of file
+        return f"Error: {str(e)}"
+
+
+def generate_with_gemini_stream(prompt, model_name=None, api_key=None, system_prompt=None):
+    """
+    Genera texto usando Google Gemini en streaming
+    
+    Args:
+        prompt (str): Prompt del usuario (XML con reglas y transcripción)
+        system_prompt (str): Prompt principal XML (SystemPrompt.xml)
+        model_name (str): Nombre del modelo
+        api_key (str): API key de Gemini
+        
+    Yields:
+        str: Fragmentos del texto generado (ErrorStream si falla)
+    """
+    if not api_key:
+        api_key = os.environ.get('GEMINI_API_KEY')
+        if not api_key:
+            yield ErrorStream("Error: GEMINI_API_KEY no configurada")
+            return
+    
+    if not _get_gemini_client(api_key):
+        yield ErrorStream("Error: No se pudo configurar Gemini")
+        return
+    
+    try:
+        model = genai.GenerativeModel(model_name or DEFAULT_GEMINI_MODEL)
+        generation_config = genai.types.GenerationConfig(
+            temperature=DEFAULT_GEMINI_TEMPERATURE
+        )
+
+        response = model.generate_content(
+            _build_final_prompt(prompt, system_prompt),
+            generation_config=generation_config,
+            stream=True
+        )
+        yield from textos_gemini(response)
+    
+    except Exception as e:
+        logger.error(f"Error en generación con Gemini: {str(e)}")
+        yield ErrorStream(f"Error: {str(e)}")
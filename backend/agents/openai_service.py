@@ -1,5 +1,6 @@
 import logging
 import os
+from ai_stream import ErrorStream, textos_openai
 logger = logging.getLogger(__name__)
 
 # Importar proveedor de IA
@@ -46,6 +47,32 @@ def _get_openai_client(api_key):
     return _openai_client_cache['client']
 
 
+def _build_completion_args(prompt, model_name, system_prompt):
+    """
+    Prepara los argumentos de chat.completions.create
+    
+    Args:
+        prompt (str): Prompt del usuario
+        model_name (str): Nombre del modelo
+        system_prompt (str): Prompt principal
+        
+    Returns:
+        dict: Argumentos de la llamada
+    """
+    messages = []
+    if system_prompt and system_prompt.strip():
+        messages.append({"role": "system", "content": system_prompt.strip()})
+    else:
+        messages.append({"role": "system", "content": "You are an expert assistant for analyzing and summarizing meeting transcriptions."})
+    messages.append({"role": "user", "content": prompt})
+
+    return {
+        "model": model_name or DEFAULT_OPENAI_MODEL,
+        "messages": messages,
+        "temperature": DEFAULT_OPENAI_TEMPERATURE
+    }
+
+
 def generate_with_openai(prompt, model_name=None, api_key=None, system_prompt=None):
     """
     Genera texto usando OpenAI
@@ -69,21 +96,7 @@ def generate_with_openai(prompt, model_name=None, api_key=None, system_prompt=No
         return "Error: No se pudo configurar OpenAI"
     
     try:
-        model_name = model_name or DEFAULT_OPENAI_MODEL
-        
-        # Preparar argumentos para la llamada
-        messages = []
-        if system_prompt and system_prompt.strip():
-            messages.append({"role": "system", "content": system_prompt.strip()})
-        else:
-            messages.append({"role": "system", "content": "You are an expert assistant for analyzing and summarizing meeting transcriptions."})
-        messages.append({"role": "user", "content": prompt})
-
-        completion_args = {
-            "model": model_name,
-            "messages": messages,
-            "temperature": DEFAULT_OPENAI_TEMPERATURE
-        }
+        completion_args = _build_completion_args(prompt, model_name, system_prompt)
 
         response = client.chat.completions.create(**completion_args)
         
@@ -91,4 +104,38 @@ def generate_with_openai(prompt, model_name=None, api_key=None, system_prompt=No
     
     except Exception as e:
         logger.error(f"Error en generación con OpenAI: {str(e)}")
-        return f"Error: {str(e)}"
\ No newline at end of file
+        return f"Error: {str(e)}"
+
+
+def generate_with_openai_stream(prompt, model_name=None, api_key=None, system_prompt=None):
+    """
+    Genera texto usando OpenAI en streaming
+    
+    Args:
+        prompt (str): Prompt del usuario (XML con reglas y transcripción)
+        system_prompt (str): Prompt principal XML (SystemPrompt.xml)
+        model_name (str): Nombre del modelo
+        api_key (str): API key de OpenAI
+        
+    Yields:
+        str: Fragmentos del texto generado (ErrorStream si falla)
+    """
+    if not api_key:
+        api_key = os.environ.get('OPENAI_API_KEY')
+        if not api_key:
+            yield ErrorStream("Error: OPENAI_API_KEY no configurada")
+            return
+    
+    client = _get_openai_client(api_key)
+    if not client:
+        yield ErrorStream("Error: No se pudo configurar OpenAI")
+        return
+    
+    try:
+        completion_args = _build_completion_args(prompt, model_name, system_prompt)
+        stream = client.chat.completions.create(**completion_args, stream=True)
+        yield from textos_openai(stream)
+    
+    except Exception as e:
+        logger.error(f"Error en generación con OpenAI: {str(e)}")
+        yield ErrorStream(f"Error: {str(e)}")
@@ -0,0 +1,56 @@
+"""
+Utilidades para respuestas en streaming de los proveedores de IA
+Los generadores de texto en streaming entregan fragmentos str; los errores se
+entregan como ErrorStream, que sigue siendo un str con el mismo formato
+"Error: ..." de las respuestas completas
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ErrorStream(str):
+    """Fragmento de un stream que indica un error ('Error: ...')"""
+
+
+def textos_gemini(response):
+    """
+    Extrae el texto de los fragmentos de generate_content(..., stream=True)
+
+    Args:
+        response: Respuesta en streaming de Gemini
+
+    Yields:
+        str: Texto de cada fragmento (o ErrorStream si la respuesta fue bloqueada)
+    """
+    generado = False
+
+    for chunk in response:
+        try:
+            texto = chunk.text
+        except ValueError:
+            # Fragmento sin texto (fin por MAX_TOKENS o SAFETY)
+            continue
+        if texto:
+            generado = True
+            yield texto
+
+    feedback = getattr(response, 'prompt_feedback', None)
+    if not generado and feedback is not None and feedback.block_reason:
+        yield ErrorStream(f"Error: Bloqueado por seguridad ({feedback.block_reason})")
+
+
+def textos_openai(stream):
+    """
+    Extrae el texto de los fragmentos de chat.completions.create(..., stream=True)
+
+    Args:
+        stream: Respuesta en streaming de OpenAI
+
+    Yields:
+        str: Texto de cada fragmento
+    """
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
@@ -0,0 +1,213 @@
+"""
+Servicio de segmentación de audio
+Divide grabaciones largas en segmentos cortados en silencios para
+transcribirlos en paralelo
+"""
+
+import os
+import uuid
+import logging
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    import soundfile as sf
+    CHUNKING_AVAILABLE = True
+except ImportError as e:
+    CHUNKING_AVAILABLE = False
+    logger.warning(f"numpy/soundfile no están disponibles ({e}). Segmentación de audio deshabilitada.")
+
+# Duración de cada frame para medir energía (segundos)
+FRAME_SECONDS = 0.05
+
+# Margen alrededor de cada punto de corte ideal donde se busca silencio (segundos)
+SEARCH_WINDOW_SECONDS = 30.0
+
+# Solapamiento entre segmentos consecutivos, usado para emparejar hablantes (segundos)
+OVERLAP_SECONDS = 10.0
+
+
+def obtener_duracion_audio(archivo_audio):
+    """
+    Obtiene la duración de un archivo de audio sin decodificarlo
+
+    Args:
+        archivo_audio (str): Ruta al archivo de audio
+
+    Returns:
+        float: Duración en segundos, o None si el formato no es soportado
+    """
+    if not CHUNKING_AVAILABLE:
+        return None
+
+    try:
+        return sf.info(archivo_audio).duration
+    except Exception as e:
+        logger.debug(f"No se pudo leer la duración de {archivo_audio}: {e}")
+        return None
+
+
+def _calcular_energia_frames(archivo_audio, samplerate):
+    """
+    Calcula la energía RMS por frame leyendo el archivo por bloques
+
+    Args:
+        archivo_audio (str): Ruta al archivo de audio
+        samplerate (int): Frecuencia de muestreo del archivo
+
+    Returns:
+        numpy.array: Energía RMS de cada frame de FRAME_SECONDS
+    """
+    frame_len = max(int(samplerate * FRAME_SECONDS), 1)
+    energias = []
+
+    for bloque in sf.blocks(archivo_audio, blocksize=frame_len, always_2d=True, dtype='float32'):
+        mono = bloque.mean(axis=1)
+        energias.append(float(np.sqrt(np.mean(mono * mono))) if len(mono) else 0.0)
+
+    return np.asarray(energias, dtype=np.float32)
+
+
+def calcular_puntos_corte(energias, num_segmentos):
+    """
+    Elige los puntos de corte en los frames de menor energía cercanos
+    a la división en partes iguales
+
+    Args:
+        energias (numpy.array): Energía RMS por frame
+        num_segmentos (int): Número de segmentos deseado
+
+    Returns:
+        list: Índices de frame de cada corte (num_segmentos - 1 elementos, crecientes)
+    """
+    total = len(energias)
+    ventana = int(SEARCH_WINDOW_SECONDS / FRAME_SECONDS)
+    cortes = []
+    anterior = 0
+
+    for i in range(1, num_segmentos):
+        ideal = total * i // num_segmentos
+        inicio = max(ideal - ventana, anterior + 1)
+        fin = min(ideal + ventana, total - 1)
+
+        if inicio >= fin:
+            continue
+
+        corte = inicio + int(np.argmin(energias[inicio:fin]))
+        cortes.append(corte)
+        anterior = corte
+
+    return cortes
+
+
+def dividir_audio_en_silencios(archivo_audio, num_segmentos, output_dir=None):
+    """
+    Divide un audio en segmentos cortados en silencios
+
+    Cada segmento (salvo el primero) empieza OVERLAP_SECONDS antes de su corte,
+    para que el tramo solapado permita emparejar los hablantes entre segmentos.
+
+    Args:
+        archivo_audio (str): Ruta al archivo de audio
+        num_segmentos (int): Número de segmentos deseado
+        output_dir (str): Directorio para los segmentos (opcional, temporal por defecto)
+
+    Returns:
+        list: Segmentos [{'path': str, 'inicio': float, 'corte': float, 'fin': float}]
+              en segundos absolutos, o None si no se pudo dividir
+    """
+    if not CHUNKING_AVAILABLE:
+        logger.error("numpy/soundfile no están instalados")
+        return None
+
+    try:
+        info = sf.info(archivo_audio)
+        samplerate = info.samplerate
+
+        energias = _calcular_energia_frames(archivo_audio, samplerate)
+        cortes = calcular_puntos_corte(energias, num_segmentos)
+
+        if not cortes:
+            return None
+
+        limites = [0.0] + [c * FRAME_SECONDS for c in cortes] + [info.duration]
+
+        if output_dir is None:
+            output_dir = tempfile.mkdtemp(prefix='segmentos_')
+
+        segmentos = []
+        prefijo = uuid.uuid4().hex[:8]
+
+        with sf.SoundFile(archivo_audio) as entrada:
+            for i in range(len(limites) - 1):
+                corte = limites[i]
+                inicio = max(corte - OVERLAP_SECONDS, 0.0) if i > 0 else 0.0
+                fin = limites[i + 1]
+
+                ruta = os.path.join(output_dir, f"{prefijo}_seg{i:03d}.flac")
+                _copiar_tramo(entrada, ruta, int(inicio * samplerate), int(fin * samplerate))
+
+                segmentos.append({
+                    'path': ruta,
+                    'inicio': inicio,
+                    'corte': corte,
+                    'fin': fin
+                })
+
+        logger.info(f"Audio dividido en {len(segmentos)} segmentos: {archivo_audio}")
+        return segmentos
+
+    except Exception as e:
+        logger.error(f"Error al dividir audio en segmentos: {str(e)}")
+        return None
+
+
+def _copiar_tramo(entrada, ruta_salida, frame_inicio, frame_fin, bloque=1 << 18):
+    """
+    Copia un tramo de un archivo de audio abierto a un FLAC nuevo por bloques
+
+    Args:
+        entrada (SoundFile): Archivo de entrada abierto
+        ruta_salida (str): Ruta del segmento a escribir
+        frame_inicio (int): Primer frame del tramo
+        frame_fin (int): Frame final (exclusivo)
+        bloque (int): Frames leídos por iteración
+    """
+    entrada.seek(frame_inicio)
+    restantes = frame_fin - frame_inicio
+
+    with sf.SoundFile(ruta_salida, mode='w', samplerate=entrada.samplerate,
+                      channels=entrada.channels, format='FLAC') as salida:
+        while restantes > 0:
+            datos = entrada.read(min(bloque, restantes), dtype='float32', always_2d=True)
+            if len(datos) == 0:
+                break
+            salida.write(datos)
+            restantes -= len(datos)
+
+
+def eliminar_segmentos(segmentos):
+    """
+    Elimina los archivos de segmentos y su directorio temporal si queda vacío
+
+    Args:
+        segmentos (list): Segmentos devueltos por dividir_audio_en_silencios
+    """
+    directorios = set()
+
+    for segmento in segmentos or []:
+        try:
+            if os.path.exists(segmento['path']):
+                os.remove(segmento['path'])
+            directorios.add(os.path.dirname(segmento['path']))
+        except OSError as e:
+            logger.warning(f"No se pudo eliminar el segmento {segmento['path']}: {e}")
+
+    for directorio in directorios:
+        try:
+            if os.path.basename(directorio).startswith('segmentos_') and not os.listdir(directorio):
+                os.rmdir(directorio)
+        except OSError:
+            pass
@@ -0,0 +1,122 @@
+"""
+Mezcla y guardado de las grabaciones del sistema y el micrófono
+Separado de system_Audio (que abre los dispositivos de audio al importarse)
+para poder ejecutarse en los workers de media_pool. Cada pista se escribe en un
+archivo de muestras mientras se graba y aquí se lee por bloques, así que ni la
+tarea enviada al pool ni la memoria del worker crecen con la duración.
+"""
+
+import os
+import logging
+import numpy as np
+import soundfile as sf
+
+logger = logging.getLogger(__name__)
+
+# Muestras que se leen de cada pista a la vez
+BLOQUE_MEZCLA = 480000
+
+# Bytes por muestra de las pistas (float32 mono)
+_BYTES_MUESTRA = 4
+
+
+def abrir_pista(ruta, sample_rate, modo='r'):
+    """
+    Abre el archivo de una pista: muestras float32 mono sin cabecera, que se
+    puede escribir bloque a bloque sin conocer la duración final
+
+    Args:
+        ruta (str): Archivo de la pista
+        sample_rate (int): Frecuencia de muestreo
+        modo (str): 'r' para leer, 'w' para escribir
+
+    Returns:
+        soundfile.SoundFile: Archivo abierto
+    """
+    return sf.SoundFile(ruta, modo, samplerate=sample_rate, channels=1, format='RAW', subtype='FLOAT')
+
+
+def muestras_pista(ruta):
+    """Número de muestras escritas en una pista (0 si no existe)"""
+    try:
+        return os.path.getsize(ruta) // _BYTES_MUESTRA if ruta else 0
+    except OSError:
+        return 0
+
+
+def _bloques(ruta, sample_rate, total):
+    """Lee las primeras 'total' muestras de una pista por bloques"""
+    with abrir_pista(ruta, sample_rate) as pista:
+        leidas = 0
+        while leidas < total:
+            bloque = pista.read(min(BLOQUE_MEZCLA, total - leidas), dtype='float32')
+            if not len(bloque):
+                break
+            leidas += len(bloque)
+            yield bloque
+
+
+def _mezclar_bloques(system_path, mic_path, sample_rate, total, system_volume, mic_volume):
+    """Mezcla las dos pistas bloque a bloque con los volúmenes indicados"""
+    for system, mic in zip(_bloques(system_path, sample_rate, total), _bloques(mic_path, sample_rate, total)):
+        yield system * system_volume + mic * mic_volume
+
+
+def guardar_grabacion(output_path, system_path, mic_path, recording_type, sample_rate,
+                      system_volume=0.6, mic_volume=0.4):
+    """
+    Mezcla las pistas grabadas según el tipo de grabación y guarda el WAV
+
+    Args:
+        output_path (str): Ruta del archivo a escribir
+        system_path (str): Pista del audio del sistema (abrir_pista) o None
+        mic_path (str): Pista del micrófono (abrir_pista) o None
+        recording_type (str): 'system', 'microphone' o 'both'
+        sample_rate (int): Frecuencia de muestreo
+        system_volume (float): Volumen del audio del sistema (0.0 a 1.0)
+        mic_volume (float): Volumen del micrófono (0.0 a 1.0)
+
+    Returns:
+        float: Duración en segundos, o None si no hay audio que guardar
+    """
+    muestras_sistema = muestras_pista(system_path) if recording_type in ('system', 'both') else 0
+    muestras_mic = muestras_pista(mic_path) if recording_type in ('microphone', 'both') else 0
+    escala = 1.0
+
+    if recording_type == 'both' and muestras_sistema and muestras_mic:
+        # Igualar longitudes tomando la menor
+        total = min(muestras_sistema, muestras_mic)
+
+        def bloques():
+            return _mezclar_bloques(system_path, mic_path, sample_rate, total, system_volume, mic_volume)
+
+        # Normalizar para evitar clipping (primera pasada: pico de la mezcla)
+        pico = max(float(np.abs(bloque).max()) for bloque in bloques())
+        if pico > 1.0:
+            escala = 1.0 / pico
+
+        logger.info(f"Audio mezclado: {total} muestras ({total/sample_rate:.2f}s), sistema={system_volume}, mic={mic_volume}")
+    else:
+        if recording_type == 'both':
+            if muestras_sistema:
+                logger.warning("No hay datos del micrófono, usando solo audio del sistema")
+            elif muestras_mic:
+                logger.warning("No hay datos del sistema, usando solo audio del micrófono")
+
+        ruta, total = (system_path, muestras_sistema) if muestras_sistema else (mic_path, muestras_mic)
+
+        def bloques():
+            return _bloques(ruta, sample_rate, total)
+
+        logger.info(f"Audio procesado ({recording_type}): {total} muestras")
+
+    if total == 0:
+        logger.error("No hay audio que guardar")
+        return None
+
+    # Guardar el archivo
+    with sf.SoundFile(output_path, 'w', samplerate=sample_rate, channels=1, format='WAV', subtype='PCM_16') as salida:
+        for bloque in bloques():
+            salida.write(bloque * escala if escala != 1.0 else bloque)
+
+    return total / sample_rate
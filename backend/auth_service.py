@@ -4,10 +4,18 @@ Servicio de autenticación de usuarios con Supabase
 
 import hashlib
 import logging
-from database import execute_query
+from database import execute_query, register_prepared_statement, execute_prepared
 
 logger = logging.getLogger(__name__)
 
+# Consulta del login (sentencia preparada en el servidor)
+_AUTHENTICATE_USER = register_prepared_statement('auth_authenticate_user', """
+    SELECT id, first_name, last_name, email, role, created_at
+    FROM users
+    WHERE LOWER(email) = %s AND password = %s
+""")
+
+
 def hash_password(password):
     """
     Genera un hash SHA-256 de la contraseña
@@ -44,13 +52,7 @@ def authenticate_user(email, password):
         password_hash = hash_password(password)
         
         # Buscar el usuario en la base de datos (case-insensitive para email)
-        query = """
-            SELECT id, first_name, last_name, email, role, created_at
-            FROM users
-            WHERE LOWER(email) = %s AND password = %s
-        """
-        
-        user = execute_query(query, (email, password_hash), fetch_one=True)
+        user = execute_prepared(_AUTHENTICATE_USER, (email, password_hash), fetch_one=True)
         
         if user:
             logger.info(f"Usuario autenticado: {email}")
@@ -0,0 +1,317 @@
+"""
+Comprobación y benchmark del almacén de blobs (blob_store)
+Trabaja con BLOB_STORE_DIR y uploads/ en un directorio temporal y comprueba:
+    - la deduplicación: N archivos con K contenidos distintos ocupan K blobs
+      (un solo inodo por contenido) y N handles
+    - que recolectar() respeta el periodo de gracia y nunca elimina un blob
+      con handles
+    - que por encima de BLOB_GC_MAX_UNREFERENCED_BYTES se eliminan primero
+      los blobs liberados hace más tiempo
+    - que la relación video -> audio desaparece con el blob del audio
+    - que crear y liberar handles mientras recolectar() se ejecuta en bucle
+      nunca deja un handle sin su contenido
+
+Mide además lo que tarda recolectar() con muchos blobs.
+
+Uso (desde backend/):
+    python benchmarks/almacen_blobs.py --blobs 20000
+"""
+
+import os
+import sys
+import time
+import shutil
+import hashlib
+import logging
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logger = logging.getLogger(__name__)
+
+_TAMANO = 64 * 1024
+
+
+def _contenido(indice, tamano=_TAMANO):
+    """Contenido determinista distinto para cada índice"""
+    semilla = hashlib.sha256(str(indice).encode('ascii')).digest()
+    return (semilla * (tamano // len(semilla) + 1))[:tamano]
+
+
+class Almacen:
+    """
+    Sube archivos sintéticos a uploads/ y los incorpora al almacén
+
+    Args:
+        blob_store (module): Módulo blob_store ya configurado
+        uploads (str): Carpeta de los file_id
+    """
+
+    def __init__(self, blob_store, uploads):
+        self.blob_store = blob_store
+        self.uploads = uploads
+        self.subidos = 0
+
+    def subir(self, indice, tamano=_TAMANO):
+        """
+        Returns:
+            tuple: (ruta del handle, sha256, si estaba deduplicado)
+        """
+        datos = _contenido(indice, tamano)
+        sha256 = hashlib.sha256(datos).hexdigest()
+        self.subidos += 1
+        ruta = os.path.join(self.uploads, f'subida_{self.subidos}.wav')
+        with open(ruta, 'wb') as f:
+            f.write(datos)
+        return ruta, sha256, self.blob_store.guardar_archivo(ruta, sha256)
+
+
+def comprobar_deduplicacion(blob_store, almacen, archivos=60, contenidos=6):
+    """
+    Returns:
+        list: Errores encontrados (vacía si todo es correcto)
+    """
+    errores = []
+    subidas = [almacen.subir(i % contenidos) for i in range(archivos)]
+
+    duplicados = sum(duplicado for _, _, duplicado in subidas)
+    if duplicados != archivos - contenidos:
+        errores.append(f"{duplicados} subidas deduplicadas de {archivos - contenidos}")
+
+    inodos = {os.stat(ruta).st_ino for ruta, _, _ in subidas}
+    stats = blob_store.get_blob_store_stats()
+    if len(inodos) != contenidos or stats['blobs'] != contenidos or stats['handles'] != archivos:
+        errores.append(f"{len(inodos)} inodos, {stats['blobs']} blobs y {stats['handles']} handles "
+                       f"para {archivos} archivos con {contenidos} contenidos")
+
+    for ruta, _, _ in subidas:
+        blob_store.liberar_archivo(ruta)
+    return errores
+
+
+def comprobar_gracia(blob_store, almacen):
+    """
+    Returns:
+        list: Errores encontrados (vacía si todo es correcto)
+    """
+    errores = []
+    blob_store.recolectar(grace=0)
+
+    conservado, _, _ = almacen.subir(1000)
+    liberado, sha_liberado, _ = almacen.subir(1001)
+    blob_store.liberar_archivo(liberado)
+
+    if blob_store.recolectar(grace=3600)['removed']:
+        errores.append("se eliminó un blob liberado dentro del periodo de gracia")
+    if not os.path.exists(blob_store._ruta_blob(sha_liberado)):
+        errores.append("el blob liberado desapareció antes del periodo de gracia")
+
+    # Volver a subir el mismo contenido durante la gracia lo reutiliza
+    ruta, _, duplicado = almacen.subir(1001)
+    if not duplicado:
+        errores.append("el contenido liberado dentro del periodo de gracia no se reutilizó")
+    blob_store.liberar_archivo(ruta)
+
+    resultado = blob_store.recolectar(grace=0)
+    if resultado['removed'] != 1 or os.path.exists(blob_store._ruta_blob(sha_liberado)):
+        errores.append(f"pasada la gracia se eliminaron {resultado['removed']} blobs en lugar de 1")
+    if not os.path.exists(conservado) or blob_store.get_blob_store_stats()['blobs'] != 1:
+        errores.append("la recolección eliminó un blob con handles")
+
+    blob_store.liberar_archivo(conservado)
+    blob_store.recolectar(grace=0)
+    return errores
+
+
+def comprobar_limite(blob_store, almacen, blobs=8):
+    """
+    Returns:
+        list: Errores encontrados (vacía si todo es correcto)
+    """
+    errores = []
+    hashes = []
+    for i in range(blobs):
+        ruta, sha256, _ = almacen.subir(2000 + i)
+        blob_store.liberar_archivo(ruta)
+        hashes.append(sha256)
+        # st_ctime ordena las liberaciones
+        time.sleep(0.01)
+
+    limite = blob_store.BLOB_GC_MAX_UNREFERENCED_BYTES
+    blob_store.BLOB_GC_MAX_UNREFERENCED_BYTES = 3 * _TAMANO
+    try:
+        resultado = blob_store.recolectar(grace=3600)
+    finally:
+        blob_store.BLOB_GC_MAX_UNREFERENCED_BYTES = limite
+
+    quedan = [os.path.exists(blob_store._ruta_blob(sha256)) for sha256 in hashes]
+    esperado = [False] * (blobs - 3) + [True] * 3
+    if quedan != esperado or resultado['bytes'] != (blobs - 3) * _TAMANO:
+        errores.append(f"con el límite de 3 blobs quedan {quedan} (se esperaba {esperado})")
+
+    blob_store.recolectar(grace=0)
+    return errores
+
+
+def comprobar_derivados(blob_store, almacen):
+    """
+    Returns:
+        list: Errores encontrados (vacía si todo es correcto)
+    """
+    errores = []
+    video, sha_video, _ = almacen.subir(3000)
+    audio, sha_audio, _ = almacen.subir(3001)
+    blob_store.registrar_audio_derivado(sha_video, sha_audio, 'm4a')
+
+    if blob_store.buscar_audio_derivado(sha_video) != {'sha256': sha_audio, 'extension': 'm4a'}:
+        errores.append("no se encontró el audio derivado registrado")
+
+    blob_store.liberar_archivo(audio)
+    blob_store.recolectar(grace=0)
+    if blob_store.buscar_audio_derivado(sha_video) is not None:
+        errores.append("el audio derivado sigue disponible tras recolectar su blob")
+    if os.path.exists(blob_store._ruta_blob(sha_video) + blob_store._SUFIJO_AUDIO):
+        errores.append("la relación video -> audio no se purgó al recolectar el audio")
+
+    blob_store.liberar_archivo(video)
+    blob_store.recolectar(grace=0)
+    return errores
+
+
+def comprobar_carrera(blob_store, almacen, segundos=2, hilos=4):
+    """
+    Crea y libera handles de unos pocos blobs mientras otro thread recolecta sin gracia
+
+    Returns:
+        tuple: (lista de errores, handles creados, recolecciones)
+    """
+    errores = []
+    contenidos = {}
+    for i in range(4):
+        ruta, sha256, _ = almacen.subir(4000 + i)
+        contenidos[sha256] = _contenido(4000 + i)
+        blob_store.liberar_archivo(ruta)
+
+    parar = threading.Event()
+    cuenta = {'handles': 0, 'recolecciones': 0}
+    lock = threading.Lock()
+
+    def recolector():
+        while not parar.is_set():
+            blob_store.recolectar(grace=0)
+            with lock:
+                cuenta['recolecciones'] += 1
+
+    def cliente(n):
+        while not parar.is_set():
+            for sha256, datos in contenidos.items():
+                handle = blob_store.crear_handle(sha256, 'wav', almacen.uploads)
+                if handle is None:
+                    # El blob se recolectó: se vuelve a subir
+                    ruta = os.path.join(almacen.uploads, f'carrera_{n}.wav')
+                    with open(ruta, 'wb') as f:
+                        f.write(datos)
+                    blob_store.guardar_archivo(ruta, sha256)
+                    handle = {'path': ruta}
+                with open(handle['path'], 'rb') as f:
+                    if f.read() != datos:
+                        with lock:
+                            errores.append("un handle quedó sin el contenido de su blob")
+                blob_store.liberar_archivo(handle['path'])
+                with lock:
+                    cuenta['handles'] += 1
+
+    threads = [threading.Thread(target=recolector)] + [threading.Thread(target=cliente, args=(n,))
+                                                      for n in range(hilos)]
+    for thread in threads:
+        thread.start()
+    time.sleep(segundos)
+    parar.set()
+    for thread in threads:
+        thread.join()
+
+    blob_store.recolectar(grace=0)
+    if os.listdir(almacen.uploads):
+        errores.append(f"quedaron handles en uploads/: {len(os.listdir(almacen.uploads))}")
+    return errores[:1], cuenta['handles'], cuenta['recolecciones']
+
+
+def medir_recoleccion(blob_store, almacen, blobs):
+    """
+    Recolecta un almacén con 'blobs' blobs, la mitad sin referencias
+
+    Returns:
+        tuple: (segundos de la pasada sin nada que eliminar, segundos eliminando la mitad)
+    """
+    handles = []
+    for i in range(blobs):
+        ruta, _, _ = almacen.subir(100000 + i, tamano=64)
+        if i % 2:
+            blob_store.liberar_archivo(ruta)
+        else:
+            handles.append(ruta)
+
+    inicio = time.perf_counter()
+    blob_store.recolectar(grace=3600)
+    sin_eliminar = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    resultado = blob_store.recolectar(grace=0)
+    eliminando = time.perf_counter() - inicio
+
+    for ruta in handles:
+        blob_store.liberar_archivo(ruta)
+    blob_store.recolectar(grace=0)
+    return sin_eliminar, eliminando, resultado['removed']
+
+
+def main(argv):
+    """Punto de entrada de la línea de comandos"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--blobs', type=int, default=20000)
+    args = parser.parse_args(argv[1:])
+
+    logging.basicConfig(level=logging.CRITICAL)
+    directorio = tempfile.mkdtemp(prefix='check_blobs_')
+    # Antes de importar blob_store; sin recolecciones automáticas durante la prueba
+    os.environ['BLOB_STORE_DIR'] = os.path.join(directorio, 'blobs')
+    os.environ['BLOB_GC_INTERVAL'] = str(10 ** 9)
+    uploads = os.path.join(directorio, 'uploads')
+    os.makedirs(uploads)
+
+    import blob_store
+
+    almacen = Almacen(blob_store, uploads)
+    correcto = True
+
+    try:
+        print(f"{'comprobación':<32} {'estado':>7}")
+        for nombre, funcion in (('deduplicación', comprobar_deduplicacion),
+                                ('periodo de gracia', comprobar_gracia),
+                                ('límite sin referencias', comprobar_limite),
+                                ('audio derivado', comprobar_derivados),
+                                ('handles durante la recolección', comprobar_carrera)):
+            resultado = funcion(blob_store, almacen)
+            errores = resultado[0] if isinstance(resultado, tuple) else resultado
+            print(f"{nombre:<32} {'OK' if not errores else 'FALLO':>7}")
+            if isinstance(resultado, tuple):
+                print(f"    {resultado[1]} handles creados y liberados durante {resultado[2]} recolecciones")
+            for error in errores:
+                print(f"    - {error}")
+            correcto &= not errores
+
+        sin_eliminar, eliminando, eliminados = medir_recoleccion(blob_store, almacen, args.blobs)
+        print(f"\nrecolectar() con {args.blobs} blobs: {sin_eliminar:.2f}s sin nada que eliminar, "
+              f"{eliminando:.2f}s eliminando {eliminados}")
+
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    print("\nTodas las comprobaciones correctas" if correcto else "\nHay comprobaciones con fallos")
+    return 0 if correcto else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,213 @@
+"""
+Benchmark de la búsqueda de texto completo (search_service)
+Crea un esquema propio con las migraciones (esquema_prueba.py) y lo llena con
+grabaciones sintéticas: transcripciones de 120 palabras y resúmenes de 25 en la
+mitad de ellas, con un vocabulario de ~5000 términos de frecuencia muy
+desigual (unos pocos aparecen en casi todas las grabaciones y la mayoría en
+muy pocas). Después mide la mediana de search_recordings por consulta y rol.
+
+La carga desactiva los triggers de la migración 0005 y calcula search_vector
+de una vez con recording_search_document (la misma función que usan los
+triggers) antes de crear el índice GIN. Al terminar se comprueba, con los
+triggers ya activos, que una transcripción nueva se encuentra al momento y
+solo la ve quien puede acceder a ella.
+
+Con --conservar el esquema no se borra y --reutilizar lo usa sin volver a
+cargarlo (la carga de un millón de grabaciones tarda varios minutos).
+
+Uso (desde backend/):
+    python benchmarks/busqueda_texto.py --grabaciones 200000
+    python benchmarks/busqueda_texto.py --grabaciones 1000000 --conservar
+    python benchmarks/busqueda_texto.py --reutilizar
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import esquema_prueba
+
+logger = logging.getLogger(__name__)
+
+# Términos frecuentes del vocabulario; el resto son 'términoN'
+_BASE = ('reunión presupuesto cliente contrato entrega proyecto equipo ventas marketing factura pago '
+         'retraso revisión calidad soporte producto lanzamiento campaña objetivo trimestre informe '
+         'riesgo proveedor migración servidor base datos seguridad auditoría contratación formación '
+         'incidencia llamada correo propuesta descuento renovación licencia plazo hito demo prototipo '
+         'diseño').split()
+_RAROS = 5000
+
+# Consultas: términos muy frecuentes, frases, raros, exclusiones y OR
+CONSULTAS = ['presupuesto', 'reunión cliente', '"contrato entrega"', 'término4000',
+             'término2 -término3', 'factura OR pago', 'término1']
+
+# Admin, supervisor del equipo 1 y un usuario general
+CASOS = (('admin', 1, 0), ('supervisor', 6, 1), ('usuario', 1234, 2))
+
+_CARGA_SQL = """
+    ALTER TABLE transcriptions DISABLE TRIGGER trg_transcriptions_search;
+    ALTER TABLE summaries DISABLE TRIGGER trg_summaries_search;
+    DROP INDEX idx_recordings_search_vector;
+
+    INSERT INTO users (first_name, last_name, email, password, role)
+    SELECT 'U', 'N' || g, 'u' || g || '@manuelsolis.com', 'x',
+           CASE WHEN g <= 5 THEN 0 WHEN g <= {equipos} + 5 THEN 1 ELSE 2 END
+    FROM generate_series(1, {usuarios}) g;
+
+    INSERT INTO teams (name, supervisor_id)
+    SELECT 'Team ' || g, 5 + g FROM generate_series(1, {equipos}) g;
+
+    INSERT INTO team_members (team_id, user_id)
+    SELECT 1 + mod(g, {equipos}), g FROM generate_series({equipos} + 6, {usuarios}) g;
+
+    INSERT INTO recordings (user_id, filename, original_filename, file_path, file_size, status, upload_date)
+    SELECT 1 + mod(g, {usuarios}), 'rec_' || g, 'rec.wav', '/tmp/rec', 1000, 'completed',
+           NOW() - g * INTERVAL '30 seconds'
+    FROM generate_series(1, {grabaciones}) g;
+
+    INSERT INTO transcriptions (recording_id, transcription_text, language)
+    SELECT r.id, (SELECT string_agg((%(vocabulario)s::text[])[1 + floor(power(random(), 3) * {terminos})::int], ' ')
+                  FROM generate_series(1, 120) k WHERE r.id > 0), 'es'
+    FROM recordings r;
+
+    INSERT INTO summaries (recording_id, summary)
+    SELECT r.id, (SELECT string_agg((%(vocabulario)s::text[])[1 + floor(power(random(), 3) * {terminos})::int], ' ')
+                  FROM generate_series(1, 25) k WHERE r.id > 0)
+    FROM recordings r WHERE mod(r.id, 2) = 0;
+
+    UPDATE recordings SET search_vector = recording_search_document(id);
+
+    ALTER TABLE transcriptions ENABLE TRIGGER trg_transcriptions_search;
+    ALTER TABLE summaries ENABLE TRIGGER trg_summaries_search;
+    SET LOCAL maintenance_work_mem = '512MB';
+    CREATE INDEX idx_recordings_search_vector ON recordings USING GIN (search_vector);
+    ANALYZE;
+"""
+
+
+def cargar(nombre, grabaciones):
+    """
+    Crea el esquema y lo llena con las grabaciones sintéticas
+
+    Returns:
+        bool: True si la carga terminó
+    """
+    import database
+
+    if not esquema_prueba.crear_esquema(nombre):
+        return False
+
+    usuarios = max(grabaciones // 5, 1000)
+    vocabulario = _BASE + [f"término{g}" for g in range(1, _RAROS + 1)]
+
+    with database.get_pool().connection() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute(_CARGA_SQL.format(
+                usuarios=usuarios, equipos=usuarios // 10, grabaciones=grabaciones, terminos=len(vocabulario)
+            ), {'vocabulario': vocabulario})
+        connection.commit()
+
+    return True
+
+
+def comprobar_trigger():
+    """
+    Guarda una transcripción con un término único y lo busca con cada rol
+
+    Returns:
+        list: Errores encontrados (vacía si todo es correcto)
+    """
+    from database import execute_query
+    from search_service import search_recordings
+
+    errores = []
+    dueno = CASOS[2][1]
+    recording = execute_query("""
+        INSERT INTO recordings (user_id, filename, original_filename, file_path, file_size, status)
+        VALUES (%s, 'nueva', 'nueva.wav', '/tmp/rec', 1000, 'completed')
+        RETURNING id
+    """, (dueno,), fetch_one=True)
+    execute_query("INSERT INTO transcriptions (recording_id, transcription_text, language) VALUES (%s, %s, 'es')",
+                  (recording['id'], 'la palabra zanahoriazul aparece una sola vez'))
+
+    for nombre, user_id, rol in CASOS:
+        ids = [r['id'] for r in search_recordings(user_id, rol, 'zanahoriazul') or []]
+        if nombre in ('admin', 'usuario') and ids != [recording['id']]:
+            errores.append(f"{nombre} no encuentra la transcripción recién guardada")
+        if nombre == 'supervisor' and ids:
+            errores.append("el supervisor encuentra una grabación que no es de su equipo")
+
+    execute_query("DELETE FROM transcriptions WHERE recording_id = %s", (recording['id'],))
+    if search_recordings(dueno, CASOS[2][2], 'zanahoriazul'):
+        errores.append("la transcripción borrada se sigue encontrando")
+
+    return errores
+
+
+def main(argv):
+    """Punto de entrada de la línea de comandos"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--grabaciones', type=int, default=200000)
+    parser.add_argument('--repeticiones', type=int, default=8)
+    parser.add_argument('--esquema', default=esquema_prueba.ESQUEMA)
+    parser.add_argument('--conservar', action='store_true', help='No borrar el esquema al terminar')
+    parser.add_argument('--reutilizar', action='store_true', help='Usar el esquema ya cargado')
+    args = parser.parse_args(argv[1:])
+
+    logging.basicConfig(level=logging.ERROR, format='%(levelname)s %(message)s')
+
+    if not esquema_prueba.usar_esquema(args.esquema):
+        return 1
+
+    from database import execute_query
+    from search_service import search_recordings
+
+    if not args.reutilizar:
+        inicio = time.perf_counter()
+        if not cargar(args.esquema, args.grabaciones):
+            print("No se pudo crear el esquema de prueba")
+            return 1
+        print(f"Carga de {args.grabaciones} grabaciones: {time.perf_counter() - inicio:.0f}s\n")
+
+    errores = []
+
+    try:
+        total = execute_query("SELECT COUNT(*) AS n FROM recordings", fetch_one=True)['n']
+        print(f"{'consulta':>22} {'rol':>11} {'resultados':>11} {'p50 (ms)':>9} {'máx (ms)':>9}   ({total} grabaciones)")
+
+        for consulta in CONSULTAS:
+            for nombre, user_id, rol in CASOS:
+                tiempos = []
+                for _ in range(args.repeticiones):
+                    inicio = time.perf_counter()
+                    resultados = search_recordings(user_id, rol, consulta)
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+
+                if resultados is None:
+                    errores.append(f"la búsqueda '{consulta}' ({nombre}) falló")
+                    continue
+
+                # Las dos primeras ejecuciones calientan la caché de PostgreSQL
+                tiempos = tiempos[2:] or tiempos
+                print(f"{consulta:>22} {nombre:>11} {len(resultados):>11} "
+                      f"{statistics.median(tiempos):>9.1f} {max(tiempos):>9.1f}")
+
+        errores.extend(comprobar_trigger())
+
+    finally:
+        if not args.conservar:
+            esquema_prueba.eliminar_esquema(args.esquema)
+
+    for error in errores:
+        print(f"FALLO: {error}")
+
+    return 1 if errores else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,137 @@
+"""
+Comprobación de la caché de transcripciones en el camino por notificación
+Ejecuta notification_service._finalizar_trabajo con la descarga de Speechmatics
+sustituida por la lectura de un json-v2 sintético por fragmentos, y comprueba
+que la copia en stream (guardar_transcripcion_cache_en_stream) publica la
+entrada: el lector json-v2 se detiene en la '}' final sin agotar el cuerpo, y
+antes de consumir el resto la entrada nunca llegaba a guardarse.
+
+Se comprueba:
+    - que el trabajo termina como completado
+    - que la caché registra un 'store' y obtener_transcripcion_cache devuelve
+      el mismo documento que se descargó
+    - que texto y diálogos coinciden con procesar_transcripcion_completa
+    - que no quedan archivos temporales en el directorio de caché
+
+Uso (desde backend/):
+    python benchmarks/cache_en_stream.py --horas 0.1 1
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import transcription_cache
+import notification_service
+from json_stream import leer_archivo_en_fragmentos
+from job_service import enqueue_job, get_job, DEFERRED, JOB_COMPLETED
+from transcription_service import procesar_transcripcion_completa
+from json_stream_memoria import generar_transcripcion
+
+logger = logging.getLogger(__name__)
+
+
+def comprobar(ruta, directorio_cache, espacios_finales):
+    """
+    Finaliza un trabajo falso leyendo el resultado de 'ruta'
+
+    Args:
+        ruta (str): Resultado json-v2 sintético
+        directorio_cache (str): Directorio de la caché para la prueba
+        espacios_finales (bool): Añadir un salto de línea tras la '}' final,
+                                 como hacen algunos servidores
+
+    Returns:
+        list: Errores encontrados (vacía si todo es correcto)
+    """
+    errores = []
+    clave = f"{'0' * 60}{int(espacios_finales):04d}"
+
+    def descargar(speechmatics_job_id, api_key):
+        yield from leer_archivo_en_fragmentos(ruta)
+        if espacios_finales:
+            yield b'\n'
+
+    notification_service.descargar_resultado_en_stream = descargar
+    transcription_cache.CACHE_DIR = directorio_cache
+    stores = transcription_cache.get_cache_stats()['stores']
+
+    job_id = enqueue_job(lambda job_id: DEFERRED, job_type='check')
+    pending = {
+        'job_id': job_id,
+        'api_key': 'clave-falsa',
+        'clave_cache': clave,
+        'on_complete': lambda transcript, texto, dialogos: {'texto': texto, 'dialogos': dialogos}
+    }
+    notification_service._finalizar_trabajo('trabajo-falso', pending)
+
+    job = get_job(job_id)
+    if job['status'] != JOB_COMPLETED:
+        errores.append(f"trabajo en estado {job['status']}: {job['error']}")
+        return errores
+
+    if transcription_cache.get_cache_stats()['stores'] != stores + 1:
+        errores.append("la caché no registró el store")
+
+    en_cache = transcription_cache.obtener_transcripcion_cache(clave)
+    with open(ruta, 'r', encoding='utf-8') as f:
+        original = json.load(f)
+    if en_cache != original:
+        errores.append("la entrada de caché no coincide con el documento descargado"
+                       if en_cache else "obtener_transcripcion_cache devolvió None")
+
+    esperado = procesar_transcripcion_completa(original)
+    if (job['result']['texto'], job['result']['dialogos']) != (esperado['texto'], esperado['dialogos']):
+        errores.append("texto o diálogos distintos de procesar_transcripcion_completa")
+
+    temporales = [n for _, _, archivos in os.walk(directorio_cache) for n in archivos if n.endswith('.tmp')]
+    if temporales:
+        errores.append(f"archivos temporales sin limpiar: {temporales}")
+
+    return errores
+
+
+def main(argv):
+    """Punto de entrada de la línea de comandos"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--horas', type=float, nargs='+', default=[0.1, 1])
+    args = parser.parse_args(argv[1:])
+
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s %(message)s')
+    directorio = tempfile.mkdtemp(prefix='check_cache_stream_')
+    correcto = True
+
+    try:
+        print(f"{'audio':>6} {'cuerpo':>16} {'estado':>7} {'tiempo (s)':>11}")
+
+        for horas in args.horas:
+            ruta = os.path.join(directorio, f"resultado_{horas:g}h.json")
+            generar_transcripcion(ruta, horas)
+
+            for espacios_finales in (False, True):
+                inicio = time.perf_counter()
+                errores = comprobar(ruta, os.path.join(directorio, 'cache'), espacios_finales)
+                segundos = time.perf_counter() - inicio
+                cuerpo = "con '\\n' final" if espacios_finales else 'exacto'
+
+                print(f"{horas:>5g}h {cuerpo:>16} {'OK' if not errores else 'FALLO':>7} {segundos:>11.2f}")
+                for error in errores:
+                    print(f"    - {error}")
+                correcto &= not errores
+
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    print("\nTodas las comprobaciones correctas" if correcto else "\nHay comprobaciones con fallos")
+    return 0 if correcto else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
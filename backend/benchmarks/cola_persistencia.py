@@ -0,0 +1,223 @@
+"""
+Comprobación y benchmark de la persistencia en segundo plano (persistence_service)
+Trabaja en un esquema propio (esquema_prueba.py) con la cola en un directorio
+temporal, y comprueba:
+    - que los resultados que quedaron en la cola en disco (un reinicio) se
+      escriben al arrancar el writer
+    - que una ráfaga de resultados se escribe agrupada en lotes, con la
+      transcripción y el resumen de cada grabación, y que
+      find_persisted_transcription la encuentra antes y después de escribirla
+    - que con la tabla summaries ausente (migración sin aplicar) los
+      resultados siguen en la cola, se reintentan y se escriben al volver
+    - que un resultado que la base de datos rechaza se aparta como .failed
+      sin impedir que se escriba el resto de su lote
+    - que volver a encolar un persist_id ya escrito (commit cuya respuesta se
+      perdió) no duplica filas ni lo vuelve a indexar
+
+Mide además lo que tarda persist_recording (lo que espera /api/process) y lo
+que tarda la ráfaga en llegar a la base de datos.
+
+Uso (desde backend/, con el mismo backend/.env que el servidor):
+    python benchmarks/cola_persistencia.py --resultados 500
+"""
+
+import os
+import sys
+import glob
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import esquema_prueba
+
+logger = logging.getLogger(__name__)
+
+
+def _contar(execute_query, tabla, condicion='TRUE', parametros=None):
+    return execute_query(f"SELECT COUNT(*) AS n FROM {tabla} WHERE {condicion}", parametros, fetch_one=True)['n']
+
+
+def _esperar(condicion, limite=30):
+    """Espera a que la condición se cumpla; devuelve si se cumplió"""
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        if condicion():
+            return True
+        time.sleep(0.05)
+    return condicion()
+
+
+def _resultado(user_id, indice, **cambios):
+    """Argumentos de persist_recording para un resultado sintético"""
+    argumentos = {
+        'user_id': user_id,
+        'filename': f'grabacion_{indice}.wav',
+        'file_path': None,
+        'file_size': 1000 + indice,
+        'content_key': f'{indice:064x}',
+        'language': 'es',
+        'transcription_text': f'Texto de la grabación {indice}',
+        'dialogues': [{'speaker': 'S1', 'text': f'Hola {indice}'}],
+        'summary': f'Resumen {indice}' if indice % 2 == 0 else None,
+        'keywords': ['prueba'],
+        'duration': 60.0
+    }
+    argumentos.update(cambios)
+    return argumentos
+
+
+def main(argv):
+    """Punto de entrada de la línea de comandos"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--resultados', type=int, default=500)
+    parser.add_argument('--esquema', default=esquema_prueba.ESQUEMA)
+    args = parser.parse_args(argv[1:])
+
+    logging.basicConfig(level=logging.CRITICAL)
+    if not esquema_prueba.usar_esquema(args.esquema):
+        return 1
+
+    directorio = tempfile.mkdtemp(prefix='check_persistencia_')
+    cola = os.path.join(directorio, 'persist_queue')
+    # Antes de importar persistence_service y blob_store
+    os.environ['PERSIST_QUEUE_DIR'] = cola
+    os.environ['BLOB_STORE_DIR'] = os.path.join(directorio, 'blobs')
+
+    import database
+    import persistence_service
+    from database import execute_query
+
+    # El indexado de embeddings necesita un proveedor: aquí solo se registra
+    indexadas = []
+    persistence_service.queue_recording = lambda recording_id, user_id, dialogos: indexadas.append(recording_id)
+
+    if not esquema_prueba.crear_esquema(args.esquema):
+        print("No se pudo crear el esquema de prueba")
+        shutil.rmtree(directorio, ignore_errors=True)
+        return 1
+
+    errores = []
+    try:
+        user_id = execute_query(
+            "INSERT INTO users (email, password) VALUES ('persistencia@example.com', 'x') RETURNING id",
+            fetch_one=True
+        )['id']
+
+        # 1. Resultados en disco de un proceso anterior
+        previos = []
+        for i in range(3):
+            registro = dict(_resultado(user_id, 100000 + i), persist_id=f'00000000-0000-4000-8000-{i:012d}',
+                            original_filename=f'grabacion_{100000 + i}.wav', mimetype=None, queued_at=time.time())
+            persistence_service._guardar_en_cola(registro)
+            previos.append(registro['persist_id'])
+
+        persistence_service.start_persistence()
+        if not _esperar(lambda: _contar(execute_query, 'recordings', 'persist_id = ANY(%s::uuid[])', (previos,)) == 3):
+            errores.append("los resultados que estaban en la cola al arrancar no se escribieron")
+
+        # 2. Ráfaga
+        n = args.resultados
+        tiempos = []
+        lotes = persistence_service.get_persistence_stats()['batches']
+        inicio = time.perf_counter()
+        for i in range(n):
+            t = time.perf_counter()
+            persistence_service.persist_recording(**_resultado(user_id, i))
+            tiempos.append(time.perf_counter() - t)
+        encontrado = persistence_service.find_persisted_transcription(user_id, f'{n - 1:064x}')
+
+        if not _esperar(lambda: persistence_service.get_persistence_stats()['written'] >= n + 3, limite=120):
+            errores.append(f"la ráfaga no se escribió: {persistence_service.get_persistence_stats()}")
+        total = time.perf_counter() - inicio
+        lotes = persistence_service.get_persistence_stats()['batches'] - lotes
+
+        if not encontrado or encontrado['transcription_text'] != f'Texto de la grabación {n - 1}':
+            errores.append("find_persisted_transcription no encontró un resultado aún en la cola")
+        encontrado = persistence_service.find_persisted_transcription(user_id, f'{n - 1:064x}')
+        if not encontrado or not encontrado['recording_id']:
+            errores.append("find_persisted_transcription no encontró un resultado ya escrito")
+
+        grabaciones = _contar(execute_query, 'recordings', 'user_id = %s', (user_id,))
+        transcripciones = _contar(execute_query, 'transcriptions')
+        resumenes = _contar(execute_query, 'summaries')
+        esperados = (n + 3, n + 3, (n + 1) // 2 + 2)
+        if (grabaciones, transcripciones, resumenes) != esperados:
+            errores.append(f"filas escritas (grabaciones, transcripciones, resúmenes): "
+                           f"{(grabaciones, transcripciones, resumenes)}, esperadas {esperados}")
+        if len(indexadas) != n + 3:
+            errores.append(f"se indexaron {len(indexadas)} grabaciones de {n + 3}")
+
+        tiempos.sort()
+        print(f"Ráfaga de {n} resultados: persist_recording p50 {tiempos[n // 2] * 1000:.2f}ms, "
+              f"máx {tiempos[-1] * 1000:.2f}ms; en la base de datos en {total:.2f}s, {lotes} lotes")
+
+        # 3. Migración sin aplicar: los resultados esperan en la cola
+        execute_query("ALTER TABLE summaries RENAME TO summaries_apartada")
+        reintentos = persistence_service.get_persistence_stats()['retries']
+        ids = [persistence_service.persist_recording(**_resultado(user_id, 200000 + i))
+               for i in range(4)]
+        if not _esperar(lambda: persistence_service.get_persistence_stats()['retries'] > reintentos, limite=10):
+            errores.append("el lote no se reintentó con la tabla summaries ausente")
+        en_cola = sum(os.path.exists(os.path.join(cola, f'{p}.json')) for p in ids)
+        execute_query("ALTER TABLE summaries_apartada RENAME TO summaries")
+        if en_cola != 4:
+            errores.append(f"con la tabla ausente quedaron {en_cola} de 4 resultados en la cola")
+        if not _esperar(lambda: _contar(execute_query, 'recordings', 'persist_id = ANY(%s::uuid[])', (ids,)) == 4):
+            errores.append("los resultados no se escribieron al restaurar la tabla")
+
+        # 4. Un resultado rechazado (usuario inexistente) en un lote
+        apartados = persistence_service.get_persistence_stats()['failed']
+        subido = os.path.join(directorio, 'subido.wav')
+        open(subido, 'wb').close()
+        ids = [persistence_service.persist_recording(**_resultado(user_id, 300000 + i))
+               for i in range(3)]
+        malo = persistence_service.persist_recording(**_resultado(user_id + 1000, 300100,
+                                                                  file_path=subido))
+        ids += [persistence_service.persist_recording(**_resultado(user_id, 300003))]
+        if not _esperar(lambda: persistence_service.get_persistence_stats()['failed'] > apartados):
+            errores.append("el resultado rechazado no se apartó")
+        if not _esperar(lambda: _contar(execute_query, 'recordings', 'persist_id = ANY(%s::uuid[])', (ids,)) == 4):
+            errores.append("el resultado rechazado impidió escribir el resto del lote")
+        if not os.path.exists(os.path.join(cola, f'{malo}.failed')) or os.path.exists(subido):
+            errores.append("el resultado rechazado no quedó como .failed o no se liberó su archivo")
+
+        # 5. Reintento de un resultado ya escrito
+        escritos = persistence_service.get_persistence_stats()['written']
+        repetido = dict(_resultado(user_id, 0), persist_id=ids[0], original_filename='x',
+                        mimetype=None, queued_at=time.time())
+        indexadas_antes = len(indexadas)
+        persistence_service._guardar_en_cola(repetido)
+        with persistence_service._cond:
+            persistence_service._pendientes.append(ids[0])
+            persistence_service._cond.notify()
+        if not _esperar(lambda: persistence_service.get_persistence_stats()['written'] > escritos):
+            errores.append("el resultado repetido no salió de la cola")
+        if _contar(execute_query, 'recordings', 'persist_id = %s::uuid', (ids[0],)) != 1:
+            errores.append("volver a escribir un persist_id duplicó la grabación")
+        if len(indexadas) != indexadas_antes:
+            errores.append("volver a escribir un persist_id lo indexó de nuevo")
+
+        restantes = sorted(os.path.basename(r) for r in glob.glob(os.path.join(cola, '*.json*')))
+        if restantes:
+            errores.append(f"quedaron archivos en la cola: {restantes}")
+
+        print(f"Estado de la cola: {persistence_service.get_persistence_stats()}")
+
+    finally:
+        esquema_prueba.eliminar_esquema(args.esquema)
+        database.get_pool().close()
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    for error in errores:
+        print(f"FALLO: {error}")
+
+    return 1 if errores else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,98 @@
+"""
+Esquema propio de PostgreSQL para los benchmarks que usan la base de datos
+Los benchmarks no tocan las tablas reales: usar_esquema() añade a DATABASE_URL
+un search_path con un esquema aparte (hay que llamarla antes de importar
+database) y crear_esquema() lo crea con las migraciones de migrations/, de modo
+que tablas, índices y triggers son los mismos que en producción. Al terminar,
+eliminar_esquema() lo borra con todo su contenido.
+
+No es un benchmark: lo importan los demás scripts de este directorio.
+"""
+
+import os
+import sys
+import logging
+from urllib.parse import quote
+
+from dotenv import load_dotenv
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+logger = logging.getLogger(__name__)
+
+# Esquema por defecto de los benchmarks
+ESQUEMA = 'benchmark'
+
+
+def usar_esquema(nombre=ESQUEMA):
+    """
+    Apunta DATABASE_URL al esquema 'nombre' (llamar antes de importar database)
+
+    Args:
+        nombre (str): Esquema en el que se crearán las tablas
+
+    Returns:
+        bool: False si DATABASE_URL no está configurada
+    """
+    load_dotenv(os.path.join(BACKEND, '.env'))
+    database_url = os.environ.get('DATABASE_URL')
+
+    if not database_url:
+        logger.error("DATABASE_URL no está configurada (entorno o backend/.env)")
+        return False
+
+    separador = '&' if '?' in database_url else '?'
+    os.environ['DATABASE_URL'] = f"{database_url}{separador}options={quote(f'-csearch_path={nombre}')}"
+    return True
+
+
+def crear_esquema(nombre=ESQUEMA, grabaciones=None):
+    """
+    Crea (o vuelve a crear) el esquema aplicando todas las migraciones
+
+    Args:
+        nombre (str): Esquema a crear
+        grabaciones (int): Si se indica, lo llena con el fixture de
+                           schema_migrations (usuarios y equipos proporcionales)
+
+    Returns:
+        bool: True si el esquema quedó creado
+    """
+    import database
+    from schema_migrations import load_migrations, _FIXTURE_SQL
+
+    with database.get_pool().connection() as connection:
+        if connection is None:
+            return False
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {nombre} CASCADE")
+            cursor.execute(f"CREATE SCHEMA {nombre}")
+            cursor.execute(f"SET LOCAL search_path TO {nombre}")
+
+            for migracion in load_migrations():
+                cursor.execute(migracion['sql'])
+
+            if grabaciones:
+                usuarios = max(grabaciones // 5, 1000)
+                cursor.execute(_FIXTURE_SQL.format(
+                    usuarios=usuarios, equipos=max(usuarios // 10, 100), grabaciones=grabaciones
+                ))
+
+        connection.commit()
+
+    return True
+
+
+def eliminar_esquema(nombre=ESQUEMA):
+    """Borra el esquema de los benchmarks y todo su contenido"""
+    import database
+
+    with database.get_pool().connection() as connection:
+        if connection is None:
+            return
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {nombre} CASCADE")
+        connection.commit()
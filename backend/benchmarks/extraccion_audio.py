@@ -0,0 +1,126 @@
+"""
+Benchmark de la extracción del audio de los videos subidos
+Genera un video sintético (sondeo_medios.generar_video) con audio AAC y otro
+con AC-3 (un códec que no se copia) y mide el tiempo real y de CPU, incluidos
+los procesos hijos (ffmpeg), de extraer_audio_de_video con:
+    - moviepy: decodifica la pista y la recodifica a mp3 (motor anterior)
+    - ffmpeg automático: copia la pista si Speechmatics acepta el códec
+      (AAC a m4a) o la convierte a AUDIO_EXTRACT_FORMAT
+    - ffmpeg forzando flac y opus a 16 kHz mono
+
+Comprueba que cada salida tiene una pista de audio con la duración del video.
+
+Uso (desde backend/):
+    python benchmarks/extraccion_audio.py --minutos 10
+"""
+
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+import resource
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import media_probe
+import video_service
+from sondeo_medios import generar_video
+
+logger = logging.getLogger(__name__)
+
+# (nombre, motor, formato forzado)
+CONFIGURACIONES = (
+    ('moviepy -> mp3', 'moviepy', None),
+    ('ffmpeg automático', 'ffmpeg', None),
+    ('ffmpeg -> flac', 'ffmpeg', 'flac'),
+    ('ffmpeg -> opus', 'ffmpeg', 'opus'),
+)
+
+# Códec de audio del video -> argumentos de ffmpeg
+VIDEOS = {
+    'aac': ['-c:v', 'mpeg4', '-q:v', '20', '-c:a', 'aac', '-b:a', '128k'],
+    'ac3': ['-c:v', 'mpeg4', '-q:v', '20', '-c:a', 'ac3', '-b:a', '192k'],
+}
+
+
+def _cpu():
+    """Tiempo de CPU del proceso y de sus hijos ya terminados (segundos)"""
+    propio = resource.getrusage(resource.RUSAGE_SELF)
+    hijos = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return propio.ru_utime + propio.ru_stime + hijos.ru_utime + hijos.ru_stime
+
+
+def extraer(video, salida, motor, formato):
+    """
+    Extrae el audio con un motor y un formato
+
+    Returns:
+        dict: Ruta de salida, tiempo real y tiempo de CPU
+    """
+    video_service.AUDIO_EXTRACT_ENGINE = motor
+    info = media_probe.inspeccionar_medio(video)
+
+    cpu = _cpu()
+    inicio = time.perf_counter()
+    ruta = video_service.extraer_audio_de_video(video, salida, formato, info=info)
+
+    return {'ruta': ruta, 'segundos': time.perf_counter() - inicio, 'cpu': _cpu() - cpu}
+
+
+def main(argv):
+    """Punto de entrada de la línea de comandos"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--minutos', type=float, default=10)
+    args = parser.parse_args(argv[1:])
+
+    logging.basicConfig(level=logging.ERROR, format='%(levelname)s %(message)s')
+    directorio = tempfile.mkdtemp(prefix='bench_extraccion_')
+    segundos_video = args.minutos * 60
+    errores = []
+
+    try:
+        print(f"{'audio':>5} {'extracción':>18} {'salida':>7} {'tiempo (s)':>11} {'CPU (s)':>8} "
+              f"{'tamaño (MB)':>12} {'pista':>22}")
+
+        for codec, argumentos in VIDEOS.items():
+            video = os.path.join(directorio, f"video_{codec}.mp4")
+            generar_video(video, segundos_video, argumentos)
+
+            for nombre, motor, formato in CONFIGURACIONES:
+                if motor == 'moviepy' and not video_service.MOVIEPY_AVAILABLE:
+                    continue
+
+                r = extraer(video, os.path.join(directorio, 'audio'), motor, formato)
+                if not r['ruta']:
+                    errores.append(f"{codec}, {nombre}: la extracción falló")
+                    continue
+
+                info = media_probe.inspeccionar_medio(r['ruta'])
+                audio = info.audio if info else None
+                if audio is None or info.duration is None or abs(info.duration - segundos_video) > 1:
+                    errores.append(f"{codec}, {nombre}: la salida no tiene el audio completo "
+                                   f"(duración {info.duration if info else None})")
+
+                # Sin ffprobe, los formatos sin parser (mp3, flac, ogg) no informan códec ni canales
+                pista = ' '.join(p for p in (audio.codec,
+                                             f"{audio.sample_rate}Hz" if audio.sample_rate else None,
+                                             f"{audio.channels}ch" if audio.channels else None) if p) if audio else '-'
+                print(f"{codec:>5} {nombre:>18} {os.path.splitext(r['ruta'])[1][1:]:>7} {r['segundos']:>11.2f} "
+                      f"{r['cpu']:>8.2f} {os.path.getsize(r['ruta']) / 1e6:>12.1f} {pista:>22}")
+                os.remove(r['ruta'])
+
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    for error in errores:
+        print(f"FALLO: {error}")
+
+    return 1 if errores else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
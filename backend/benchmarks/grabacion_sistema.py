@@ -0,0 +1,260 @@
+"""
+Benchmark y comprobación del guardado de las grabaciones del sistema
+Sustituye soundcard por dispositivos simulados (un tono distinto para el
+audio del sistema y el micrófono, entregado al instante en bloques de 1
+segundo) y graba con system_Audio durante los minutos indicados. Después:
+    - detiene la grabación con el guardado en la petición
+      (MEDIA_POOL_WORKERS=0) y en el pool, y mide el tiempo de
+      detener_grabacion_sistema
+    - compara los bytes que viajan al worker por pickle (las rutas de las
+      pistas) con los de la forma anterior (la lista de bloques en memoria)
+    - mide con tracemalloc el pico de memoria de guardar_grabacion frente a
+      la mezcla anterior (concatenar los bloques y mezclar de una vez)
+    - comprueba que el WAV guardado coincide con el de la mezcla anterior,
+      también con volúmenes que obligan a normalizar, y que no quedan pistas
+      temporales
+
+Uso (desde backend/):
+    python benchmarks/grabacion_sistema.py --minutos 30
+"""
+
+import os
+import sys
+import time
+import types
+import pickle
+import shutil
+import logging
+import argparse
+import tempfile
+import tracemalloc
+
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 48000
+
+
+# ==================== DISPOSITIVOS SIMULADOS ====================
+
+class _Grabador:
+    """Entrega 'segundos' bloques de 1 segundo de un tono y después espera a que pare la grabación"""
+
+    def __init__(self, frecuencia, segundos):
+        self.frecuencia = frecuencia
+        self.segundos = segundos
+        self.entregados = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def record(self, numframes):
+        if self.entregados < self.segundos:
+            t = (np.arange(numframes) + self.entregados * numframes) / SAMPLE_RATE
+            self.entregados += 1
+            return np.sin(2 * np.pi * self.frecuencia * t).astype(np.float32)[:, None]
+        while sys.modules['system_Audio'].recording_state['active']:
+            time.sleep(0.01)
+        return np.zeros((0, 1), dtype=np.float32)
+
+
+class _Dispositivo:
+    def __init__(self, frecuencia, segundos, grabadores):
+        self.name = f'tono {frecuencia}Hz'
+        self.argumentos = (frecuencia, segundos)
+        self.grabadores = grabadores
+
+    def recorder(self, samplerate, blocksize):
+        grabador = _Grabador(*self.argumentos)
+        self.grabadores.append(grabador)
+        return grabador
+
+
+def simular_soundcard(segundos, grabadores):
+    """
+    Registra un módulo soundcard con un altavoz (loopback, 440 Hz) y un micrófono (660 Hz)
+
+    Args:
+        segundos (int): Bloques de 1 segundo que entrega cada dispositivo
+        grabadores (list): Recibe los grabadores creados
+    """
+    modulo = types.ModuleType('soundcard')
+    modulo.SoundcardRuntimeWarning = type('SoundcardRuntimeWarning', (Warning,), {})
+    altavoz = _Dispositivo(440, segundos, grabadores)
+    microfono = _Dispositivo(660, segundos, grabadores)
+    modulo.default_speaker = lambda: altavoz
+    modulo.get_microphone = lambda id, include_loopback=False: altavoz
+    modulo.default_microphone = lambda: microfono
+    sys.modules['soundcard'] = modulo
+
+
+# ==================== FORMA ANTERIOR ====================
+
+def guardar_anterior(output_path, system_chunks, mic_chunks, sample_rate, system_volume, mic_volume):
+    """guardar_grabacion antes de las pistas en disco (tipo 'both')"""
+    system_audio = np.concatenate(system_chunks)
+    mic_audio = np.concatenate(mic_chunks)
+    n = min(len(system_audio), len(mic_audio))
+    mixed = system_audio[:n] * system_volume + mic_audio[:n] * mic_volume
+    max_val = np.abs(mixed).max()
+    if max_val > 1.0:
+        mixed = mixed / max_val
+    sf.write(file=output_path, data=mixed, samplerate=sample_rate)
+    return n / sample_rate
+
+
+def _bloques_tono(frecuencia, segundos):
+    return [np.sin(2 * np.pi * frecuencia * (np.arange(SAMPLE_RATE) + s * SAMPLE_RATE) / SAMPLE_RATE)
+            .astype(np.float32) for s in range(segundos)]
+
+
+def _pico(funcion, *args):
+    """Ejecuta una función y devuelve (segundos, pico de memoria de tracemalloc en bytes)"""
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    try:
+        funcion(*args)
+        return time.perf_counter() - inicio, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+# ==================== PRUEBAS ====================
+
+def grabar_y_detener(system_Audio, grabadores, directorio, system_volume, mic_volume):
+    """
+    Graba hasta que los dos dispositivos simulados entregan todos sus bloques y detiene
+
+    Returns:
+        tuple: (resultado de detener_grabacion_sistema, segundos que tardó, argumentos de la tarea)
+    """
+    del grabadores[:]
+    enviados = []
+    guardar = system_Audio.run_media_task
+
+    def registrar(nombre, *args, **kwargs):
+        enviados.append(pickle.dumps((nombre, args, kwargs), protocol=pickle.HIGHEST_PROTOCOL))
+        return guardar(nombre, *args, **kwargs)
+
+    system_Audio.iniciar_grabacion_sistema(directorio, 'both')
+    while len(grabadores) < 2 or any(g.entregados < g.segundos for g in grabadores):
+        time.sleep(0.01)
+
+    system_Audio.run_media_task = registrar
+    try:
+        inicio = time.perf_counter()
+        resultado = system_Audio.detener_grabacion_sistema(directorio, system_volume, mic_volume)
+        return resultado, time.perf_counter() - inicio, enviados
+    finally:
+        system_Audio.run_media_task = guardar
+
+
+def comparar(ruta, referencia):
+    """
+    Compara dos WAV PCM de 16 bits (se admite 1 de diferencia por redondeo)
+
+    Returns:
+        str: Descripción de la diferencia o None si coinciden
+    """
+    a, _ = sf.read(ruta, dtype='int16')
+    b, _ = sf.read(referencia, dtype='int16')
+    if len(a) != len(b):
+        return f"{len(a)} muestras frente a {len(b)}"
+    diferencia = int(np.abs(a.astype(np.int32) - b).max()) if len(a) else 0
+    return f"diferencia máxima de {diferencia}" if diferencia > 1 else None
+
+
+def main(argv):
+    """Punto de entrada de la línea de comandos"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--minutos', type=float, default=30)
+    args = parser.parse_args(argv[1:])
+
+    logging.basicConfig(level=logging.ERROR, format='%(levelname)s %(message)s')
+    segundos = max(1, int(args.minutos * 60))
+    grabadores = []
+    simular_soundcard(segundos, grabadores)
+
+    import media_pool
+    import system_Audio
+    from audio_mixing import guardar_grabacion, abrir_pista
+
+    directorio = tempfile.mkdtemp(prefix='bench_grabacion_')
+    temporales = set(os.listdir(tempfile.gettempdir()))
+    errores = []
+
+    try:
+        system_chunks = _bloques_tono(440, segundos)
+        mic_chunks = _bloques_tono(660, segundos)
+        mb = 1024 * 1024
+
+        print(f"Grabación simulada de {segundos}s (sistema y micrófono, {SAMPLE_RATE} Hz)\n")
+        print(f"{'guardado':>16} {'detener (s)':>12} {'enviado al pool':>16}")
+
+        anterior = pickle.dumps(('guardar_grabacion', ('salida.wav', system_chunks, mic_chunks, 'both',
+                                                       SAMPLE_RATE, 0.6, 0.4), {}),
+                                protocol=pickle.HIGHEST_PROTOCOL)
+        print(f"{'anterior':>16} {'-':>12} {len(anterior) / mb:>13.1f} MB")
+
+        for nombre, workers in (('en la petición', 0), ('pool', 1)):
+            media_pool.MEDIA_POOL_WORKERS = workers
+            media_pool.start_media_pool()
+            resultado, tiempo, enviados = grabar_y_detener(system_Audio, grabadores, directorio, 0.6, 0.4)
+            if not resultado:
+                errores.append(f"{nombre}: detener_grabacion_sistema no devolvió la grabación")
+                continue
+            print(f"{nombre:>16} {tiempo:>12.2f} {len(enviados[0]) if enviados else 0:>13} B")
+
+            referencia = os.path.join(directorio, 'referencia.wav')
+            guardar_anterior(referencia, system_chunks, mic_chunks, SAMPLE_RATE, 0.6, 0.4)
+            diferencia = comparar(os.path.join(directorio, resultado['file_id']), referencia)
+            if diferencia:
+                errores.append(f"{nombre}: el WAV no coincide con la mezcla anterior ({diferencia})")
+            if abs(resultado['duration'] - segundos) > 0.01:
+                errores.append(f"{nombre}: duración {resultado['duration']} (esperada {segundos})")
+
+        # Pico de memoria del guardado, con volúmenes que obligan a normalizar
+        pistas = []
+        for chunks in (system_chunks, mic_chunks):
+            fd, ruta = tempfile.mkstemp(suffix='.f32', dir=directorio)
+            os.close(fd)
+            with abrir_pista(ruta, SAMPLE_RATE, 'w') as pista:
+                for chunk in chunks:
+                    pista.write(chunk)
+            pistas.append(ruta)
+
+        nueva = os.path.join(directorio, 'nueva.wav')
+        referencia = os.path.join(directorio, 'referencia.wav')
+        t_nueva, pico_nueva = _pico(guardar_grabacion, nueva, pistas[0], pistas[1], 'both', SAMPLE_RATE, 1.0, 1.0)
+        t_anterior, pico_anterior = _pico(guardar_anterior, referencia, system_chunks, mic_chunks,
+                                          SAMPLE_RATE, 1.0, 1.0)
+        print(f"\n{'mezcla':>16} {'tiempo (s)':>12} {'pico de memoria':>16}")
+        print(f"{'anterior':>16} {t_anterior:>12.2f} {pico_anterior / mb:>13.1f} MB")
+        print(f"{'por bloques':>16} {t_nueva:>12.2f} {pico_nueva / mb:>13.1f} MB")
+
+        diferencia = comparar(nueva, referencia)
+        if diferencia:
+            errores.append(f"la mezcla normalizada no coincide con la anterior ({diferencia})")
+
+        restos = {n for n in set(os.listdir(tempfile.gettempdir())) - temporales if n.startswith('grabacion_')}
+        if restos:
+            errores.append(f"quedaron pistas temporales: {sorted(restos)}")
+
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    for error in errores:
+        print(f"FALLO: {error}")
+
+    return 1 if errores else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,197 @@
+"""
+Benchmark del índice vectorial local (IVF sobre NumPy)
+Llena un IndiceVectorial con vectores sintéticos (mezcla de gaussianas
+normalizadas, varios fragmentos por grabación), entrena el IVF y mide, frente
+a la búsqueda exacta por fuerza bruta:
+    - recall@k y latencia p50/p95 para varios nprobe
+    - latencia de la búsqueda restringida a unos pocos dueños
+    - altas, bajas, altas incrementales tras entrenar y guardar/cargar
+
+También comprueba que la búsqueda filtrada solo devuelve grabaciones de esos
+dueños, que las grabaciones eliminadas no vuelven a aparecer y que el índice
+cargado de disco responde igual que el original.
+
+Uso (desde backend/):
+    python benchmarks/indice_vectorial.py --vectores 100000 --ruido 0.7
+"""
+
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vector_index import IndiceVectorial
+
+logger = logging.getLogger(__name__)
+
+# Dimensión de los vectores y centros de la mezcla
+DIMENSION = 256
+CENTROS = 2000
+
+# Fragmentos (turnos) por grabación y dueños distintos
+FRAGMENTOS_POR_GRABACION = 10
+USUARIOS = 500
+
+
+class GeneradorVectores:
+    """
+    Vectores normalizados alrededor de centros aleatorios
+
+    Args:
+        ruido (float): Desviación del ruido añadido a cada centro (más ruido, más difícil)
+        semilla (int): Semilla del generador
+    """
+
+    def __init__(self, ruido, semilla=1):
+        self.ruido = ruido
+        self.rng = np.random.default_rng(semilla)
+        self.centros = self.rng.normal(size=(CENTROS, DIMENSION)).astype(np.float32)
+
+    def generar(self, n):
+        """Genera n vectores normalizados"""
+        x = self.centros[self.rng.integers(0, CENTROS, n)]
+        x = x + self.rng.normal(scale=self.ruido, size=(n, DIMENSION)).astype(np.float32)
+        return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def _fragmentos(n):
+    """Fragmentos mínimos como los de dividir_en_fragmentos"""
+    return [{'turn': i, 'speaker': 'S1', 'text': f"fragmento {i}"} for i in range(n)]
+
+
+def _exactos(indice, consulta, k):
+    """(recording_id, turn) de los k fragmentos vivos más similares, por fuerza bruta"""
+    vivos = np.flatnonzero(indice._vivos[:indice._n])
+    puntuaciones = indice._vectores[vivos] @ consulta
+    mejores = vivos[np.argsort(-puntuaciones)[:k]]
+    return {(int(indice._recording_ids[f]), int(indice._turnos[f])) for f in mejores}
+
+
+def _claves(resultados):
+    """(recording_id, turn) de un resultado de buscar"""
+    return {(r['recording_id'], r['turn']) for r in resultados}
+
+
+def _percentiles(latencias):
+    """p50 y p95 en milisegundos"""
+    ms = np.array(latencias) * 1000
+    return np.median(ms), np.percentile(ms, 95)
+
+
+def main(argv):
+    """Punto de entrada de la línea de comandos"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--vectores', type=int, default=100000)
+    parser.add_argument('--ruido', type=float, default=0.7)
+    parser.add_argument('--consultas', type=int, default=200)
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[8, 16, 32, 64])
+    args = parser.parse_args(argv[1:])
+
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s %(message)s')
+    generador = GeneradorVectores(args.ruido)
+    grabaciones = args.vectores // FRAGMENTOS_POR_GRABACION
+    fallos = []
+
+    indice = IndiceVectorial(DIMENSION, 'benchmark')
+    vectores = generador.generar(grabaciones * FRAGMENTOS_POR_GRABACION)
+    fragmentos = _fragmentos(FRAGMENTOS_POR_GRABACION)
+
+    inicio = time.perf_counter()
+    for r in range(grabaciones):
+        filas = slice(r * FRAGMENTOS_POR_GRABACION, (r + 1) * FRAGMENTOS_POR_GRABACION)
+        indice.agregar(r, r % USUARIOS, fragmentos, vectores[filas])
+    segundos = time.perf_counter() - inicio
+    print(f"altas: {grabaciones} grabaciones en {segundos:.1f}s ({segundos / grabaciones * 1000:.3f} ms/grabación)")
+
+    consultas = generador.generar(args.consultas)
+
+    inicio = time.perf_counter()
+    exactos = [_exactos(indice, q, args.k) for q in consultas]
+    print(f"fuerza bruta: {(time.perf_counter() - inicio) / len(consultas) * 1000:.1f} ms/consulta")
+
+    inicio = time.perf_counter()
+    indice.entrenar(semilla=0)
+    print(f"entrenamiento: {time.perf_counter() - inicio:.1f}s, {indice.stats()['lists']} listas\n")
+
+    print(f"{'nprobe':>7} {f'recall@{args.k}':>10} {'p50 (ms)':>9} {'p95 (ms)':>9}")
+    for nprobe in args.nprobe:
+        aciertos = 0
+        latencias = []
+        for q, esperado in zip(consultas, exactos):
+            inicio = time.perf_counter()
+            resultados = indice.buscar(q, args.k, nprobe=nprobe)
+            latencias.append(time.perf_counter() - inicio)
+            aciertos += len(_claves(resultados) & esperado) / args.k
+
+        p50, p95 = _percentiles(latencias)
+        print(f"{nprobe:>7} {aciertos / len(consultas):>10.3f} {p50:>9.2f} {p95:>9.2f}")
+
+    # Búsqueda restringida a unos pocos dueños (supervisor con un equipo pequeño)
+    duenos = set(range(1, 7))
+    latencias = []
+    for q in consultas[:50]:
+        inicio = time.perf_counter()
+        resultados = indice.buscar(q, args.k, user_ids=duenos)
+        latencias.append(time.perf_counter() - inicio)
+        if any(r['user_id'] not in duenos for r in resultados):
+            fallos.append("la búsqueda filtrada devolvió grabaciones de otros usuarios")
+            break
+    p50, _ = _percentiles(latencias)
+    print(f"\nfiltrada ({len(duenos)} de {USUARIOS} usuarios): p50 {p50:.2f} ms")
+
+    # Bajas: las grabaciones eliminadas no pueden volver a aparecer
+    eliminadas = min(1000, grabaciones // 2)
+    inicio = time.perf_counter()
+    for r in range(eliminadas):
+        indice.eliminar(r)
+    segundos = time.perf_counter() - inicio
+    print(f"bajas: {segundos / eliminadas * 1e6:.1f} us/grabación")
+
+    for q in consultas[:50]:
+        if any(r['recording_id'] < eliminadas for r in indice.buscar(q, args.k, nprobe=max(args.nprobe))):
+            fallos.append("una búsqueda devolvió una grabación eliminada")
+            break
+
+    # Altas incrementales después de entrenar (se asignan a la lista más cercana)
+    inicio = time.perf_counter()
+    for r in range(eliminadas):
+        indice.agregar(r, 1, fragmentos, generador.generar(FRAGMENTOS_POR_GRABACION))
+    segundos = time.perf_counter() - inicio
+    print(f"altas tras entrenar: {segundos / eliminadas * 1000:.3f} ms/grabación")
+
+    directorio = tempfile.mkdtemp(prefix='bench_vector_index_')
+    try:
+        ruta = os.path.join(directorio, 'indice.npz')
+
+        inicio = time.perf_counter()
+        indice.guardar(ruta)
+        guardar = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        cargado = IndiceVectorial.cargar(ruta, 'benchmark')
+        cargar = time.perf_counter() - inicio
+        print(f"guardar: {guardar:.2f}s, cargar: {cargar:.2f}s ({os.path.getsize(ruta) / 1024 / 1024:.0f} MB)")
+
+        for q in consultas[:50]:
+            if _claves(cargado.buscar(q, args.k)) != _claves(indice.buscar(q, args.k)):
+                fallos.append("el índice cargado no responde igual que el original")
+                break
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    for fallo in fallos:
+        print(f"FALLO: {fallo}")
+
+    return 1 if fallos else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
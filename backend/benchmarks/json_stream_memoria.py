@@ -0,0 +1,177 @@
+"""
+Benchmark de memoria de la lectura de resultados json-v2
+Compara el pico de memoria (tracemalloc) de procesar una transcripción de
+Speechmatics cargando el JSON completo (bytes de la respuesta + json.loads +
+procesar_transcripcion_completa) con el de leerla en stream por fragmentos de
+64KB (procesar_transcripcion_en_stream), sobre transcripciones sintéticas.
+
+El pico incluye el resultado que se devuelve (texto y diálogos), que crece con
+la duración en los dos casos; la columna 'sin resultado' descuenta lo que queda
+retenido al terminar. En stream el resto del pico son las palabras que el
+acumulador guarda hasta unirlas en el texto; la fila 'lectura' recorre el
+documento sin acumular nada y muestra que la lectura en sí no crece con la
+duración.
+
+Uso (desde backend/):
+    python benchmarks/json_stream_memoria.py --horas 1 4
+"""
+
+import os
+import gc
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from json_stream import iterar_json_v2, leer_archivo_en_fragmentos
+from transcription_service import procesar_transcripcion_completa, procesar_transcripcion_en_stream
+
+logger = logging.getLogger(__name__)
+
+# Palabras por minuto de la transcripción sintética (conversación normal)
+PALABRAS_POR_MINUTO = 150
+
+_VOCABULARIO = ('reunión', 'presupuesto', 'cliente', 'proyecto', 'equipo', 'semana', 'entonces',
+                'vale', 'creo', 'que', 'el', 'la', 'de', 'para', 'con', 'informe', 'fecha',
+                'revisar', 'propuesta', 'ventas', 'objetivo', 'siguiente', 'punto', 'bueno')
+
+
+def generar_transcripcion(ruta, horas, semilla=0):
+    """
+    Escribe un resultado json-v2 sintético con palabras, puntuación y hablantes
+
+    Args:
+        ruta (str): Archivo a escribir
+        horas (float): Duración de la grabación simulada
+        semilla (int): Semilla del generador aleatorio
+
+    Returns:
+        int: Número de items en 'results'
+    """
+    rng = random.Random(semilla)
+    total_palabras = int(horas * 60 * PALABRAS_POR_MINUTO)
+    paso = 60.0 / PALABRAS_POR_MINUTO
+    hablante = 'S1'
+    items = 0
+    t = 0.0
+
+    with open(ruta, 'w', encoding='utf-8') as f:
+        f.write('{"format": "2.9", "job": {"id": "benchmark", "duration": %d}, '
+                '"metadata": {"transcription_config": {"language": "es", "diarization": "speaker"}}, '
+                '"results": [' % int(horas * 3600))
+
+        for _ in range(total_palabras):
+            if rng.random() < 0.02:
+                hablante = f"S{rng.randint(1, 4)}"
+
+            palabra = {
+                'alternatives': [{'confidence': round(rng.uniform(0.6, 1.0), 2),
+                                  'content': rng.choice(_VOCABULARIO), 'language': 'es',
+                                  'speaker': hablante}],
+                'end_time': round(t + paso * 0.8, 2),
+                'start_time': round(t, 2),
+                'type': 'word'
+            }
+            f.write((',' if items else '') + json.dumps(palabra, ensure_ascii=False))
+            items += 1
+
+            if rng.random() < 0.08:
+                punto = {
+                    'alternatives': [{'confidence': 1.0, 'content': '.', 'language': 'es',
+                                      'speaker': hablante}],
+                    'attaches_to': 'previous',
+                    'end_time': round(t + paso * 0.8, 2),
+                    'is_eos': True,
+                    'start_time': round(t + paso * 0.8, 2),
+                    'type': 'punctuation'
+                }
+                f.write(',' + json.dumps(punto, ensure_ascii=False))
+                items += 1
+
+            t += paso
+
+        f.write('], "summary": {"content": "Resumen sintético."}}')
+
+    return items
+
+
+def _ruta_completa(ruta):
+    """Camino anterior: cuerpo completo en memoria, json.loads y recorrido del dict"""
+    with open(ruta, 'rb') as f:
+        cuerpo = f.read()
+    resultado = json.loads(cuerpo)
+    procesado = procesar_transcripcion_completa(resultado)
+    return procesado['texto'], procesado['dialogos']
+
+
+def _ruta_stream(ruta):
+    """Camino en stream: fragmentos de 64KB directamente al acumulador"""
+    procesado = procesar_transcripcion_en_stream(leer_archivo_en_fragmentos(ruta))
+    return procesado['texto'], procesado['dialogos']
+
+
+def _ruta_lectura(ruta):
+    """Solo el lector incremental, descartando cada item"""
+    return iterar_json_v2(leer_archivo_en_fragmentos(ruta), lambda item: None)
+
+
+def medir(funcion, ruta):
+    """
+    Ejecuta una de las rutas bajo tracemalloc
+
+    Returns:
+        dict: Pico de memoria, memoria retenida por el resultado (bytes) y tiempo
+    """
+    gc.collect()
+    tracemalloc.start()
+    inicio = time.perf_counter()
+
+    resultado = funcion(ruta)
+
+    segundos = time.perf_counter() - inicio
+    retenido, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del resultado
+
+    return {'pico': pico, 'retenido': retenido, 'segundos': segundos}
+
+
+def main(argv):
+    """Punto de entrada de la línea de comandos"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--horas', type=float, nargs='+', default=[1, 4])
+    args = parser.parse_args(argv[1:])
+
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s %(message)s')
+    mb = 1024 * 1024
+
+    print(f"{'audio':>6} {'JSON (MB)':>10} {'items':>8} {'camino':>9} {'pico (MB)':>10} "
+          f"{'sin resultado (MB)':>19} {'tiempo (s)':>11}")
+
+    for horas in args.horas:
+        descriptor, ruta = tempfile.mkstemp(prefix='bench_json_v2_', suffix='.json')
+        os.close(descriptor)
+
+        try:
+            items = generar_transcripcion(ruta, horas)
+            tamano = os.path.getsize(ruta) / mb
+
+            for nombre, funcion in (('completo', _ruta_completa), ('stream', _ruta_stream),
+                                    ('lectura', _ruta_lectura)):
+                r = medir(funcion, ruta)
+                print(f"{horas:>5g}h {tamano:>10.1f} {items:>8} {nombre:>9} {r['pico'] / mb:>10.1f} "
+                      f"{(r['pico'] - r['retenido']) / mb:>19.1f} {r['segundos']:>11.2f}")
+        finally:
+            os.remove(ruta)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
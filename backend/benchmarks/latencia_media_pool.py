@@ -0,0 +1,274 @@
+"""
+Benchmark de la latencia de la API durante la extracción de audio de un video
+Arranca la aplicación en otro proceso (arrancar_servidor de
+subida_concurrente.py) con MEDIA_POOL_WORKERS=0, que extrae el audio en el
+thread de la petición, y con el pool de procesos, sube un video generado
+(sondeo_medios.generar_video) y mide la latencia de GET /api, consultado cada
+50ms desde otro thread mientras dura la subida.
+
+Con el pool comprueba además, cada cosa en un servidor nuevo:
+    - que cancelar la extracción (DELETE /api/media-pool/tasks/<id>) responde
+      409 a la subida, reemplaza el worker y no deja archivos en uploads/
+    - que con MEDIA_POOL_TASK_TIMEOUT=1 la subida responde 504
+
+Por defecto se usa el motor moviepy (el que decodifica y recodifica el audio
+en Python); con --motor ffmpeg la extracción apenas usa CPU del servidor.
+
+Uso (desde backend/, con el mismo backend/.env que el servidor):
+    python benchmarks/latencia_media_pool.py --minutos 5
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+import http.client
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sondeo_medios import generar_video
+from subida_concurrente import arrancar_servidor
+
+logger = logging.getLogger(__name__)
+
+_FRONTERA = 'frontera-benchmark'
+_BLOQUE = 1024 * 1024
+_INTERVALO = 0.05
+
+_ARGUMENTOS_VIDEO = ['-c:v', 'mpeg4', '-q:v', '20', '-c:a', 'aac', '-b:a', '128k']
+
+
+def _peticion(puerto, metodo, ruta, cuerpo=None, cabeceras=None, timeout=600):
+    """
+    Hace una petición a la aplicación
+
+    Returns:
+        tuple: (código de respuesta, JSON de la respuesta)
+    """
+    conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=timeout)
+    try:
+        conexion.request(metodo, ruta, body=cuerpo, headers=cabeceras or {})
+        respuesta = conexion.getresponse()
+        return respuesta.status, json.loads(respuesta.read() or b'{}')
+    finally:
+        conexion.close()
+
+
+def _cuerpo(video):
+    """Cuerpo multipart con el video, como generador"""
+    yield (f'--{_FRONTERA}\r\nContent-Disposition: form-data; name="audio"; filename="video.mp4"\r\n'
+           'Content-Type: video/mp4\r\n\r\n').encode('ascii')
+    with open(video, 'rb') as f:
+        while bloque := f.read(_BLOQUE):
+            yield bloque
+    yield f'\r\n--{_FRONTERA}--\r\n'.encode('ascii')
+
+
+def subir_video(puerto, video):
+    """
+    Sube el video a /api/upload
+
+    Returns:
+        tuple: (código de respuesta, JSON de la respuesta)
+    """
+    longitud = sum(len(parte) for parte in _cuerpo(video))
+    try:
+        return _peticion(puerto, 'POST', '/api/upload', _cuerpo(video), {
+            'Content-Type': f'multipart/form-data; boundary={_FRONTERA}',
+            'Content-Length': str(longitud)
+        })
+    except Exception as e:
+        return None, {'error': str(e)}
+
+
+def esperar_workers(puerto, workers, limite=60):
+    """Espera a que el pool tenga todos sus workers arrancados"""
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        _, stats = _peticion(puerto, 'GET', '/api/media-pool')
+        if len(stats.get('worker_pids', [])) >= workers:
+            return stats
+        time.sleep(0.2)
+    raise RuntimeError("los workers del pool no arrancaron a tiempo")
+
+
+def latencia_durante(puerto, funcion):
+    """
+    Consulta GET /api cada 50ms mientras se ejecuta una función
+
+    Returns:
+        tuple: (latencias en milisegundos ordenadas, resultado de la función, segundos)
+    """
+    latencias = []
+    terminado = threading.Event()
+
+    def sondear():
+        while not terminado.is_set():
+            inicio = time.perf_counter()
+            _peticion(puerto, 'GET', '/api')
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            terminado.wait(_INTERVALO)
+
+    thread = threading.Thread(target=sondear)
+    thread.start()
+    inicio = time.perf_counter()
+    try:
+        resultado = funcion()
+    finally:
+        segundos = time.perf_counter() - inicio
+        terminado.set()
+        thread.join()
+
+    return sorted(latencias), resultado, segundos
+
+
+def _percentil(valores, p):
+    return valores[min(len(valores) - 1, int(p * len(valores)))]
+
+
+def _archivos(directorio):
+    """Archivos que quedan en uploads/"""
+    carpeta = os.path.join(directorio, 'uploads')
+    if not os.path.isdir(carpeta):
+        return set()
+    return {n for n in os.listdir(carpeta) if os.path.isfile(os.path.join(carpeta, n))}
+
+
+def comprobar_cancelacion(video, workers, entorno, directorio):
+    """
+    Cancela con DELETE /api/media-pool/tasks/<id> la extracción en curso de una subida
+
+    Returns:
+        list: Errores encontrados (vacía si todo es correcto)
+    """
+    trabajo = tempfile.mkdtemp(prefix='servidor_', dir=directorio)
+    proceso, puerto = arrancar_servidor(trabajo, dict(entorno, MEDIA_POOL_WORKERS=str(workers)))
+    try:
+        esperar_workers(puerto, workers)
+        resultado = {}
+        thread = threading.Thread(target=lambda: resultado.update(respuesta=subir_video(puerto, video)))
+        thread.start()
+
+        task_id = None
+        while task_id is None and thread.is_alive():
+            running = _peticion(puerto, 'GET', '/api/media-pool')[1]['running']
+            task_id = next((t['task_id'] for t in running if t['task'] == 'extraer_audio'), None)
+            time.sleep(_INTERVALO)
+
+        if task_id is None:
+            thread.join()
+            return ["la extracción terminó antes de poder cancelarla (usar un video más largo)"]
+
+        errores = []
+        codigo, _ = _peticion(puerto, 'DELETE', f'/api/media-pool/tasks/{task_id}')
+        thread.join()
+        if codigo != 200:
+            errores.append(f"la cancelación respondió {codigo}")
+        if resultado['respuesta'][0] != 409:
+            errores.append(f"la subida cancelada respondió {resultado['respuesta'][0]} en lugar de 409")
+        if _peticion(puerto, 'DELETE', f'/api/media-pool/tasks/{task_id}')[0] != 404:
+            errores.append("una tarea ya cancelada se puede volver a cancelar")
+
+        stats = esperar_workers(puerto, workers)
+        if stats['cancelled'] != 1 or stats['worker_restarts'] != 1:
+            errores.append(f"tras cancelar, el pool cuenta {stats['cancelled']} cancelaciones y "
+                           f"{stats['worker_restarts']} workers reemplazados (se esperaba 1 y 1)")
+        if _archivos(trabajo):
+            errores.append(f"la cancelación dejó archivos en uploads/: {sorted(_archivos(trabajo))}")
+        return errores
+    finally:
+        proceso.terminate()
+        proceso.wait()
+        shutil.rmtree(trabajo, ignore_errors=True)
+
+
+def comprobar_timeout(video, workers, entorno, directorio):
+    """
+    Sube el video a un servidor con MEDIA_POOL_TASK_TIMEOUT=1
+
+    Returns:
+        list: Errores encontrados (vacía si todo es correcto)
+    """
+    trabajo = tempfile.mkdtemp(prefix='servidor_', dir=directorio)
+    proceso, puerto = arrancar_servidor(trabajo, dict(entorno, MEDIA_POOL_WORKERS=str(workers),
+                                                      MEDIA_POOL_TASK_TIMEOUT='1'))
+    try:
+        esperar_workers(puerto, workers)
+        codigo, _ = subir_video(puerto, video)
+        stats = _peticion(puerto, 'GET', '/api/media-pool')[1]
+        errores = []
+        if codigo != 504:
+            errores.append(f"la extracción que supera MEDIA_POOL_TASK_TIMEOUT respondió {codigo} en lugar de 504")
+        if stats['timeouts'] != 1:
+            errores.append(f"el pool cuenta {stats['timeouts']} tareas vencidas en lugar de 1")
+        if _archivos(trabajo):
+            errores.append(f"el timeout dejó archivos en uploads/: {sorted(_archivos(trabajo))}")
+        return errores
+    finally:
+        proceso.terminate()
+        proceso.wait()
+        shutil.rmtree(trabajo, ignore_errors=True)
+
+
+def main(argv):
+    """Punto de entrada de la línea de comandos"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--minutos', type=float, default=5)
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument('--motor', choices=('moviepy', 'ffmpeg'), default='moviepy')
+    args = parser.parse_args(argv[1:])
+
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s %(message)s')
+    directorio = tempfile.mkdtemp(prefix='bench_media_pool_')
+    entorno = {'AUDIO_EXTRACT_ENGINE': args.motor}
+    errores = []
+
+    try:
+        video = os.path.join(directorio, 'video.mp4')
+        generar_video(video, args.minutos * 60, _ARGUMENTOS_VIDEO)
+
+        print(f"Video de {args.minutos:g} minutos ({os.path.getsize(video) / 1e6:.1f}MB), motor {args.motor}, "
+              f"GET /api cada {_INTERVALO * 1000:.0f}ms durante la subida\n")
+        print(f"{'extracción':>17} {'subida (s)':>11} {'peticiones':>11} {'p50 (ms)':>9} {'p95 (ms)':>9} "
+              f"{'p99 (ms)':>9} {'máx (ms)':>9}")
+
+        for nombre, workers in (('en la petición', 0), (f'pool ({args.workers})', args.workers)):
+            trabajo = tempfile.mkdtemp(prefix='servidor_', dir=directorio)
+            proceso, puerto = arrancar_servidor(trabajo, dict(entorno, MEDIA_POOL_WORKERS=str(workers)))
+            try:
+                if workers:
+                    esperar_workers(puerto, workers)
+                # Primera petición fuera de la medida (imports perezosos de Flask)
+                _peticion(puerto, 'GET', '/api')
+
+                latencias, (codigo, datos), segundos = latencia_durante(puerto, lambda: subir_video(puerto, video))
+                if codigo != 200 or not datos.get('is_video'):
+                    errores.append(f"{nombre}: la subida respondió {codigo}: {datos.get('error')}")
+
+                print(f"{nombre:>17} {segundos:>11.1f} {len(latencias):>11} {_percentil(latencias, 0.5):>9.1f} "
+                      f"{_percentil(latencias, 0.95):>9.1f} {_percentil(latencias, 0.99):>9.1f} {latencias[-1]:>9.1f}")
+            finally:
+                proceso.terminate()
+                proceso.wait()
+                shutil.rmtree(trabajo, ignore_errors=True)
+
+        errores.extend(comprobar_cancelacion(video, args.workers, entorno, directorio))
+        errores.extend(comprobar_timeout(video, args.workers, entorno, directorio))
+
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    for error in errores:
+        print(f"FALLO: {error}")
+
+    return 1 if errores else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,156 @@
+"""
+Benchmark del procesado de resultados json-v2 en una sola pasada
+Compara procesar_transcripcion_completa (una pasada que devuelve texto,
+diálogos y estadísticas por hablante) con el camino anterior, que recorría
+'results' dos veces (una para el texto y otra para los diálogos) concatenando
+cadenas con +=. Las dos versiones anteriores se reproducen aquí tal como
+estaban para poder comparar; antes de medir se comprueba que la salida es
+idéntica.
+
+Uso (desde backend/):
+    python benchmarks/parseo_transcripcion.py --horas 0.5 1 4 --repeticiones 3
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transcription_service import procesar_transcripcion_completa
+from json_stream_memoria import generar_transcripcion
+
+logger = logging.getLogger(__name__)
+
+
+def _texto_anterior(resultado):
+    """procesar_transcripcion_para_texto antes del cambio (primera pasada)"""
+    if not resultado:
+        return ""
+
+    texto_completo = ""
+    hablante_actual = None
+
+    for resultado_item in resultado.get('results', []):
+        if resultado_item['type'] == 'word':
+            alternative = resultado_item.get('alternatives', [{}])[0]
+
+            if 'speaker' in alternative:
+                hablante = alternative['speaker']
+                if hablante != hablante_actual:
+                    hablante_actual = hablante
+                    texto_completo += f"\n\n[SPEAKER_{hablante}]"
+
+            texto_completo += alternative.get('content', '')
+
+            if resultado_item.get('is_eos', False):
+                texto_completo += ". "
+            else:
+                texto_completo += " "
+
+    return texto_completo.strip()
+
+
+def _dialogos_anterior(resultado):
+    """procesar_transcripcion_estructurada antes del cambio (segunda pasada)"""
+    if not resultado:
+        return []
+
+    dialogos = []
+    hablante_actual = None
+    texto_actual = ""
+
+    for resultado_item in resultado.get('results', []):
+        if resultado_item['type'] == 'word':
+            alternative = resultado_item.get('alternatives', [{}])[0]
+
+            if 'speaker' in alternative:
+                hablante = alternative['speaker']
+
+                if hablante != hablante_actual:
+                    if hablante_actual is not None and texto_actual.strip():
+                        dialogos.append({'speaker': hablante_actual, 'text': texto_actual.strip()})
+
+                    hablante_actual = hablante
+                    texto_actual = ""
+
+            texto_actual += alternative.get('content', '')
+
+            if resultado_item.get('is_eos', False):
+                texto_actual += ". "
+            else:
+                texto_actual += " "
+
+    if hablante_actual is not None and texto_actual.strip():
+        dialogos.append({'speaker': hablante_actual, 'text': texto_actual.strip()})
+
+    return dialogos
+
+
+def _camino_anterior(resultado):
+    """Dos recorridos de 'results', como hacían /api/process y las notificaciones"""
+    return _texto_anterior(resultado), _dialogos_anterior(resultado)
+
+
+def _camino_una_pasada(resultado):
+    """Un único recorrido con procesar_transcripcion_completa"""
+    procesado = procesar_transcripcion_completa(resultado)
+    return procesado['texto'], procesado['dialogos']
+
+
+def medir(funcion, resultado, repeticiones):
+    """
+    Ejecuta una de las rutas varias veces
+
+    Returns:
+        float: Mejor tiempo en segundos
+    """
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(resultado)
+        segundos = time.perf_counter() - inicio
+        mejor = segundos if mejor is None else min(mejor, segundos)
+    return mejor
+
+
+def main(argv):
+    """Punto de entrada de la línea de comandos"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--horas', type=float, nargs='+', default=[0.5, 1, 4])
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args(argv[1:])
+
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s %(message)s')
+
+    print(f"{'audio':>6} {'items':>8} {'dos pasadas (s)':>16} {'una pasada (s)':>15} {'mejora':>7}")
+
+    for horas in args.horas:
+        descriptor, ruta = tempfile.mkstemp(prefix='bench_parseo_', suffix='.json')
+        os.close(descriptor)
+
+        try:
+            items = generar_transcripcion(ruta, horas)
+            with open(ruta, 'r', encoding='utf-8') as f:
+                resultado = json.load(f)
+        finally:
+            os.remove(ruta)
+
+        if _camino_anterior(resultado) != _camino_una_pasada(resultado):
+            print(f"{horas:>5g}h la salida de una pasada no coincide con la anterior")
+            return 1
+
+        anterior = medir(_camino_anterior, resultado, args.repeticiones)
+        una_pasada = medir(_camino_una_pasada, resultado, args.repeticiones)
+
+        print(f"{horas:>5g}h {items:>8} {anterior:>16.3f} {una_pasada:>15.3f} {anterior / una_pasada:>6.1f}x")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
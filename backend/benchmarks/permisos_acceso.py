@@ -0,0 +1,223 @@
+"""
+Benchmark de las verificaciones de acceso a grabaciones
+Crea un esquema propio con las migraciones y el fixture de schema_migrations
+(esquema_prueba.py) y compara permission_service con las versiones anteriores
+a la caché de acceso (access_cache), que se reproducen aquí:
+    - filter_accessible_recordings: antes cargaba todas las grabaciones
+      accesibles y filtraba la lista en Python; ahora una consulta con = ANY
+    - can_access_recording e is_user_in_supervisor_teams: antes un JOIN entre
+      teams y team_members en cada llamada; ahora un set en memoria
+
+Antes de medir comprueba que las dos versiones dan el mismo resultado para
+los tres roles, y al final que agregar o quitar un miembro con team_service
+se ve en la siguiente verificación (la caché se invalida).
+
+El esquema se borra al terminar.
+
+Uso (desde backend/):
+    python benchmarks/permisos_acceso.py --grabaciones 100000 --ids 200
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import esquema_prueba
+
+logger = logging.getLogger(__name__)
+
+# Supervisor del fixture (equipo 7) y un usuario que no está en su equipo
+SUPERVISOR = 7
+AJENO = 8
+
+
+def _accesibles_anterior(user_id, user_role):
+    """get_accessible_recording_ids antes de la caché de acceso"""
+    from database import execute_query
+    from permission_service import is_admin, is_supervisor
+
+    if is_admin(user_role):
+        results = execute_query("SELECT id FROM recordings", fetch_all=True)
+    elif is_supervisor(user_role):
+        results = execute_query("""
+            SELECT DISTINCT r.id
+            FROM recordings r
+            WHERE r.user_id = %s
+            OR r.user_id IN (
+                SELECT tm.user_id
+                FROM team_members tm
+                JOIN teams t ON tm.team_id = t.id
+                WHERE t.supervisor_id = %s
+            )
+        """, (user_id, user_id), fetch_all=True)
+    else:
+        results = execute_query("SELECT id FROM recordings WHERE user_id = %s", (user_id,), fetch_all=True)
+
+    return [r['id'] for r in results] if results else []
+
+
+def _filtrar_anterior(user_id, user_role, recording_ids):
+    """filter_accessible_recordings antes de la caché de acceso"""
+    accesibles = _accesibles_anterior(user_id, user_role)
+    return [rid for rid in recording_ids if rid in accesibles]
+
+
+def _en_equipos_anterior(supervisor_id, user_id):
+    """is_user_in_supervisor_teams antes de la caché de acceso"""
+    import database
+    from permission_service import _USER_IN_SUPERVISOR_TEAMS
+
+    result = database.execute_prepared(_USER_IN_SUPERVISOR_TEAMS, (supervisor_id, user_id), fetch_one=True)
+    return result['is_in_team'] if result else False
+
+
+def _acceso_anterior(user_id, user_role, recording_id):
+    """can_access_recording antes de la caché de acceso"""
+    import database
+    from permission_service import is_admin, is_supervisor, _RECORDING_OWNER
+
+    if is_admin(user_role):
+        return True
+
+    recording = database.execute_prepared(_RECORDING_OWNER, (recording_id,), fetch_one=True)
+    if not recording:
+        return False
+    if recording['user_id'] == user_id:
+        return True
+    if is_supervisor(user_role):
+        return _en_equipos_anterior(user_id, recording['user_id'])
+    return False
+
+
+def medir(funcion, llamadas):
+    """
+    Ejecuta una función varias veces (tras un calentamiento)
+
+    Returns:
+        tuple: (p50, p99) en milisegundos
+    """
+    for _ in range(min(llamadas, 20)):
+        funcion()
+
+    tiempos = []
+    for _ in range(llamadas):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+
+    tiempos.sort()
+    return tiempos[len(tiempos) // 2], tiempos[int(len(tiempos) * 0.99)]
+
+
+def comprobar_invalidacion():
+    """
+    Agrega y quita un miembro del equipo del supervisor con team_service
+
+    Returns:
+        list: Errores encontrados (vacía si todo es correcto)
+    """
+    import team_service
+    from permission_service import is_user_in_supervisor_teams
+
+    errores = []
+
+    if is_user_in_supervisor_teams(SUPERVISOR, AJENO):
+        return [f"el usuario {AJENO} ya estaba en el equipo {SUPERVISOR}"]
+
+    team_service.add_user_to_team(SUPERVISOR, AJENO)
+    if not is_user_in_supervisor_teams(SUPERVISOR, AJENO):
+        errores.append("el miembro agregado no se ve hasta que expira la caché")
+
+    team_service.remove_user_from_team(SUPERVISOR, AJENO)
+    if is_user_in_supervisor_teams(SUPERVISOR, AJENO):
+        errores.append("el miembro quitado se sigue viendo hasta que expira la caché")
+
+    return errores
+
+
+def main(argv):
+    """Punto de entrada de la línea de comandos"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--grabaciones', type=int, default=100000)
+    parser.add_argument('--ids', type=int, default=200)
+    parser.add_argument('--llamadas', type=int, default=3000)
+    parser.add_argument('--esquema', default=esquema_prueba.ESQUEMA)
+    args = parser.parse_args(argv[1:])
+
+    logging.basicConfig(level=logging.ERROR, format='%(levelname)s %(message)s')
+
+    if not esquema_prueba.usar_esquema(args.esquema):
+        return 1
+
+    import access_cache
+    import permission_service as ps
+    from database import execute_query
+
+    if not esquema_prueba.crear_esquema(args.esquema, args.grabaciones):
+        print("No se pudo crear el esquema de prueba")
+        return 1
+
+    errores = []
+
+    try:
+        rng = random.Random(1)
+        miembros = list(access_cache.get_supervised_user_ids(SUPERVISOR))
+        del_equipo = [r['id'] for r in execute_query(
+            "SELECT id FROM recordings WHERE user_id = ANY(%s)", (miembros,), fetch_all=True
+        )]
+        muestra = rng.sample(range(1, args.grabaciones + 1), args.ids - min(len(del_equipo), args.ids // 4))
+        muestra += del_equipo[:args.ids // 4]
+        rng.shuffle(muestra)
+
+        casos = ((ps.ROLE_ADMIN, 'admin', 1), (ps.ROLE_SUPERVISOR, 'supervisor', SUPERVISOR),
+                 (ps.ROLE_USER, 'usuario', miembros[0]))
+
+        for rol, nombre, user_id in casos:
+            if _filtrar_anterior(user_id, rol, muestra) != ps.filter_accessible_recordings(user_id, rol, muestra):
+                errores.append(f"filter_accessible_recordings ({nombre}) no coincide con la versión anterior")
+            for recording_id in muestra[:50]:
+                if _acceso_anterior(user_id, rol, recording_id) != ps.can_access_recording(user_id, rol, recording_id):
+                    errores.append(f"can_access_recording ({nombre}) no coincide en la grabación {recording_id}")
+                    break
+
+        print(f"{'verificación':>40} {'anterior p50/p99 (ms)':>22} {'actual p50/p99 (ms)':>20}")
+
+        def fila(etiqueta, anterior, actual, llamadas):
+            a = medir(anterior, llamadas)
+            b = medir(actual, llamadas)
+            print(f"{etiqueta:>40} {a[0]:>12.3f} / {a[1]:<7.3f} {b[0]:>10.3f} / {b[1]:<7.3f}")
+
+        for rol, nombre, user_id in casos:
+            fila(f"filtrar {args.ids} ids ({nombre})",
+                 lambda: _filtrar_anterior(user_id, rol, muestra),
+                 lambda: ps.filter_accessible_recordings(user_id, rol, muestra),
+                 max(args.llamadas // 100, 10))
+
+        fila("can_access_recording (supervisor)",
+             lambda: _acceso_anterior(SUPERVISOR, ps.ROLE_SUPERVISOR, rng.choice(del_equipo)),
+             lambda: ps.can_access_recording(SUPERVISOR, ps.ROLE_SUPERVISOR, rng.choice(del_equipo)),
+             args.llamadas)
+        fila("is_user_in_supervisor_teams",
+             lambda: _en_equipos_anterior(SUPERVISOR, miembros[0]),
+             lambda: ps.is_user_in_supervisor_teams(SUPERVISOR, miembros[0]),
+             args.llamadas)
+
+        errores.extend(comprobar_invalidacion())
+        print(f"\nCaché de acceso: {access_cache.get_access_cache_stats()}")
+
+    finally:
+        esquema_prueba.eliminar_esquema(args.esquema)
+
+    for error in errores:
+        print(f"FALLO: {error}")
+
+    return 1 if errores else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
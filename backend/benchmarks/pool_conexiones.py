@@ -0,0 +1,186 @@
+"""
+Benchmark del pool de conexiones a PostgreSQL
+Compara las consultas por segundo abriendo una conexión psycopg2 por consulta
+(como hacía execute_query antes del pool) con execute_query sobre el pool
+compartido, con varios threads lanzando SELECT 1 a la vez. Con Supabase la
+diferencia es mayor que en local, porque cada conexión nueva paga TCP, TLS y
+la autenticación.
+
+Después comprueba que el pool se recupera de conexiones caídas: cierra por
+debajo las conexiones libres y verifica que las siguientes consultas funcionan
+y que el pool no vuelve a entregar las conexiones cerradas; y que un pool con
+min_size=3 repone en segundo plano las conexiones que se descartan.
+
+Usa DATABASE_URL (entorno o backend/.env); no crea ni modifica tablas.
+
+Uso (desde backend/):
+    python benchmarks/pool_conexiones.py --hilos 1 4 16 --consultas 2000
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from db_pool import ConnectionPool
+
+logger = logging.getLogger(__name__)
+
+
+def _conexion_por_consulta():
+    """Camino anterior: conexión nueva, consulta y cierre"""
+    connection = database.get_db_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 AS x")
+            return cursor.fetchone()['x']
+    finally:
+        connection.close()
+
+
+def _pool():
+    """Camino actual: execute_query con una conexión prestada del pool"""
+    return database.execute_query("SELECT 1 AS x", fetch_one=True)['x']
+
+
+def consultas_por_segundo(funcion, consultas, hilos):
+    """
+    Reparte las consultas entre varios threads
+
+    Returns:
+        float: Consultas completadas por segundo
+    """
+    errores = []
+
+    def trabajador():
+        try:
+            for _ in range(consultas // hilos):
+                if funcion() != 1:
+                    errores.append('resultado inesperado')
+        except Exception as e:
+            errores.append(str(e))
+
+    threads = [threading.Thread(target=trabajador) for _ in range(hilos)]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    segundos = time.perf_counter() - inicio
+
+    if errores:
+        raise RuntimeError(errores[0])
+
+    return (consultas // hilos) * hilos / segundos
+
+
+def comprobar_conexiones_caidas():
+    """
+    Cierra las conexiones libres del pool sin avisarle y lanza consultas
+
+    Returns:
+        list: Errores encontrados (vacía si todo es correcto)
+    """
+    errores = []
+    pool = database.get_pool()
+
+    prestadas = [pool.getconn() for _ in range(3)]
+    for connection in prestadas:
+        pool.putconn(connection)
+        connection.close()
+
+    for _ in range(5):
+        if database.execute_query("SELECT 1 AS x", fetch_one=True) is None:
+            errores.append("una consulta falló tras cerrar las conexiones libres")
+            break
+
+    # Todas las conexiones que entrega el pool deben estar abiertas y responder
+    prestadas = [pool.getconn() for _ in range(pool.max_size)]
+    try:
+        for connection in prestadas:
+            if connection is None or connection.closed:
+                errores.append("el pool entregó una conexión cerrada")
+                break
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connection.rollback()
+    finally:
+        for connection in prestadas:
+            if connection is not None:
+                pool.putconn(connection)
+
+    return errores
+
+
+def comprobar_reposicion(min_size=3, limite=10):
+    """
+    Descarta todas las conexiones de un pool con min_size conexiones y espera a que las reponga
+
+    Returns:
+        list: Errores encontrados (vacía si todo es correcto)
+    """
+    pool = ConnectionPool(database.get_db_connection, min_size=min_size, max_size=min_size + 2)
+    try:
+        prestadas = [pool.getconn() for _ in range(min_size)]
+        for connection in prestadas:
+            pool.putconn(connection, discard=True)
+
+        fin = time.monotonic() + limite
+        while pool.get_stats()['idle'] < min_size and time.monotonic() < fin:
+            time.sleep(0.05)
+
+        stats = pool.get_stats()
+        errores = []
+        if stats['size'] != min_size or stats['idle'] != min_size:
+            errores.append(f"tras descartar {min_size} conexiones el pool tiene {stats['size']} "
+                           f"({stats['idle']} libres) en lugar de {min_size}")
+        if stats['refilled'] != min_size:
+            errores.append(f"el pool repuso {stats['refilled']} conexiones en lugar de {min_size}")
+        return errores
+    finally:
+        pool.close()
+
+
+def main(argv):
+    """Punto de entrada de la línea de comandos"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--hilos', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--consultas', type=int, default=2000)
+    args = parser.parse_args(argv[1:])
+
+    logging.basicConfig(level=logging.ERROR, format='%(levelname)s %(message)s')
+
+    if not database.test_connection():
+        print("No se pudo conectar a la base de datos (DATABASE_URL)")
+        return 1
+
+    print(f"{'hilos':>6} {'conexión por consulta (q/s)':>28} {'pool (q/s)':>11} {'mejora':>7}")
+
+    for hilos in args.hilos:
+        # La conexión por consulta es lenta: basta con una parte de las consultas
+        sin_pool = consultas_por_segundo(_conexion_por_consulta, max(args.consultas // 10, hilos), hilos)
+        con_pool = consultas_por_segundo(_pool, args.consultas, hilos)
+        print(f"{hilos:>6} {sin_pool:>28.0f} {con_pool:>11.0f} {con_pool / sin_pool:>6.1f}x")
+
+    print(f"\nMétricas del pool: {database.get_pool_stats()}")
+
+    errores = comprobar_conexiones_caidas()
+    print(f"Conexiones caídas: {'OK' if not errores else 'FALLO'}")
+    for error in errores:
+        print(f"    - {error}")
+
+    reposicion = comprobar_reposicion()
+    print(f"Reposición hasta min_size: {'OK' if not reposicion else 'FALLO'}")
+    for error in reposicion:
+        print(f"    - {error}")
+
+    return 1 if errores or reposicion else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,260 @@
+"""
+Comprobación del registro de trabajos asíncronos (job_service)
+Encola tareas sintéticas (esperas, errores y tareas que devuelven DEFERRED)
+y comprueba:
+    - el paso queued -> processing -> completed con el resultado guardado, y
+      que get_job_status no expone el resultado
+    - que una tarea que lanza una excepción deja el trabajo como fallido
+    - que un trabajo DEFERRED sigue en curso hasta complete_job o fail_job, y
+      que una segunda finalización (notificación tardía o polling) no lo cambia
+    - que nunca se ejecutan más de TRANSCRIPTION_WORKERS tareas a la vez y
+      que get_queue_stats cuadra con los trabajos encolados mientras varios
+      threads encolan y actualizan el progreso
+    - que la purga por JOB_TTL_SECONDS elimina solo los trabajos terminados
+
+Uso (desde backend/):
+    python benchmarks/registro_trabajos.py --trabajos 200 --workers 4
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import job_service
+from job_service import (enqueue_job, complete_job, fail_job, update_job_progress, get_job,
+                         get_job_status, get_queue_stats, DEFERRED,
+                         JOB_QUEUED, JOB_PROCESSING, JOB_COMPLETED, JOB_FAILED)
+
+logger = logging.getLogger(__name__)
+
+
+def _esperar(job_ids, estados, limite=30):
+    """Espera a que todos los trabajos estén en alguno de los estados indicados"""
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        if all(get_job(job_id)['status'] in estados for job_id in job_ids):
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def comprobar_ciclo():
+    """
+    Un trabajo que termina bien y otro que lanza una excepción
+
+    Returns:
+        list: Errores encontrados (vacía si todo es correcto)
+    """
+    errores = []
+    liberar = threading.Event()
+    vistos = []
+
+    def tarea(job_id, valor):
+        vistos.append(get_job(job_id)['status'])
+        update_job_progress(job_id, 'transcribing')
+        liberar.wait(10)
+        return {'valor': valor}
+
+    def tarea_fallida(job_id):
+        raise ValueError('fallo de prueba')
+
+    job_id = enqueue_job(tarea, job_type='prueba', valor=42)
+    fallido = enqueue_job(tarea_fallida)
+
+    if not _esperar([job_id], (JOB_PROCESSING,)) or get_job(job_id)['progress'] != 'transcribing':
+        errores.append(f"el trabajo en curso está en {get_job(job_id)['status']}/{get_job(job_id)['progress']}")
+    liberar.set()
+
+    if not _esperar([job_id, fallido], (JOB_COMPLETED, JOB_FAILED)):
+        return errores + ["los trabajos no terminaron a tiempo"]
+
+    job = get_job(job_id)
+    if vistos != [JOB_PROCESSING]:
+        errores.append(f"la tarea se ejecutó con el trabajo en {vistos}")
+    if job['status'] != JOB_COMPLETED or job['result'] != {'valor': 42} or job['progress'] != 'completed':
+        errores.append(f"el trabajo terminó como {job['status']} con {job['result']}")
+    if not job['created_at'] <= job['started_at'] <= job['finished_at']:
+        errores.append("las fechas del trabajo no siguen el orden creado <= iniciado <= terminado")
+    if 'result' in get_job_status(job_id):
+        errores.append("get_job_status expone el resultado")
+
+    job = get_job(fallido)
+    if job['status'] != JOB_FAILED or job['error'] != 'fallo de prueba':
+        errores.append(f"la tarea con excepción terminó como {job['status']} ({job['error']})")
+
+    if get_job('no-existe') is not None or complete_job('no-existe', {}) or fail_job('no-existe', 'x'):
+        errores.append("un trabajo inexistente se puede consultar o finalizar")
+
+    return errores
+
+
+def comprobar_diferidos():
+    """
+    Trabajos DEFERRED finalizados desde fuera del worker, dos veces
+
+    Returns:
+        list: Errores encontrados (vacía si todo es correcto)
+    """
+    errores = []
+    completado = enqueue_job(lambda job_id: DEFERRED)
+    fallido = enqueue_job(lambda job_id: DEFERRED)
+
+    # La tarea ya volvió pero el trabajo sigue en curso
+    time.sleep(0.2)
+    for job_id in (completado, fallido):
+        if get_job(job_id)['status'] != JOB_PROCESSING:
+            errores.append(f"un trabajo DEFERRED quedó en {get_job(job_id)['status']} al volver la tarea")
+
+    if not complete_job(completado, {'texto': 'notificación'}):
+        errores.append("complete_job no completó un trabajo DEFERRED")
+    if not fail_job(fallido, 'error de Speechmatics'):
+        errores.append("fail_job no marcó como fallido un trabajo DEFERRED")
+
+    # Segunda finalización: no debe cambiar nada
+    if complete_job(completado, {'texto': 'polling'}) or fail_job(completado, 'tarde'):
+        errores.append("un trabajo completado se volvió a finalizar")
+    if complete_job(fallido, {'texto': 'tarde'}):
+        errores.append("un trabajo fallido se volvió a completar")
+
+    job = get_job(completado)
+    if job['status'] != JOB_COMPLETED or job['result'] != {'texto': 'notificación'}:
+        errores.append(f"el trabajo completado quedó en {job['status']} con {job['result']}")
+    job = get_job(fallido)
+    if job['status'] != JOB_FAILED or job['error'] != 'error de Speechmatics':
+        errores.append(f"el trabajo fallido quedó en {job['status']} ({job['error']})")
+
+    return errores
+
+
+def comprobar_concurrencia(trabajos, workers, hilos=8):
+    """
+    Varios threads encolan trabajos y actualizan su progreso a la vez
+
+    Returns:
+        tuple: (lista de errores, segundos, máximo de tareas simultáneas)
+    """
+    errores = []
+    lock = threading.Lock()
+    estado = {'activas': 0, 'maximo': 0}
+    job_ids = []
+
+    def tarea(job_id, espera):
+        with lock:
+            estado['activas'] += 1
+            estado['maximo'] = max(estado['maximo'], estado['activas'])
+        try:
+            for etapa in ('transcribing', 'parsing', 'summarizing'):
+                update_job_progress(job_id, etapa)
+                time.sleep(espera / 3)
+            return job_id
+        finally:
+            with lock:
+                estado['activas'] -= 1
+
+    def encolar(n):
+        for _ in range(n):
+            job_id = enqueue_job(tarea, espera=0.01)
+            with lock:
+                job_ids.append(job_id)
+            get_queue_stats()
+
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=encolar, args=(trabajos // hilos + (i < trabajos % hilos),))
+               for i in range(hilos)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = get_queue_stats()
+    en_registro = sum(stats[e] for e in (JOB_QUEUED, JOB_PROCESSING, JOB_COMPLETED, JOB_FAILED))
+    if len(job_ids) != trabajos or len(set(job_ids)) != trabajos or en_registro < trabajos:
+        errores.append(f"se encolaron {len(set(job_ids))} trabajos distintos de {trabajos} "
+                       f"y el registro cuenta {en_registro}")
+
+    if not _esperar(job_ids, (JOB_COMPLETED, JOB_FAILED), limite=60):
+        errores.append("los trabajos no terminaron a tiempo")
+    segundos = time.perf_counter() - inicio
+
+    mal = [job_id for job_id in job_ids if get_job(job_id)['result'] != job_id]
+    if mal:
+        errores.append(f"{len(mal)} trabajos terminaron sin su resultado")
+    if estado['maximo'] > workers:
+        errores.append(f"se ejecutaron {estado['maximo']} tareas a la vez con {workers} workers")
+
+    return errores, segundos, estado['maximo']
+
+
+def comprobar_purga():
+    """
+    Con JOB_TTL_SECONDS=0 el siguiente enqueue_job purga los trabajos terminados
+
+    Returns:
+        list: Errores encontrados (vacía si todo es correcto)
+    """
+    errores = []
+    terminado = enqueue_job(lambda job_id: 'hecho')
+    en_curso = enqueue_job(lambda job_id: DEFERRED)
+    _esperar([terminado], (JOB_COMPLETED,))
+    time.sleep(0.1)
+
+    ttl = job_service.JOB_TTL_SECONDS
+    job_service.JOB_TTL_SECONDS = 0
+    try:
+        nuevo = enqueue_job(lambda job_id: DEFERRED)
+    finally:
+        job_service.JOB_TTL_SECONDS = ttl
+
+    if get_job(terminado) is not None:
+        errores.append("la purga no eliminó un trabajo terminado")
+    if get_job(en_curso) is None or get_job(nuevo) is None:
+        errores.append("la purga eliminó un trabajo en curso")
+    stats = get_queue_stats()
+    if stats[JOB_COMPLETED] or stats[JOB_FAILED]:
+        errores.append(f"tras la purga quedan trabajos terminados: {stats}")
+
+    complete_job(en_curso, None)
+    complete_job(nuevo, None)
+    return errores
+
+
+def main(argv):
+    """Punto de entrada de la línea de comandos"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--trabajos', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args(argv[1:])
+
+    logging.basicConfig(level=logging.CRITICAL)
+    # Antes de crear el pool de workers con el primer trabajo
+    job_service.MAX_WORKERS = args.workers
+    correcto = True
+
+    print(f"{'comprobación':<28} {'estado':>7} {'tiempo (s)':>11}")
+
+    for nombre, funcion in (('ciclo de un trabajo', comprobar_ciclo),
+                            ('trabajos DEFERRED', comprobar_diferidos),
+                            ('concurrencia', lambda: comprobar_concurrencia(args.trabajos, args.workers)),
+                            ('purga por JOB_TTL_SECONDS', comprobar_purga)):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        errores, detalle = (resultado[0], resultado[1:]) if isinstance(resultado, tuple) else (resultado, None)
+        print(f"{nombre:<28} {'OK' if not errores else 'FALLO':>7} {time.perf_counter() - inicio:>11.2f}")
+        if detalle:
+            print(f"    {args.trabajos} trabajos de 10ms con {args.workers} workers en {detalle[0]:.2f}s, "
+                  f"como mucho {detalle[1]} a la vez")
+        for error in errores:
+            print(f"    - {error}")
+        correcto &= not errores
+
+    print("\nTodas las comprobaciones correctas" if correcto else "\nHay comprobaciones con fallos")
+    return 0 if correcto else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
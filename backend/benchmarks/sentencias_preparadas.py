@@ -0,0 +1,217 @@
+"""
+Benchmark de las sentencias preparadas en el servidor
+Crea un esquema propio con las migraciones y el fixture de schema_migrations
+(esquema_prueba.py) y mide la latencia p50/p99 de cada sentencia registrada
+con register_prepared_statement ejecutada con execute_prepared, con
+DB_PREPARED_STATEMENTS activado (PREPARE una vez por conexión y EXECUTE) y
+desactivado (la consulta original con execute_query).
+
+Antes de medir comprueba que las dos formas devuelven lo mismo, y al final:
+    - que una sentencia que desaparece de la sesión (DEALLOCATE, como al
+      pasar por un pooler) se resuelve ejecutando la consulta sin preparar y
+      se vuelve a preparar en el siguiente uso, sin llegar a desactivarse
+    - que una sentencia que no se puede preparar se desactiva tras
+      PREPARED_MAX_FAILURES fallos seguidos y se vuelve a intentar pasado
+      PREPARED_RETRY_SECONDS
+
+El esquema se borra al terminar.
+
+Uso (desde backend/):
+    python benchmarks/sentencias_preparadas.py --grabaciones 100000 --llamadas 5000
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import esquema_prueba
+
+logger = logging.getLogger(__name__)
+
+
+def _sentencias():
+    """
+    Sentencias registradas por los servicios con parámetros del fixture
+
+    Returns:
+        list: Tuplas (nombre, params)
+    """
+    import auth_service
+    import permission_service
+    from agents import agents_service
+
+    return [
+        (auth_service._AUTHENTICATE_USER, ('user42@manuelsolis.com', 'x')),
+        (agents_service._AGENT_BY_ID, (42,)),
+        (agents_service._AGENT_BY_ID_AND_USER, (42, 43)),
+        (permission_service._RECORDING_OWNER, (4242,)),
+        (permission_service._USER_IN_SUPERVISOR_TEAMS, (7, 42)),
+    ]
+
+
+def medir(name, params, llamadas):
+    """
+    Ejecuta una sentencia varias veces (tras un calentamiento)
+
+    Returns:
+        tuple: (p50, p99) en microsegundos
+    """
+    import database
+
+    for _ in range(min(llamadas // 10, 300)):
+        database.execute_prepared(name, params, fetch_one=True)
+
+    tiempos = []
+    for _ in range(llamadas):
+        inicio = time.perf_counter()
+        database.execute_prepared(name, params, fetch_one=True)
+        tiempos.append((time.perf_counter() - inicio) * 1e6)
+
+    tiempos.sort()
+    return tiempos[len(tiempos) // 2], tiempos[int(len(tiempos) * 0.99)]
+
+
+def comprobar_deallocate(name, params):
+    """
+    Elimina varias veces la sentencia de todas las conexiones libres sin avisar
+    al registro: cada vez la primera ejecución va sin preparar y la siguiente
+    la vuelve a preparar, sin que la sentencia llegue a desactivarse
+
+    Returns:
+        list: Errores encontrados (vacía si todo es correcto)
+    """
+    import database
+
+    esperado = database.execute_query(database._prepared_statements[name]['query'], params, fetch_one=True)
+    pool = database.get_pool()
+
+    for _ in range(database.PREPARED_MAX_FAILURES + 2):
+        conexiones = [pool.getconn() for _ in range(pool.get_stats()['size'])]
+        for connection in conexiones:
+            with connection.cursor() as cursor:
+                cursor.execute("DEALLOCATE ALL")
+            connection.commit()
+        for connection in conexiones:
+            pool.putconn(connection)
+
+        stats = database.get_prepared_stats()
+        if database.execute_prepared(name, params, fetch_one=True) != esperado:
+            return ["la ejecución tras DEALLOCATE no devolvió el resultado esperado"]
+        if database.get_prepared_stats()['fallbacks'] != stats['fallbacks'] + 1:
+            return ["la ejecución tras DEALLOCATE no pasó por la consulta sin preparar"]
+
+        if database.execute_prepared(name, params, fetch_one=True) != esperado:
+            return ["la ejecución siguiente a DEALLOCATE no devolvió el resultado esperado"]
+        despues = database.get_prepared_stats()
+        if despues['prepares'] != stats['prepares'] + 1 or despues['executions'] != stats['executions'] + 1:
+            return ["la sentencia no se volvió a preparar tras DEALLOCATE"]
+
+    if name in database.get_prepared_stats()['disabled']:
+        return ["la sentencia quedó desactivada tras varios DEALLOCATE seguidos de ejecuciones correctas"]
+    return []
+
+
+def comprobar_reactivacion():
+    """
+    Registra una sentencia que PostgreSQL no puede preparar (SHOW) y comprueba
+    que se desactiva tras PREPARED_MAX_FAILURES fallos y se vuelve a intentar
+    pasado PREPARED_RETRY_SECONDS
+
+    Returns:
+        list: Errores encontrados (vacía si todo es correcto)
+    """
+    import database
+
+    name = database.register_prepared_statement('benchmark_show', "SHOW search_path")
+    reintento = database.PREPARED_RETRY_SECONDS
+    database.PREPARED_RETRY_SECONDS = 1
+    errores = []
+
+    try:
+        for _ in range(database.PREPARED_MAX_FAILURES):
+            if database.execute_prepared(name, fetch_one=True) is None:
+                return ["la consulta sin preparar de una sentencia que falla no devolvió resultado"]
+        if name not in database.get_prepared_stats()['disabled']:
+            errores.append(f"la sentencia no se desactivó tras {database.PREPARED_MAX_FAILURES} fallos seguidos")
+
+        fallbacks = database.get_prepared_stats()['fallbacks']
+        database.execute_prepared(name, fetch_one=True)
+        if database.get_prepared_stats()['fallbacks'] != fallbacks:
+            errores.append("la sentencia desactivada se volvió a intentar preparar")
+
+        time.sleep(database.PREPARED_RETRY_SECONDS + 0.1)
+        if name in database.get_prepared_stats()['disabled']:
+            errores.append("la sentencia sigue desactivada pasado PREPARED_RETRY_SECONDS")
+        database.execute_prepared(name, fetch_one=True)
+        if database.get_prepared_stats()['fallbacks'] != fallbacks + 1:
+            errores.append("pasado PREPARED_RETRY_SECONDS la sentencia no se volvió a intentar preparar")
+
+    finally:
+        database.PREPARED_RETRY_SECONDS = reintento
+        with database._prepared_lock:
+            database._prepared_statements.pop(name, None)
+
+    return errores
+
+
+def main(argv):
+    """Punto de entrada de la línea de comandos"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--grabaciones', type=int, default=100000)
+    parser.add_argument('--llamadas', type=int, default=5000)
+    parser.add_argument('--esquema', default=esquema_prueba.ESQUEMA)
+    args = parser.parse_args(argv[1:])
+
+    logging.basicConfig(level=logging.ERROR, format='%(levelname)s %(message)s')
+
+    if not esquema_prueba.usar_esquema(args.esquema):
+        return 1
+
+    import database
+
+    if not esquema_prueba.crear_esquema(args.esquema, args.grabaciones):
+        print("No se pudo crear el esquema de prueba")
+        return 1
+
+    errores = []
+
+    try:
+        sentencias = _sentencias()
+
+        for name, params in sentencias:
+            database.PREPARED_STATEMENTS_ENABLED = True
+            preparada = database.execute_prepared(name, params, fetch_one=True)
+            database.PREPARED_STATEMENTS_ENABLED = False
+            if database.execute_prepared(name, params, fetch_one=True) != preparada:
+                errores.append(f"{name}: la sentencia preparada no devuelve lo mismo que la consulta")
+
+        print(f"{'sentencia':>36} {'sin preparar p50/p99 (us)':>26} {'preparada p50/p99 (us)':>23}")
+
+        for name, params in sentencias:
+            database.PREPARED_STATEMENTS_ENABLED = False
+            sin_preparar = medir(name, params, args.llamadas)
+            database.PREPARED_STATEMENTS_ENABLED = True
+            preparada = medir(name, params, args.llamadas)
+
+            print(f"{name:>36} {sin_preparar[0]:>16.0f} / {sin_preparar[1]:<7.0f} "
+                  f"{preparada[0]:>13.0f} / {preparada[1]:<7.0f}")
+
+        errores.extend(comprobar_deallocate(*sentencias[0]))
+        errores.extend(comprobar_reactivacion())
+        print(f"\nContadores: {database.get_prepared_stats()}")
+
+    finally:
+        esquema_prueba.eliminar_esquema(args.esquema)
+
+    for error in errores:
+        print(f"FALLO: {error}")
+
+    return 1 if errores else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,193 @@
+"""
+Benchmark de la inspección de archivos multimedia (media_probe)
+Genera con el ffmpeg de moviepy un video corto en cada formato que ve la
+subida (MP4 con el moov al final y con faststart, MOV, MP4 fragmentado, MKV,
+WebM, WAV) y uno que el parser no cubre (AVI), y mide el tiempo de:
+    - la lectura de cabeceras de media_probe (sin caché)
+    - ffprobe (si está instalado) y la cabecera que imprime el ffmpeg de
+      moviepy, que son las alternativas externas
+    - abrir y cerrar un VideoFileClip de moviepy, como hacía antes
+      verificar_es_video_real
+
+Comprueba además que la lectura de cabeceras coincide con ffmpeg en las pistas
+y la duración, y que la segunda inspección del mismo archivo sale de la caché.
+
+Uso (desde backend/):
+    python benchmarks/sondeo_medios.py --segundos 20 --repeticiones 5
+"""
+
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import media_probe
+from video_service import FFMPEG_BINARY, MOVIEPY_AVAILABLE
+
+logger = logging.getLogger(__name__)
+
+# Formato -> (extensión, argumentos de ffmpeg para el video y el audio)
+FORMATOS = {
+    'mp4': ('mp4', ['-c:v', 'mpeg4', '-c:a', 'aac']),
+    'mp4 faststart': ('mp4', ['-c:v', 'mpeg4', '-c:a', 'aac', '-movflags', '+faststart']),
+    'mov': ('mov', ['-c:v', 'mpeg4', '-c:a', 'aac']),
+    'mp4 fragmentado': ('mp4', ['-c:v', 'mpeg4', '-c:a', 'aac', '-movflags', 'frag_keyframe+empty_moov']),
+    'mkv': ('mkv', ['-c:v', 'mpeg4', '-c:a', 'aac']),
+    'webm': ('webm', ['-c:v', 'libvpx', '-b:v', '300k', '-c:a', 'libvorbis']),
+    'wav': ('wav', ['-vn', '-c:a', 'pcm_s16le']),
+    'avi': ('avi', ['-c:v', 'mpeg4', '-c:a', 'libmp3lame']),
+}
+
+
+def generar_video(ruta, segundos, argumentos, tamano='320x240', audio_rate=48000):
+    """
+    Genera un video sintético (barras de prueba y un tono) con el ffmpeg de moviepy
+
+    Args:
+        ruta (str): Archivo de salida (la extensión decide el contenedor)
+        segundos (float): Duración
+        argumentos (list): Códecs y opciones de salida de ffmpeg
+        tamano (str): Resolución del video
+        audio_rate (int): Frecuencia de muestreo del tono (estéreo)
+    """
+    subprocess.run(
+        [FFMPEG_BINARY, '-nostdin', '-hide_banner', '-loglevel', 'error', '-y',
+         '-f', 'lavfi', '-i', f'testsrc=size={tamano}:rate=25:duration={segundos}',
+         '-f', 'lavfi', '-i', f'sine=frequency=440:sample_rate={audio_rate}:duration={segundos}',
+         '-ac', '2', '-shortest'] + argumentos + [ruta],
+        check=True
+    )
+
+
+def _sin_cache():
+    """Inspección de cabeceras con la caché vacía"""
+    with media_probe._lock:
+        media_probe._cache.clear()
+
+
+def _cabeceras(ruta):
+    _sin_cache()
+    return media_probe.inspeccionar_medio(ruta)
+
+
+def _ffprobe(ruta):
+    return media_probe._inspeccionar_ffprobe(ruta, shutil.which(media_probe.FFPROBE_BINARY))
+
+
+def _ffmpeg(ruta):
+    return media_probe._inspeccionar_ffmpeg(ruta)
+
+
+def _videofileclip(ruta):
+    """verificar_es_video_real antes de media_probe"""
+    from moviepy import VideoFileClip
+
+    clip = VideoFileClip(ruta)
+    try:
+        return clip.duration
+    finally:
+        clip.close()
+
+
+def medir(funcion, ruta, repeticiones):
+    """
+    Ejecuta una inspección varias veces
+
+    Returns:
+        float: Mediana en milisegundos (o None si falla)
+    """
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        try:
+            funcion(ruta)
+        except Exception as e:
+            logger.debug(f"{funcion.__name__} falló con {ruta}: {e}")
+            return None
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    return tiempos[len(tiempos) // 2]
+
+
+def comprobar(nombre, ruta, segundos):
+    """
+    Compara la lectura de cabeceras con ffmpeg y comprueba la caché
+
+    Returns:
+        list: Errores encontrados (vacía si todo es correcto)
+    """
+    errores = []
+    info = _cabeceras(ruta)
+    referencia = _ffmpeg(ruta)
+
+    if info is None:
+        return [f"{nombre}: no se pudo inspeccionar"]
+
+    if (info.has_audio, info.has_video) != (referencia.has_audio, referencia.has_video):
+        errores.append(f"{nombre}: pistas distintas de ffmpeg "
+                       f"({info.has_audio}/{info.has_video} frente a {referencia.has_audio}/{referencia.has_video})")
+    if info.duration is None or abs(info.duration - segundos) > 0.5:
+        errores.append(f"{nombre}: duración {info.duration} (esperada {segundos})")
+    if info.audio and referencia.audio and referencia.audio.codec and info.audio.codec != referencia.audio.codec:
+        errores.append(f"{nombre}: códec de audio {info.audio.codec} (ffmpeg: {referencia.audio.codec})")
+
+    hits = media_probe.get_media_probe_stats()['hits']
+    if media_probe.inspeccionar_medio(ruta) is not info or media_probe.get_media_probe_stats()['hits'] != hits + 1:
+        errores.append(f"{nombre}: la segunda inspección no salió de la caché")
+
+    return errores
+
+
+def main(argv):
+    """Punto de entrada de la línea de comandos"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--segundos', type=float, default=20)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args(argv[1:])
+
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s %(message)s')
+    directorio = tempfile.mkdtemp(prefix='bench_media_probe_')
+    hay_ffprobe = shutil.which(media_probe.FFPROBE_BINARY) is not None
+    errores = []
+
+    def celda(valor):
+        return f"{valor:>12.1f}" if valor is not None else f"{'-':>12}"
+
+    try:
+        print(f"{'formato':>16} {'origen':>8} {'cabeceras (ms)':>15} {'ffprobe (ms)':>12} "
+              f"{'ffmpeg (ms)':>12} {'VideoFileClip (ms)':>19}")
+
+        for nombre, (extension, argumentos) in FORMATOS.items():
+            ruta = os.path.join(directorio, f"{nombre.replace(' ', '_')}.{extension}")
+            generar_video(ruta, args.segundos, argumentos)
+
+            errores.extend(comprobar(nombre, ruta, args.segundos))
+            origen = _cabeceras(ruta).source
+
+            cabeceras = medir(_cabeceras, ruta, args.repeticiones)
+            ffprobe = medir(_ffprobe, ruta, args.repeticiones) if hay_ffprobe else None
+            ffmpeg = medir(_ffmpeg, ruta, args.repeticiones)
+            clip = medir(_videofileclip, ruta, args.repeticiones) if MOVIEPY_AVAILABLE and extension != 'wav' else None
+
+            print(f"{nombre:>16} {origen:>8} {cabeceras:>15.2f} {celda(ffprobe)} {celda(ffmpeg)} {celda(clip):>19}")
+
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    if not hay_ffprobe:
+        print(f"\n{media_probe.FFPROBE_BINARY} no está instalado: los formatos sin parser usan el ffmpeg de moviepy")
+
+    for error in errores:
+        print(f"FALLO: {error}")
+
+    return 1 if errores else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
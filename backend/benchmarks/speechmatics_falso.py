@@ -0,0 +1,351 @@
+"""
+Comprobación de /api/process con notificaciones contra un Speechmatics falso
+Levanta un servidor HTTP local que implementa la parte de la API batch de
+Speechmatics que usa el backend (POST /v2/jobs, GET /v2/jobs/<id> y
+GET /v2/jobs/<id>/transcript) y envía las notificaciones de finalización a la
+aplicación, que se ejecuta en otro puerto local. Se sube un WAV sintético por
+caso con /api/upload, se procesa con /api/process y se espera el resultado en
+/api/jobs/<id>/result. No se envía nada a Speechmatics.
+
+Casos:
+    notificar       la notificación llega: el trabajo termina, la transcripción
+                    se descarga una sola vez y se guarda en la caché
+    repetir         el mismo audio otra vez: sale de la caché sin enviar trabajo
+    sin_notificar   la notificación no llega: el polling de respaldo lo recupera
+    secreto_malo    la notificación lleva otro secreto: 401 y polling
+    tardia          la notificación llega después de que el polling terminara
+                    el trabajo: no lo modifica
+    atascado        el trabajo sigue 'running': falla al cumplirse
+                    SPEECHMATICS_POLL_MAX_WAIT
+
+En todos se comprueba además que la configuración enviada pide la notificación
+sin 'contents' (la transcripción no viaja en el cuerpo) y con la cabecera
+Authorization del secreto.
+
+Uso (desde backend/, con el mismo backend/.env que el servidor):
+    python benchmarks/speechmatics_falso.py --retraso 0.3 --poll 2 --max-espera 5
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import uuid
+import wave
+import email
+import socket
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+from urllib.parse import urlsplit
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import httpx
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, RAIZ)
+
+logger = logging.getLogger(__name__)
+
+SECRETO = 'secreto-de-prueba'
+
+PALABRAS = ('hola', 'revisamos', 'el', 'presupuesto', 'del', 'proyecto')
+
+
+# ==================== SPEECHMATICS FALSO ====================
+
+class SpeechmaticsFalso(BaseHTTPRequestHandler):
+    """
+    Manejador del servidor falso. El escenario de cada trabajo se toma de
+    'siguiente' en el momento de recibirlo
+    """
+
+    siguiente = 'notificar'
+    retraso = 0.3
+    trabajos = {}
+    lock = threading.Lock()
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _responder(self, codigo, datos=None, cuerpo=None):
+        cuerpo = cuerpo if cuerpo is not None else json.dumps(datos).encode('utf-8')
+        self.send_response(codigo)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def do_POST(self):
+        if urlsplit(self.path).path.rstrip('/') != '/v2/jobs':
+            return self._responder(404, {'error': 'not found'})
+
+        cuerpo = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        mensaje = email.message_from_bytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode('latin-1') + cuerpo
+        )
+        campos = {parte.get_param('name', header='content-disposition'): parte.get_payload(decode=True)
+                  for parte in mensaje.get_payload()}
+
+        job_id = uuid.uuid4().hex[:10]
+        with self.lock:
+            self.trabajos[job_id] = {
+                'escenario': self.siguiente,
+                'config': json.loads(campos['config']),
+                'audio_bytes': len(campos.get('data_file') or b''),
+                'estado': 'running',
+                'descargas': 0,
+                'consultas': 0,
+                'notificaciones': []
+            }
+
+        threading.Thread(target=self._terminar, args=(job_id,), daemon=True).start()
+        self._responder(201, {'id': job_id})
+
+    def do_GET(self):
+        partes = urlsplit(self.path).path.strip('/').split('/')
+        with self.lock:
+            trabajo = self.trabajos.get(partes[2]) if len(partes) >= 3 and partes[:2] == ['v2', 'jobs'] else None
+        if trabajo is None:
+            return self._responder(404, {'error': 'job not found'})
+
+        if len(partes) == 3:
+            with self.lock:
+                trabajo['consultas'] += 1
+            return self._responder(200, {'job': {'id': partes[2], 'status': trabajo['estado'], 'duration': 1}})
+
+        if partes[3:] == ['transcript'] and trabajo['estado'] == 'done':
+            with self.lock:
+                trabajo['descargas'] += 1
+            return self._responder(200, cuerpo=_transcripcion(partes[2]))
+
+        self._responder(404, {'error': 'transcript not available'})
+
+    @classmethod
+    def _terminar(cls, job_id):
+        """Completa el trabajo tras 'retraso' segundos y notifica según el escenario"""
+        trabajo = cls.trabajos[job_id]
+        escenario = trabajo['escenario']
+        time.sleep(cls.retraso)
+
+        if escenario == 'atascado':
+            return
+        with cls.lock:
+            trabajo['estado'] = 'done'
+
+        if escenario == 'sin_notificar':
+            return
+        if escenario == 'tardia':
+            # Esperar a que el polling de respaldo termine el trabajo
+            while trabajo['descargas'] == 0:
+                time.sleep(0.05)
+            time.sleep(0.5)
+
+        notificacion = trabajo['config']['notification_config'][0]
+        cabeceras = dict(h.split(': ', 1) for h in notificacion.get('auth_headers', []))
+        if escenario == 'secreto_malo':
+            cabeceras['Authorization'] = 'Bearer otro-secreto'
+
+        respuesta = httpx.post(notificacion['url'], params={'id': job_id, 'status': 'success'},
+                               headers=cabeceras, timeout=10)
+        with cls.lock:
+            trabajo['notificaciones'].append((respuesta.status_code, respuesta.json().get('matched')))
+
+
+def _transcripcion(job_id):
+    """Resultado json-v2 del trabajo: las mismas palabras para todos"""
+    items = []
+    for i, palabra in enumerate(PALABRAS):
+        items.append({'type': 'word', 'start_time': i * 0.5, 'end_time': i * 0.5 + 0.4,
+                      'alternatives': [{'content': palabra, 'confidence': 0.99, 'speaker': 'S1'}]})
+    documento = {'format': '2.9', 'job': {'id': job_id},
+                 'metadata': {'transcription_config': {'language': 'es', 'diarization': 'speaker'}},
+                 'results': items}
+    return json.dumps(documento).encode('utf-8')
+
+
+# ==================== CLIENTE ====================
+
+def _wav(semilla):
+    """WAV de un segundo, distinto para cada semilla (otra clave de caché)"""
+    salida = io.BytesIO()
+    with wave.open(salida, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(8000)
+        w.writeframes(bytes((semilla + i) % 256 for i in range(16000)))
+    return salida.getvalue()
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def procesar(cliente, audio, tiempo_maximo):
+    """
+    Sube un audio, lo procesa y espera el resultado
+
+    Returns:
+        tuple: (código HTTP final, cuerpo del resultado, segundos, URL del resultado)
+    """
+    inicio = time.perf_counter()
+    subida = cliente.post('/api/upload', files={'audio': ('prueba.wav', audio, 'audio/wav')})
+    subida.raise_for_status()
+
+    respuesta = cliente.post('/api/process', json={'file_id': subida.json()['file_id'],
+                                                   'api_key': 'clave-falsa', 'language': 'es'})
+    respuesta.raise_for_status()
+    url = respuesta.json()['result_url']
+
+    while time.perf_counter() - inicio < tiempo_maximo:
+        resultado = cliente.get(url)
+        if resultado.status_code != 202:
+            return resultado.status_code, resultado.json(), time.perf_counter() - inicio, url
+        time.sleep(0.05)
+
+    return 202, {}, time.perf_counter() - inicio, url
+
+
+def comprobar_caso(cliente, escenario, audio, args, transcription_cache):
+    """
+    Ejecuta un caso y devuelve los errores encontrados
+
+    Returns:
+        tuple: (errores, segundos)
+    """
+    errores = []
+    SpeechmaticsFalso.siguiente = escenario
+    trabajos_antes = set(SpeechmaticsFalso.trabajos)
+    stores = transcription_cache.get_cache_stats()['stores']
+
+    codigo, resultado, segundos, url = procesar(cliente, audio, args.max_espera + 10)
+    nuevos = [SpeechmaticsFalso.trabajos[j] for j in set(SpeechmaticsFalso.trabajos) - trabajos_antes]
+    dialogos_esperados = [{'speaker': 'S1', 'text': ' '.join(PALABRAS)}]
+
+    if escenario == 'repetir':
+        if nuevos:
+            errores.append(f"se enviaron {len(nuevos)} trabajos nuevos con el audio en caché")
+        if codigo != 200 or resultado.get('dialogues') != dialogos_esperados:
+            errores.append(f"resultado {codigo}: {str(resultado)[:200]}")
+        return errores, segundos
+
+    if len(nuevos) != 1:
+        errores.append(f"se esperaba 1 trabajo enviado y hubo {len(nuevos)}")
+        return errores, segundos
+    trabajo = nuevos[0]
+
+    notificacion = trabajo['config'].get('notification_config', [{}])[0]
+    if 'contents' in notificacion:
+        errores.append(f"la notificación pide contents={notificacion['contents']}")
+    if notificacion.get('auth_headers') != [f"Authorization: Bearer {SECRETO}"]:
+        errores.append(f"auth_headers inesperados: {notificacion.get('auth_headers')}")
+
+    if escenario == 'atascado':
+        if codigo != 500 or 'timed out' not in str(resultado.get('error')):
+            errores.append(f"se esperaba fallo por tiempo y se obtuvo {codigo}: {resultado}")
+        if segundos < args.max_espera:
+            errores.append(f"falló a los {segundos:.1f}s, antes de SPEECHMATICS_POLL_MAX_WAIT")
+        return errores, segundos
+
+    if codigo != 200 or resultado.get('dialogues') != dialogos_esperados:
+        errores.append(f"resultado {codigo}: {str(resultado)[:200]}")
+    if transcription_cache.get_cache_stats()['stores'] != stores + 1:
+        errores.append("el resultado no se guardó en la caché")
+
+    if escenario == 'tardia':
+        # Esperar la notificación tardía y comprobar que el trabajo no cambia
+        limite = time.perf_counter() + 10
+        while not trabajo['notificaciones'] and time.perf_counter() < limite:
+            time.sleep(0.05)
+        if trabajo['notificaciones'] != [(200, False)]:
+            errores.append(f"notificación tardía respondida con {trabajo['notificaciones']}")
+        time.sleep(0.5)
+        despues = cliente.get(url)
+        if despues.status_code != 200 or despues.json() != resultado:
+            errores.append(f"el trabajo cambió tras la notificación tardía: {despues.status_code}")
+    elif escenario == 'secreto_malo':
+        if trabajo['notificaciones'] != [(401, None)]:
+            errores.append(f"notificación con otro secreto respondida con {trabajo['notificaciones']}")
+    elif escenario == 'notificar':
+        if trabajo['notificaciones'] != [(200, True)]:
+            errores.append(f"notificación respondida con {trabajo['notificaciones']}")
+        if trabajo['consultas']:
+            errores.append(f"{trabajo['consultas']} consultas de estado con la notificación a tiempo")
+
+    if trabajo['descargas'] != 1:
+        errores.append(f"la transcripción se descargó {trabajo['descargas']} veces")
+
+    return errores, segundos
+
+
+def main(argv):
+    """Punto de entrada de la línea de comandos"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--retraso', type=float, default=0.3,
+                        help='segundos que tarda el servidor falso en terminar cada trabajo')
+    parser.add_argument('--poll', type=float, default=2.0,
+                        help='SPEECHMATICS_POLL_INITIAL_DELAY para la prueba')
+    parser.add_argument('--max-espera', type=float, default=5.0,
+                        help='SPEECHMATICS_POLL_MAX_WAIT para la prueba')
+    args = parser.parse_args(argv[1:])
+
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s %(message)s')
+    SpeechmaticsFalso.retraso = args.retraso
+
+    servidor_falso = ThreadingHTTPServer(('127.0.0.1', 0), SpeechmaticsFalso)
+    threading.Thread(target=servidor_falso.serve_forever, daemon=True).start()
+    puerto_app = _puerto_libre()
+    directorio = tempfile.mkdtemp(prefix='check_speechmatics_')
+
+    # La configuración se lee al importar los módulos: definirla antes de importar app
+    os.environ.update({
+        'SPEECHMATICS_URL': f"http://127.0.0.1:{servidor_falso.server_address[1]}/v2",
+        'SPEECHMATICS_NOTIFICATION_URL': f"http://127.0.0.1:{puerto_app}/api/speechmatics/notifications",
+        'SPEECHMATICS_NOTIFICATION_SECRET': SECRETO,
+        'SPEECHMATICS_POLL_INITIAL_DELAY': str(args.poll),
+        'SPEECHMATICS_POLL_MAX_WAIT': str(args.max_espera),
+        'TRANSCRIPTION_CACHE_DIR': os.path.join(directorio, 'cache'),
+    })
+
+    from werkzeug.serving import make_server
+    import app as servidor
+    import transcription_cache
+
+    servidor_app = make_server('127.0.0.1', puerto_app, servidor.app, threaded=True)
+    threading.Thread(target=servidor_app.serve_forever, daemon=True).start()
+
+    casos = ('notificar', 'repetir', 'sin_notificar', 'secreto_malo', 'tardia', 'atascado')
+    correcto = True
+
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{puerto_app}", timeout=30) as cliente:
+            print(f"Speechmatics falso: {args.retraso}s por trabajo, polling a los {args.poll}s, "
+                  f"máximo {args.max_espera}s")
+            print(f"{'caso':<14} {'estado':>7} {'tiempo (s)':>11}")
+
+            for i, escenario in enumerate(casos):
+                # 'repetir' usa el mismo audio que 'notificar'
+                audio = _wav(0 if escenario == 'repetir' else i)
+                errores, segundos = comprobar_caso(cliente, escenario, audio, args, transcription_cache)
+
+                print(f"{escenario:<14} {'OK' if not errores else 'FALLO':>7} {segundos:>11.2f}")
+                for error in errores:
+                    print(f"    - {error}")
+                correcto &= not errores
+
+    finally:
+        servidor_app.shutdown()
+        servidor_falso.shutdown()
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    print("\nTodas las comprobaciones correctas" if correcto else "\nHay comprobaciones con fallos")
+    return 0 if correcto else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,373 @@
+"""
+Comprobación de los endpoints en streaming (Server-Sent Events)
+Ejecuta /api/chat/stream, /api/edit-summary/stream y /api/agents/generate/stream
+con el cliente de pruebas de Flask y un proveedor falso que entrega tokens con
+un temporizador (no se envía nada a Gemini ni a OpenAI).
+
+El proveedor falso sustituye google.generativeai y openai.OpenAI dentro de los
+servicios, así que se recorre el mismo camino que en producción: generadores
+*_stream de summary_service y de los agentes, ErrorStream y _respuesta_sse.
+
+Se comprueba:
+    - el formato SSE: cada evento termina en línea en blanco, 'data:' es JSON y
+      solo los eventos 'done' y 'error' llevan nombre
+    - que el stream termina con un único 'done' o 'error' y nada después
+    - que el texto de los eventos es el generado por el proveedor
+    - que un ErrorStream "Error: ..." llega como evento 'error' (excepciones
+      de los agentes, respuestas bloqueadas, proveedor no soportado)
+    - que ante una excepción chat y edición terminan igual que sus endpoints
+      sin streaming (500 -> 'error', 200 -> 'done' con el mismo mensaje)
+
+Además se muestra el tiempo hasta el primer fragmento frente al tiempo total.
+
+Uso (desde backend/, con el mismo backend/.env que el servidor):
+    python benchmarks/sse_proveedor_falso.py --tokens 20 --intervalo 0.05
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from types import SimpleNamespace
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, RAIZ)
+
+import app as servidor
+import summary_service
+from agents import gemini_service, openai_service
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPCION = ("[SPEAKER_S1] Revisamos el presupuesto del proyecto para el cliente.\n\n"
+                 "[SPEAKER_S2] La propuesta de ventas se entrega la semana que viene.")
+
+
+# ==================== PROVEEDOR FALSO ====================
+
+class ProveedorFalso:
+    """
+    Genera tokens numerados con una pausa entre ellos
+
+    modo:
+        'ok'        todos los tokens
+        'excepcion' lanza una excepción después de la mitad de los tokens
+        'bloqueado' ningún texto y prompt_feedback.block_reason (solo Gemini)
+    """
+
+    modo = 'ok'
+    tokens = 20
+    intervalo = 0.05
+
+    @classmethod
+    def textos(cls):
+        for i in range(cls.tokens):
+            if cls.modo == 'excepcion' and i == cls.tokens // 2:
+                raise RuntimeError("conexión cerrada por el proveedor falso")
+            time.sleep(cls.intervalo)
+            yield f"tok{i} "
+
+    @classmethod
+    def esperado(cls):
+        """Texto que debería llegar al cliente antes del evento final"""
+        if cls.modo == 'bloqueado':
+            return ''
+        total = cls.tokens // 2 if cls.modo == 'excepcion' else cls.tokens
+        return ''.join(f"tok{i} " for i in range(total))
+
+
+class _RespuestaGemini:
+    """Respuesta de generate_content: iterable de fragmentos con .text"""
+
+    def __init__(self):
+        bloqueado = ProveedorFalso.modo == 'bloqueado'
+        self.prompt_feedback = SimpleNamespace(block_reason='SAFETY' if bloqueado else None)
+
+    def __iter__(self):
+        if ProveedorFalso.modo == 'bloqueado':
+            return
+        for texto in ProveedorFalso.textos():
+            yield SimpleNamespace(text=texto)
+
+    @property
+    def text(self):
+        if ProveedorFalso.modo == 'bloqueado':
+            raise ValueError("respuesta bloqueada")
+        return ''.join(ProveedorFalso.textos())
+
+
+class _ModeloGemini:
+    def __init__(self, model_name=None):
+        self.model_name = model_name
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        respuesta = _RespuestaGemini()
+        if not stream:
+            respuesta.text  # en modo excepción falla igual que la API
+        return respuesta
+
+
+genai_falso = SimpleNamespace(
+    configure=lambda api_key=None: None,
+    GenerativeModel=_ModeloGemini,
+    types=SimpleNamespace(GenerationConfig=lambda **kwargs: kwargs)
+)
+
+
+class OpenAIFalso:
+    """Sustituto de openai.OpenAI con chat.completions.create(..., stream=True)"""
+
+    def __init__(self, api_key=None):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    @staticmethod
+    def _create(stream=False, **kwargs):
+        def fragmentos():
+            for texto in ProveedorFalso.textos():
+                delta = SimpleNamespace(content=texto)
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=None))])
+        return fragmentos()
+
+
+def instalar_proveedor_falso():
+    """Sustituye los clientes de Gemini y OpenAI en los servicios"""
+    summary_service.genai = genai_falso
+    summary_service.GEMINI_AVAILABLE = True
+    summary_service._gemini_cache.update(api_key=None, model_name=None, model=None)
+
+    gemini_service.genai = genai_falso
+    gemini_service.GEMINI_AVAILABLE = True
+    gemini_service._gemini_client_cache.update(api_key=None, client=None)
+
+    openai_service.OpenAI = OpenAIFalso
+    openai_service.OPENAI_AVAILABLE = True
+    openai_service._openai_client_cache.update(api_key=None, client=None)
+
+
+# ==================== LECTURA DEL STREAM ====================
+
+def leer_sse(cliente, ruta, cuerpo):
+    """
+    Lee una respuesta SSE validando el formato
+
+    Returns:
+        dict: Eventos (nombre, datos), tiempos y errores de formato encontrados
+    """
+    inicio = time.perf_counter()
+    respuesta = cliente.post(ruta, json=cuerpo, buffered=False)
+    errores = []
+    eventos = []
+    primero = None
+    pendiente = ''
+
+    if respuesta.mimetype != 'text/event-stream':
+        errores.append(f"HTTP {respuesta.status_code} {respuesta.mimetype}: {respuesta.get_data(as_text=True)[:200]}")
+        return {'eventos': eventos, 'errores': errores, 'primero': None, 'total': 0.0}
+
+    for bloque in respuesta.response:
+        pendiente += bloque.decode('utf-8') if isinstance(bloque, bytes) else bloque
+
+        while '\n\n' in pendiente:
+            crudo, pendiente = pendiente.split('\n\n', 1)
+            nombre = None
+            datos = None
+
+            for linea in crudo.split('\n'):
+                if linea.startswith('event: '):
+                    nombre = linea[len('event: '):]
+                elif linea.startswith('data: '):
+                    try:
+                        datos = json.loads(linea[len('data: '):])
+                    except ValueError:
+                        errores.append(f"data no es JSON: {linea!r}")
+                else:
+                    errores.append(f"línea inesperada: {linea!r}")
+
+            if datos is None:
+                errores.append(f"evento sin data: {crudo!r}")
+                continue
+            if nombre is None and 'text' not in datos:
+                errores.append(f"evento sin nombre y sin 'text': {datos}")
+            if nombre not in (None, 'done', 'error'):
+                errores.append(f"evento desconocido: {nombre}")
+            if primero is None:
+                primero = time.perf_counter() - inicio
+            eventos.append((nombre, datos))
+
+    respuesta.close()
+    total = time.perf_counter() - inicio
+
+    if pendiente:
+        errores.append(f"datos tras el último evento: {pendiente!r}")
+
+    finales = [i for i, (nombre, _) in enumerate(eventos) if nombre]
+    if finales != [len(eventos) - 1]:
+        errores.append(f"se esperaba un único 'done'/'error' al final, eventos con nombre en {finales}")
+
+    return {'eventos': eventos, 'errores': errores, 'primero': primero, 'total': total}
+
+
+def comprobar(cliente, caso, ruta, cuerpo, final_esperado, error_esperado=None, extra_done=None,
+              texto_esperado=None):
+    """
+    Lee un endpoint y comprueba texto, evento final y formato
+
+    Args:
+        final_esperado (str): 'done' o 'error'
+        error_esperado (str): Mensaje del evento 'error' (opcional)
+        extra_done (dict): Campos que debe llevar el evento 'done' (opcional)
+        texto_esperado (str): Texto de los eventos (por defecto el del proveedor)
+
+    Returns:
+        bool: True si el caso es correcto
+    """
+    r = leer_sse(cliente, ruta, cuerpo)
+    errores = r['errores']
+    eventos = r['eventos']
+
+    texto = ''.join(datos.get('text', '') for nombre, datos in eventos if nombre is None)
+    if texto_esperado is None:
+        texto_esperado = ProveedorFalso.esperado()
+    if texto != texto_esperado:
+        errores.append(f"texto recibido {texto[-60:]!r} distinto del esperado {texto_esperado[-60:]!r}")
+
+    if eventos:
+        nombre, datos = eventos[-1]
+        if nombre != final_esperado:
+            errores.append(f"evento final '{nombre}' ({datos}), se esperaba '{final_esperado}'")
+        elif nombre == 'done':
+            if datos.get('success') is not True:
+                errores.append(f"'done' sin success: {datos}")
+            for clave, valor in (extra_done or {}).items():
+                if datos.get(clave) != valor:
+                    errores.append(f"'done' con {clave}={datos.get(clave)!r}, se esperaba {valor!r}")
+        elif nombre == 'error':
+            if datos.get('success') is not False or not str(datos.get('error', '')).startswith('Error:'):
+                errores.append(f"'error' mal formado: {datos}")
+            if error_esperado and datos.get('error') != error_esperado:
+                errores.append(f"'error' con {datos.get('error')!r}, se esperaba {error_esperado!r}")
+
+    textos = sum(1 for nombre, _ in eventos if nombre is None)
+    primero = f"{r['primero']:.3f}" if r['primero'] is not None else '-'
+    print(f"{caso:<34} {'OK' if not errores else 'FALLO':>6} {textos:>7} "
+          f"{(eventos[-1][0] if eventos else '-'):>7} {primero:>13} {r['total']:>10.3f}")
+    for error in errores:
+        print(f"    - {error}")
+
+    return not errores
+
+
+def final_sin_streaming(cliente, ruta, cuerpo, campo):
+    """
+    Resultado del endpoint equivalente sin streaming
+
+    Returns:
+        tuple: ('done', texto de la respuesta) si respondió 200,
+               ('error', mensaje de error) en otro caso
+    """
+    respuesta = cliente.post(ruta, json=cuerpo)
+    datos = respuesta.get_json() or {}
+    if respuesta.status_code == 200:
+        return 'done', datos.get(campo)
+    return 'error', datos.get('error')
+
+
+# ==================== CASOS ====================
+
+def main(argv):
+    """Punto de entrada de la línea de comandos"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tokens', type=int, default=20)
+    parser.add_argument('--intervalo', type=float, default=0.05,
+                        help='segundos entre tokens del proveedor falso')
+    args = parser.parse_args(argv[1:])
+
+    # Los errores simulados se registran en los servicios; solo interesa la tabla
+    logging.getLogger().setLevel(logging.CRITICAL)
+    ProveedorFalso.tokens = args.tokens
+    ProveedorFalso.intervalo = args.intervalo
+    instalar_proveedor_falso()
+
+    cliente = servidor.app.test_client()
+    chat = {'message': 'presupuesto del proyecto', 'context': TRANSCRIPCION, 'gemini_api_key': 'clave-falsa'}
+    edicion = {'instruction': 'Hazlo más corto', 'current_summary': 'Resumen.',
+               'context': TRANSCRIPCION, 'gemini_api_key': 'clave-falsa'}
+
+    def agente(provider):
+        return {'agent_config': {'provider': provider, 'prompt_template': 'Lista de tareas'},
+                'transcription': TRANSCRIPCION, 'gemini_api_key': 'clave-falsa',
+                'openai_api_key': 'clave-falsa'}
+
+    print(f"Proveedor falso: {args.tokens} tokens, {args.intervalo}s entre tokens")
+    print(f"{'caso':<34} {'estado':>6} {'textos':>7} {'final':>7} {'1er evento(s)':>13} {'total (s)':>10}")
+
+    correcto = True
+
+    # Respuestas completas
+    ProveedorFalso.modo = 'ok'
+    respuesta = cliente.post('/api/chat/stream', json=chat, buffered=False)
+    transcript_id = None
+    for bloque in respuesta.response:
+        if b'event: done' in bloque:
+            transcript_id = json.loads(bloque.split(b'data: ', 1)[1])['transcript_id']
+    respuesta.close()
+
+    correcto &= comprobar(cliente, 'chat', '/api/chat/stream', chat, 'done',
+                          extra_done={'transcript_id': transcript_id})
+    correcto &= comprobar(cliente, 'chat (transcript_id)', '/api/chat/stream',
+                          {'message': chat['message'], 'transcript_id': transcript_id,
+                           'gemini_api_key': 'clave-falsa'},
+                          'done', extra_done={'transcript_id': transcript_id})
+    correcto &= comprobar(cliente, 'edit-summary', '/api/edit-summary/stream', edicion, 'done')
+    correcto &= comprobar(cliente, 'agente gemini', '/api/agents/generate/stream', agente('gemini'), 'done')
+    correcto &= comprobar(cliente, 'agente openai', '/api/agents/generate/stream', agente('openai'), 'done')
+
+    # Excepción a mitad de la respuesta: chat y edición terminan como sin
+    # streaming (500 -> 'error'; 200 -> los tokens ya enviados más el mismo
+    # mensaje como texto y 'done')
+    ProveedorFalso.modo = 'excepcion'
+    for caso, ruta, cuerpo, campo in (('chat', '/api/chat', chat, 'response'),
+                                      ('edit-summary', '/api/edit-summary', edicion, 'edited_summary')):
+        final, mensaje = final_sin_streaming(cliente, ruta, cuerpo, campo)
+        if final == 'error':
+            correcto &= comprobar(cliente, f"{caso} (excepcion)", f"{ruta}/stream", cuerpo, 'error',
+                                  error_esperado=mensaje)
+        else:
+            correcto &= comprobar(cliente, f"{caso} (excepcion)", f"{ruta}/stream", cuerpo, 'done',
+                                  texto_esperado=ProveedorFalso.esperado() + mensaje)
+
+    correcto &= comprobar(cliente, 'agente gemini (excepcion)', '/api/agents/generate/stream',
+                          agente('gemini'), 'error',
+                          error_esperado="Error: conexión cerrada por el proveedor falso")
+    correcto &= comprobar(cliente, 'agente openai (excepcion)', '/api/agents/generate/stream',
+                          agente('openai'), 'error',
+                          error_esperado="Error: conexión cerrada por el proveedor falso")
+
+    # Respuesta bloqueada sin texto: ErrorStream de textos_gemini -> 'error'
+    # (sin streaming, chat responde 200 con "Lo siento, ..." porque .text falla)
+    ProveedorFalso.modo = 'bloqueado'
+    bloqueado = "Error: Bloqueado por seguridad (SAFETY)"
+    correcto &= comprobar(cliente, 'chat (bloqueado)', '/api/chat/stream', chat, 'error',
+                          error_esperado=bloqueado)
+    correcto &= comprobar(cliente, 'edit-summary (bloqueado)', '/api/edit-summary/stream', edicion,
+                          'error', error_esperado=bloqueado)
+    correcto &= comprobar(cliente, 'agente gemini (bloqueado)', '/api/agents/generate/stream',
+                          agente('gemini'), 'error', error_esperado=bloqueado)
+
+    # Errores de configuración: ErrorStream antes del primer token
+    ProveedorFalso.modo = 'ok'
+    ProveedorFalso.tokens, tokens = 0, ProveedorFalso.tokens
+    correcto &= comprobar(cliente, 'agente proveedor no soportado', '/api/agents/generate/stream',
+                          dict(agente('gemini'), agent_config={'provider': 'otro', 'prompt_template': 'x'}),
+                          'error', error_esperado="Error: Proveedor 'otro' no soportado")
+    ProveedorFalso.tokens = tokens
+
+    print("\nTodas las comprobaciones correctas" if correcto else "\nHay comprobaciones con fallos")
+    return 0 if correcto else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
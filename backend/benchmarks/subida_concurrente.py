@@ -0,0 +1,299 @@
+"""
+Benchmark de subidas concurrentes a /api/upload
+Arranca la aplicación en un proceso aparte (servidor de desarrollo de Werkzeug
+con threads, en un directorio temporal para que uploads/ no se mezcle con el
+real) y lanza varias subidas multipart grandes a la vez. Mide desde fuera, en
+/proc del proceso servidor (solo Linux):
+    - tiempo total y MB/s
+    - RSS de partida y pico durante las subidas
+    - bytes escritos y leídos (wchar/rchar: incluye los temporales de Werkzeug)
+    - tiempo de CPU del servidor
+
+Se compara la lectura en stream de upload_service con varios UPLOAD_CHUNK_SIZE
+y la forma anterior (request.files + file.save), que se registra en el
+servidor de la prueba como /benchmark/file-save. Cada subida lleva contenido
+distinto para que el almacén de blobs no las deduplique.
+
+Uso (desde backend/, con el mismo backend/.env que el servidor):
+    python benchmarks/subida_concurrente.py --subidas 20 --mb 100
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import logging
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logger = logging.getLogger(__name__)
+
+_FRONTERA = 'frontera-benchmark'
+_BLOQUE = 1024 * 1024
+
+# (nombre, ruta, UPLOAD_CHUNK_SIZE)
+CONFIGURACIONES = (
+    ('file.save', '/benchmark/file-save', None),
+    ('stream 1MB', '/api/upload', 1024 * 1024),
+    ('stream 256KB', '/api/upload', 256 * 1024),
+    ('stream 64KB', '/api/upload', 64 * 1024),
+)
+
+
+# ==================== SERVIDOR ====================
+
+def servidor(puerto):
+    """
+    Proceso servidor: la aplicación más la ruta de referencia con file.save
+    (se ejecuta con el directorio de trabajo en la carpeta temporal)
+    """
+    import uuid
+
+    sys.path.insert(0, RAIZ)
+    logging.disable(logging.CRITICAL)
+
+    from flask import request, jsonify
+    from werkzeug.utils import secure_filename
+    from werkzeug.serving import run_simple
+    import app as aplicacion
+
+    @aplicacion.app.route('/benchmark/file-save', methods=['POST'])
+    def subir_con_file_save():
+        """/api/upload antes de upload_service: Werkzeug guarda el cuerpo y file.save lo copia"""
+        archivo = request.files['audio']
+        file_id = f"{uuid.uuid4()}_{secure_filename(archivo.filename)}"
+        archivo.save(os.path.join(aplicacion.app.config['UPLOAD_FOLDER'], file_id))
+        return jsonify({'success': True, 'file_id': file_id})
+
+    # Las cabeceras multipart hacen que una subida de exactamente UPLOAD_MAX_FILE_SIZE
+    # supere el límite por petición; aquí solo cuenta el límite del archivo
+    aplicacion.app.config['MAX_CONTENT_LENGTH'] = None
+    # Servicios en segundo plano, como en 'python app.py'
+    aplicacion.start_persistence()
+    aplicacion.start_media_pool()
+    run_simple('127.0.0.1', puerto, aplicacion.app, threaded=True)
+
+
+def _puerto_libre():
+    """Puerto TCP libre en localhost"""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def arrancar_servidor(directorio, entorno=None, limite=60):
+    """
+    Arranca la aplicación en otro proceso, con el directorio de trabajo (y
+    uploads/) y las cachés en 'directorio', y espera a que acepte conexiones
+
+    Args:
+        directorio (str): Directorio de trabajo del servidor
+        entorno (dict): Variables de entorno adicionales
+        limite (float): Segundos máximos de espera
+
+    Returns:
+        tuple: (proceso, puerto)
+    """
+    puerto = _puerto_libre()
+    # Blobs y cachés propios: sin ellos las subidas se deduplican contra las de cache/
+    cache = os.path.join(directorio, 'cache')
+    entorno = dict(os.environ, TMPDIR=directorio,
+                   BLOB_STORE_DIR=os.path.join(cache, 'blobs'),
+                   TRANSCRIPTION_CACHE_DIR=os.path.join(cache, 'transcriptions'),
+                   RESUMABLE_UPLOAD_DIR=os.path.join(cache, 'resumable_uploads'),
+                   **(entorno or {}))
+    proceso = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--servidor', str(puerto)],
+                               cwd=directorio, env=entorno,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        if proceso.poll() is not None:
+            raise RuntimeError("el servidor terminó al arrancar")
+        try:
+            socket.create_connection(('127.0.0.1', puerto), timeout=1).close()
+            return proceso, puerto
+        except OSError:
+            time.sleep(0.2)
+
+    proceso.terminate()
+    raise RuntimeError("el servidor no arrancó a tiempo")
+
+
+# ==================== CLIENTE ====================
+
+class Medidor:
+    """
+    Lee RSS, E/S y CPU de un proceso desde /proc mientras dura una prueba
+
+    Args:
+        pid (int): Proceso a medir
+    """
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.pico = 0
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._muestrear, daemon=True)
+
+    def rss(self):
+        """RSS actual en bytes"""
+        with open(f'/proc/{self.pid}/status') as f:
+            for linea in f:
+                if linea.startswith('VmRSS'):
+                    return int(linea.split()[1]) * 1024
+        return 0
+
+    def io(self):
+        """Contadores de /proc/<pid>/io"""
+        with open(f'/proc/{self.pid}/io') as f:
+            return {linea.split(':')[0]: int(linea.split()[1]) for linea in f}
+
+    def cpu(self):
+        """Tiempo de CPU (usuario + sistema) en segundos"""
+        with open(f'/proc/{self.pid}/stat') as f:
+            campos = f.read().rsplit(')', 1)[1].split()
+        return (int(campos[11]) + int(campos[12])) / os.sysconf('SC_CLK_TCK')
+
+    def _muestrear(self):
+        while not self._parar.is_set():
+            self.pico = max(self.pico, self.rss())
+            self._parar.wait(0.05)
+
+    def __enter__(self):
+        self.rss_inicial = self.pico = self.rss()
+        self.io_inicial = self.io()
+        self.cpu_inicial = self.cpu()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._thread.join()
+        io = self.io()
+        self.escrito = io['wchar'] - self.io_inicial['wchar']
+        self.leido = io['rchar'] - self.io_inicial['rchar']
+        self.cpu_usada = self.cpu() - self.cpu_inicial
+
+
+def _cuerpo(indice, megas, relleno):
+    """
+    Cuerpo multipart de una subida como generador: un archivo de 'megas' MB
+    que empieza por el índice, para que cada subida tenga contenido distinto
+    """
+    prefijo = f'{indice:016d}'.encode('ascii')
+    yield (f'--{_FRONTERA}\r\nContent-Disposition: form-data; name="audio"; filename="subida_{indice}.wav"\r\n'
+           'Content-Type: audio/wav\r\n\r\n').encode('ascii')
+    yield prefijo
+    yield relleno[len(prefijo):]
+    for _ in range(megas - 1):
+        yield relleno
+    yield f'\r\n--{_FRONTERA}--\r\n'.encode('ascii')
+
+
+def subir(puerto, ruta, indice, megas, relleno, resultados):
+    """Envía una subida y guarda el código de respuesta"""
+    longitud = sum(len(parte) for parte in _cuerpo(indice, megas, relleno))
+    conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=600)
+    try:
+        conexion.request('POST', ruta, body=_cuerpo(indice, megas, relleno), headers={
+            'Content-Type': f'multipart/form-data; boundary={_FRONTERA}',
+            'Content-Length': str(longitud)
+        })
+        respuesta = conexion.getresponse()
+        datos = json.loads(respuesta.read() or b'{}')
+        resultados.append((respuesta.status, datos.get('error')))
+    except Exception as e:
+        resultados.append((None, str(e)))
+    finally:
+        conexion.close()
+
+
+def probar(nombre, ruta, chunk_size, subidas, megas, directorio):
+    """
+    Arranca un servidor con la configuración indicada y lanza las subidas a la vez
+
+    Returns:
+        dict: Métricas de la prueba
+    """
+    trabajo = tempfile.mkdtemp(prefix='servidor_', dir=directorio)
+    entorno = {'UPLOAD_MAX_FILE_SIZE': str(megas * _BLOQUE)}
+    if chunk_size:
+        entorno['UPLOAD_CHUNK_SIZE'] = str(chunk_size)
+    proceso, puerto = arrancar_servidor(trabajo, entorno)
+    try:
+        relleno = os.urandom(_BLOQUE)
+        resultados = []
+        threads = [threading.Thread(target=subir, args=(puerto, ruta, i, megas, relleno, resultados))
+                   for i in range(subidas)]
+
+        with Medidor(proceso.pid) as medidor:
+            inicio = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            segundos = time.perf_counter() - inicio
+
+        return {
+            'nombre': nombre,
+            'segundos': segundos,
+            'mb_s': subidas * megas / segundos,
+            'rss_inicial': medidor.rss_inicial,
+            'rss_pico': medidor.pico,
+            'escrito': medidor.escrito,
+            'leido': medidor.leido,
+            'cpu': medidor.cpu_usada,
+            'errores': [r for r in resultados if r[0] != 200]
+        }
+    finally:
+        proceso.terminate()
+        proceso.wait()
+        shutil.rmtree(trabajo, ignore_errors=True)
+
+
+def main(argv):
+    """Punto de entrada de la línea de comandos"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--subidas', type=int, default=20)
+    parser.add_argument('--mb', type=int, default=100, help='Tamaño de cada subida (MB)')
+    parser.add_argument('--servidor', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv[1:])
+
+    if args.servidor:
+        servidor(args.servidor)
+        return 0
+
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s %(message)s')
+    mb = 1024 * 1024
+    directorio = tempfile.mkdtemp(prefix='bench_subidas_')
+    correcto = True
+
+    try:
+        print(f"{args.subidas} subidas concurrentes de {args.mb}MB\n")
+        print(f"{'camino':>13} {'tiempo (s)':>11} {'MB/s':>6} {'RSS base (MB)':>14} {'RSS pico (MB)':>14} "
+              f"{'escrito (MB)':>13} {'leído (MB)':>11} {'CPU (s)':>8}")
+
+        for nombre, ruta, chunk_size in CONFIGURACIONES:
+            r = probar(nombre, ruta, chunk_size, args.subidas, args.mb, directorio)
+            print(f"{r['nombre']:>13} {r['segundos']:>11.1f} {r['mb_s']:>6.0f} {r['rss_inicial'] / mb:>14.0f} "
+                  f"{r['rss_pico'] / mb:>14.0f} {r['escrito'] / mb:>13.0f} {r['leido'] / mb:>11.0f} {r['cpu']:>8.1f}")
+            for codigo, error in r['errores'][:3]:
+                print(f"    - respuesta {codigo}: {error}")
+            correcto &= not r['errores']
+
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    return 0 if correcto else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
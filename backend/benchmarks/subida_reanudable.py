@@ -0,0 +1,232 @@
+"""
+Comprobación y benchmark de las subidas por fragmentos (/api/uploads)
+Arranca la aplicación en otro proceso (arrancar_servidor de
+subida_concurrente.py) y sube un archivo aleatorio simulando un cliente con
+una conexión inestable: una parte de los fragmentos se corta a mitad del
+cuerpo (se envía un Content-Length completo y se cierra el socket antes) y
+después se reanuda desde los rangos que informa GET /api/uploads/<id>.
+
+Escenarios:
+    - fragmentos en orden sin cortes (el hash se calcula mientras llegan)
+    - fragmentos en orden y desordenados, con cortes
+    - un fragmento enviado primero con otro contenido y repetido después con
+      el correcto (el hash incremental no puede incluir los bytes antiguos)
+    - un fragmento repetido con el mismo contenido
+
+En todos se finaliza con el sha256 del archivo, que debe coincidir, y se
+compara el archivo guardado en uploads/. El tiempo de finalizar muestra si se
+usó el hash calculado mientras llegaban los fragmentos o hubo que leer el
+archivo.
+
+Uso (desde backend/, con el mismo backend/.env que el servidor):
+    python benchmarks/subida_reanudable.py --mb 300 --cortes 0.3
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import hashlib
+import logging
+import argparse
+import tempfile
+import http.client
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from subida_concurrente import arrancar_servidor
+
+logger = logging.getLogger(__name__)
+
+_BLOQUE = 1024 * 1024
+
+
+class Cliente:
+    """
+    Cliente de una subida por fragmentos contra el servidor de la prueba
+
+    Args:
+        puerto (int): Puerto del servidor
+        ruta (str): Archivo a subir
+    """
+
+    def __init__(self, puerto, ruta):
+        self.puerto = puerto
+        self.ruta = ruta
+        self.size = os.path.getsize(ruta)
+        self.cortes = 0
+        self.rondas = 0
+
+        codigo, datos = self.peticion('POST', '/api/uploads', json.dumps({
+            'filename': 'grabacion.wav', 'size': self.size
+        }), {'Content-Type': 'application/json'})
+        if codigo != 201:
+            raise RuntimeError(f"no se pudo iniciar la subida: {codigo} {datos}")
+        self.url = datos['upload_url']
+        self.chunk_size = datos['chunk_size']
+
+    def peticion(self, metodo, ruta, cuerpo=None, cabeceras=None):
+        """
+        Returns:
+            tuple: (código de respuesta, JSON de la respuesta)
+        """
+        conexion = http.client.HTTPConnection('127.0.0.1', self.puerto, timeout=600)
+        try:
+            conexion.request(metodo, ruta, body=cuerpo, headers=cabeceras or {})
+            respuesta = conexion.getresponse()
+            return respuesta.status, json.loads(respuesta.read() or b'{}')
+        finally:
+            conexion.close()
+
+    def _leer(self, offset, n):
+        with open(self.ruta, 'rb') as f:
+            f.seek(offset)
+            return f.read(n)
+
+    def enviar(self, offset, datos):
+        """Envía un fragmento completo"""
+        codigo, respuesta = self.peticion('PUT', f'{self.url}?offset={offset}', datos,
+                                          {'Content-Type': 'application/octet-stream'})
+        if codigo != 200:
+            raise RuntimeError(f"el fragmento en {offset} respondió {codigo}: {respuesta.get('error')}")
+
+    def enviar_cortado(self, offset, n, enviados):
+        """Anuncia un fragmento de n bytes y cierra la conexión tras enviar 'enviados'"""
+        with socket.create_connection(('127.0.0.1', self.puerto)) as s:
+            s.sendall(f"PUT {self.url}?offset={offset} HTTP/1.1\r\nHost: localhost\r\n"
+                      f"Content-Type: application/octet-stream\r\nContent-Length: {n}\r\n\r\n".encode('ascii'))
+            s.sendall(self._leer(offset, enviados))
+        self.cortes += 1
+
+    def huecos(self):
+        """Rangos [inicio, fin) que el servidor aún no ha recibido"""
+        _, estado = self.peticion('GET', self.url)
+        huecos, posicion = [], 0
+        for inicio, fin in estado['received']:
+            if inicio > posicion:
+                huecos.append((posicion, inicio))
+            posicion = fin
+        if posicion < self.size:
+            huecos.append((posicion, self.size))
+        return huecos
+
+    def subir(self, offsets, cortes, aleatorio):
+        """Envía los fragmentos indicados, cortando una fracción de ellos"""
+        for offset in offsets:
+            n = min(self.chunk_size, self.size - offset)
+            if aleatorio.random() < cortes:
+                self.enviar_cortado(offset, n, aleatorio.randrange(n))
+            else:
+                self.enviar(offset, self._leer(offset, n))
+
+    def reanudar(self):
+        """Envía lo que falta según el servidor hasta completar el archivo"""
+        # El servidor registra lo recibido de una conexión cortada al cerrarla
+        time.sleep(0.5)
+        while huecos := self.huecos():
+            self.rondas += 1
+            for inicio, fin in huecos:
+                for offset in range(inicio, fin, self.chunk_size):
+                    self.enviar(offset, self._leer(offset, min(self.chunk_size, fin - offset)))
+
+    def finalizar(self, sha256):
+        return self.peticion('POST', f'{self.url}/finalize', json.dumps({'sha256': sha256}),
+                             {'Content-Type': 'application/json'})
+
+
+def _sha256(ruta):
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        while bloque := f.read(_BLOQUE):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def escenario(nombre, puerto, ruta, sha256, trabajo, cortes, semilla):
+    """
+    Sube el archivo con un escenario y lo finaliza
+
+    Returns:
+        tuple: (fila de resultados, lista de errores)
+    """
+    aleatorio = random.Random(semilla)
+    cliente = Cliente(puerto, ruta)
+    offsets = list(range(0, cliente.size, cliente.chunk_size))
+
+    inicio = time.perf_counter()
+    if nombre == 'desordenado':
+        aleatorio.shuffle(offsets)
+    if nombre == 'repetido distinto':
+        # Primero basura en el primer fragmento y después el contenido correcto
+        cliente.enviar(0, os.urandom(min(cliente.chunk_size, cliente.size)))
+    if nombre in ('en orden', 'desordenado'):
+        cliente.subir(offsets, cortes, aleatorio)
+    else:
+        cliente.subir(offsets, 0, aleatorio)
+    if nombre == 'repetido igual':
+        cliente.enviar(0, cliente._leer(0, min(cliente.chunk_size, cliente.size)))
+    cliente.reanudar()
+    subida = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    codigo, datos = cliente.finalizar(sha256)
+    finalizar = time.perf_counter() - inicio
+
+    errores = []
+    if codigo != 200:
+        errores.append(f"{nombre}: finalizar respondió {codigo}: {datos.get('error')}")
+    else:
+        guardado = os.path.join(trabajo, 'uploads', datos['file_id'])
+        if datos.get('sha256') != sha256 or _sha256(guardado) != sha256:
+            errores.append(f"{nombre}: el archivo guardado no coincide con el subido")
+
+    return (nombre, cliente.cortes, cliente.rondas, subida, finalizar, codigo), errores
+
+
+def main(argv):
+    """Punto de entrada de la línea de comandos"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--mb', type=int, default=300, help='Tamaño del archivo (MB)')
+    parser.add_argument('--cortes', type=float, default=0.3, help='Fracción de fragmentos cortados')
+    parser.add_argument('--semilla', type=int, default=3)
+    args = parser.parse_args(argv[1:])
+
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s %(message)s')
+    directorio = tempfile.mkdtemp(prefix='bench_reanudable_')
+    errores = []
+
+    try:
+        ruta = os.path.join(directorio, 'archivo.bin')
+        with open(ruta, 'wb') as f:
+            for _ in range(args.mb):
+                f.write(os.urandom(_BLOQUE))
+        sha256 = _sha256(ruta)
+
+        trabajo = tempfile.mkdtemp(prefix='servidor_', dir=directorio)
+        proceso, puerto = arrancar_servidor(trabajo)
+        try:
+            print(f"Archivo de {args.mb}MB, {args.cortes:.0%} de los fragmentos cortados\n")
+            print(f"{'escenario':>18} {'cortes':>7} {'rondas':>7} {'subida (s)':>11} {'finalizar (s)':>14} {'código':>7}")
+
+            for nombre in ('sin cortes', 'en orden', 'desordenado', 'repetido distinto', 'repetido igual'):
+                fila, fallos = escenario(nombre, puerto, ruta, sha256, trabajo, args.cortes, args.semilla)
+                print(f"{fila[0]:>18} {fila[1]:>7} {fila[2]:>7} {fila[3]:>11.1f} {fila[4]:>14.2f} {fila[5]:>7}")
+                errores.extend(fallos)
+        finally:
+            proceso.terminate()
+            proceso.wait()
+
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    for error in errores:
+        print(f"FALLO: {error}")
+
+    return 1 if errores else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,295 @@
+"""
+Benchmark de la transcripción por segmentos en paralelo
+Compara el tiempo total de transcribir_audio_service en un solo trabajo y
+dividiendo la grabación en N segmentos, sobre grabaciones sintéticas largas y
+con un backend falso de Speechmatics (no se envía nada a la API).
+
+Las grabaciones tienen varios hablantes, cada uno con un tono distinto, y
+pausas entre turnos. El backend falso detecta los turnos por energía y
+frecuencia, etiqueta los hablantes en orden de aparición en cada trabajo (como
+Speechmatics) y tarda en responder FAKE_OVERHEAD + duración * FAKE_RTF
+segundos multiplicados por --escala, para que el benchmark dure poco. La
+segmentación del audio se ejecuta de verdad y no se escala, así que a escala 1
+la ventaja del modo en paralelo sería mayor que la medida.
+
+Además del tiempo se muestran las etiquetas de hablante del resultado unido
+(la grabación tiene 3 hablantes: de más indica hablantes que no se pudieron
+emparejar entre segmentos porque no hablaban en el tramo solapado) y la
+proporción de palabras atribuidas al hablante correcto.
+
+Uso (desde backend/):
+    python benchmarks/transcripcion_paralela.py --minutos 60 120 --segmentos 2 4 8
+"""
+
+import os
+import sys
+import time
+import uuid
+import random
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+from bisect import bisect_right
+
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import transcription_service
+from transcription_service import transcribir_audio_service, procesar_transcripcion_completa
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 8000
+
+# Tono de cada hablante de la grabación sintética (Hz)
+TONOS_HABLANTES = (220, 440, 880)
+
+# Modelo de tiempo de respuesta del backend falso (segundos, antes de --escala)
+FAKE_OVERHEAD = 20.0
+FAKE_RTF = 0.3
+
+# Separación entre palabras dentro de un turno (segundos)
+PALABRA_SEGUNDOS = 0.4
+
+_FRAME = int(SAMPLE_RATE * 0.05)
+
+
+# ==================== AUDIO SINTÉTICO ====================
+
+def generar_grabacion(ruta, minutos, semilla=0):
+    """
+    Escribe un WAV con turnos de hablantes separados por pausas
+
+    Args:
+        ruta (str): Archivo a escribir
+        minutos (float): Duración de la grabación
+        semilla (int): Semilla del generador aleatorio
+
+    Returns:
+        list: Turnos (inicio, fin, índice del hablante) en segundos
+    """
+    rng = random.Random(semilla)
+    duracion = minutos * 60
+    turnos = []
+    t = 0.0
+    hablante = 0
+
+    with sf.SoundFile(ruta, mode='w', samplerate=SAMPLE_RATE, channels=1, subtype='PCM_16') as salida:
+        while t < duracion:
+            pausa = min(rng.uniform(0.4, 1.5), duracion - t)
+            salida.write(np.zeros(int(pausa * SAMPLE_RATE), dtype=np.float32))
+            t += pausa
+
+            largo = min(rng.uniform(4.0, 40.0), duracion - t)
+            if largo <= 0:
+                break
+            muestras = np.arange(int(largo * SAMPLE_RATE), dtype=np.float32) / SAMPLE_RATE
+            salida.write((0.3 * np.sin(2 * np.pi * TONOS_HABLANTES[hablante] * muestras)).astype(np.float32))
+            turnos.append((t, t + largo, hablante))
+            t += largo
+
+            hablante = rng.choice([h for h in range(len(TONOS_HABLANTES)) if h != hablante])
+
+    return turnos
+
+
+# ==================== BACKEND FALSO ====================
+
+def _transcribir_falso(ruta):
+    """
+    Genera el json-v2 de un archivo: una palabra cada PALABRA_SEGUNDOS en los
+    tramos con voz y hablantes numerados en orden de aparición
+
+    Returns:
+        tuple: (resultado json-v2, duración del audio)
+    """
+    audio, samplerate = sf.read(ruta, dtype='float32')
+    frames = audio[:len(audio) // _FRAME * _FRAME].reshape(-1, _FRAME)
+
+    energia = np.sqrt((frames * frames).mean(axis=1))
+    cruces = (np.diff(np.signbit(frames), axis=1) != 0).sum(axis=1)
+    # Frecuencia aproximada por cruces por cero, solo en frames con voz cuyos
+    # vecinos también la tienen (los bordes de un turno mezclan tono y pausa)
+    voz = energia > 0.1
+    completos = voz.copy()
+    completos[1:] &= voz[:-1]
+    completos[:-1] &= voz[1:]
+    frecuencia = cruces / (2 * _FRAME / samplerate)
+    frecuencia[~completos] = 0
+
+    tonos = []
+    items = []
+    siguiente_palabra = 0.0
+
+    for i, f in enumerate(frecuencia):
+        if not f:
+            continue
+        inicio = i * _FRAME / samplerate
+        if inicio < siguiente_palabra:
+            continue
+        # Mismo hablante si el tono está a menos de un 10% de uno ya visto
+        indice = next((j for j, tono in enumerate(tonos) if abs(f - tono) < 0.1 * tono), None)
+        if indice is None:
+            tonos.append(f)
+            indice = len(tonos) - 1
+        hablante = f"S{indice + 1}"
+        items.append({
+            'type': 'word',
+            'start_time': round(inicio, 3),
+            'end_time': round(inicio + PALABRA_SEGUNDOS * 0.8, 3),
+            'alternatives': [{'content': 'bla', 'confidence': 0.99, 'speaker': hablante}]
+        })
+        siguiente_palabra = inicio + PALABRA_SEGUNDOS
+
+    resultado = {
+        'format': '2.9',
+        'metadata': {'transcription_config': {'language': 'es', 'diarization': 'speaker'}},
+        'results': items
+    }
+    return resultado, len(audio) / samplerate
+
+
+class BatchClientFalso:
+    """Sustituto de speechmatics.batch_client.BatchClient para el benchmark"""
+
+    escala = 0.01
+    _trabajos = {}
+    _lock = threading.Lock()
+
+    def __init__(self, settings=None):
+        self.settings = settings
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit_job(self, audio, transcription_config):
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._trabajos[job_id] = (audio, time.monotonic())
+        return job_id
+
+    def wait_for_completion(self, job_id, transcription_format='json-v2'):
+        with self._lock:
+            ruta, enviado = self._trabajos.pop(job_id)
+
+        resultado, duracion = _transcribir_falso(ruta)
+
+        restante = (FAKE_OVERHEAD + duracion * FAKE_RTF) * self.escala - (time.monotonic() - enviado)
+        if restante > 0:
+            time.sleep(restante)
+        return resultado
+
+
+# ==================== MEDICIÓN ====================
+
+_tiempo_division = []
+
+
+def _dividir_midiendo(archivo_audio, num_segmentos, output_dir=None):
+    """dividir_audio_en_silencios anotando cuánto tarda"""
+    inicio = time.perf_counter()
+    try:
+        return _dividir_original(archivo_audio, num_segmentos, output_dir)
+    finally:
+        _tiempo_division.append(time.perf_counter() - inicio)
+
+
+def _precision_hablantes(resultado, turnos):
+    """
+    Proporción de palabras cuya etiqueta corresponde al hablante real (con la
+    correspondencia etiqueta -> hablante mayoritaria) y etiquetas distintas
+    """
+    inicios = [t[0] for t in turnos]
+    conteos = {}
+
+    for item in resultado.get('results', []):
+        etiqueta = item['alternatives'][0].get('speaker')
+        real = turnos[max(bisect_right(inicios, item['start_time'] + 0.01) - 1, 0)][2]
+        conteos.setdefault(etiqueta, {}).setdefault(real, 0)
+        conteos[etiqueta][real] += 1
+
+    total = sum(sum(c.values()) for c in conteos.values())
+    aciertos = sum(max(c.values()) for c in conteos.values())
+    return (aciertos / total if total else 0.0), len(conteos)
+
+
+def medir(ruta, turnos, num_segmentos):
+    """
+    Transcribe una grabación con el backend falso
+
+    Returns:
+        dict: Tiempo, palabras, etiquetas de hablante y precisión de hablantes
+    """
+    _tiempo_division.clear()
+    inicio = time.perf_counter()
+    resultado = transcribir_audio_service(ruta, 'clave-falsa', 'es', enable_summarization=False,
+                                          use_cache=False, num_segmentos=num_segmentos)
+    segundos = time.perf_counter() - inicio
+
+    if resultado is None:
+        raise RuntimeError(f"La transcripción con {num_segmentos} segmentos falló")
+
+    precision, etiquetas = _precision_hablantes(resultado, turnos)
+    procesado = procesar_transcripcion_completa(resultado)
+
+    return {
+        'segundos': segundos,
+        'division': sum(_tiempo_division),
+        'palabras': len(resultado['results']),
+        'turnos': len(procesado['dialogos']),
+        'etiquetas': etiquetas,
+        'precision': precision
+    }
+
+
+def main(argv):
+    """Punto de entrada de la línea de comandos"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--minutos', type=float, nargs='+', default=[60, 120])
+    parser.add_argument('--segmentos', type=int, nargs='+', default=[2, 4, 8])
+    parser.add_argument('--escala', type=float, default=0.01,
+                        help='factor aplicado al tiempo de respuesta del backend falso')
+    args = parser.parse_args(argv[1:])
+
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s %(message)s')
+    global _dividir_original
+    BatchClientFalso.escala = args.escala
+    transcription_service.BatchClient = BatchClientFalso
+    _dividir_original = transcription_service.dividir_audio_en_silencios
+    transcription_service.dividir_audio_en_silencios = _dividir_midiendo
+
+    directorio = tempfile.mkdtemp(prefix='bench_transcripcion_')
+
+    try:
+        print(f"Backend falso: {FAKE_OVERHEAD:.0f}s + {FAKE_RTF} x duración, escala {args.escala}")
+        print(f"{'audio':>8} {'modo':>12} {'tiempo (s)':>11} {'división (s)':>13} {'aceleración':>12} "
+              f"{'palabras':>9} {'turnos':>7} {'hablantes':>10} {'precisión':>10}")
+
+        for minutos in args.minutos:
+            ruta = os.path.join(directorio, f"grabacion_{minutos:g}min.wav")
+            turnos = generar_grabacion(ruta, minutos)
+
+            base = None
+            for num_segmentos in [1] + args.segmentos:
+                r = medir(ruta, turnos, num_segmentos)
+                base = base or r['segundos']
+                modo = 'un trabajo' if num_segmentos == 1 else f"{num_segmentos} segmentos"
+                print(f"{minutos:>6g}m {modo:>12} {r['segundos']:>11.2f} {r['division']:>13.2f} "
+                      f"{base / r['segundos']:>11.2f}x "
+                      f"{r['palabras']:>9} {r['turnos']:>7} {r['etiquetas']:>10} {r['precision']:>10.1%}")
+
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,371 @@
+"""
+Almacén de archivos direccionado por contenido
+Cada contenido distinto se guarda una sola vez en BLOB_STORE_DIR/ab/cd/<sha256>
+y los file_id de uploads/ son enlaces duros (handles) a ese blob: el mismo
+audio subido dos veces ocupa el disco una vez y no se vuelve a procesar.
+El contador de referencias de un blob es su número de enlaces (st_nlink - 1
+handles), que mantiene el sistema de archivos aunque el proceso se caiga.
+Los blobs sin handles se conservan BLOB_GC_GRACE segundos para reutilizarlos
+si se vuelve a subir el mismo archivo y después los elimina recolectar().
+Para los videos se guarda qué audio se extrajo de cada uno (<sha256>.audio),
+así que subir de nuevo el mismo video no repite la extracción.
+
+Uso (desde backend/):
+    python blob_store.py gc      # elimina los blobs sin referencias
+    python blob_store.py stats   # blobs, referencias y espacio
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import logging
+import threading
+from transcription_cache import registrar_hash_audio
+
+logger = logging.getLogger(__name__)
+
+# Directorio de los blobs (debe estar en el mismo sistema de archivos que uploads/)
+BLOB_STORE_DIR = os.environ.get(
+    'BLOB_STORE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'blobs')
+)
+
+# Tiempo que se conserva un blob sin referencias (segundos, por defecto 7 días)
+BLOB_GC_GRACE = int(os.environ.get('BLOB_GC_GRACE', 7 * 24 * 3600))
+
+# Espacio máximo de los blobs sin referencias; por encima se eliminan los más antiguos
+BLOB_GC_MAX_UNREFERENCED_BYTES = int(os.environ.get('BLOB_GC_MAX_UNREFERENCED_BYTES', 5 * 1024 * 1024 * 1024))
+
+# Intervalo mínimo entre dos recolecciones automáticas (segundos)
+BLOB_GC_INTERVAL = int(os.environ.get('BLOB_GC_INTERVAL', 3600))
+
+_SUFIJO_AUDIO = '.audio'
+
+_lock = threading.Lock()
+_estado = {'ultima_recoleccion': time.monotonic(), 'recolectando': False}
+_stats = {
+    'stored': 0,
+    'deduplicated': 0,
+    'derived_hits': 0,
+    'released': 0,
+    'collected': 0,
+    'collected_bytes': 0,
+    'unsupported': 0
+}
+
+
+def _ruta_blob(sha256):
+    """Ruta del blob de un contenido (dos niveles de subdirectorios por hash)"""
+    return os.path.join(BLOB_STORE_DIR, sha256[:2], sha256[2:4], sha256)
+
+
+def _enlazar(origen, destino):
+    """Crea destino como enlace duro a origen de forma atómica (reemplaza destino)"""
+    temporal = f"{destino}.{uuid.uuid4().hex}.tmp"
+    os.link(origen, temporal)
+    os.replace(temporal, destino)
+
+
+def guardar_archivo(ruta, sha256):
+    """
+    Incorpora al almacén un archivo recién subido; el archivo pasa a ser un
+    handle del blob de su contenido (si el blob ya existía, se descarta la copia)
+
+    Args:
+        ruta (str): Archivo en uploads/ (su nombre es el file_id)
+        sha256 (str): Hash del contenido
+
+    Returns:
+        bool: True si el contenido ya estaba en el almacén
+    """
+    blob = _ruta_blob(sha256)
+    os.makedirs(os.path.dirname(blob), exist_ok=True)
+
+    while True:
+        try:
+            # El archivo recibido se convierte en el blob sin copiarlo
+            os.link(ruta, blob)
+            with _lock:
+                _stats['stored'] += 1
+            duplicado = False
+            break
+
+        except FileExistsError:
+            # Mismo contenido ya guardado: el handle apunta al blob existente
+            try:
+                _enlazar(blob, ruta)
+            except FileNotFoundError:
+                # recolectar() eliminó el blob entre los dos enlaces: este archivo pasa a ser el blob
+                continue
+            with _lock:
+                _stats['deduplicated'] += 1
+            duplicado = True
+            break
+
+        except OSError as e:
+            # Sin enlaces duros (otro sistema de archivos): el archivo queda fuera del almacén
+            with _lock:
+                _stats['unsupported'] += 1
+            logger.warning(f"No se pudo guardar {ruta} en el almacén de blobs: {e}")
+            return False
+
+    registrar_hash_audio(ruta, sha256)
+    _recolectar_si_toca()
+    return duplicado
+
+
+def crear_handle(sha256, extension, directorio):
+    """
+    Crea un file_id nuevo que apunta a un blob existente
+
+    Args:
+        sha256 (str): Hash del contenido
+        extension (str): Extensión del file_id (formato del archivo)
+        directorio (str): Carpeta de los file_id (uploads/)
+
+    Returns:
+        dict: {'file_id', 'path'} o None si el blob no existe
+    """
+    file_id = f"{uuid.uuid4().hex}.{extension}"
+    ruta = os.path.join(directorio, file_id)
+
+    try:
+        _enlazar(_ruta_blob(sha256), ruta)
+    except FileNotFoundError:
+        return None
+
+    registrar_hash_audio(ruta, sha256)
+    return {'file_id': file_id, 'path': ruta}
+
+
+def registrar_audio_derivado(sha256_video, sha256_audio, extension):
+    """
+    Guarda qué audio se extrajo de un video
+
+    Args:
+        sha256_video (str): Hash del video
+        sha256_audio (str): Hash del audio extraído (ya guardado con guardar_archivo)
+        extension (str): Extensión del audio
+    """
+    ruta = _ruta_blob(sha256_video) + _SUFIJO_AUDIO
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+
+    temporal = f"{ruta}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump({'sha256': sha256_audio, 'extension': extension}, f)
+    os.replace(temporal, ruta)
+
+
+def buscar_audio_derivado(sha256_video):
+    """
+    Obtiene el audio extraído previamente de un video, si su blob sigue guardado
+
+    Args:
+        sha256_video (str): Hash del video
+
+    Returns:
+        dict: {'sha256', 'extension'} o None
+    """
+    ruta = _ruta_blob(sha256_video) + _SUFIJO_AUDIO
+
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            derivado = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if not os.path.exists(_ruta_blob(derivado['sha256'])):
+        return None
+
+    with _lock:
+        _stats['derived_hits'] += 1
+    return derivado
+
+
+def liberar_archivo(ruta):
+    """
+    Elimina un file_id; si era el último handle de su blob, el blob queda
+    pendiente de recolectar (se conserva BLOB_GC_GRACE por si se vuelve a subir)
+
+    Args:
+        ruta (str): Archivo en uploads/
+
+    Returns:
+        bool: True si el archivo existía
+    """
+    try:
+        os.remove(ruta)
+    except FileNotFoundError:
+        return False
+
+    with _lock:
+        _stats['released'] += 1
+
+    _recolectar_si_toca()
+    return True
+
+
+def _blobs():
+    """Recorre los blobs: (ruta, sha256, os.stat_result)"""
+    if not os.path.isdir(BLOB_STORE_DIR):
+        return
+
+    for nivel1 in os.scandir(BLOB_STORE_DIR):
+        if not nivel1.is_dir():
+            continue
+        for nivel2 in os.scandir(nivel1.path):
+            if not nivel2.is_dir():
+                continue
+            for entrada in os.scandir(nivel2.path):
+                if '.' in entrada.name:
+                    continue
+                try:
+                    yield entrada.path, entrada.name, entrada.stat()
+                except FileNotFoundError:
+                    continue
+
+
+def recolectar(grace=None):
+    """
+    Elimina los blobs sin handles liberados hace más de grace segundos y, si
+    los no referenciados superan BLOB_GC_MAX_UNREFERENCED_BYTES, los más antiguos
+
+    Args:
+        grace (int): Antigüedad mínima (por defecto BLOB_GC_GRACE)
+
+    Returns:
+        dict: {'removed', 'bytes'}
+    """
+    grace = BLOB_GC_GRACE if grace is None else grace
+    ahora = time.time()
+
+    # st_ctime cambia al crear o borrar un enlace: es el momento de la última liberación
+    sin_referencias = sorted(
+        (info.st_ctime, ruta, info.st_size)
+        for ruta, _, info in _blobs() if info.st_nlink <= 1
+    )
+    total = sum(tamano for _, _, tamano in sin_referencias)
+
+    eliminados = 0
+    liberados = 0
+    for ctime, ruta, tamano in sin_referencias:
+        if ahora - ctime < grace and total <= BLOB_GC_MAX_UNREFERENCED_BYTES:
+            break
+
+        # Comprobar de nuevo: se puede haber creado un handle mientras tanto
+        try:
+            if os.stat(ruta).st_nlink > 1:
+                continue
+            os.remove(ruta)
+        except FileNotFoundError:
+            continue
+
+        try:
+            os.remove(ruta + _SUFIJO_AUDIO)
+        except FileNotFoundError:
+            pass
+
+        total -= tamano
+        eliminados += 1
+        liberados += tamano
+
+    _purgar_derivados()
+
+    with _lock:
+        _stats['collected'] += eliminados
+        _stats['collected_bytes'] += liberados
+
+    if eliminados:
+        logger.info(f"Almacén de blobs: {eliminados} blobs eliminados ({liberados} bytes)")
+    return {'removed': eliminados, 'bytes': liberados}
+
+
+def _purgar_derivados():
+    """Elimina las relaciones video -> audio cuyo audio ya no existe"""
+    if not os.path.isdir(BLOB_STORE_DIR):
+        return
+
+    for raiz, _, archivos in os.walk(BLOB_STORE_DIR):
+        for nombre in archivos:
+            if not nombre.endswith(_SUFIJO_AUDIO):
+                continue
+            ruta = os.path.join(raiz, nombre)
+            try:
+                with open(ruta, 'r', encoding='utf-8') as f:
+                    derivado = json.load(f)
+                if not os.path.exists(_ruta_blob(derivado['sha256'])):
+                    os.remove(ruta)
+            except (OSError, ValueError, KeyError):
+                continue
+
+
+def _recolectar_si_toca():
+    """Lanza una recolección en segundo plano si pasó BLOB_GC_INTERVAL desde la última"""
+    with _lock:
+        if _estado['recolectando'] or time.monotonic() - _estado['ultima_recoleccion'] < BLOB_GC_INTERVAL:
+            return
+        _estado['recolectando'] = True
+        _estado['ultima_recoleccion'] = time.monotonic()
+
+    def ejecutar():
+        try:
+            recolectar()
+        except Exception as e:
+            logger.error(f"Error al recolectar blobs: {e}", exc_info=True)
+        finally:
+            with _lock:
+                _estado['recolectando'] = False
+
+    threading.Thread(target=ejecutar, name='blob-gc', daemon=True).start()
+
+
+def get_blob_store_stats():
+    """
+    Obtiene el estado del almacén (recorre los blobs: usar para diagnóstico)
+
+    Returns:
+        dict: Blobs, handles, bytes guardados y contadores de deduplicación y recolección
+    """
+    blobs = 0
+    handles = 0
+    total = 0
+    sin_referencias = 0
+
+    for _, _, info in _blobs():
+        blobs += 1
+        handles += info.st_nlink - 1
+        total += info.st_size
+        if info.st_nlink <= 1:
+            sin_referencias += 1
+
+    with _lock:
+        return {
+            'blobs': blobs,
+            'handles': handles,
+            'bytes': total,
+            'unreferenced': sin_referencias,
+            **_stats
+        }
+
+
+def main(argv):
+    """Punto de entrada de la línea de comandos"""
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s %(message)s')
+    comando = argv[1] if len(argv) > 1 else 'stats'
+
+    if comando == 'gc':
+        print(json.dumps(recolectar(), indent=2))
+        return 0
+
+    if comando == 'stats':
+        print(json.dumps(get_blob_store_stats(), indent=2))
+        return 0
+
+    print(f"Comando desconocido: {comando} (gc, stats)")
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
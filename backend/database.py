@@ -3,10 +3,16 @@ Módulo para manejar la conexión con la base de datos Supabase
 """
 
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2 import errorcodes
+from psycopg2.extras import RealDictCursor, execute_batch, execute_values as _execute_values
 import os
 from dotenv import load_dotenv
+import re
+import time
 import logging
+import threading
+from contextlib import contextmanager
+from db_pool import ConnectionPool
 
 # Cargar variables de entorno
 env_path = os.path.join(os.path.dirname(__file__), '.env')
@@ -15,6 +21,29 @@ if os.path.exists(env_path):
 
 logger = logging.getLogger(__name__)
 
+# Pool de conexiones compartido (se crea en la primera consulta)
+_pool = None
+_pool_lock = threading.Lock()
+
+# Sentencias preparadas en el servidor (desactivar con poolers en modo transacción)
+PREPARED_STATEMENTS_ENABLED = os.getenv('DB_PREPARED_STATEMENTS', 'true').lower() in ('1', 'true', 'yes')
+
+# Fallos seguidos tras los que una sentencia deja de prepararse y se ejecuta sin preparar
+PREPARED_MAX_FAILURES = 3
+
+# Segundos que una sentencia desactivada se ejecuta sin preparar antes de volver a intentarlo
+PREPARED_RETRY_SECONDS = int(os.getenv('DB_PREPARED_RETRY_SECONDS', 300))
+
+# Registro de sentencias preparadas: nombre -> dict
+_prepared_statements = {}
+_prepared_stats = {
+    'prepares': 0,
+    'executions': 0,
+    'fallbacks': 0
+}
+_prepared_lock = threading.Lock()
+_PLACEHOLDER = re.compile(r'%s')
+
 def get_db_connection():
     """
     Crea y retorna una conexión a la base de datos Supabase
@@ -42,6 +71,31 @@ def get_db_connection():
         logger.error(f"Error al conectar a la base de datos: {e}")
         return None
 
+def get_pool():
+    """
+    Obtiene el pool de conexiones, creándolo la primera vez
+    
+    Returns:
+        ConnectionPool: Pool de conexiones compartido
+    """
+    global _pool
+    
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(get_db_connection)
+    
+    return _pool
+
+def get_pool_stats():
+    """
+    Obtiene las métricas del pool de conexiones
+    
+    Returns:
+        dict: Métricas del pool (vacío si aún no se ha creado)
+    """
+    return _pool.get_stats() if _pool is not None else {}
+
 def test_connection():
     """
     Prueba la conexión a la base de datos
@@ -50,17 +104,13 @@ def test_connection():
         bool: True si la conexión es exitosa, False en caso contrario
     """
     try:
-        connection = get_db_connection()
-        
-        if connection is None:
-            return False
-        
-        cursor = connection.cursor()
-        cursor.execute("SELECT NOW();")
-        result = cursor.fetchone()
-        
-        cursor.close()
-        connection.close()
+        with get_pool().connection() as connection:
+            if connection is None:
+                return False
+            
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT NOW();")
+                result = cursor.fetchone()
         
         logger.info(f"Conexión exitosa. Hora del servidor: {result['now']}")
         return True
@@ -71,7 +121,7 @@ def test_connection():
 
 def execute_query(query, params=None, fetch_one=False, fetch_all=False):
     """
-    Ejecuta una consulta SQL en la base de datos
+    Ejecuta una consulta SQL en la base de datos usando una conexión del pool
     
     Args:
         query (str): Consulta SQL a ejecutar
@@ -82,11 +132,12 @@ def execute_query(query, params=None, fetch_one=False, fetch_all=False):
     Returns:
         result: Resultado de la consulta o None si falla
     """
+    pool = get_pool()
     connection = None
     cursor = None
     
     try:
-        connection = get_db_connection()
+        connection = pool.getconn()
         
         if connection is None:
             return None
@@ -116,12 +167,239 @@ def execute_query(query, params=None, fetch_one=False, fetch_all=False):
         
     except Exception as e:
         logger.error(f"Error al ejecutar consulta: {e}")
-        if connection:
-            connection.rollback()
+        if connection and not connection.closed:
+            try:
+                connection.rollback()
+            except Exception:
+                pass
         return None
         
     finally:
-        if cursor:
-            cursor.close()
+        if cursor and not cursor.closed:
+            try:
+                cursor.close()
+            except Exception:
+                pass
         if connection:
-            connection.close()
+            # Las conexiones rotas se descartan; el resto vuelve al pool
+            pool.putconn(connection, discard=bool(connection.closed))
+
+@contextmanager
+def transaction():
+    """
+    Unidad de trabajo: ejecuta varias sentencias en una sola conexión del pool
+    y una sola transacción. Hace commit al salir del bloque y rollback si se
+    produce una excepción (que se propaga al llamador)
+    
+    Uso:
+        with transaction() as cursor:
+            cursor.execute("INSERT ... RETURNING id", (...))
+            team_id = cursor.fetchone()['id']
+            execute_values("INSERT INTO ... VALUES %s", rows, cursor=cursor)
+    
+    Yields:
+        cursor: Cursor RealDictCursor de la transacción
+    """
+    pool = get_pool()
+    connection = pool.getconn()
+    
+    if connection is None:
+        raise RuntimeError("No se pudo obtener una conexión a la base de datos")
+    
+    try:
+        with connection.cursor() as cursor:
+            yield cursor
+        connection.commit()
+    except Exception:
+        if not connection.closed:
+            try:
+                connection.rollback()
+            except Exception:
+                pass
+        raise
+    finally:
+        pool.putconn(connection, discard=bool(connection.closed))
+
+def execute_many(query, params_list, cursor=None, page_size=100):
+    """
+    Ejecuta la misma sentencia con muchos conjuntos de parámetros, enviándolos
+    al servidor por lotes (psycopg2.extras.execute_batch)
+    
+    Args:
+        query (str): Sentencia SQL con marcadores %s
+        params_list (list): Lista de tuplas de parámetros
+        cursor: Cursor de una transacción abierta (opcional; si no, se usa una transacción propia)
+        page_size (int): Sentencias por viaje al servidor
+    
+    Returns:
+        int: Número de conjuntos de parámetros ejecutados, o None si falla
+    """
+    params_list = list(params_list)
+    
+    if cursor is not None:
+        execute_batch(cursor, query, params_list, page_size=page_size)
+        return len(params_list)
+    
+    try:
+        with transaction() as own_cursor:
+            execute_batch(own_cursor, query, params_list, page_size=page_size)
+        return len(params_list)
+    except Exception as e:
+        logger.error(f"Error al ejecutar consulta por lotes: {e}")
+        return None
+
+def execute_values(query, rows, cursor=None, template=None, page_size=100, fetch=False):
+    """
+    Inserta muchas filas con una sola sentencia VALUES por página
+    (psycopg2.extras.execute_values)
+    
+    Args:
+        query (str): Sentencia con un único marcador %s para la lista VALUES
+                     (ej: "INSERT INTO t (a, b) VALUES %s RETURNING id")
+        rows (list): Lista de tuplas, una por fila
+        cursor: Cursor de una transacción abierta (opcional; si no, se usa una transacción propia)
+        template (str): Plantilla de cada fila (opcional, ej: "(%s, %s::jsonb)")
+        page_size (int): Filas por sentencia
+        fetch (bool): Si True, retorna las filas devueltas por RETURNING
+    
+    Returns:
+        list|int: Filas devueltas si fetch es True, o número de filas enviadas; None si falla
+    """
+    rows = list(rows)
+    
+    if not rows:
+        return [] if fetch else 0
+    
+    if cursor is not None:
+        result = _execute_values(cursor, query, rows, template=template, page_size=page_size, fetch=fetch)
+        return result if fetch else len(rows)
+    
+    try:
+        with transaction() as own_cursor:
+            result = _execute_values(own_cursor, query, rows, template=template, page_size=page_size, fetch=fetch)
+        return result if fetch else len(rows)
+    except Exception as e:
+        logger.error(f"Error al insertar filas por lotes: {e}")
+        return None
+
+def register_prepared_statement(name, query):
+    """
+    Registra una consulta de lectura frecuente para ejecutarla como sentencia
+    preparada en el servidor (se prepara una vez por conexión del pool)
+    
+    Args:
+        name (str): Nombre de la sentencia (identificador SQL válido)
+        query (str): Consulta SELECT con marcadores %s
+    
+    Returns:
+        str: Nombre registrado
+    """
+    contador = iter(range(1, query.count('%s') + 1))
+    
+    with _prepared_lock:
+        _prepared_statements[name] = {
+            'query': query,
+            'num_params': query.count('%s'),
+            'prepare_sql': f"PREPARE {name} AS " + _PLACEHOLDER.sub(lambda _: f"${next(contador)}", query),
+            'failures': 0,
+            'disabled_until': 0.0
+        }
+    
+    return name
+
+def execute_prepared(name, params=None, fetch_one=False, fetch_all=False):
+    """
+    Ejecuta una sentencia registrada con register_prepared_statement
+    Si la conexión aún no la tiene preparada se prepara primero; si preparar o
+    ejecutar falla, se ejecuta la consulta original con execute_query. Tras
+    PREPARED_MAX_FAILURES fallos seguidos la sentencia se ejecuta sin preparar
+    durante PREPARED_RETRY_SECONDS
+    
+    Args:
+        name (str): Nombre de la sentencia registrada
+        params (tuple): Parámetros de la consulta
+        fetch_one (bool): Si True, retorna un solo resultado
+        fetch_all (bool): Si True, retorna todos los resultados
+    
+    Returns:
+        result: Resultado de la consulta o None si falla
+    """
+    statement = _prepared_statements.get(name)
+    
+    if statement is None:
+        logger.error(f"Sentencia preparada no registrada: {name}")
+        return None
+    
+    if PREPARED_STATEMENTS_ENABLED and statement['disabled_until'] <= time.monotonic():
+        pool = get_pool()
+        connection = pool.getconn()
+        
+        if connection is None:
+            return None
+        
+        try:
+            prepared = pool.get_state(connection).setdefault('prepared', set())
+            
+            with connection.cursor() as cursor:
+                if name not in prepared:
+                    cursor.execute(statement['prepare_sql'])
+                    prepared.add(name)
+                    with _prepared_lock:
+                        _prepared_stats['prepares'] += 1
+                
+                marcadores = ', '.join(['%s'] * statement['num_params'])
+                cursor.execute(f"EXECUTE {name} ({marcadores})" if marcadores else f"EXECUTE {name}", params)
+                
+                if fetch_one:
+                    result = cursor.fetchone()
+                elif fetch_all:
+                    result = cursor.fetchall()
+                else:
+                    result = cursor.rowcount
+            
+            with _prepared_lock:
+                _prepared_stats['executions'] += 1
+                statement['failures'] = 0
+            return result
+        
+        except psycopg2.Error as e:
+            logger.warning(f"Sentencia preparada {name} no disponible, se ejecuta sin preparar: {e}")
+            # PREPARE no es transaccional: el rollback no la elimina de la sesión, así
+            # que si falló EXECUTE sigue preparada y no se vuelve a preparar
+            if e.pgcode == errorcodes.DUPLICATE_PREPARED_STATEMENT:
+                prepared.add(name)
+            # Eliminada en el servidor (DEALLOCATE, DISCARD ALL): se vuelve a preparar en el próximo uso
+            elif e.pgcode == errorcodes.INVALID_SQL_STATEMENT_NAME:
+                prepared.discard(name)
+            with _prepared_lock:
+                _prepared_stats['fallbacks'] += 1
+                # Una conexión caída no es un fallo de la sentencia
+                if not connection.closed and not isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError)):
+                    statement['failures'] += 1
+                if statement['failures'] >= PREPARED_MAX_FAILURES:
+                    statement['disabled_until'] = time.monotonic() + PREPARED_RETRY_SECONDS
+                    logger.warning(f"Sentencia preparada {name} desactivada {PREPARED_RETRY_SECONDS}s "
+                                   f"tras {statement['failures']} fallos seguidos")
+                    statement['failures'] = 0
+        
+        finally:
+            # putconn hace rollback de la transacción de lectura
+            pool.putconn(connection, discard=bool(connection.closed))
+    
+    return execute_query(statement['query'], params, fetch_one=fetch_one, fetch_all=fetch_all)
+
+def get_prepared_stats():
+    """
+    Obtiene los contadores de las sentencias preparadas
+    
+    Returns:
+        dict: Preparaciones, ejecuciones preparadas, ejecuciones sin preparar
+              tras un fallo y sentencias desactivadas
+    """
+    with _prepared_lock:
+        stats = dict(_prepared_stats)
+        stats['registered'] = len(_prepared_statements)
+        ahora = time.monotonic()
+        stats['disabled'] = [n for n, st in _prepared_statements.items() if st['disabled_until'] > ahora]
+    stats['enabled'] = PREPARED_STATEMENTS_ENABLED
+    return stats
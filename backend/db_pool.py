@@ -0,0 +1,332 @@
+"""
+Pool de conexiones a la base de datos
+Reutiliza las conexiones psycopg2 entre consultas para no pagar la conexión TCP,
+TLS y la autenticación con Supabase en cada consulta. Es seguro entre threads,
+comprueba las conexiones al sacarlas del pool, las recicla al superar su tiempo
+de vida máximo, repone las descartadas hasta el mínimo y mide el tiempo de
+espera cuando el pool está lleno.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Conexiones abiertas como mínimo y como máximo
+POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN_SIZE', 1))
+POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', 10))
+
+# Tiempo de vida máximo de una conexión antes de reciclarla (segundos)
+POOL_MAX_LIFETIME = float(os.environ.get('DB_POOL_MAX_LIFETIME', 1800))
+
+# Tiempo máximo de espera por una conexión libre (segundos)
+POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+
+# Conexiones inactivas más tiempo que esto se comprueban con SELECT 1 al sacarlas (segundos)
+POOL_HEALTH_CHECK_IDLE = float(os.environ.get('DB_POOL_HEALTH_CHECK_IDLE', 30))
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones thread-safe
+
+    Args:
+        connect (callable): Función que abre una conexión nueva (o devuelve None si falla)
+        min_size (int): Conexiones que se mantienen abiertas
+        max_size (int): Conexiones abiertas como máximo
+        max_lifetime (float): Segundos tras los que una conexión se recicla
+        timeout (float): Segundos máximos de espera por una conexión libre
+        health_check_idle (float): Inactividad a partir de la cual se comprueba la conexión
+    """
+
+    def __init__(self, connect, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE,
+                 max_lifetime=POOL_MAX_LIFETIME, timeout=POOL_TIMEOUT,
+                 health_check_idle=POOL_HEALTH_CHECK_IDLE):
+        self._connect = connect
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max(1, max_size)
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.health_check_idle = health_check_idle
+
+        # Conexiones libres: (conexión, último uso); las más recientes al final
+        self._idle = deque()
+        # Fecha de creación de cada conexión abierta (libre o en uso)
+        self._created_at = {}
+        # Estado asociado a cada conexión (ej: sentencias preparadas en el servidor)
+        self._state = {}
+        self._opening = 0
+        self._refilling = False
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'timeouts': 0,
+            'opened': 0,
+            'recycled': 0,
+            'refilled': 0,
+            'health_check_failures': 0
+        }
+
+        for _ in range(self.min_size):
+            connection = self._open()
+            if connection is None:
+                break
+            self._idle.append((connection, time.monotonic()))
+
+    # ==================== APERTURA Y CIERRE ====================
+
+    def _open(self):
+        """Abre una conexión nueva y la registra"""
+        connection = self._connect()
+        if connection is None:
+            return None
+
+        with self._cond:
+            self._created_at[connection] = time.monotonic()
+            self._stats['opened'] += 1
+
+        return connection
+
+    def _discard(self, connection):
+        """Cierra una conexión y deja libre su hueco en el pool"""
+        with self._cond:
+            self._created_at.pop(connection, None)
+            self._state.pop(connection, None)
+            self._cond.notify()
+            rellenar = (not self._closed and not self._refilling and
+                        len(self._created_at) + self._opening < self.min_size)
+            if rellenar:
+                self._refilling = True
+
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+        if rellenar:
+            threading.Thread(target=self._refill, name='db-pool-refill', daemon=True).start()
+
+    def _refill(self):
+        """
+        Vuelve a abrir conexiones hasta min_size tras descartar alguna
+        (en segundo plano, para no cargar la conexión nueva a quien la descartó)
+        """
+        try:
+            while True:
+                with self._cond:
+                    if self._closed or len(self._created_at) + self._opening >= self.min_size:
+                        return
+                    self._opening += 1
+
+                connection = None
+                try:
+                    connection = self._open()
+                finally:
+                    with self._cond:
+                        self._opening -= 1
+                        if connection is not None and not self._closed:
+                            self._idle.append((connection, time.monotonic()))
+                            self._stats['refilled'] += 1
+                        self._cond.notify()
+
+                if connection is None:
+                    # Se reintenta con el siguiente descarte
+                    logger.warning("No se pudo reponer una conexión del pool")
+                    return
+                if self._closed:
+                    self._discard(connection)
+                    return
+        finally:
+            with self._cond:
+                self._refilling = False
+
+    def _is_expired(self, connection):
+        """Indica si la conexión superó su tiempo de vida"""
+        created_at = self._created_at.get(connection)
+        return created_at is None or time.monotonic() - created_at > self.max_lifetime
+
+    def _is_healthy(self, connection, idle_since):
+        """
+        Comprueba una conexión antes de entregarla
+        Siempre se verifica que siga abierta; la consulta SELECT 1 solo se hace
+        si estuvo inactiva más de health_check_idle, para no añadir un viaje
+        de ida y vuelta a cada consulta
+        """
+        if connection.closed:
+            return False
+
+        if time.monotonic() - idle_since < self.health_check_idle:
+            return True
+
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connection.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f"Conexión del pool descartada en la comprobación: {e}")
+            with self._cond:
+                self._stats['health_check_failures'] += 1
+            return False
+
+    # ==================== PRÉSTAMO Y DEVOLUCIÓN ====================
+
+    def getconn(self):
+        """
+        Obtiene una conexión del pool, esperando si están todas en uso
+
+        Returns:
+            connection: Conexión psycopg2 o None si no se pudo obtener a tiempo
+        """
+        inicio = time.monotonic()
+        limite = inicio + self.timeout
+        espero = False
+
+        while True:
+            candidata = None
+            abrir = False
+
+            with self._cond:
+                while not self._idle and len(self._created_at) + self._opening >= self.max_size:
+                    restante = limite - time.monotonic()
+                    if restante <= 0 or self._closed:
+                        self._stats['timeouts'] += 1
+                        logger.error(f"Tiempo de espera agotado para obtener una conexión ({self.timeout}s)")
+                        return None
+                    espero = True
+                    self._cond.wait(restante)
+
+                if self._idle:
+                    candidata, idle_since = self._idle.pop()
+                else:
+                    self._opening += 1
+                    abrir = True
+
+            if abrir:
+                try:
+                    candidata = self._open()
+                finally:
+                    with self._cond:
+                        self._opening -= 1
+                        if candidata is None:
+                            self._cond.notify()
+                if candidata is None:
+                    return None
+            elif self._is_expired(candidata):
+                with self._cond:
+                    self._stats['recycled'] += 1
+                self._discard(candidata)
+                continue
+            elif not self._is_healthy(candidata, idle_since):
+                self._discard(candidata)
+                continue
+
+            espera = time.monotonic() - inicio
+            with self._cond:
+                self._stats['checkouts'] += 1
+                if espero:
+                    self._stats['waits'] += 1
+                    self._stats['wait_time_total'] += espera
+                    self._stats['wait_time_max'] = max(self._stats['wait_time_max'], espera)
+
+            return candidata
+
+    def putconn(self, connection, discard=False):
+        """
+        Devuelve una conexión al pool
+
+        Args:
+            connection: Conexión obtenida con getconn
+            discard (bool): Cerrar la conexión en lugar de reutilizarla
+        """
+        if connection is None:
+            return
+
+        if not discard and not connection.closed:
+            try:
+                # No devolver conexiones con una transacción abierta
+                connection.rollback()
+            except Exception:
+                discard = True
+
+        if discard or connection.closed or self._closed or self._is_expired(connection):
+            if not discard and not connection.closed and not self._closed:
+                with self._cond:
+                    self._stats['recycled'] += 1
+            self._discard(connection)
+            return
+
+        with self._cond:
+            self._idle.append((connection, time.monotonic()))
+            self._cond.notify()
+
+    def get_state(self, connection):
+        """
+        Obtiene el estado asociado a una conexión del pool; se descarta junto
+        con la conexión cuando esta se cierra o se recicla
+
+        Args:
+            connection: Conexión obtenida con getconn
+
+        Returns:
+            dict: Estado de la conexión
+        """
+        with self._cond:
+            return self._state.setdefault(connection, {})
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager que presta una conexión y la devuelve al salir
+        Si ocurre un error la conexión se descarta si quedó cerrada
+
+        Yields:
+            connection: Conexión psycopg2 o None si no se pudo obtener
+        """
+        connection = self.getconn()
+        try:
+            yield connection
+        finally:
+            if connection is not None:
+                self.putconn(connection, discard=bool(connection.closed))
+
+    def close(self):
+        """Cierra todas las conexiones libres y no acepta más devoluciones"""
+        with self._cond:
+            self._closed = True
+            libres = [connection for connection, _ in self._idle]
+            self._idle.clear()
+            self._cond.notify_all()
+
+        for connection in libres:
+            self._discard(connection)
+
+    # ==================== MÉTRICAS ====================
+
+    def get_stats(self):
+        """
+        Obtiene el estado y las métricas del pool
+
+        Returns:
+            dict: Tamaño, conexiones libres y en uso, préstamos, esperas y reciclados
+        """
+        with self._cond:
+            stats = dict(self._stats)
+            stats['size'] = len(self._created_at)
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = len(self._created_at) - len(self._idle)
+            stats['max_size'] = self.max_size
+
+        stats['wait_time_avg_ms'] = round(1000 * stats['wait_time_total'] / stats['waits'], 2) if stats['waits'] else 0.0
+        stats['wait_time_max_ms'] = round(1000 * stats.pop('wait_time_max'), 2)
+        stats.pop('wait_time_total')
+        return stats
@@ -0,0 +1,226 @@
+"""
+Embeddings de fragmentos de transcripción
+Divide las transcripciones por turno de hablante y obtiene sus vectores con el
+proveedor configurado (Gemini, OpenAI o 'local'). Los vectores se devuelven
+normalizados (norma 1), así que el producto escalar es la similitud coseno.
+El proveedor 'local' no usa ninguna API: proyecta los términos con hashing y
+solo captura coincidencias léxicas, sirve para desarrollo y pruebas sin red.
+"""
+
+import os
+import re
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Proveedor, modelo y dimensión de los vectores
+EMBEDDING_PROVIDER = os.environ.get('EMBEDDING_PROVIDER', 'gemini').lower()
+EMBEDDING_MODEL = os.environ.get(
+    'EMBEDDING_MODEL',
+    {'gemini': 'models/text-embedding-004', 'openai': 'text-embedding-3-small'}.get(EMBEDDING_PROVIDER, 'hashing')
+)
+EMBEDDING_DIMENSIONS = int(os.environ.get('EMBEDDING_DIMENSIONS', 256))
+
+# Textos por llamada a la API
+EMBEDDING_BATCH_SIZE = int(os.environ.get('EMBEDDING_BATCH_SIZE', 100))
+
+# Longitud máxima de un fragmento; los turnos más largos se dividen por oraciones
+EMBEDDING_CHUNK_CHARS = int(os.environ.get('EMBEDDING_CHUNK_CHARS', 1500))
+
+# Vectores recientes en memoria (el chat reutiliza los del indexado en segundo plano)
+EMBEDDING_CACHE_SIZE = int(os.environ.get('EMBEDDING_CACHE_SIZE', 20000))
+
+_ORACION = re.compile(r'(?<=[.!?…])\s+')
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+_clientes = {'gemini_api_key': None, 'openai_api_key': None, 'openai': None}
+
+
+def firma_embeddings():
+    """
+    Identifica el espacio de los vectores; vectores con firmas distintas no son comparables
+
+    Returns:
+        str: 'proveedor:modelo:dimensión'
+    """
+    return f"{EMBEDDING_PROVIDER}:{EMBEDDING_MODEL}:{EMBEDDING_DIMENSIONS}"
+
+
+# ==================== FRAGMENTOS ====================
+
+def _partir_texto(texto, max_chars):
+    """Divide un texto largo en trozos de hasta max_chars, respetando las oraciones"""
+    trozos = []
+    actual = ''
+
+    for oracion in _ORACION.split(texto):
+        while len(oracion) > max_chars:
+            if actual:
+                trozos.append(actual)
+                actual = ''
+            trozos.append(oracion[:max_chars])
+            oracion = oracion[max_chars:]
+
+        if actual and len(actual) + 1 + len(oracion) > max_chars:
+            trozos.append(actual)
+            actual = oracion
+        else:
+            actual = f"{actual} {oracion}" if actual else oracion
+
+    if actual:
+        trozos.append(actual)
+
+    return trozos
+
+
+def dividir_en_fragmentos(dialogos, max_chars=EMBEDDING_CHUNK_CHARS):
+    """
+    Divide una transcripción en fragmentos por turno de hablante
+
+    Args:
+        dialogos (list): Turnos [{'speaker': str, 'text': str}]
+        max_chars (int): Longitud máxima de un fragmento
+
+    Returns:
+        list: Fragmentos [{'turn': índice del turno, 'speaker': str, 'text': str}]
+    """
+    fragmentos = []
+
+    for i, dialogo in enumerate(dialogos or []):
+        texto = (dialogo.get('text') or '').strip()
+        if not texto:
+            continue
+
+        for trozo in _partir_texto(texto, max_chars):
+            fragmentos.append({'turn': i, 'speaker': dialogo.get('speaker'), 'text': trozo})
+
+    return fragmentos
+
+
+def texto_fragmento(fragmento):
+    """Texto que se envía al modelo para un fragmento (con el hablante)"""
+    return f"{fragmento['speaker']}: {fragmento['text']}"
+
+
+# ==================== PROVEEDORES ====================
+
+def _embeddings_gemini(textos, tipo):
+    """Vectores de Gemini (embed_content con task_type de recuperación)"""
+    import google.generativeai as genai
+
+    api_key = os.environ.get('GEMINI_API_KEY')
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY no configurada")
+
+    if _clientes['gemini_api_key'] != api_key:
+        genai.configure(api_key=api_key)
+        _clientes['gemini_api_key'] = api_key
+
+    resultado = genai.embed_content(
+        model=EMBEDDING_MODEL,
+        content=textos,
+        task_type='retrieval_query' if tipo == 'consulta' else 'retrieval_document',
+        output_dimensionality=EMBEDDING_DIMENSIONS
+    )
+    return resultado['embedding']
+
+
+def _embeddings_openai(textos, tipo):
+    """Vectores de OpenAI (embeddings.create con dimensions)"""
+    from openai import OpenAI
+
+    api_key = os.environ.get('OPENAI_API_KEY')
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY no configurada")
+
+    if _clientes['openai_api_key'] != api_key or _clientes['openai'] is None:
+        _clientes['openai'] = OpenAI(api_key=api_key)
+        _clientes['openai_api_key'] = api_key
+
+    respuesta = _clientes['openai'].embeddings.create(
+        model=EMBEDDING_MODEL,
+        input=textos,
+        dimensions=EMBEDDING_DIMENSIONS
+    )
+    return [dato.embedding for dato in sorted(respuesta.data, key=lambda d: d.index)]
+
+
+def _embeddings_local(textos, tipo):
+    """Vectores por hashing de términos y pares de términos (sin red)"""
+    from retrieval_index import tokenizar
+
+    vectores = np.zeros((len(textos), EMBEDDING_DIMENSIONS), dtype=np.float32)
+
+    for fila, texto in enumerate(textos):
+        terminos = tokenizar(texto)
+        for termino in terminos + [f"{a} {b}" for a, b in zip(terminos, terminos[1:])]:
+            h = int.from_bytes(hashlib.blake2b(termino.encode('utf-8'), digest_size=8).digest(), 'little')
+            vectores[fila, h % EMBEDDING_DIMENSIONS] += 1.0 if (h >> 63) else -1.0
+
+    return vectores
+
+
+_PROVEEDORES = {
+    'gemini': _embeddings_gemini,
+    'openai': _embeddings_openai,
+    'local': _embeddings_local
+}
+
+
+# ==================== API ====================
+
+def generar_embeddings(textos, tipo='documento'):
+    """
+    Obtiene los vectores de varios textos (en lotes de EMBEDDING_BATCH_SIZE)
+
+    Args:
+        textos (list): Textos
+        tipo (str): 'documento' para fragmentos indexados o 'consulta' para búsquedas
+
+    Returns:
+        np.ndarray: Matriz (len(textos), EMBEDDING_DIMENSIONS) float32 normalizada,
+                    o None si el proveedor falla
+    """
+    proveedor = _PROVEEDORES.get(EMBEDDING_PROVIDER)
+    if proveedor is None:
+        logger.error(f"Proveedor de embeddings desconocido: {EMBEDDING_PROVIDER}")
+        return None
+
+    vectores = np.zeros((len(textos), EMBEDDING_DIMENSIONS), dtype=np.float32)
+    claves = [hashlib.sha1(f"{tipo}\x1f{texto}".encode('utf-8')).digest() for texto in textos]
+    pendientes = []
+
+    with _lock:
+        for i, clave in enumerate(claves):
+            vector = _cache.get(clave)
+            if vector is None:
+                pendientes.append(i)
+            else:
+                _cache.move_to_end(clave)
+                vectores[i] = vector
+
+    try:
+        for inicio in range(0, len(pendientes), EMBEDDING_BATCH_SIZE):
+            lote = pendientes[inicio:inicio + EMBEDDING_BATCH_SIZE]
+            calculados = np.asarray(proveedor([textos[i] for i in lote], tipo), dtype=np.float32)
+
+            normas = np.linalg.norm(calculados, axis=1, keepdims=True)
+            calculados /= np.maximum(normas, 1e-12)
+            vectores[lote] = calculados
+
+    except Exception as e:
+        logger.error(f"Error al generar embeddings con {EMBEDDING_PROVIDER}: {e}")
+        return None
+
+    with _lock:
+        for i in pendientes:
+            _cache[claves[i]] = vectores[i]
+        while len(_cache) > EMBEDDING_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+    return vectores
@@ -0,0 +1,267 @@
+"""
+Resumen jerárquico (map-reduce) de transcripciones largas
+Divide la transcripción en bloques por turnos de hablante con un presupuesto
+de tokens, resume los bloques en paralelo y combina los resúmenes hasta que
+el resultado cabe en el contexto del modelo. Los resúmenes de cada bloque se
+guardan en caché para que el chat y la edición no vuelvan a enviar el texto
+completo.
+"""
+
+import os
+import re
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Tokens de transcripción que se envían directamente al modelo sin resumir
+CONTEXT_TOKEN_BUDGET = int(os.environ.get('SUMMARY_CONTEXT_TOKENS', 30000))
+
+# Tamaño máximo de cada bloque en la fase map (tokens)
+CHUNK_TOKEN_BUDGET = int(os.environ.get('SUMMARY_CHUNK_TOKENS', 6000))
+
+# Llamadas simultáneas al modelo durante la fase map
+MAX_PARALLEL_REQUESTS = int(os.environ.get('SUMMARY_MAX_PARALLEL', 4))
+
+# Entradas máximas en la caché de resúmenes de bloque
+CHUNK_CACHE_SIZE = int(os.environ.get('SUMMARY_CHUNK_CACHE_SIZE', 1024))
+
+# Aproximación de caracteres por token (suficiente para presupuestar)
+CHARS_PER_TOKEN = 4
+
+# Niveles máximos de reducción antes de recortar
+MAX_REDUCE_LEVELS = 4
+
+# Marca de inicio de turno en el texto de procesar_transcripcion_para_texto
+_INICIO_TURNO = re.compile(r'(?=\[SPEAKER_[^\]]+\])')
+_FIN_FRASE = re.compile(r'(?<=[.!?])\s+')
+
+# Cambiar la versión invalida los resúmenes de bloque en caché
+_MAP_PROMPT_VERSION = 1
+_MAP_PROMPT = """You are condensing one part of a long meeting transcription so it can be analyzed later without the full text.
+
+TRANSCRIPTION PART {indice} OF {total}:
+{bloque}
+
+TASK:
+Write dense notes of this part. Keep the speaker labels (e.g. [SPEAKER_S1]) next to what each speaker said, and preserve every decision, action item, owner, date, number, name and open question. Do not add information that is not in the text. Do not use emojis. Return ONLY the notes.
+
+NOTES:"""
+
+_chunk_cache = OrderedDict()
+_cache_stats = {'hits': 0, 'misses': 0}
+_cache_lock = threading.Lock()
+
+
+def estimar_tokens(texto):
+    """
+    Estima el número de tokens de un texto
+
+    Args:
+        texto (str): Texto a medir
+
+    Returns:
+        int: Número aproximado de tokens
+    """
+    return len(texto or '') // CHARS_PER_TOKEN + 1
+
+
+def dividir_en_turnos(transcripcion):
+    """
+    Divide una transcripción en turnos de hablante
+
+    Args:
+        transcripcion (str): Texto con marcas [SPEAKER_x]
+
+    Returns:
+        list: Turnos (cada uno empieza con su marca de hablante, salvo texto sin marcas)
+    """
+    return [turno.strip() for turno in _INICIO_TURNO.split(transcripcion or '') if turno.strip()]
+
+
+def _partir_turno(turno, max_chars):
+    """
+    Parte un turno que no cabe en un bloque por frases (o por palabras si hace falta)
+
+    Args:
+        turno (str): Texto del turno
+        max_chars (int): Tamaño máximo de cada parte en caracteres
+
+    Returns:
+        list: Partes del turno
+    """
+    partes = []
+    actual = ''
+
+    for frase in _FIN_FRASE.split(turno):
+        # Frase más larga que el bloque: cortar por palabras
+        while len(frase) > max_chars:
+            corte = frase.rfind(' ', 0, max_chars)
+            corte = corte if corte > 0 else max_chars
+            if actual:
+                partes.append(actual)
+                actual = ''
+            partes.append(frase[:corte])
+            frase = frase[corte:].lstrip()
+
+        if actual and len(actual) + len(frase) + 1 > max_chars:
+            partes.append(actual)
+            actual = frase
+        else:
+            actual = f"{actual} {frase}" if actual else frase
+
+    if actual:
+        partes.append(actual)
+
+    return partes
+
+
+def dividir_en_bloques(transcripcion, max_tokens=CHUNK_TOKEN_BUDGET):
+    """
+    Agrupa los turnos de hablante en bloques que no superan el presupuesto de tokens
+    Los turnos nunca se cortan, salvo que uno solo supere el presupuesto
+
+    Args:
+        transcripcion (str): Texto con marcas [SPEAKER_x]
+        max_tokens (int): Tokens máximos por bloque
+
+    Returns:
+        list: Bloques de texto
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    bloques = []
+    actual = []
+    tamano = 0
+
+    for turno in dividir_en_turnos(transcripcion):
+        piezas = [turno] if len(turno) <= max_chars else _partir_turno(turno, max_chars)
+
+        for pieza in piezas:
+            if actual and tamano + len(pieza) + 2 > max_chars:
+                bloques.append("\n\n".join(actual))
+                actual = []
+                tamano = 0
+            actual.append(pieza)
+            tamano += len(pieza) + 2
+
+    if actual:
+        bloques.append("\n\n".join(actual))
+
+    return bloques
+
+
+def _clave_bloque(clave_modelo, bloque):
+    """Clave de caché de un bloque para un modelo concreto"""
+    contenido = f"{_MAP_PROMPT_VERSION}:{clave_modelo}:{bloque}"
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+
+def _obtener_de_cache(clave):
+    """Obtiene un resumen de bloque de la caché (LRU)"""
+    with _cache_lock:
+        resumen = _chunk_cache.get(clave)
+        if resumen is None:
+            _cache_stats['misses'] += 1
+        else:
+            _chunk_cache.move_to_end(clave)
+            _cache_stats['hits'] += 1
+        return resumen
+
+
+def _guardar_en_cache(clave, resumen):
+    """Guarda un resumen de bloque desalojando los menos usados"""
+    with _cache_lock:
+        _chunk_cache[clave] = resumen
+        _chunk_cache.move_to_end(clave)
+        while len(_chunk_cache) > CHUNK_CACHE_SIZE:
+            _chunk_cache.popitem(last=False)
+
+
+def resumir_bloques(bloques, generar, clave_modelo, max_paralelo=MAX_PARALLEL_REQUESTS):
+    """
+    Fase map: resume cada bloque, reutilizando los que ya están en caché
+
+    Args:
+        bloques (list): Bloques de texto
+        generar (callable): generar(prompt) -> str; debe lanzar excepción si falla
+        clave_modelo (str): Identifica proveedor y modelo (forma parte de la clave de caché)
+        max_paralelo (int): Llamadas simultáneas como máximo
+
+    Returns:
+        list: Resumen de cada bloque, en el mismo orden
+    """
+    total = len(bloques)
+    claves = [_clave_bloque(clave_modelo, bloque) for bloque in bloques]
+    resumenes = [_obtener_de_cache(clave) for clave in claves]
+    pendientes = [i for i, resumen in enumerate(resumenes) if resumen is None]
+
+    if not pendientes:
+        return resumenes
+
+    def _resumir(i):
+        prompt = _MAP_PROMPT.format(indice=i + 1, total=total, bloque=bloques[i])
+        resumen = generar(prompt).strip()
+        _guardar_en_cache(claves[i], resumen)
+        return resumen
+
+    logger.info(f"Resumiendo {len(pendientes)} de {total} bloques ({total - len(pendientes)} en caché)")
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_paralelo, len(pendientes)))) as executor:
+        for i, resumen in zip(pendientes, executor.map(_resumir, pendientes)):
+            resumenes[i] = resumen
+
+    return resumenes
+
+
+def condensar_transcripcion(transcripcion, generar, clave_modelo, max_tokens=CONTEXT_TOKEN_BUDGET):
+    """
+    Devuelve un contexto que cabe en max_tokens: la transcripción tal cual si ya
+    cabe, o las notas combinadas de sus bloques (reducidas por niveles si hace falta)
+
+    Args:
+        transcripcion (str): Texto con marcas [SPEAKER_x]
+        generar (callable): generar(prompt) -> str; debe lanzar excepción si falla
+        clave_modelo (str): Identifica proveedor y modelo
+        max_tokens (int): Presupuesto de tokens del contexto
+
+    Returns:
+        str: Transcripción o notas condensadas
+    """
+    texto = transcripcion or ''
+
+    for nivel in range(MAX_REDUCE_LEVELS):
+        if estimar_tokens(texto) <= max_tokens:
+            return texto
+
+        bloques = dividir_en_bloques(texto, min(CHUNK_TOKEN_BUDGET, max_tokens))
+        resumenes = resumir_bloques(bloques, generar, clave_modelo)
+        total = len(resumenes)
+
+        texto = "\n\n".join(
+            f"[PART {i + 1}/{total}]\n{resumen}" for i, resumen in enumerate(resumenes)
+        )
+        logger.info(f"Nivel {nivel + 1} de reducción: {total} bloques, ~{estimar_tokens(texto)} tokens")
+
+    if estimar_tokens(texto) > max_tokens:
+        logger.warning("Las notas siguen superando el presupuesto de contexto, se recortan")
+        texto = texto[:max_tokens * CHARS_PER_TOKEN]
+
+    return texto
+
+
+def get_chunk_cache_stats():
+    """
+    Obtiene los contadores de la caché de resúmenes de bloque
+
+    Returns:
+        dict: Entradas, aciertos y fallos
+    """
+    with _cache_lock:
+        return {
+            'entries': len(_chunk_cache),
+            'hits': _cache_stats['hits'],
+            'misses': _cache_stats['misses']
+        }
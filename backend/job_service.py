@@ -0,0 +1,301 @@
+"""
+Servicio de trabajos asíncronos de procesamiento
+Mantiene un pool de workers que ejecutan las transcripciones fuera de los
+threads HTTP de Flask y un registro en memoria con el estado de cada trabajo
+"""
+
+import os
+import uuid
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Estados posibles de un trabajo
+JOB_QUEUED = 'queued'
+JOB_PROCESSING = 'processing'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+
+# Valor que una tarea puede devolver para indicar que el trabajo se completará
+# más tarde desde fuera del worker (ver complete_job / fail_job)
+DEFERRED = object()
+
+# Número de workers (configurable por variable de entorno)
+MAX_WORKERS = int(os.environ.get('TRANSCRIPTION_WORKERS', 4))
+
+# Tiempo que se conservan los trabajos terminados (segundos)
+JOB_TTL_SECONDS = int(os.environ.get('JOB_TTL_SECONDS', 3600))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# Registro de trabajos: job_id -> dict
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def _get_executor():
+    """
+    Obtiene el pool de workers, creándolo la primera vez que se usa
+
+    Returns:
+        ThreadPoolExecutor: Pool de workers compartido
+    """
+    global _executor
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=MAX_WORKERS,
+                    thread_name_prefix='job-worker'
+                )
+                logger.info(f"Pool de trabajos iniciado con {MAX_WORKERS} workers")
+
+    return _executor
+
+
+def _purgar_trabajos_expirados():
+    """
+    Elimina del registro los trabajos terminados hace más de JOB_TTL_SECONDS
+    """
+    limite = time.time() - JOB_TTL_SECONDS
+
+    with _jobs_lock:
+        expirados = [
+            job_id for job_id, job in _jobs.items()
+            if job['status'] in (JOB_COMPLETED, JOB_FAILED)
+            and job['finished_at'] and job['finished_at'] < limite
+        ]
+        for job_id in expirados:
+            del _jobs[job_id]
+
+    if expirados:
+        logger.info(f"{len(expirados)} trabajos expirados eliminados")
+
+
+def _ejecutar_trabajo(job_id, task, kwargs):
+    """
+    Ejecuta la tarea de un trabajo dentro de un worker y registra el resultado
+
+    Args:
+        job_id (str): ID del trabajo
+        task (callable): Función a ejecutar, recibe job_id como primer argumento
+        kwargs (dict): Argumentos adicionales para la tarea
+    """
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return
+        job['status'] = JOB_PROCESSING
+        job['started_at'] = time.time()
+
+    try:
+        result = task(job_id, **kwargs)
+
+        if result is DEFERRED:
+            logger.info(f"Trabajo {job_id} a la espera de finalización externa")
+            return
+
+        with _jobs_lock:
+            job['status'] = JOB_COMPLETED
+            job['result'] = result
+            job['progress'] = 'completed'
+            job['finished_at'] = time.time()
+
+        logger.info(f"Trabajo {job_id} completado")
+
+    except Exception as e:
+        logger.error(f"Error en trabajo {job_id}: {str(e)}", exc_info=True)
+
+        with _jobs_lock:
+            job['status'] = JOB_FAILED
+            job['error'] = str(e)
+            job['finished_at'] = time.time()
+
+
+def enqueue_job(task, job_type='process', **kwargs):
+    """
+    Encola un trabajo para ser ejecutado por el pool de workers
+
+    Args:
+        task (callable): Función a ejecutar como task(job_id, **kwargs).
+                         Su valor de retorno se guarda como resultado del trabajo.
+                         Si lanza una excepción el trabajo queda como fallido.
+        job_type (str): Tipo de trabajo (informativo)
+        **kwargs: Argumentos para la tarea
+
+    Returns:
+        str: ID del trabajo encolado
+    """
+    _purgar_trabajos_expirados()
+
+    job_id = uuid.uuid4().hex
+
+    with _jobs_lock:
+        _jobs[job_id] = {
+            'id': job_id,
+            'type': job_type,
+            'status': JOB_QUEUED,
+            'progress': 'queued',
+            'result': None,
+            'error': None,
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None
+        }
+
+    _get_executor().submit(_ejecutar_trabajo, job_id, task, kwargs)
+    logger.info(f"Trabajo {job_id} encolado (tipo: {job_type})")
+
+    return job_id
+
+
+def submit_to_pool(func, *args, **kwargs):
+    """
+    Ejecuta una función en el pool de workers compartido
+
+    Args:
+        func (callable): Función a ejecutar
+        *args, **kwargs: Argumentos de la función
+
+    Returns:
+        Future: Future de la ejecución
+    """
+    return _get_executor().submit(func, *args, **kwargs)
+
+
+def complete_job(job_id, result):
+    """
+    Marca como completado un trabajo cuya tarea devolvió DEFERRED.
+    Un trabajo ya terminado no se modifica (p. ej. una notificación tardía
+    de un trabajo que el polling ya finalizó)
+
+    Args:
+        job_id (str): ID del trabajo
+        result: Resultado del trabajo
+
+    Returns:
+        bool: True si el trabajo existía y seguía en curso
+    """
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return False
+        if job['status'] in (JOB_COMPLETED, JOB_FAILED):
+            logger.warning(f"Trabajo {job_id} ya terminado ({job['status']}), no se completa de nuevo")
+            return False
+        job['status'] = JOB_COMPLETED
+        job['result'] = result
+        job['progress'] = 'completed'
+        job['finished_at'] = time.time()
+
+    logger.info(f"Trabajo {job_id} completado")
+    return True
+
+
+def fail_job(job_id, error):
+    """
+    Marca como fallido un trabajo cuya tarea devolvió DEFERRED.
+    Un trabajo ya terminado no se modifica
+
+    Args:
+        job_id (str): ID del trabajo
+        error (str): Mensaje de error
+
+    Returns:
+        bool: True si el trabajo existía y seguía en curso
+    """
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return False
+        if job['status'] in (JOB_COMPLETED, JOB_FAILED):
+            logger.warning(f"Trabajo {job_id} ya terminado ({job['status']}), se ignora el error: {error}")
+            return False
+        job['status'] = JOB_FAILED
+        job['error'] = str(error)
+        job['finished_at'] = time.time()
+
+    logger.error(f"Trabajo {job_id} fallido: {error}")
+    return True
+
+
+def update_job_progress(job_id, progress):
+    """
+    Actualiza la etapa de progreso de un trabajo en curso
+
+    Args:
+        job_id (str): ID del trabajo
+        progress (str): Descripción de la etapa actual ('transcribing', 'parsing', etc.)
+    """
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is not None:
+            job['progress'] = progress
+
+
+def get_job(job_id):
+    """
+    Obtiene una copia del estado de un trabajo
+
+    Args:
+        job_id (str): ID del trabajo
+
+    Returns:
+        dict: Estado del trabajo o None si no existe
+    """
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        return dict(job) if job else None
+
+
+def get_job_status(job_id):
+    """
+    Obtiene el estado público de un trabajo (sin el resultado)
+
+    Args:
+        job_id (str): ID del trabajo
+
+    Returns:
+        dict: Estado del trabajo o None si no existe
+    """
+    job = get_job(job_id)
+
+    if job is None:
+        return None
+
+    return {
+        'job_id': job['id'],
+        'type': job['type'],
+        'status': job['status'],
+        'progress': job['progress'],
+        'error': job['error'],
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at']
+    }
+
+
+def get_queue_stats():
+    """
+    Obtiene estadísticas del registro de trabajos
+
+    Returns:
+        dict: Número de trabajos por estado y número de workers
+    """
+    with _jobs_lock:
+        stats = {
+            JOB_QUEUED: 0,
+            JOB_PROCESSING: 0,
+            JOB_COMPLETED: 0,
+            JOB_FAILED: 0
+        }
+        for job in _jobs.values():
+            stats[job['status']] += 1
+
+    stats['workers'] = MAX_WORKERS
+    return stats
@@ -0,0 +1,171 @@
+"""
+Lector incremental del formato json-v2 de Speechmatics
+Recorre el JSON a medida que llegan los fragmentos (por ejemplo, el cuerpo de
+una respuesta HTTP) y entrega cada elemento de 'results' por separado, de modo
+que nunca se carga la transcripción completa en memoria
+"""
+
+import json
+import codecs
+import logging
+
+logger = logging.getLogger(__name__)
+
+_decoder = json.JSONDecoder()
+_ESPACIOS = ' \t\n\r'
+
+
+class _LectorFragmentos:
+    """
+    Buffer sobre un iterador de fragmentos de texto o bytes
+    Solo conserva lo que aún no se ha consumido
+    """
+
+    def __init__(self, fragmentos):
+        self._fragmentos = iter(fragmentos)
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.buf = ''
+        self.pos = 0
+        self.terminado = False
+
+    def cargar(self):
+        """
+        Agrega el siguiente fragmento al buffer descartando lo ya consumido
+
+        Returns:
+            bool: False si no quedan fragmentos
+        """
+        if self.terminado:
+            return False
+
+        fragmento = next(self._fragmentos, None)
+
+        if fragmento is None:
+            self.terminado = True
+            fragmento = self._utf8.decode(b'', final=True)
+        elif isinstance(fragmento, (bytes, bytearray)):
+            fragmento = self._utf8.decode(fragmento)
+
+        self.buf = self.buf[self.pos:] + fragmento
+        self.pos = 0
+        return True
+
+    def saltar_espacios(self):
+        """Avanza sobre espacios en blanco, cargando fragmentos si hace falta"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _ESPACIOS:
+                self.pos += 1
+            if self.pos < len(self.buf) or not self.cargar():
+                return
+
+    def siguiente_caracter(self):
+        """
+        Consume el siguiente carácter que no sea espacio
+
+        Returns:
+            str: Carácter consumido o None si terminó la entrada
+        """
+        self.saltar_espacios()
+        if self.pos >= len(self.buf):
+            return None
+        caracter = self.buf[self.pos]
+        self.pos += 1
+        return caracter
+
+    def ver_caracter(self):
+        """
+        Obtiene el siguiente carácter que no sea espacio sin consumirlo
+
+        Returns:
+            str: Carácter o None si terminó la entrada
+        """
+        self.saltar_espacios()
+        return self.buf[self.pos] if self.pos < len(self.buf) else None
+
+    def esperar(self, esperado):
+        """Consume un carácter concreto o lanza ValueError"""
+        caracter = self.siguiente_caracter()
+        if caracter != esperado:
+            raise ValueError(f"JSON inválido: se esperaba '{esperado}' y se encontró {caracter!r}")
+
+    def valor(self):
+        """
+        Decodifica un valor JSON completo, cargando fragmentos hasta que esté entero
+
+        Returns:
+            Valor decodificado
+        """
+        while True:
+            self.saltar_espacios()
+            try:
+                valor, fin = _decoder.raw_decode(self.buf, self.pos)
+                # Un número al final del buffer puede estar cortado ("12" de "123")
+                if fin == len(self.buf) and not self.terminado and self.buf[self.pos] not in '{["':
+                    raise json.JSONDecodeError('valor posiblemente incompleto', self.buf, fin)
+                self.pos = fin
+                return valor
+            except json.JSONDecodeError:
+                if not self.cargar():
+                    raise
+
+
+def iterar_json_v2(fragmentos, on_result):
+    """
+    Recorre un documento json-v2 llamando a on_result con cada elemento de 'results'
+
+    Args:
+        fragmentos (iterable): Fragmentos del documento (str o bytes)
+        on_result (callable): Función llamada con cada item de 'results' (dict)
+
+    Returns:
+        dict: El resto de claves del documento (metadata, job, summary, ...),
+              sin 'results'
+    """
+    lector = _LectorFragmentos(fragmentos)
+    documento = {}
+
+    lector.esperar('{')
+    if lector.ver_caracter() == '}':
+        lector.siguiente_caracter()
+        return documento
+
+    while True:
+        clave = lector.valor()
+        lector.esperar(':')
+
+        if clave == 'results':
+            lector.esperar('[')
+            if lector.ver_caracter() == ']':
+                lector.siguiente_caracter()
+            else:
+                while True:
+                    on_result(lector.valor())
+                    separador = lector.siguiente_caracter()
+                    if separador == ']':
+                        break
+                    if separador != ',':
+                        raise ValueError(f"JSON inválido en 'results': {separador!r}")
+        else:
+            documento[clave] = lector.valor()
+
+        separador = lector.siguiente_caracter()
+        if separador == '}':
+            return documento
+        if separador != ',':
+            raise ValueError(f"JSON inválido: {separador!r}")
+
+
+def leer_archivo_en_fragmentos(ruta, tamano=64 * 1024):
+    """
+    Genera los fragmentos de un archivo de texto
+
+    Args:
+        ruta (str): Ruta al archivo
+        tamano (int): Tamaño de cada fragmento en bytes
+
+    Yields:
+        bytes: Fragmentos del archivo
+    """
+    with open(ruta, 'rb') as f:
+        for fragmento in iter(lambda: f.read(tamano), b''):
+            yield fragmento
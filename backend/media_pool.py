@@ -0,0 +1,440 @@
+"""
+Pool de procesos para el trabajo multimedia pesado
+Ejecuta la extracción y conversión de audio de los videos, la inspección de
+archivos y la mezcla de las grabaciones del sistema en procesos worker
+separados, para que no compitan por el GIL con los threads HTTP de Flask.
+Cada worker es un intérprete nuevo (este mismo archivo ejecutado como script)
+que recibe las tareas por una tubería: no hereda el estado de la aplicación
+y se puede matar, con los ffmpeg que haya lanzado, si una tarea supera su
+tiempo máximo o se cancela; el pool lo reemplaza por uno nuevo.
+La cola de espera es limitada: si está llena las tareas se rechazan con
+queue.Full en lugar de acumularse.
+
+Con MEDIA_POOL_WORKERS=0 las tareas se ejecutan en el thread que las envía.
+"""
+
+import os
+import sys
+import uuid
+import time
+import queue
+import pickle
+import signal
+import atexit
+import logging
+import importlib
+import threading
+import subprocess
+from concurrent.futures import Future, CancelledError
+
+logger = logging.getLogger(__name__)
+
+# Procesos worker (0 = ejecutar las tareas en el thread que las envía)
+MEDIA_POOL_WORKERS = int(os.environ.get('MEDIA_POOL_WORKERS', min(4, os.cpu_count() or 1)))
+
+# Tareas que pueden esperar a un worker libre; por encima se rechazan (0 = sin límite)
+MEDIA_POOL_MAX_QUEUE = int(os.environ.get('MEDIA_POOL_MAX_QUEUE', 16))
+
+# Tiempo máximo de ejecución de una tarea (segundos)
+MEDIA_POOL_TASK_TIMEOUT = int(os.environ.get('MEDIA_POOL_TASK_TIMEOUT', 1800))
+
+# Tareas disponibles: nombre -> (módulo, función). Se importan en el worker.
+TAREAS = {
+    'extraer_audio': ('video_service', 'extraer_audio_de_video'),
+    'inspeccionar': ('media_probe', 'inspeccionar_medio'),
+    'guardar_grabacion': ('audio_mixing', 'guardar_grabacion')
+}
+
+_TIEMPOS_RECIENTES = 100
+
+_lock = threading.Lock()
+_cola = None
+_activas = {}
+_workers = {}
+_tiempos = {'wait': [], 'run': []}
+_stats = {
+    'submitted': 0,
+    'completed': 0,
+    'failed': 0,
+    'timeouts': 0,
+    'cancelled': 0,
+    'rejected': 0,
+    'worker_restarts': 0
+}
+
+
+class _Tarea:
+    """Tarea enviada al pool y su estado"""
+
+    def __init__(self, nombre, args, kwargs, timeout):
+        self.id = uuid.uuid4().hex
+        self.nombre = nombre
+        self.args = args
+        self.kwargs = kwargs
+        self.timeout = timeout
+        self.future = Future()
+        self.future.task_id = self.id
+        self.creada = time.monotonic()
+        self.inicio = None
+        self.proceso = None
+        self.motivo = None
+
+
+# ==================== WORKERS ====================
+
+def _iniciar_worker():
+    """Lanza un proceso worker en su propio grupo de procesos"""
+    return subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__)],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        start_new_session=True
+    )
+
+
+def _matar_worker(proceso):
+    """Mata un worker y los procesos que haya lanzado (ffmpeg)"""
+    try:
+        if hasattr(os, 'killpg'):
+            os.killpg(proceso.pid, signal.SIGKILL)
+        else:
+            proceso.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _cerrar_worker(proceso):
+    """Cierra las tuberías de un worker terminado y recoge su estado"""
+    for tuberia in (proceso.stdin, proceso.stdout):
+        try:
+            tuberia.close()
+        except OSError:
+            pass
+    try:
+        proceso.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        _matar_worker(proceso)
+
+
+def _registrar_tiempo(tipo, segundos):
+    """Guarda un tiempo de espera o de ejecución en la ventana de tiempos recientes"""
+    tiempos = _tiempos[tipo]
+    tiempos.append(segundos)
+    if len(tiempos) > _TIEMPOS_RECIENTES:
+        del tiempos[0]
+
+
+def _vencer(tarea, motivo):
+    """Interrumpe una tarea en ejecución matando su worker"""
+    with _lock:
+        if tarea.proceso is None or tarea.future.done():
+            return
+        tarea.motivo = motivo
+        proceso = tarea.proceso
+
+    logger.warning(f"Tarea {tarea.nombre} ({tarea.id}) interrumpida: {motivo}")
+    _matar_worker(proceso)
+
+
+def _ejecutar_en_worker(tarea, proceso):
+    """
+    Envía una tarea a un worker y espera su resultado
+
+    Returns:
+        bool: True si el worker sigue utilizable
+    """
+    temporizador = threading.Timer(tarea.timeout, _vencer, (tarea, 'timeout'))
+    temporizador.daemon = True
+    temporizador.start()
+
+    try:
+        pickle.dump((tarea.nombre, tarea.args, tarea.kwargs), proceso.stdin, protocol=pickle.HIGHEST_PROTOCOL)
+        proceso.stdin.flush()
+        estado, valor = pickle.load(proceso.stdout)
+
+    except (EOFError, OSError, pickle.UnpicklingError):
+        # El worker murió: se mató por tiempo o cancelación, o se cayó
+        if tarea.motivo == 'timeout':
+            tarea.future.set_exception(TimeoutError(f"La tarea {tarea.nombre} superó {tarea.timeout}s"))
+        elif tarea.motivo == 'cancelled':
+            tarea.future.set_exception(CancelledError())
+        else:
+            tarea.future.set_exception(RuntimeError(f"El worker terminó inesperadamente ({tarea.nombre})"))
+        return False
+
+    finally:
+        temporizador.cancel()
+
+    if estado == 'ok':
+        tarea.future.set_result(valor)
+    else:
+        tarea.future.set_exception(RuntimeError(valor))
+    return True
+
+
+def _atender(slot):
+    """Thread que alimenta a un worker con las tareas de la cola"""
+    proceso = None
+
+    while True:
+        if proceso is None:
+            proceso = _iniciar_worker()
+            with _lock:
+                _workers[slot] = {'pid': proceso.pid, 'task': None}
+
+        tarea = _cola.get()
+
+        if not tarea.future.set_running_or_notify_cancel():
+            # Cancelada mientras esperaba
+            with _lock:
+                _activas.pop(tarea.id, None)
+            continue
+
+        if proceso.poll() is not None:
+            # El worker murió mientras esperaba tareas
+            _cerrar_worker(proceso)
+            proceso = _iniciar_worker()
+            with _lock:
+                _workers[slot] = {'pid': proceso.pid, 'task': None}
+                _stats['worker_restarts'] += 1
+
+        with _lock:
+            tarea.inicio = time.monotonic()
+            tarea.proceso = proceso
+            _workers[slot]['task'] = tarea.id
+            _registrar_tiempo('wait', tarea.inicio - tarea.creada)
+
+        try:
+            sigue_vivo = _ejecutar_en_worker(tarea, proceso)
+        except Exception as e:
+            # Argumentos que no se pueden enviar: el worker puede haber quedado a medias
+            logger.error(f"Error al enviar la tarea {tarea.nombre}: {e}")
+            tarea.future.set_exception(e)
+            sigue_vivo = False
+
+        if not sigue_vivo:
+            _matar_worker(proceso)
+            _cerrar_worker(proceso)
+            proceso = None
+
+        with _lock:
+            _activas.pop(tarea.id, None)
+            _workers[slot]['task'] = None
+            _registrar_tiempo('run', time.monotonic() - tarea.inicio)
+            if tarea.motivo == 'timeout':
+                _stats['timeouts'] += 1
+            elif tarea.motivo == 'cancelled':
+                _stats['cancelled'] += 1
+            elif tarea.future.exception() is not None:
+                _stats['failed'] += 1
+            else:
+                _stats['completed'] += 1
+            if proceso is None:
+                _stats['worker_restarts'] += 1
+
+
+def start_media_pool():
+    """Inicia los workers (al arrancar la aplicación o con la primera tarea)"""
+    global _cola
+
+    if MEDIA_POOL_WORKERS <= 0:
+        return
+
+    with _lock:
+        if _cola is not None:
+            return
+        _cola = queue.Queue(maxsize=MEDIA_POOL_MAX_QUEUE)
+
+    for slot in range(MEDIA_POOL_WORKERS):
+        threading.Thread(target=_atender, args=(slot,), name=f'media-worker-{slot}', daemon=True).start()
+
+    logger.info(f"Pool de medios iniciado con {MEDIA_POOL_WORKERS} workers")
+
+
+@atexit.register
+def _detener_workers():
+    """Mata los workers al salir la aplicación"""
+    with _lock:
+        pids = [w['pid'] for w in _workers.values()]
+    for pid in pids:
+        try:
+            if hasattr(os, 'killpg'):
+                os.killpg(pid, signal.SIGKILL)
+            else:
+                os.kill(pid, signal.SIGTERM)
+        except OSError:
+            pass
+
+
+def _funcion(nombre):
+    """Función registrada para una tarea"""
+    modulo, funcion = TAREAS[nombre]
+    return getattr(importlib.import_module(modulo), funcion)
+
+
+# ==================== API ====================
+
+def submit_media_task(nombre, *args, timeout=None, **kwargs):
+    """
+    Encola una tarea en el pool
+
+    Args:
+        nombre (str): Tarea registrada en TAREAS
+        *args, **kwargs: Argumentos de la función (se envían por pickle)
+        timeout (int): Tiempo máximo de ejecución (por defecto MEDIA_POOL_TASK_TIMEOUT)
+
+    Returns:
+        Future: Resultado de la tarea (future.task_id identifica la tarea).
+                result() lanza TimeoutError si superó su tiempo, CancelledError
+                si se canceló y RuntimeError si falló en el worker
+
+    Raises:
+        queue.Full: Si la cola de espera está llena
+    """
+    if nombre not in TAREAS:
+        raise ValueError(f"Tarea desconocida: {nombre}")
+
+    tarea = _Tarea(nombre, args, kwargs, timeout or MEDIA_POOL_TASK_TIMEOUT)
+
+    if MEDIA_POOL_WORKERS <= 0:
+        tarea.future.set_running_or_notify_cancel()
+        try:
+            tarea.future.set_result(_funcion(nombre)(*args, **kwargs))
+        except Exception as e:
+            tarea.future.set_exception(e)
+        return tarea.future
+
+    start_media_pool()
+
+    with _lock:
+        try:
+            _cola.put_nowait(tarea)
+        except queue.Full:
+            _stats['rejected'] += 1
+            raise
+        _activas[tarea.id] = tarea
+        _stats['submitted'] += 1
+
+    return tarea.future
+
+
+def run_media_task(nombre, *args, timeout=None, **kwargs):
+    """
+    Ejecuta una tarea en el pool y espera su resultado (el thread que espera no retiene el GIL)
+
+    Args:
+        nombre (str): Tarea registrada en TAREAS
+        *args, **kwargs: Argumentos de la función
+        timeout (int): Tiempo máximo de ejecución (por defecto MEDIA_POOL_TASK_TIMEOUT)
+
+    Returns:
+        Valor devuelto por la función
+
+    Raises:
+        queue.Full, TimeoutError, CancelledError o RuntimeError (ver submit_media_task)
+    """
+    return submit_media_task(nombre, *args, timeout=timeout, **kwargs).result()
+
+
+def cancel_media_task(task_id):
+    """
+    Cancela una tarea: si espera en la cola no se ejecuta y si está en
+    ejecución se mata su worker
+
+    Args:
+        task_id (str): ID de la tarea (future.task_id)
+
+    Returns:
+        bool: True si la tarea existía y no había terminado
+    """
+    with _lock:
+        tarea = _activas.get(task_id)
+
+    if tarea is None or tarea.future.done():
+        return False
+
+    if tarea.future.cancel():
+        with _lock:
+            _stats['cancelled'] += 1
+        logger.info(f"Tarea {tarea.nombre} ({task_id}) cancelada antes de ejecutarse")
+        return True
+
+    _vencer(tarea, 'cancelled')
+    return True
+
+
+def get_media_pool_stats():
+    """
+    Obtiene las métricas del pool
+
+    Returns:
+        dict: Workers, tareas en cola y en ejecución, contadores y tiempos
+              de espera y ejecución recientes (segundos)
+    """
+    ahora = time.monotonic()
+
+    with _lock:
+        en_ejecucion = [
+            {
+                'task_id': t.id,
+                'task': t.nombre,
+                'running_seconds': round(ahora - t.inicio, 3),
+                'timeout': t.timeout
+            }
+            for t in _activas.values() if t.inicio is not None
+        ]
+        tiempos = {}
+        for tipo, valores in _tiempos.items():
+            tiempos[f'avg_{tipo}_seconds'] = round(sum(valores) / len(valores), 3) if valores else None
+            tiempos[f'max_{tipo}_seconds'] = round(max(valores), 3) if valores else None
+
+        return {
+            'workers': MEDIA_POOL_WORKERS,
+            'worker_pids': [w['pid'] for w in _workers.values()],
+            'busy': len(en_ejecucion),
+            'queued': _cola.qsize() if _cola is not None else 0,
+            'max_queue': MEDIA_POOL_MAX_QUEUE,
+            'task_timeout': MEDIA_POOL_TASK_TIMEOUT,
+            'running': en_ejecucion,
+            **tiempos,
+            **_stats
+        }
+
+
+# ==================== PROCESO WORKER ====================
+
+def _worker():
+    """Bucle de un proceso worker: lee tareas de stdin y escribe los resultados"""
+    # Las tareas y ffmpeg no pueden escribir en el canal de resultados
+    canal = os.fdopen(os.dup(sys.stdout.fileno()), 'wb')
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    entrada = sys.stdin.buffer
+
+    logging.basicConfig(level=logging.WARNING, format=f'[media-worker {os.getpid()}] %(levelname)s %(name)s: %(message)s')
+
+    # Importar las tareas antes de recibir la primera (mientras el worker está libre)
+    for nombre in TAREAS:
+        try:
+            _funcion(nombre)
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"Tarea {nombre} no disponible: {e}")
+
+    while True:
+        try:
+            nombre, args, kwargs = pickle.load(entrada)
+        except EOFError:
+            return 0
+
+        try:
+            respuesta = ('ok', _funcion(nombre)(*args, **kwargs))
+            datos = pickle.dumps(respuesta, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logging.getLogger(__name__).error(f"Error en la tarea {nombre}: {e}", exc_info=True)
+            datos = pickle.dumps(('error', f"{type(e).__name__}: {e}"), protocol=pickle.HIGHEST_PROTOCOL)
+
+        canal.write(datos)
+        canal.flush()
+
+
+if __name__ == '__main__':
+    sys.exit(_worker())
@@ -0,0 +1,773 @@
+"""
+Inspección de archivos multimedia
+Lee una sola vez las cabeceras del contenedor (MP4/MOV, Matroska/WebM y WAV
+con un parser propio que solo lee las cabeceras, sin decodificar ni lanzar
+procesos; el resto con ffprobe o, si no está instalado, con el ffmpeg de
+moviepy) y devuelve un MediaInfo con sus pistas, duración, códecs, frecuencia
+de muestreo y canales.
+El resultado se guarda en memoria por archivo (dispositivo, inodo, tamaño y
+fecha de modificación): la verificación del video, la extracción del audio y
+la información posterior reutilizan la misma inspección, también desde otro
+enlace duro del mismo archivo (los file_id del almacén de blobs).
+"""
+
+import os
+import json
+import shutil
+import struct
+import logging
+import threading
+import subprocess
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+
+logger = logging.getLogger(__name__)
+
+# Inspecciones guardadas en memoria
+MEDIA_PROBE_CACHE_SIZE = int(os.environ.get('MEDIA_PROBE_CACHE_SIZE', 256))
+
+# Ejecutable de ffprobe para los formatos sin parser propio (si no existe se usa ffmpeg)
+FFPROBE_BINARY = os.environ.get('FFPROBE_BINARY', 'ffprobe')
+
+# Tiempo máximo de ffprobe/ffmpeg al inspeccionar un archivo (segundos)
+MEDIA_PROBE_TIMEOUT = int(os.environ.get('MEDIA_PROBE_TIMEOUT', 30))
+
+# Tamaño máximo de las cabeceras que se leen a memoria (moov de MP4, Tracks de Matroska)
+_MAX_CABECERA = 64 * 1024 * 1024
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'parsed': 0, 'external': 0, 'errors': 0}
+
+
+@dataclass(frozen=True)
+class StreamInfo:
+    """Pista de un archivo multimedia"""
+    index: int
+    kind: str                   # 'audio', 'video' u 'other'
+    codec: str = None           # Nombre del códec al estilo de ffmpeg ('aac', 'opus', 'h264'...)
+    sample_rate: int = None
+    channels: int = None
+    width: int = None
+    height: int = None
+    fps: float = None
+    duration: float = None
+
+
+@dataclass(frozen=True)
+class MediaInfo:
+    """Resultado de inspeccionar un archivo multimedia"""
+    container: str              # 'mp4', 'mov', 'matroska', 'webm', 'wav' o el de ffprobe/ffmpeg
+    duration: float
+    streams: tuple
+    source: str                 # 'parser', 'ffprobe' o 'ffmpeg'
+
+    @property
+    def audio(self):
+        """Primera pista de audio (o None)"""
+        return next((s for s in self.streams if s.kind == 'audio'), None)
+
+    @property
+    def video(self):
+        """Primera pista de video (o None)"""
+        return next((s for s in self.streams if s.kind == 'video'), None)
+
+    @property
+    def has_audio(self):
+        return self.audio is not None
+
+    @property
+    def has_video(self):
+        return self.video is not None
+
+    def to_dict(self):
+        """Representación serializable a JSON"""
+        datos = asdict(self)
+        datos['streams'] = list(datos['streams'])
+        return datos
+
+
+# ==================== MP4 / MOV (ISO BMFF) ====================
+
+_CODECS_MP4 = {
+    'avc1': 'h264', 'avc3': 'h264', 'hvc1': 'hevc', 'hev1': 'hevc', 'av01': 'av1',
+    'vp08': 'vp8', 'vp09': 'vp9', 'mp4v': 'mpeg4', 's263': 'h263', 'jpeg': 'mjpeg',
+    'mp4a': 'aac', 'Opus': 'opus', 'fLaC': 'flac', 'alac': 'alac', 'ac-3': 'ac3',
+    'ec-3': 'eac3', '.mp3': 'mp3', 'samr': 'amr_nb', 'sawb': 'amr_wb',
+    'sowt': 'pcm_s16le', 'twos': 'pcm_s16be', 'ulaw': 'pcm_mulaw', 'alaw': 'pcm_alaw'
+}
+
+# objectTypeIndication del descriptor esds (códec real de una pista 'mp4a')
+_CODECS_ESDS = {
+    0x40: 'aac', 0x66: 'aac', 0x67: 'aac', 0x68: 'aac', 0x69: 'mp3', 0x6B: 'mp3',
+    0xA5: 'ac3', 0xA6: 'eac3', 0xA9: 'dts', 0xAD: 'opus', 0xDD: 'vorbis'
+}
+
+_CONTENEDORES_MP4 = {b'moov', b'trak', b'mdia', b'minf', b'stbl', b'mvex', b'edts', b'dinf'}
+
+
+def _cajas(datos, inicio=0, fin=None):
+    """Recorre las cajas de un bloque en memoria: (tipo, inicio del contenido, fin)"""
+    fin = len(datos) if fin is None else fin
+    pos = inicio
+
+    while pos + 8 <= fin:
+        tamano, tipo = struct.unpack_from('>I4s', datos, pos)
+        cabecera = 8
+        if tamano == 1:
+            if pos + 16 > fin:
+                return
+            tamano = struct.unpack_from('>Q', datos, pos + 8)[0]
+            cabecera = 16
+        elif tamano == 0:
+            tamano = fin - pos
+
+        if tamano < cabecera or pos + tamano > fin:
+            return
+
+        yield tipo, pos + cabecera, pos + tamano
+        pos += tamano
+
+
+def _hijo(datos, inicio, fin, tipo):
+    """Primera caja hija de un tipo: (inicio del contenido, fin) o None"""
+    for t, a, b in _cajas(datos, inicio, fin):
+        if t == tipo:
+            return a, b
+    return None
+
+
+def _tiempo_caja(datos, inicio):
+    """(timescale, duration) de una caja mvhd/mdhd/mehd con versión 0 o 1"""
+    version = datos[inicio]
+    if version == 1:
+        return struct.unpack_from('>IQ', datos, inicio + 20)
+    return struct.unpack_from('>II', datos, inicio + 12)
+
+
+def _leer_tamano_descriptor(datos, pos):
+    """Longitud de un descriptor MPEG-4 (hasta 4 bytes con bit de continuación)"""
+    tamano = 0
+    for _ in range(4):
+        byte = datos[pos]
+        pos += 1
+        tamano = (tamano << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            break
+    return tamano, pos
+
+
+def _codec_esds(datos, inicio, fin):
+    """Códec indicado en el descriptor esds de una pista 'mp4a'"""
+    pos = inicio + 4  # versión y flags
+    if pos >= fin or datos[pos] != 0x03:
+        return None
+
+    _, pos = _leer_tamano_descriptor(datos, pos + 1)
+    flags = datos[pos + 2]
+    pos += 3
+    if flags & 0x80:
+        pos += 2
+    if flags & 0x40:
+        pos += datos[pos] + 1
+    if flags & 0x20:
+        pos += 2
+
+    if pos >= fin or datos[pos] != 0x04:
+        return None
+    _, pos = _leer_tamano_descriptor(datos, pos + 1)
+    return _CODECS_ESDS.get(datos[pos])
+
+
+def _pista_mp4(datos, inicio, fin, indice):
+    """StreamInfo de una caja trak"""
+    mdia = _hijo(datos, inicio, fin, b'mdia')
+    if not mdia:
+        return None
+
+    hdlr = _hijo(datos, *mdia, b'hdlr')
+    manejador = datos[hdlr[0] + 8:hdlr[0] + 12] if hdlr else b''
+    tipo = {b'soun': 'audio', b'vide': 'video'}.get(manejador, 'other')
+
+    duracion = None
+    mdhd = _hijo(datos, *mdia, b'mdhd')
+    if mdhd:
+        escala, unidades = _tiempo_caja(datos, mdhd[0])
+        if escala and unidades and unidades != 0xFFFFFFFF:
+            duracion = unidades / escala
+
+    campos = {'index': indice, 'kind': tipo, 'duration': duracion}
+
+    stbl = None
+    minf = _hijo(datos, *mdia, b'minf')
+    if minf:
+        stbl = _hijo(datos, *minf, b'stbl')
+    stsd = _hijo(datos, *stbl, b'stsd') if stbl else None
+
+    if stsd and struct.unpack_from('>I', datos, stsd[0] + 4)[0] > 0:
+        entrada = stsd[0] + 8
+        tamano_entrada, formato = struct.unpack_from('>I4s', datos, entrada)
+        fin_entrada = min(entrada + tamano_entrada, stsd[1])
+        formato = formato.decode('latin-1')
+        campos['codec'] = _CODECS_MP4.get(formato, formato.strip().lower())
+
+        if tipo == 'audio':
+            version_qt, = struct.unpack_from('>H', datos, entrada + 16)
+            if version_qt == 2:
+                # QuickTime v2: frecuencia en float64 y canales en uint32
+                frecuencia, canales = struct.unpack_from('>dI', datos, entrada + 40)
+                hijos = entrada + 72
+            else:
+                canales, = struct.unpack_from('>H', datos, entrada + 24)
+                frecuencia = struct.unpack_from('>I', datos, entrada + 32)[0] >> 16
+                hijos = entrada + (52 if version_qt == 1 else 36)
+
+            campos['channels'] = int(canales) or None
+            campos['sample_rate'] = int(frecuencia) or None
+
+            if formato == 'mp4a':
+                esds = _hijo(datos, hijos, fin_entrada, b'esds')
+                if not esds:
+                    # QuickTime guarda el esds dentro de una caja 'wave'
+                    wave = _hijo(datos, hijos, fin_entrada, b'wave')
+                    esds = _hijo(datos, *wave, b'esds') if wave else None
+                if esds:
+                    campos['codec'] = _codec_esds(datos, *esds) or campos['codec']
+
+        elif tipo == 'video':
+            campos['width'], campos['height'] = struct.unpack_from('>HH', datos, entrada + 32)
+
+            stsz = _hijo(datos, *stbl, b'stsz')
+            if stsz and duracion:
+                muestras = struct.unpack_from('>I', datos, stsz[0] + 8)[0]
+                if muestras:
+                    campos['fps'] = round(muestras / duracion, 3)
+
+    return StreamInfo(**campos)
+
+
+def _cajas_archivo(f, tamano_archivo):
+    """Recorre las cajas de primer nivel del archivo sin leer su contenido: (tipo, inicio, fin, cabecera)"""
+    pos = 0
+
+    while pos + 8 <= tamano_archivo:
+        f.seek(pos)
+        cabecera = f.read(16)
+        if len(cabecera) < 8:
+            return
+
+        tamano, tipo = struct.unpack_from('>I4s', cabecera)
+        if tamano == 1:
+            tamano = struct.unpack_from('>Q', cabecera, 8)[0]
+            inicio = pos + 16
+        else:
+            inicio = pos + 8
+            if tamano == 0:
+                tamano = tamano_archivo - pos
+
+        if tamano < 8:
+            return
+
+        yield tipo, inicio, pos + tamano, cabecera
+        pos += tamano
+
+
+def _leer_moov(f, tamano_archivo):
+    """Busca la caja moov recorriendo las cajas de primer nivel (salta mdat sin leerla)"""
+    marca = None
+
+    for tipo, inicio, fin, cabecera in _cajas_archivo(f, tamano_archivo):
+        if tipo == b'ftyp':
+            marca = cabecera[8:12]
+        elif tipo == b'moov':
+            if fin - inicio > _MAX_CABECERA:
+                raise ValueError(f"Caja moov demasiado grande ({fin - inicio} bytes)")
+            f.seek(inicio)
+            return marca, f.read(fin - inicio)
+
+    return marca, None
+
+
+def _duracion_fragmentos(f, tamano_archivo, moov):
+    """
+    Duración de un MP4 fragmentado sin mehd (ffmpeg con empty_moov): final del
+    último fragmento (moof) de cada pista, con tfdt más la duración de sus muestras
+    """
+    escalas = {}
+    duraciones_trex = {}
+
+    for tipo, a, b in _cajas(moov):
+        if tipo == b'trak':
+            tkhd = _hijo(moov, a, b, b'tkhd')
+            mdia = _hijo(moov, a, b, b'mdia')
+            mdhd = _hijo(moov, *mdia, b'mdhd') if mdia else None
+            if tkhd and mdhd:
+                track_id = struct.unpack_from('>I', moov, tkhd[0] + (20 if moov[tkhd[0]] == 1 else 12))[0]
+                escalas[track_id] = _tiempo_caja(moov, mdhd[0])[0]
+        elif tipo == b'mvex':
+            for t, c, _ in _cajas(moov, a, b):
+                if t == b'trex':
+                    track_id, _, duracion = struct.unpack_from('>III', moov, c + 4)
+                    duraciones_trex[track_id] = duracion
+
+    ultimo = None
+    for tipo, inicio, fin, _ in _cajas_archivo(f, tamano_archivo):
+        if tipo == b'moof':
+            ultimo = (inicio, fin)
+
+    if ultimo is None or ultimo[1] - ultimo[0] > _MAX_CABECERA:
+        return None
+
+    f.seek(ultimo[0])
+    moof = f.read(ultimo[1] - ultimo[0])
+    duracion = None
+
+    for tipo, a, b in _cajas(moof):
+        if tipo != b'traf':
+            continue
+
+        tfhd = _hijo(moof, a, b, b'tfhd')
+        tfdt = _hijo(moof, a, b, b'tfdt')
+        if not tfhd or not tfdt:
+            continue
+
+        flags = int.from_bytes(moof[tfhd[0] + 1:tfhd[0] + 4], 'big')
+        track_id = struct.unpack_from('>I', moof, tfhd[0] + 4)[0]
+        pos = tfhd[0] + 8 + (8 if flags & 0x01 else 0) + (4 if flags & 0x02 else 0)
+        por_defecto = struct.unpack_from('>I', moof, pos)[0] if flags & 0x08 else duraciones_trex.get(track_id, 0)
+
+        fin_pista = struct.unpack_from('>Q' if moof[tfdt[0]] == 1 else '>I', moof, tfdt[0] + 4)[0]
+
+        for t, c, _ in _cajas(moof, a, b):
+            if t != b'trun':
+                continue
+            flags_trun = int.from_bytes(moof[c + 1:c + 4], 'big')
+            muestras = struct.unpack_from('>I', moof, c + 4)[0]
+            if not flags_trun & 0x100:
+                fin_pista += muestras * por_defecto
+                continue
+            pos = c + 8 + (4 if flags_trun & 0x01 else 0) + (4 if flags_trun & 0x04 else 0)
+            paso = 4 * bin(flags_trun & 0xF00).count('1')
+            for _ in range(muestras):
+                fin_pista += struct.unpack_from('>I', moof, pos)[0]
+                pos += paso
+
+        escala = escalas.get(track_id)
+        if escala:
+            duracion = max(duracion or 0, fin_pista / escala)
+
+    return duracion
+
+
+def _inspeccionar_mp4(f, tamano_archivo):
+    """MediaInfo de un MP4/MOV/M4A o None si no lo es"""
+    f.seek(4)
+    if f.read(4) not in (b'ftyp', b'moov', b'free', b'mdat', b'wide', b'skip'):
+        return None
+
+    marca, moov = _leer_moov(f, tamano_archivo)
+    if moov is None:
+        return None
+
+    duracion = None
+    mvhd = _hijo(moov, 0, len(moov), b'mvhd')
+    if mvhd:
+        escala, unidades = _tiempo_caja(moov, mvhd[0])
+        if escala and unidades and unidades != 0xFFFFFFFF:
+            duracion = unidades / escala
+
+    if not duracion:
+        # MP4 fragmentado: la duración total está en mvex/mehd
+        mvex = _hijo(moov, 0, len(moov), b'mvex')
+        mehd = _hijo(moov, *mvex, b'mehd') if mvex else None
+        if mehd and mvhd:
+            version = moov[mehd[0]]
+            unidades = struct.unpack_from('>Q' if version == 1 else '>I', moov, mehd[0] + 4)[0]
+            escala = _tiempo_caja(moov, mvhd[0])[0]
+            duracion = unidades / escala if escala and unidades else None
+
+    pistas = []
+    for tipo, a, b in _cajas(moov):
+        if tipo == b'trak':
+            pista = _pista_mp4(moov, a, b, len(pistas))
+            if pista:
+                pistas.append(pista)
+
+    if duracion is None:
+        duracion = max((p.duration for p in pistas if p.duration), default=None)
+
+    if duracion is None and _hijo(moov, 0, len(moov), b'mvex'):
+        duracion = _duracion_fragmentos(f, tamano_archivo, moov)
+
+    contenedor = 'mov' if marca == b'qt  ' else 'mp4'
+    return MediaInfo(container=contenedor, duration=duracion, streams=tuple(pistas), source='parser')
+
+
+# ==================== MATROSKA / WEBM (EBML) ====================
+
+_EBML = 0x1A45DFA3
+_DOCTYPE = 0x4282
+_SEGMENT = 0x18538067
+_INFO = 0x1549A966
+_TRACKS = 0x1654AE6B
+_CLUSTER = 0x1F43B675
+_TIMECODE_SCALE = 0x2AD7B1
+_DURATION = 0x4489
+_TRACK_ENTRY = 0xAE
+_TRACK_TYPE = 0x83
+_CODEC_ID = 0x86
+_DEFAULT_DURATION = 0x23E383
+_VIDEO = 0xE0
+_AUDIO = 0xE1
+_PIXEL_WIDTH = 0xB0
+_PIXEL_HEIGHT = 0xBA
+_SAMPLING_FREQUENCY = 0xB5
+_CHANNELS = 0x9F
+
+_CODECS_MATROSKA = {
+    'V_MPEG4/ISO/AVC': 'h264', 'V_MPEGH/ISO/HEVC': 'hevc', 'V_VP8': 'vp8', 'V_VP9': 'vp9',
+    'V_AV1': 'av1', 'V_MPEG4/ISO/ASP': 'mpeg4', 'V_MJPEG': 'mjpeg', 'V_THEORA': 'theora',
+    'A_OPUS': 'opus', 'A_VORBIS': 'vorbis', 'A_FLAC': 'flac', 'A_MPEG/L3': 'mp3',
+    'A_MPEG/L2': 'mp2', 'A_AC3': 'ac3', 'A_EAC3': 'eac3', 'A_DTS': 'dts', 'A_ALAC': 'alac',
+    'A_PCM/INT/LIT': 'pcm_s16le', 'A_PCM/FLOAT/IEEE': 'pcm_f32le'
+}
+
+_TAMANO_DESCONOCIDO = -1
+
+
+def _vint(datos, pos, es_id=False):
+    """Entero de longitud variable de EBML: (valor, posición siguiente)"""
+    primero = datos[pos]
+    longitud = 1
+    mascara = 0x80
+    while longitud <= 8 and not primero & mascara:
+        mascara >>= 1
+        longitud += 1
+    if longitud > 8:
+        raise ValueError("Entero EBML inválido")
+
+    valor = primero if es_id else primero & (mascara - 1)
+    for byte in datos[pos + 1:pos + longitud]:
+        valor = (valor << 8) | byte
+
+    if not es_id and valor == (1 << (7 * longitud)) - 1:
+        valor = _TAMANO_DESCONOCIDO
+    return valor, pos + longitud
+
+
+def _elementos(datos, inicio=0, fin=None):
+    """Recorre los elementos EBML de un bloque en memoria: (id, inicio, fin)"""
+    fin = len(datos) if fin is None else fin
+    pos = inicio
+
+    while pos < fin:
+        id_elemento, pos = _vint(datos, pos, es_id=True)
+        tamano, pos = _vint(datos, pos)
+        final = fin if tamano == _TAMANO_DESCONOCIDO else min(pos + tamano, fin)
+        yield id_elemento, pos, final
+        pos = final
+
+
+def _uint(datos, inicio, fin):
+    return int.from_bytes(datos[inicio:fin], 'big') if fin > inicio else 0
+
+
+def _float(datos, inicio, fin):
+    if fin - inicio == 4:
+        return struct.unpack_from('>f', datos, inicio)[0]
+    if fin - inicio == 8:
+        return struct.unpack_from('>d', datos, inicio)[0]
+    return None
+
+
+def _pista_matroska(datos, inicio, fin, indice):
+    """StreamInfo de un elemento TrackEntry"""
+    campos = {'index': indice, 'kind': 'other'}
+
+    for id_elemento, a, b in _elementos(datos, inicio, fin):
+        if id_elemento == _TRACK_TYPE:
+            campos['kind'] = {1: 'video', 2: 'audio'}.get(_uint(datos, a, b), 'other')
+        elif id_elemento == _CODEC_ID:
+            codec_id = datos[a:b].rstrip(b'\x00').decode('ascii', 'replace')
+            codec = _CODECS_MATROSKA.get(codec_id)
+            if codec is None and codec_id.startswith('A_AAC'):
+                codec = 'aac'
+            campos['codec'] = codec or codec_id.lower()
+        elif id_elemento == _DEFAULT_DURATION:
+            nanosegundos = _uint(datos, a, b)
+            if nanosegundos:
+                campos['fps'] = round(1e9 / nanosegundos, 3)
+        elif id_elemento == _VIDEO:
+            for hijo, c, d in _elementos(datos, a, b):
+                if hijo == _PIXEL_WIDTH:
+                    campos['width'] = _uint(datos, c, d)
+                elif hijo == _PIXEL_HEIGHT:
+                    campos['height'] = _uint(datos, c, d)
+        elif id_elemento == _AUDIO:
+            campos['sample_rate'] = 8000
+            campos['channels'] = 1
+            for hijo, c, d in _elementos(datos, a, b):
+                if hijo == _SAMPLING_FREQUENCY:
+                    campos['sample_rate'] = int(_float(datos, c, d) or 8000)
+                elif hijo == _CHANNELS:
+                    campos['channels'] = _uint(datos, c, d)
+
+    if campos['kind'] != 'video':
+        campos.pop('fps', None)
+    return StreamInfo(**campos)
+
+
+def _inspeccionar_matroska(f, tamano_archivo):
+    """MediaInfo de un MKV/WebM o None si no lo es"""
+    f.seek(0)
+    cabecera = f.read(64)
+    if len(cabecera) < 4 or struct.unpack_from('>I', cabecera)[0] != _EBML:
+        return None
+
+    tamano, pos = _vint(cabecera, 4)
+    contenedor = 'matroska'
+    for id_elemento, a, b in _elementos(cabecera, pos, min(pos + tamano, len(cabecera))):
+        if id_elemento == _DOCTYPE:
+            contenedor = cabecera[a:b].rstrip(b'\x00').decode('ascii', 'replace')
+    pos += tamano
+
+    # Segment: se recorren sus hijos leyendo solo Info y Tracks (se detiene en el primer Cluster)
+    f.seek(pos)
+    cabecera = f.read(16)
+    id_elemento, p = _vint(cabecera, 0, es_id=True)
+    if id_elemento != _SEGMENT:
+        return None
+    _, p = _vint(cabecera, p)
+    pos += p
+
+    escala = 1000000
+    duracion = None
+    pistas = []
+
+    while pos < tamano_archivo:
+        f.seek(pos)
+        cabecera = f.read(16)
+        if len(cabecera) < 2:
+            break
+        id_elemento, p = _vint(cabecera, 0, es_id=True)
+        tamano, p = _vint(cabecera, p)
+        inicio = pos + p
+
+        if id_elemento == _CLUSTER or tamano == _TAMANO_DESCONOCIDO:
+            break
+
+        if id_elemento in (_INFO, _TRACKS):
+            if tamano > _MAX_CABECERA:
+                raise ValueError(f"Cabecera Matroska demasiado grande ({tamano} bytes)")
+            f.seek(inicio)
+            datos = f.read(tamano)
+
+            if id_elemento == _INFO:
+                for hijo, a, b in _elementos(datos):
+                    if hijo == _TIMECODE_SCALE:
+                        escala = _uint(datos, a, b) or escala
+                    elif hijo == _DURATION:
+                        duracion = _float(datos, a, b)
+            else:
+                for hijo, a, b in _elementos(datos):
+                    if hijo == _TRACK_ENTRY:
+                        pistas.append(_pista_matroska(datos, a, b, len(pistas)))
+
+        pos = inicio + tamano
+
+    if not pistas:
+        return None
+
+    segundos = duracion * escala / 1e9 if duracion else None
+    return MediaInfo(container=contenedor, duration=segundos, streams=tuple(pistas), source='parser')
+
+
+# ==================== WAV ====================
+
+def _inspeccionar_wav(f, tamano_archivo):
+    """MediaInfo de un WAV (RIFF) o None si no lo es"""
+    f.seek(0)
+    cabecera = f.read(12)
+    if len(cabecera) < 12 or cabecera[:4] != b'RIFF' or cabecera[8:12] != b'WAVE':
+        return None
+
+    formato = None
+    datos = None
+    pos = 12
+
+    while pos + 8 <= tamano_archivo and (formato is None or datos is None):
+        f.seek(pos)
+        id_chunk, tamano = struct.unpack('<4sI', f.read(8))
+        if id_chunk == b'fmt ':
+            formato = f.read(min(tamano, 40))
+        elif id_chunk == b'data':
+            datos = min(tamano, tamano_archivo - pos - 8)
+        pos += 8 + tamano + (tamano & 1)
+
+    if formato is None or len(formato) < 16:
+        return None
+
+    codigo, canales, frecuencia, bytes_segundo, _, bits = struct.unpack_from('<HHIIHH', formato)
+    if codigo == 0xFFFE and len(formato) >= 26:
+        # WAVE_FORMAT_EXTENSIBLE: el formato real está en el subformato
+        codigo = struct.unpack_from('<H', formato, 24)[0]
+
+    if codigo == 1:
+        codec = 'pcm_u8' if bits == 8 else f"pcm_s{bits}le"
+    else:
+        codec = {3: f"pcm_f{bits}le", 6: 'pcm_alaw', 7: 'pcm_mulaw', 0x55: 'mp3'}.get(codigo, f"wav_0x{codigo:04x}")
+
+    duracion = datos / bytes_segundo if datos is not None and bytes_segundo else None
+    pista = StreamInfo(index=0, kind='audio', codec=codec, sample_rate=frecuencia,
+                       channels=canales, duration=duracion)
+    return MediaInfo(container='wav', duration=duracion, streams=(pista,), source='parser')
+
+
+_PARSERS = (_inspeccionar_mp4, _inspeccionar_matroska, _inspeccionar_wav)
+
+
+# ==================== HERRAMIENTAS EXTERNAS ====================
+
+def _numero(valor, tipo=float):
+    try:
+        return tipo(float(valor))
+    except (TypeError, ValueError):
+        return None
+
+
+def _inspeccionar_ffprobe(ruta, ejecutable):
+    """MediaInfo a partir de la salida JSON de ffprobe"""
+    resultado = subprocess.run(
+        [ejecutable, '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams', ruta],
+        capture_output=True, timeout=MEDIA_PROBE_TIMEOUT, check=True
+    )
+    datos = json.loads(resultado.stdout)
+
+    pistas = []
+    for stream in datos.get('streams', []):
+        tipo = stream.get('codec_type')
+        fps = None
+        if tipo == 'video' and stream.get('avg_frame_rate', '0/0') != '0/0':
+            numerador, denominador = stream['avg_frame_rate'].split('/')
+            fps = round(int(numerador) / int(denominador), 3) if int(denominador) else None
+
+        pistas.append(StreamInfo(
+            index=len(pistas),
+            kind=tipo if tipo in ('audio', 'video') else 'other',
+            codec=stream.get('codec_name'),
+            sample_rate=_numero(stream.get('sample_rate'), int),
+            channels=stream.get('channels'),
+            width=stream.get('width'),
+            height=stream.get('height'),
+            fps=fps,
+            duration=_numero(stream.get('duration'))
+        ))
+
+    formato = datos.get('format', {})
+    contenedor = (formato.get('format_name') or '').split(',')[0] or None
+    return MediaInfo(container=contenedor, duration=_numero(formato.get('duration')),
+                     streams=tuple(pistas), source='ffprobe')
+
+
+def _inspeccionar_ffmpeg(ruta):
+    """MediaInfo a partir de la cabecera que imprime el ffmpeg de moviepy (sin códec de audio ni canales)"""
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+    infos = ffmpeg_parse_infos(ruta, check_duration=True, decode_file=False)
+
+    pistas = []
+    for entrada in infos.get('inputs', []):
+        for stream in entrada.get('streams', []):
+            tipo = stream.get('stream_type')
+            size = stream.get('size') or (None, None)
+            pistas.append(StreamInfo(
+                index=len(pistas),
+                kind=tipo if tipo in ('audio', 'video') else 'other',
+                codec=stream.get('codec_name'),
+                sample_rate=stream.get('fps') if tipo == 'audio' else None,
+                width=size[0] if tipo == 'video' else None,
+                height=size[1] if tipo == 'video' else None,
+                fps=stream.get('fps') if tipo == 'video' else None
+            ))
+
+    return MediaInfo(container=None, duration=infos.get('duration'), streams=tuple(pistas), source='ffmpeg')
+
+
+def _inspeccionar_externo(ruta):
+    """Inspección con ffprobe si está instalado; si no, con ffmpeg"""
+    ffprobe = shutil.which(FFPROBE_BINARY)
+    if ffprobe:
+        return _inspeccionar_ffprobe(ruta, ffprobe)
+    return _inspeccionar_ffmpeg(ruta)
+
+
+# ==================== API ====================
+
+def inspeccionar_medio(ruta):
+    """
+    Inspecciona un archivo multimedia (una sola vez por contenido del archivo)
+
+    Args:
+        ruta (str): Ruta del archivo
+
+    Returns:
+        MediaInfo: Pistas, duración y códecs, o None si no se puede leer
+    """
+    try:
+        info = os.stat(ruta)
+    except OSError as e:
+        logger.error(f"No se pudo inspeccionar {ruta}: {e}")
+        return None
+
+    clave = (info.st_dev, info.st_ino, info.st_size, info.st_mtime_ns)
+
+    with _lock:
+        resultado = _cache.get(clave)
+        if resultado is not None:
+            _cache.move_to_end(clave)
+            _stats['hits'] += 1
+            return resultado
+        _stats['misses'] += 1
+
+    resultado = None
+    try:
+        with open(ruta, 'rb') as f:
+            for parser in _PARSERS:
+                try:
+                    resultado = parser(f, info.st_size)
+                except (ValueError, IndexError, struct.error) as e:
+                    logger.debug(f"Cabecera no reconocida por {parser.__name__} en {ruta}: {e}")
+                    resultado = None
+                if resultado is not None:
+                    break
+
+        if resultado is None:
+            resultado = _inspeccionar_externo(ruta)
+            origen = 'external'
+        else:
+            origen = 'parsed'
+
+    except Exception as e:
+        with _lock:
+            _stats['errors'] += 1
+        logger.debug(f"No se pudo inspeccionar {ruta}: {e}")
+        return None
+
+    with _lock:
+        _stats[origen] += 1
+        _cache[clave] = resultado
+        while len(_cache) > MEDIA_PROBE_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+    return resultado
+
+
+def get_media_probe_stats():
+    """
+    Obtiene las estadísticas de las inspecciones
+
+    Returns:
+        dict: Entradas en memoria, aciertos y origen de las inspecciones
+    """
+    with _lock:
+        return {'entries': len(_cache), 'max_entries': MEDIA_PROBE_CACHE_SIZE, **_stats}
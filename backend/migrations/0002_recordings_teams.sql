@@ -0,0 +1,63 @@
+-- Equipos, grabaciones, transcripciones y resúmenes con los índices de las
+-- consultas de recording_service, team_service, permission_service y access_cache
+
+CREATE TABLE IF NOT EXISTS teams (
+    id BIGSERIAL PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    supervisor_id BIGINT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    description TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Equipos de un supervisor (access_cache, get_teams_by_supervisor)
+CREATE INDEX IF NOT EXISTS idx_teams_supervisor_id ON teams(supervisor_id);
+
+CREATE TABLE IF NOT EXISTS team_members (
+    id BIGSERIAL PRIMARY KEY,
+    team_id BIGINT NOT NULL REFERENCES teams(id) ON DELETE CASCADE,
+    user_id BIGINT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    joined_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Miembros de un equipo y pertenencia (team_id, user_id)
+CREATE INDEX IF NOT EXISTS idx_team_members_team_user ON team_members(team_id, user_id);
+-- Equipos de un usuario (get_user_teams, is_user_in_team)
+CREATE INDEX IF NOT EXISTS idx_team_members_user_team ON team_members(user_id, team_id);
+
+CREATE TABLE IF NOT EXISTS recordings (
+    id BIGSERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    filename VARCHAR(255) NOT NULL,
+    original_filename VARCHAR(255),
+    file_path TEXT,
+    file_size BIGINT,
+    duration DOUBLE PRECISION,
+    mimetype VARCHAR(100),
+    status VARCHAR(50) DEFAULT 'uploaded',
+    upload_date TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Listados paginados por cursor (upload_date, id)
+CREATE INDEX IF NOT EXISTS idx_recordings_upload_date_id ON recordings(upload_date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_recordings_user_upload_date_id ON recordings(user_id, upload_date DESC, id DESC);
+
+CREATE TABLE IF NOT EXISTS transcriptions (
+    id BIGSERIAL PRIMARY KEY,
+    recording_id BIGINT NOT NULL REFERENCES recordings(id) ON DELETE CASCADE,
+    transcription_text TEXT,
+    dialogues JSONB DEFAULT '[]'::jsonb,
+    language VARCHAR(20),
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_transcriptions_recording_id ON transcriptions(recording_id);
+
+CREATE TABLE IF NOT EXISTS summaries (
+    id BIGSERIAL PRIMARY KEY,
+    recording_id BIGINT NOT NULL REFERENCES recordings(id) ON DELETE CASCADE,
+    summary TEXT,
+    keywords TEXT[],
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_summaries_recording_id ON summaries(recording_id);
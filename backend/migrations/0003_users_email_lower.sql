@@ -0,0 +1,3 @@
+-- authenticate_user busca por LOWER(email); el índice sobre email no sirve para esa expresión
+
+CREATE INDEX IF NOT EXISTS idx_users_email_lower ON users(LOWER(email));
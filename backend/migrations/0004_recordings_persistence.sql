@@ -0,0 +1,9 @@
+-- Persistencia en segundo plano de los resultados de /api/process
+-- content_key: SHA-256 del audio + configuración de transcripción (misma clave que la caché en disco)
+-- persist_id: identificador de la escritura, para que los reintentos no dupliquen filas
+
+ALTER TABLE recordings ADD COLUMN IF NOT EXISTS content_key VARCHAR(64);
+ALTER TABLE recordings ADD COLUMN IF NOT EXISTS persist_id UUID;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_recordings_persist_id ON recordings(persist_id);
+CREATE INDEX IF NOT EXISTS idx_recordings_user_content_key ON recordings(user_id, content_key);
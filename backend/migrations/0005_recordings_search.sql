@@ -0,0 +1,81 @@
+-- Búsqueda de texto completo sobre transcripciones y resúmenes (search_service)
+-- recordings.search_vector reúne el resumen (peso A) y la transcripción (peso B)
+-- con la configuración de texto del idioma de la transcripción; los triggers de
+-- transcriptions y summaries lo mantienen actualizado
+
+ALTER TABLE recordings ADD COLUMN IF NOT EXISTS search_vector TSVECTOR;
+
+-- Configuración de texto de PostgreSQL para un código de idioma ('es', 'en-US', ...)
+CREATE OR REPLACE FUNCTION recording_search_config(idioma TEXT) RETURNS regconfig
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT CASE lower(split_part(coalesce(idioma, ''), '-', 1))
+        WHEN 'es' THEN 'spanish'::regconfig
+        WHEN 'en' THEN 'english'::regconfig
+        WHEN 'pt' THEN 'portuguese'::regconfig
+        WHEN 'fr' THEN 'french'::regconfig
+        WHEN 'de' THEN 'german'::regconfig
+        WHEN 'it' THEN 'italian'::regconfig
+        ELSE 'simple'::regconfig
+    END
+$$;
+
+-- Documento de búsqueda de una grabación
+CREATE OR REPLACE FUNCTION recording_search_document(p_recording_id BIGINT) RETURNS tsvector
+LANGUAGE plpgsql STABLE AS $$
+DECLARE
+    config regconfig;
+    transcripcion TEXT;
+    resumen TEXT;
+BEGIN
+    SELECT recording_search_config(max(t.language)), string_agg(t.transcription_text, ' ' ORDER BY t.id)
+    INTO config, transcripcion
+    FROM transcriptions t
+    WHERE t.recording_id = p_recording_id;
+
+    SELECT string_agg(s.summary, ' ' ORDER BY s.id)
+    INTO resumen
+    FROM summaries s
+    WHERE s.recording_id = p_recording_id;
+
+    IF transcripcion IS NULL AND resumen IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    RETURN setweight(to_tsvector(config, coalesce(resumen, '')), 'A')
+        || setweight(to_tsvector(config, coalesce(transcripcion, '')), 'B');
+END
+$$;
+
+CREATE OR REPLACE FUNCTION recordings_search_refresh() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        UPDATE recordings SET search_vector = recording_search_document(id) WHERE id = OLD.recording_id;
+    END IF;
+
+    IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND NEW.recording_id <> OLD.recording_id) THEN
+        UPDATE recordings SET search_vector = recording_search_document(id) WHERE id = NEW.recording_id;
+    END IF;
+
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS trg_transcriptions_search ON transcriptions;
+CREATE TRIGGER trg_transcriptions_search
+    AFTER INSERT OR DELETE OR UPDATE OF transcription_text, language, recording_id ON transcriptions
+    FOR EACH ROW EXECUTE FUNCTION recordings_search_refresh();
+
+DROP TRIGGER IF EXISTS trg_summaries_search ON summaries;
+CREATE TRIGGER trg_summaries_search
+    AFTER INSERT OR DELETE OR UPDATE OF summary, recording_id ON summaries
+    FOR EACH ROW EXECUTE FUNCTION recordings_search_refresh();
+
+-- Grabaciones guardadas antes de esta migración
+UPDATE recordings r
+SET search_vector = recording_search_document(r.id)
+WHERE r.search_vector IS NULL
+AND (EXISTS (SELECT 1 FROM transcriptions t WHERE t.recording_id = r.id)
+     OR EXISTS (SELECT 1 FROM summaries s WHERE s.recording_id = r.id));
+
+CREATE INDEX IF NOT EXISTS idx_recordings_search_vector ON recordings USING GIN (search_vector);
@@ -0,0 +1,17 @@
+-- recordings.upload_date obligatoria: la paginación por cursor compara
+-- (upload_date, id) y encode_cursor necesita una fecha. Las tablas creadas antes
+-- de 0002 (CREATE TABLE IF NOT EXISTS no las modifica) pueden tener filas sin
+-- fecha; se les asigna la de su primera transcripción o resumen y, si no tienen,
+-- la más antigua de la tabla, para que queden al final de los listados
+
+UPDATE recordings r
+SET upload_date = COALESCE(
+    (SELECT min(t.created_at) FROM transcriptions t WHERE t.recording_id = r.id),
+    (SELECT min(s.created_at) FROM summaries s WHERE s.recording_id = r.id),
+    (SELECT min(o.upload_date) FROM recordings o WHERE o.upload_date IS NOT NULL),
+    NOW()
+)
+WHERE r.upload_date IS NULL;
+
+ALTER TABLE recordings ALTER COLUMN upload_date SET DEFAULT NOW();
+ALTER TABLE recordings ALTER COLUMN upload_date SET NOT NULL;
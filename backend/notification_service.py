@@ -0,0 +1,279 @@
+"""
+Servicio de finalización de transcripciones por notificación
+Recibe las notificaciones (webhooks) de Speechmatics, las asocia a los trabajos
+pendientes y ejecuta el procesamiento de la transcripción. Si la notificación
+no llega, un único thread consulta el estado con backoff adaptativo.
+Documentación: https://docs.speechmatics.com/speech-to-text/batch/notifications
+"""
+
+import os
+import hmac
+import time
+import logging
+import threading
+
+from transcription_service import (consultar_estado_trabajo, descargar_resultado_en_stream,
+                                   procesar_transcripcion_en_stream)
+from transcription_cache import guardar_transcripcion_cache_en_stream
+from job_service import submit_to_pool, complete_job, fail_job, update_job_progress
+
+logger = logging.getLogger(__name__)
+
+# URL pública a la que Speechmatics enviará las notificaciones (si no está, se usa polling)
+NOTIFICATION_URL = os.environ.get('SPEECHMATICS_NOTIFICATION_URL')
+
+# Secreto compartido que Speechmatics envía en la cabecera Authorization
+# (obligatorio: sin él las notificaciones se rechazan y se usa polling)
+NOTIFICATION_SECRET = os.environ.get('SPEECHMATICS_NOTIFICATION_SECRET')
+
+# Backoff del polling de respaldo (segundos)
+POLL_INITIAL_DELAY = float(os.environ.get('SPEECHMATICS_POLL_INITIAL_DELAY', 60))
+POLL_MAX_DELAY = float(os.environ.get('SPEECHMATICS_POLL_MAX_DELAY', 600))
+POLL_BACKOFF_FACTOR = 2.0
+
+# Tiempo máximo de espera de un trabajo sin notificación ni resultado (segundos);
+# pasado este tiempo el trabajo local se marca como fallido
+POLL_MAX_WAIT = float(os.environ.get('SPEECHMATICS_POLL_MAX_WAIT', 6 * 3600))
+
+# Tiempo que se guardan notificaciones que llegan antes de registrar el trabajo
+EARLY_NOTIFICATION_TTL = 300
+
+# Estados de Speechmatics que indican fallo definitivo
+_ESTADOS_FALLIDOS = {'rejected', 'deleted', 'expired'}
+
+# Trabajos pendientes: speechmatics_job_id -> dict
+_pending = {}
+# Notificaciones recibidas antes del registro: speechmatics_job_id -> (timestamp, status)
+_early_notifications = {}
+_lock = threading.Lock()
+
+_poller_thread = None
+_poller_wakeup = threading.Event()
+
+
+def is_notification_enabled():
+    """
+    Indica si las notificaciones de Speechmatics están configuradas
+
+    Returns:
+        bool: True si hay URL de notificación y secreto configurados
+    """
+    return bool(NOTIFICATION_URL and NOTIFICATION_SECRET)
+
+
+def get_notification_auth_header():
+    """
+    Obtiene la cabecera de autenticación que Speechmatics debe enviar en la notificación
+
+    Returns:
+        str: Cabecera 'Authorization: Bearer ...' o None si no hay secreto configurado
+    """
+    if not NOTIFICATION_SECRET:
+        return None
+    return f"Authorization: Bearer {NOTIFICATION_SECRET}"
+
+
+def verify_notification_auth(authorization):
+    """
+    Verifica la cabecera Authorization de una notificación entrante
+
+    Args:
+        authorization (str): Valor de la cabecera Authorization recibida
+
+    Returns:
+        bool: True si es válida (siempre False si no hay secreto configurado)
+    """
+    if not NOTIFICATION_SECRET:
+        return False
+    return hmac.compare_digest(authorization or '', f"Bearer {NOTIFICATION_SECRET}")
+
+
+def register_pending_transcription(speechmatics_job_id, job_id, api_key, on_complete, clave_cache=None):
+    """
+    Registra un trabajo de Speechmatics a la espera de su notificación
+
+    Args:
+        speechmatics_job_id (str): ID del trabajo en Speechmatics
+        job_id (str): ID del trabajo local (job_service)
+        api_key (str): API key de Speechmatics (para el polling de respaldo)
+        on_complete (callable): Función on_complete(transcript, texto, dialogos) que
+                                devuelve el resultado final del trabajo local
+        clave_cache (str): Clave para guardar el resultado en la caché (opcional)
+    """
+    now = time.time()
+
+    with _lock:
+        _pending[speechmatics_job_id] = {
+            'job_id': job_id,
+            'api_key': api_key,
+            'on_complete': on_complete,
+            'clave_cache': clave_cache,
+            'registered_at': now,
+            'poll_delay': POLL_INITIAL_DELAY,
+            'next_poll_at': now + POLL_INITIAL_DELAY,
+            'polls': 0
+        }
+        early = _early_notifications.pop(speechmatics_job_id, None)
+
+    update_job_progress(job_id, 'transcribing')
+    logger.info(f"Trabajo Speechmatics {speechmatics_job_id} registrado para el trabajo {job_id}")
+
+    # La notificación llegó antes de que termináramos de registrar el trabajo
+    if early is not None:
+        _, status = early
+        handle_notification(speechmatics_job_id, status)
+
+    _ensure_poller()
+
+
+def handle_notification(speechmatics_job_id, status):
+    """
+    Procesa una notificación de finalización de Speechmatics. La transcripción
+    se descarga siempre de Speechmatics, nunca se toma del cuerpo de la notificación
+
+    Args:
+        speechmatics_job_id (str): ID del trabajo en Speechmatics (parámetro 'id')
+        status (str): Estado notificado (parámetro 'status', 'success' si terminó bien)
+
+    Returns:
+        bool: True si la notificación corresponde a un trabajo pendiente
+    """
+    with _lock:
+        pending = _pending.pop(speechmatics_job_id, None)
+
+        if pending is None:
+            _purgar_notificaciones_antiguas()
+            _early_notifications[speechmatics_job_id] = (time.time(), status)
+
+    if pending is None:
+        logger.warning(f"Notificación para trabajo desconocido {speechmatics_job_id} (status={status})")
+        return False
+
+    if status != 'success':
+        fail_job(pending['job_id'], f"Transcription failed ({status})")
+        return True
+
+    submit_to_pool(_finalizar_trabajo, speechmatics_job_id, pending)
+    return True
+
+
+def get_pending_count():
+    """
+    Obtiene el número de trabajos a la espera de notificación
+
+    Returns:
+        int: Número de trabajos pendientes
+    """
+    with _lock:
+        return len(_pending)
+
+
+def _purgar_notificaciones_antiguas():
+    """
+    Elimina notificaciones tempranas que nunca se asociaron a un trabajo
+    (debe llamarse con _lock adquirido)
+    """
+    limite = time.time() - EARLY_NOTIFICATION_TTL
+    for sm_id in [k for k, v in _early_notifications.items() if v[0] < limite]:
+        del _early_notifications[sm_id]
+
+
+def _finalizar_trabajo(speechmatics_job_id, pending):
+    """
+    Descarga la transcripción de un trabajo terminado y la procesa en stream,
+    sin cargar el JSON completo en memoria
+    
+    Args:
+        speechmatics_job_id (str): ID del trabajo en Speechmatics
+        pending (dict): Entrada del registro de pendientes
+    """
+    job_id = pending['job_id']
+    clave_cache = pending.get('clave_cache')
+    
+    try:
+        update_job_progress(job_id, 'parsing')
+        
+        fragmentos = descargar_resultado_en_stream(speechmatics_job_id, pending['api_key'])
+        if clave_cache:
+            fragmentos = guardar_transcripcion_cache_en_stream(clave_cache, fragmentos)
+        
+        procesado = procesar_transcripcion_en_stream(fragmentos)
+        # El lector se detiene en la '}' final; consumir el resto del cuerpo
+        # para que la copia en caché se publique
+        for _ in fragmentos:
+            pass
+        # Solo metadata y resumen: las palabras ya están en texto y diálogos
+        transcript = procesado['resultado']
+        
+        result = pending['on_complete'](transcript, procesado['texto'], procesado['dialogos'])
+        complete_job(job_id, result)
+    
+    except Exception as e:
+        logger.error(f"Error al finalizar trabajo {job_id}: {str(e)}", exc_info=True)
+        fail_job(job_id, str(e))
+
+
+def _ensure_poller():
+    """
+    Inicia el thread de polling de respaldo si no está corriendo
+    """
+    global _poller_thread
+
+    with _lock:
+        if _poller_thread is None or not _poller_thread.is_alive():
+            _poller_thread = threading.Thread(
+                target=_poller_loop,
+                name='speechmatics-poller',
+                daemon=True
+            )
+            _poller_thread.start()
+
+    _poller_wakeup.set()
+
+
+def _poller_loop():
+    """
+    Consulta el estado de los trabajos cuya notificación no ha llegado,
+    duplicando el intervalo entre consultas hasta POLL_MAX_DELAY. Los que
+    siguen sin resultado tras POLL_MAX_WAIT se dan por fallidos
+    """
+    while True:
+        _poller_wakeup.clear()
+        now = time.time()
+
+        with _lock:
+            vencidos = [
+                (sm_id, pending) for sm_id, pending in _pending.items()
+                if pending['next_poll_at'] <= now
+            ]
+
+        for sm_id, pending in vencidos:
+            status = consultar_estado_trabajo(sm_id, pending['api_key'])
+            pending['polls'] += 1
+
+            if status == 'done':
+                logger.info(f"Trabajo {sm_id} terminado sin notificación, recuperado por polling")
+                handle_notification(sm_id, 'success')
+            elif status in _ESTADOS_FALLIDOS:
+                handle_notification(sm_id, status)
+            elif time.time() - pending['registered_at'] >= POLL_MAX_WAIT:
+                # Sigue en curso o la consulta falla (status None) desde hace demasiado
+                with _lock:
+                    expirado = _pending.pop(sm_id, None) is not None
+                if expirado:
+                    logger.error(f"Trabajo {sm_id} sin resultado tras {POLL_MAX_WAIT:.0f}s (último estado: {status})")
+                    fail_job(pending['job_id'], f"Transcription timed out after {POLL_MAX_WAIT:.0f}s")
+            else:
+                with _lock:
+                    if sm_id in _pending:
+                        pending['poll_delay'] = min(pending['poll_delay'] * POLL_BACKOFF_FACTOR, POLL_MAX_DELAY)
+                        # La última consulta se hace al cumplirse POLL_MAX_WAIT
+                        pending['next_poll_at'] = min(time.time() + pending['poll_delay'],
+                                                      pending['registered_at'] + POLL_MAX_WAIT)
+
+        with _lock:
+            proximo = min((p['next_poll_at'] for p in _pending.values()), default=None)
+
+        # Dormir hasta la próxima consulta o hasta que se registre un trabajo nuevo
+        timeout = None if proximo is None else max(proximo - time.time(), 0.1)
+        _poller_wakeup.wait(timeout)
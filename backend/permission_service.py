@@ -4,8 +4,9 @@ Roles: 0=Admin, 1=Supervisor, 2=Usuario General
 """
 
 import logging
-from database import execute_query
+from database import execute_query, register_prepared_statement, execute_prepared
 from team_service import get_team_ids_by_supervisor, is_user_in_team
+from access_cache import get_supervised_user_ids
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +15,21 @@ ROLE_ADMIN = 0
 ROLE_SUPERVISOR = 1
 ROLE_USER = 2
 
+# Consultas de las verificaciones de acceso (sentencias preparadas en el servidor)
+_RECORDING_OWNER = register_prepared_statement(
+    'permission_recording_owner',
+    "SELECT user_id FROM recordings WHERE id = %s"
+)
+_USER_IN_SUPERVISOR_TEAMS = register_prepared_statement('permission_user_in_supervisor_teams', """
+    SELECT EXISTS(
+        SELECT 1
+        FROM team_members tm
+        JOIN teams t ON tm.team_id = t.id
+        WHERE t.supervisor_id = %s
+        AND tm.user_id = %s
+    ) as is_in_team
+""")
+
 # ==================== VERIFICACIÓN DE ROLES ====================
 
 def is_admin(user_role):
@@ -66,8 +82,7 @@ def can_access_recording(user_id, user_role, recording_id):
             return True
         
         # Obtener la grabación
-        query = "SELECT user_id FROM recordings WHERE id = %s"
-        recording = execute_query(query, (recording_id,), fetch_one=True)
+        recording = execute_prepared(_RECORDING_OWNER, (recording_id,), fetch_one=True)
         
         if not recording:
             return False
@@ -285,16 +300,12 @@ def is_user_in_supervisor_teams(supervisor_id, user_id):
         bool: True si el usuario está en algún equipo del supervisor
     """
     try:
-        query = """
-            SELECT EXISTS(
-                SELECT 1
-                FROM team_members tm
-                JOIN teams t ON tm.team_id = t.id
-                WHERE t.supervisor_id = %s
-                AND tm.user_id = %s
-            ) as is_in_team
-        """
-        result = execute_query(query, (supervisor_id, user_id), fetch_one=True)
+        # Miembros de los equipos del supervisor en caché (O(1) por verificación)
+        supervised = get_supervised_user_ids(supervisor_id)
+        if supervised is not None:
+            return user_id in supervised
+        
+        result = execute_prepared(_USER_IN_SUPERVISOR_TEAMS, (supervisor_id, user_id), fetch_one=True)
         return result['is_in_team'] if result else False
         
     except Exception as e:
@@ -322,18 +333,11 @@ def get_accessible_recording_ids(user_id, user_role):
         
         # Supervisor: sus grabaciones + grabaciones de sus equipos
         if is_supervisor(user_role):
-            query = """
-                SELECT DISTINCT r.id
-                FROM recordings r
-                WHERE r.user_id = %s
-                OR r.user_id IN (
-                    SELECT tm.user_id
-                    FROM team_members tm
-                    JOIN teams t ON tm.team_id = t.id
-                    WHERE t.supervisor_id = %s
-                )
-            """
-            results = execute_query(query, (user_id, user_id), fetch_all=True)
+            supervised = get_supervised_user_ids(user_id)
+            if supervised is None:
+                return []
+            query = "SELECT id FROM recordings WHERE user_id = ANY(%s)"
+            results = execute_query(query, (list(supervised | {user_id}),), fetch_all=True)
             return [r['id'] for r in results] if results else []
         
         # Usuario general: solo sus grabaciones
@@ -349,6 +353,8 @@ def get_accessible_recording_ids(user_id, user_role):
 def filter_accessible_recordings(user_id, user_role, recording_ids):
     """
     Filtra una lista de IDs de grabaciones dejando solo las accesibles
+    El filtrado se hace en una sola consulta con = ANY(%s), sin cargar
+    todas las grabaciones accesibles del usuario
     
     Args:
         user_id (int): ID del usuario
@@ -356,13 +362,34 @@ def filter_accessible_recordings(user_id, user_role, recording_ids):
         recording_ids (list): Lista de IDs a filtrar
         
     Returns:
-        list: Lista filtrada de IDs accesibles
+        list: Lista filtrada de IDs accesibles (en el orden recibido)
     """
     if not recording_ids:
         return []
     
-    accessible_ids = get_accessible_recording_ids(user_id, user_role)
-    return [rid for rid in recording_ids if rid in accessible_ids]
+    try:
+        ids = list(dict.fromkeys(recording_ids))
+        
+        if is_admin(user_role):
+            query = "SELECT id FROM recordings WHERE id = ANY(%s)"
+            params = (ids,)
+        else:
+            owners = {user_id}
+            if is_supervisor(user_role):
+                supervised = get_supervised_user_ids(user_id)
+                if supervised is None:
+                    return []
+                owners |= supervised
+            query = "SELECT id FROM recordings WHERE id = ANY(%s) AND user_id = ANY(%s)"
+            params = (ids, list(owners))
+        
+        results = execute_query(query, params, fetch_all=True)
+        accessible_ids = {r['id'] for r in results} if results else set()
+        return [rid for rid in recording_ids if rid in accessible_ids]
+        
+    except Exception as e:
+        logger.error(f"Error al filtrar grabaciones accesibles: {e}")
+        return []
 
 
 def get_user_permissions_summary(user_role):
@@ -0,0 +1,435 @@
+"""
+Persistencia en segundo plano (write-behind) de transcripciones y resúmenes
+/api/process responde sin esperar a la base de datos: cada resultado se guarda
+primero en una cola en disco y un thread lo escribe después en recordings,
+transcriptions y summaries, agrupando varios resultados en una sola transacción.
+Si la base de datos no responde, los resultados siguen en disco y se reintentan
+con espera exponencial (también después de reiniciar el servidor).
+"""
+
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from collections import deque
+import psycopg2
+from psycopg2.extras import Json
+from database import execute_query, execute_values, transaction
+from vector_index import queue_recording
+from blob_store import liberar_archivo
+
+logger = logging.getLogger(__name__)
+
+# Directorio de la cola persistente (configurable por variable de entorno)
+QUEUE_DIR = os.environ.get(
+    'PERSIST_QUEUE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'persist_queue')
+)
+
+# Resultados que se escriben como máximo en una transacción
+BATCH_SIZE = int(os.environ.get('PERSIST_BATCH_SIZE', 50))
+
+# Tiempo que se espera a que lleguen más resultados antes de escribir (segundos)
+BATCH_WAIT_SECONDS = float(os.environ.get('PERSIST_BATCH_WAIT', 0.5))
+
+# Espera máxima entre reintentos cuando la base de datos falla (segundos)
+RETRY_MAX_DELAY = float(os.environ.get('PERSIST_RETRY_MAX_DELAY', 300))
+
+# Errores de conexión: se reintenta el lote completo más tarde
+_ERRORES_TRANSITORIOS = (psycopg2.OperationalError, psycopg2.InterfaceError, RuntimeError)
+
+# Errores de esquema (UndefinedTable, UndefinedColumn...): faltan migraciones, los
+# resultados siguen en la cola hasta que se apliquen
+_ERRORES_ESQUEMA = (psycopg2.ProgrammingError,)
+
+_pendientes = deque()
+# (user_id, content_key) -> persist_id de los resultados aún no escritos
+_por_contenido = {}
+_cond = threading.Condition()
+_writer_thread = None
+
+_stats = {
+    'queued': 0,
+    'written': 0,
+    'batches': 0,
+    'retries': 0,
+    'failed': 0,
+    'last_error': None
+}
+
+
+# ==================== COLA EN DISCO ====================
+
+def _ruta(persist_id, sufijo='.json'):
+    """Ruta del archivo de la cola para un resultado"""
+    return os.path.join(QUEUE_DIR, f"{persist_id}{sufijo}")
+
+
+def _guardar_en_cola(registro):
+    """Escribe un resultado en la cola en disco de forma atómica"""
+    os.makedirs(QUEUE_DIR, exist_ok=True)
+    ruta = _ruta(registro['persist_id'])
+    temporal = f"{ruta}.tmp"
+
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(registro, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(temporal, ruta)
+
+
+def _leer_de_cola(persist_id):
+    """
+    Lee un resultado de la cola en disco
+
+    Returns:
+        dict: Resultado o None si no existe o está dañado (se aparta como .failed)
+    """
+    ruta = _ruta(persist_id)
+
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.error(f"Resultado {persist_id} dañado en la cola, se aparta: {e}")
+        _apartar(persist_id)
+        return None
+
+
+def _quitar_de_cola(persist_id):
+    """Elimina un resultado ya escrito de la cola en disco"""
+    try:
+        os.remove(_ruta(persist_id))
+    except FileNotFoundError:
+        pass
+
+
+def _apartar(persist_id, file_path=None):
+    """
+    Renombra un resultado que no se puede escribir para revisarlo a mano y libera
+    el archivo subido que conservaba para la grabación
+    """
+    try:
+        os.replace(_ruta(persist_id), _ruta(persist_id, '.failed'))
+    except OSError:
+        pass
+
+    if file_path:
+        liberar_archivo(file_path)
+
+    with _cond:
+        _stats['failed'] += 1
+
+
+def _recuperar_cola():
+    """Vuelve a encolar los resultados que quedaron en disco (por ejemplo, tras un reinicio)"""
+    if not os.path.isdir(QUEUE_DIR):
+        return
+
+    archivos = [a for a in os.listdir(QUEUE_DIR) if a.endswith('.json')]
+    archivos.sort(key=lambda a: os.path.getmtime(os.path.join(QUEUE_DIR, a)))
+
+    with _cond:
+        for archivo in archivos:
+            persist_id = archivo[:-len('.json')]
+            if persist_id not in _pendientes:
+                _pendientes.append(persist_id)
+        _cond.notify()
+
+    if archivos:
+        logger.info(f"{len(archivos)} resultados pendientes recuperados de la cola de persistencia")
+
+
+# ==================== ESCRITURA ====================
+
+def _escribir_lote(registros):
+    """
+    Escribe varios resultados en una sola transacción
+    Los persist_id ya escritos (reintento tras un commit cuya respuesta se perdió)
+    se ignoran gracias al índice único sobre recordings.persist_id
+    """
+    with transaction() as cursor:
+        filas = execute_values(
+            """
+            INSERT INTO recordings
+            (user_id, filename, original_filename, file_path, file_size,
+             duration, mimetype, status, content_key, persist_id)
+            VALUES %s
+            ON CONFLICT (persist_id) DO NOTHING
+            RETURNING id, persist_id
+            """,
+            [
+                (r['user_id'], r['filename'], r['original_filename'], r['file_path'], r['file_size'],
+                 r['duration'], r['mimetype'], 'completed', r['content_key'], r['persist_id'])
+                for r in registros
+            ],
+            cursor=cursor,
+            template="(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s::uuid)",
+            fetch=True
+        )
+
+        ids = {str(fila['persist_id']): fila['id'] for fila in filas}
+        nuevos = [r for r in registros if r['persist_id'] in ids]
+
+        execute_values(
+            "INSERT INTO transcriptions (recording_id, transcription_text, dialogues, language) VALUES %s",
+            [
+                (ids[r['persist_id']], r['transcription_text'], Json(r['dialogues'] or []), r['language'])
+                for r in nuevos
+            ],
+            cursor=cursor
+        )
+
+        execute_values(
+            "INSERT INTO summaries (recording_id, summary, keywords) VALUES %s",
+            [
+                (ids[r['persist_id']], r['summary'], r['keywords'])
+                for r in nuevos if r['summary'] is not None
+            ],
+            cursor=cursor
+        )
+
+    return ids
+
+
+def _procesar_lote(persist_ids):
+    """
+    Escribe un lote; si falla por un dato inválido lo escribe uno a uno para
+    apartar solo los resultados problemáticos
+
+    Returns:
+        bool: False si la base de datos no está disponible (reintentar el lote)
+    """
+    registros = [r for r in (_leer_de_cola(p) for p in persist_ids) if r is not None]
+
+    if not registros:
+        return True
+
+    try:
+        ids = _escribir_lote(registros)
+        escritos = registros
+
+    except _ERRORES_TRANSITORIOS as e:
+        with _cond:
+            _stats['last_error'] = str(e)
+        logger.warning(f"Base de datos no disponible para persistir {len(registros)} resultados: {e}")
+        return False
+
+    except _ERRORES_ESQUEMA as e:
+        with _cond:
+            _stats['last_error'] = str(e)
+        logger.error(f"El esquema no admite los resultados pendientes (python schema_migrations.py upgrade): {e}")
+        return False
+
+    except psycopg2.Error as e:
+        with _cond:
+            _stats['last_error'] = str(e)
+
+        if len(registros) > 1:
+            # Escribir uno a uno: cada llamada escribe o aparta su resultado
+            for registro in registros:
+                if not _procesar_lote([registro['persist_id']]):
+                    return False
+            return True
+
+        logger.error(f"Resultado {registros[0]['persist_id']} rechazado por la base de datos: {e}")
+        _apartar(registros[0]['persist_id'], registros[0].get('file_path'))
+        escritos = []
+        ids = {}
+
+    for registro in escritos:
+        _quitar_de_cola(registro['persist_id'])
+
+        # Los ya escritos en un intento anterior no vuelven en ids (ON CONFLICT)
+        if registro['persist_id'] in ids:
+            queue_recording(ids[registro['persist_id']], registro['user_id'], registro['dialogues'])
+
+    with _cond:
+        for registro in registros:
+            clave = (registro['user_id'], registro['content_key'])
+            if _por_contenido.get(clave) == registro['persist_id']:
+                del _por_contenido[clave]
+        _stats['written'] += len(escritos)
+        _stats['batches'] += 1
+
+    return True
+
+
+def _writer_loop():
+    """Thread que vacía la cola en lotes y reintenta con espera exponencial"""
+    _recuperar_cola()
+    espera = 1.0
+
+    while True:
+        with _cond:
+            while not _pendientes:
+                _cond.wait()
+
+            # Dar tiempo a que lleguen más resultados para escribirlos juntos
+            limite = time.monotonic() + BATCH_WAIT_SECONDS
+            while len(_pendientes) < BATCH_SIZE and time.monotonic() < limite:
+                _cond.wait(limite - time.monotonic())
+
+            lote = [_pendientes.popleft() for _ in range(min(BATCH_SIZE, len(_pendientes)))]
+
+        try:
+            correcto = _procesar_lote(lote)
+        except Exception as e:
+            logger.error(f"Error inesperado al persistir resultados: {e}", exc_info=True)
+            correcto = False
+
+        if correcto:
+            espera = 1.0
+            continue
+
+        # Devolver el lote al principio de la cola y esperar antes de reintentar
+        with _cond:
+            _pendientes.extendleft(reversed(lote))
+            _stats['retries'] += 1
+
+        time.sleep(espera)
+        espera = min(espera * 2, RETRY_MAX_DELAY)
+
+
+def _asegurar_writer():
+    """Inicia el thread de escritura si no está en marcha"""
+    global _writer_thread
+
+    with _cond:
+        if _writer_thread is None or not _writer_thread.is_alive():
+            _writer_thread = threading.Thread(
+                target=_writer_loop,
+                name='persistence-writer',
+                daemon=True
+            )
+            _writer_thread.start()
+
+
+# ==================== API ====================
+
+def persist_recording(user_id, filename, file_path, file_size, content_key, language,
+                      transcription_text, dialogues, summary=None, keywords=None,
+                      original_filename=None, duration=None, mimetype=None):
+    """
+    Encola una grabación con su transcripción y resumen para guardarla en la
+    base de datos en segundo plano. Retorna en cuanto el resultado está en disco
+
+    Args:
+        user_id (int): ID del usuario dueño de la grabación
+        filename (str): Nombre del archivo subido (file_id)
+        file_path (str): Ruta del archivo subido
+        file_size (int): Tamaño en bytes
+        content_key (str): Clave del contenido (clave_cache_transcripcion)
+        language (str): Idioma de la transcripción
+        transcription_text (str): Texto de la transcripción
+        dialogues (list): Diálogos por hablante
+        summary (str): Resumen (opcional)
+        keywords (list): Palabras clave del resumen (opcional)
+        original_filename (str): Nombre original del archivo (opcional)
+        duration (float): Duración en segundos (opcional)
+        mimetype (str): Tipo MIME (opcional)
+
+    Returns:
+        str: persist_id del resultado encolado o None si no se pudo encolar
+    """
+    registro = {
+        'persist_id': str(uuid.uuid4()),
+        'user_id': user_id,
+        'filename': filename,
+        'original_filename': original_filename or filename,
+        'file_path': file_path,
+        'file_size': file_size,
+        'duration': duration,
+        'mimetype': mimetype,
+        'content_key': content_key,
+        'language': language,
+        'transcription_text': transcription_text,
+        'dialogues': dialogues or [],
+        'summary': summary,
+        'keywords': keywords,
+        'queued_at': time.time()
+    }
+
+    try:
+        _guardar_en_cola(registro)
+    except OSError as e:
+        logger.error(f"No se pudo encolar el resultado para persistir: {e}")
+        return None
+
+    with _cond:
+        _pendientes.append(registro['persist_id'])
+        if content_key:
+            _por_contenido[(user_id, content_key)] = registro['persist_id']
+        _stats['queued'] += 1
+        _cond.notify()
+
+    _asegurar_writer()
+    return registro['persist_id']
+
+
+def find_persisted_transcription(user_id, content_key):
+    """
+    Busca una transcripción ya guardada del mismo audio y configuración para
+    un usuario (en la base de datos o todavía en la cola de escritura)
+
+    Args:
+        user_id (int): ID del usuario
+        content_key (str): Clave del contenido (clave_cache_transcripcion)
+
+    Returns:
+        dict: {'recording_id', 'transcription_text', 'dialogues', 'language',
+               'summary', 'keywords'} o None si no existe
+    """
+    if not user_id or not content_key:
+        return None
+
+    with _cond:
+        persist_id = _por_contenido.get((user_id, content_key))
+
+    if persist_id:
+        registro = _leer_de_cola(persist_id)
+        if registro:
+            return {
+                'recording_id': None,
+                'transcription_text': registro['transcription_text'],
+                'dialogues': registro['dialogues'],
+                'language': registro['language'],
+                'summary': registro['summary'],
+                'keywords': registro['keywords']
+            }
+
+    query = """
+        SELECT r.id AS recording_id, t.transcription_text, t.dialogues, t.language,
+               s.summary, s.keywords
+        FROM recordings r
+        JOIN transcriptions t ON t.recording_id = r.id
+        LEFT JOIN summaries s ON s.recording_id = r.id
+        WHERE r.user_id = %s AND r.content_key = %s
+        ORDER BY r.upload_date DESC, r.id DESC
+        LIMIT 1
+    """
+    result = execute_query(query, (user_id, content_key), fetch_one=True)
+    return dict(result) if result else None
+
+
+def get_persistence_stats():
+    """
+    Obtiene el estado de la cola de persistencia
+
+    Returns:
+        dict: Pendientes, encolados, escritos, lotes, reintentos, apartados y último error
+    """
+    with _cond:
+        stats = dict(_stats)
+        stats['pending'] = len(_pendientes)
+    return stats
+
+
+def start_persistence():
+    """Inicia el thread de escritura (recupera los resultados pendientes en disco)"""
+    _asegurar_writer()
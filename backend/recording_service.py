@@ -2,12 +2,31 @@
 Servicio para operaciones CRUD de grabaciones (recordings)
 """
 
-import os
+import base64
 import logging
-from database import execute_query
+from datetime import datetime
+from psycopg2.extras import Json
+from database import execute_query, transaction
+from access_cache import get_supervised_user_ids
+from vector_index import queue_recording, remove_recording
+from blob_store import liberar_archivo
 
 logger = logging.getLogger(__name__)
 
+# Tamaño de página por defecto y máximo de la paginación por cursor
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Indicadores de contenido con EXISTS (sin JOIN ni DISTINCT sobre las filas)
+_CONTENT_FLAGS = """EXISTS (SELECT 1 FROM transcriptions t WHERE t.recording_id = r.id) AS has_transcription,
+                   EXISTS (SELECT 1 FROM summaries s WHERE s.recording_id = r.id) AS has_summary"""
+
+_ORDER = "ORDER BY r.upload_date DESC, r.id DESC"
+
+# Columnas de recordings que se devuelven (search_vector solo se usa para buscar)
+_COLUMNS = """r.id, r.user_id, r.filename, r.original_filename, r.file_path, r.file_size,
+               r.duration, r.mimetype, r.status, r.upload_date"""
+
 # ==================== CREATE ====================
 
 def create_recording(user_id, filename, original_filename, file_path, 
@@ -53,8 +72,109 @@ def create_recording(user_id, filename, original_filename, file_path,
         return None
 
 
+def save_recording_with_content(user_id, filename, original_filename, file_path, file_size,
+                                transcription_text, dialogues=None, language=None,
+                                summary=None, keywords=None, duration=None, mimetype=None,
+                                status='completed'):
+    """
+    Guarda una grabación junto con su transcripción y su resumen en una sola
+    transacción: o se guardan las tres filas o ninguna
+    
+    Args:
+        user_id (int): ID del usuario que subió el archivo
+        filename (str): Nombre único generado (UUID)
+        original_filename (str): Nombre original del archivo
+        file_path (str): Ruta completa del archivo
+        file_size (int): Tamaño en bytes
+        transcription_text (str): Texto de la transcripción
+        dialogues (list): Diálogos por hablante (opcional)
+        language (str): Idioma de la transcripción (opcional)
+        summary (str): Resumen (opcional; si no se indica no se crea la fila)
+        keywords (list): Palabras clave del resumen (opcional)
+        duration (float): Duración en segundos (opcional)
+        mimetype (str): Tipo MIME del archivo (opcional)
+        status (str): Estado de la grabación
+        
+    Returns:
+        int: ID de la grabación creada o None si falla
+    """
+    try:
+        with transaction() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO recordings 
+                (user_id, filename, original_filename, file_path, file_size, 
+                 duration, mimetype, status)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                RETURNING id
+                """,
+                (user_id, filename, original_filename, file_path, file_size,
+                 duration, mimetype, status)
+            )
+            recording_id = cursor.fetchone()['id']
+            
+            cursor.execute(
+                """
+                INSERT INTO transcriptions (recording_id, transcription_text, dialogues, language)
+                VALUES (%s, %s, %s, %s)
+                """,
+                (recording_id, transcription_text, Json(dialogues or []), language)
+            )
+            
+            if summary is not None:
+                cursor.execute(
+                    """
+                    INSERT INTO summaries (recording_id, summary, keywords)
+                    VALUES (%s, %s, %s)
+                    """,
+                    (recording_id, summary, keywords)
+                )
+        
+        logger.info(f"Grabación guardada con su contenido: ID={recording_id}, usuario={user_id}")
+        queue_recording(recording_id, user_id, dialogues)
+        return recording_id
+        
+    except Exception as e:
+        logger.error(f"Error al guardar grabación con contenido: {e}")
+        return None
+
+
 # ==================== READ ====================
 
+def _list_query(conditions, with_user, pagination):
+    """
+    Construye la consulta de un listado de grabaciones
+    La página se selecciona primero sobre recordings (usando el índice de
+    upload_date, id) y los EXISTS y el JOIN con users se calculan solo para
+    sus filas; si no, PostgreSQL puede recorrer transcriptions y summaries
+    completas para los indicadores
+    
+    Args:
+        conditions (list): Condiciones SQL sobre r
+        with_user (bool): Incluir nombre y email del dueño
+        pagination (str): "LIMIT %s" o "LIMIT %s OFFSET %s"
+        
+    Returns:
+        str: Consulta SQL
+    """
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    user_columns = "u.first_name, u.last_name, u.email," if with_user else ""
+    user_join = "JOIN users u ON r.user_id = u.id" if with_user else ""
+    
+    return f"""
+        SELECT {_COLUMNS}, {user_columns}
+               {_CONTENT_FLAGS}
+        FROM (
+            SELECT * FROM recordings r
+            {where}
+            {_ORDER}
+            {pagination}
+        ) r
+        {user_join}
+        {_ORDER}
+    """
+
+
 def get_recording_by_id(recording_id):
     """
     Obtiene una grabación por su ID
@@ -66,15 +186,12 @@ def get_recording_by_id(recording_id):
         dict: Datos de la grabación o None
     """
     try:
-        query = """
-            SELECT r.*, 
+        query = f"""
+            SELECT {_COLUMNS},
                    u.first_name, u.last_name, u.email,
-                   CASE WHEN t.id IS NOT NULL THEN true ELSE false END as has_transcription,
-                   CASE WHEN s.id IS NOT NULL THEN true ELSE false END as has_summary
+                   {_CONTENT_FLAGS}
             FROM recordings r
             JOIN users u ON r.user_id = u.id
-            LEFT JOIN transcriptions t ON r.id = t.recording_id
-            LEFT JOIN summaries s ON r.id = s.recording_id
             WHERE r.id = %s
         """
         result = execute_query(query, (recording_id,), fetch_one=True)
@@ -91,6 +208,7 @@ def get_recording_by_id(recording_id):
 def get_user_recordings(user_id, limit=100, offset=0, status=None):
     """
     Obtiene todas las grabaciones de un usuario
+    Para recorrer muchas páginas usar get_user_recordings_page
     
     Args:
         user_id (int): ID del usuario
@@ -102,34 +220,17 @@ def get_user_recordings(user_id, limit=100, offset=0, status=None):
         list: Lista de grabaciones
     """
     try:
+        conditions = ["r.user_id = %s"]
+        params = [user_id]
+        
         if status:
-            query = """
-                SELECT r.*, 
-                       CASE WHEN t.id IS NOT NULL THEN true ELSE false END as has_transcription,
-                       CASE WHEN s.id IS NOT NULL THEN true ELSE false END as has_summary
-                FROM recordings r
-                LEFT JOIN transcriptions t ON r.id = t.recording_id
-                LEFT JOIN summaries s ON r.id = s.recording_id
-                WHERE r.user_id = %s AND r.status = %s
-                ORDER BY r.upload_date DESC
-                LIMIT %s OFFSET %s
-            """
-            params = (user_id, status, limit, offset)
-        else:
-            query = """
-                SELECT r.*, 
-                       CASE WHEN t.id IS NOT NULL THEN true ELSE false END as has_transcription,
-                       CASE WHEN s.id IS NOT NULL THEN true ELSE false END as has_summary
-                FROM recordings r
-                LEFT JOIN transcriptions t ON r.id = t.recording_id
-                LEFT JOIN summaries s ON r.id = s.recording_id
-                WHERE r.user_id = %s
-                ORDER BY r.upload_date DESC
-                LIMIT %s OFFSET %s
-            """
-            params = (user_id, limit, offset)
-        
-        results = execute_query(query, params, fetch_all=True)
+            conditions.append("r.status = %s")
+            params.append(status)
+        
+        query = _list_query(conditions, with_user=False, pagination="LIMIT %s OFFSET %s")
+        params.extend([limit, offset])
+        
+        results = execute_query(query, tuple(params), fetch_all=True)
         return [dict(r) for r in results] if results else []
         
     except Exception as e:
@@ -142,6 +243,7 @@ def get_supervisor_recordings(supervisor_id, limit=100, offset=0):
     Obtiene grabaciones accesibles por un supervisor:
     - Sus propias grabaciones
     - Grabaciones de miembros de sus equipos
+    Para recorrer muchas páginas usar get_supervisor_recordings_page
     
     Args:
         supervisor_id (int): ID del supervisor
@@ -152,29 +254,14 @@ def get_supervisor_recordings(supervisor_id, limit=100, offset=0):
         list: Lista de grabaciones accesibles
     """
     try:
-        query = """
-            SELECT DISTINCT r.*, 
-                   u.first_name, u.last_name, u.email,
-                   CASE WHEN t.id IS NOT NULL THEN true ELSE false END as has_transcription,
-                   CASE WHEN s.id IS NOT NULL THEN true ELSE false END as has_summary
-            FROM recordings r
-            JOIN users u ON r.user_id = u.id
-            LEFT JOIN transcriptions t ON r.id = t.recording_id
-            LEFT JOIN summaries s ON r.id = s.recording_id
-            WHERE 
-                r.user_id = %s
-                OR r.user_id IN (
-                    SELECT tm.user_id
-                    FROM team_members tm
-                    JOIN teams te ON tm.team_id = te.id
-                    WHERE te.supervisor_id = %s
-                )
-            ORDER BY r.upload_date DESC
-            LIMIT %s OFFSET %s
-        """
+        owner_ids = _supervisor_owner_ids(supervisor_id)
+        if owner_ids is None:
+            return []
+        
+        query = _list_query(["r.user_id = ANY(%s)"], with_user=True, pagination="LIMIT %s OFFSET %s")
         results = execute_query(
             query, 
-            (supervisor_id, supervisor_id, limit, offset),
+            (owner_ids, limit, offset),
             fetch_all=True
         )
         return [dict(r) for r in results] if results else []
@@ -187,6 +274,7 @@ def get_supervisor_recordings(supervisor_id, limit=100, offset=0):
 def get_all_recordings(limit=100, offset=0):
     """
     Obtiene todas las grabaciones (solo Admin)
+    Para recorrer muchas páginas usar get_all_recordings_page
     
     Args:
         limit (int): Máximo de resultados
@@ -196,18 +284,7 @@ def get_all_recordings(limit=100, offset=0):
         list: Lista de todas las grabaciones
     """
     try:
-        query = """
-            SELECT r.*, 
-                   u.first_name, u.last_name, u.email,
-                   CASE WHEN t.id IS NOT NULL THEN true ELSE false END as has_transcription,
-                   CASE WHEN s.id IS NOT NULL THEN true ELSE false END as has_summary
-            FROM recordings r
-            JOIN users u ON r.user_id = u.id
-            LEFT JOIN transcriptions t ON r.id = t.recording_id
-            LEFT JOIN summaries s ON r.id = s.recording_id
-            ORDER BY r.upload_date DESC
-            LIMIT %s OFFSET %s
-        """
+        query = _list_query([], with_user=True, pagination="LIMIT %s OFFSET %s")
         results = execute_query(query, (limit, offset), fetch_all=True)
         return [dict(r) for r in results] if results else []
         
@@ -216,6 +293,158 @@ def get_all_recordings(limit=100, offset=0):
         return []
 
 
+# ==================== PAGINACIÓN POR CURSOR ====================
+
+def _supervisor_owner_ids(supervisor_id):
+    """Usuarios cuyas grabaciones ve un supervisor (él mismo y sus equipos)"""
+    supervised = get_supervised_user_ids(supervisor_id)
+    if supervised is None:
+        return None
+    return list(supervised | {supervisor_id})
+
+
+def encode_cursor(recording):
+    """
+    Genera el cursor que apunta después de una grabación
+    
+    Args:
+        recording (dict): Grabación con upload_date e id
+        
+    Returns:
+        str: Cursor opaco
+    """
+    raw = f"{recording['upload_date'].isoformat()}|{recording['id']}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """
+    Decodifica un cursor generado por encode_cursor
+    
+    Args:
+        cursor (str): Cursor opaco
+        
+    Returns:
+        tuple: (upload_date, id)
+        
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        upload_date, recording_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(upload_date), int(recording_id)
+    except Exception:
+        raise ValueError(f"Cursor inválido: {cursor!r}")
+
+
+def _get_recordings_page(conditions, params, limit, cursor, with_user):
+    """
+    Obtiene una página de grabaciones ordenadas por (upload_date, id) descendente
+    Filtra con (upload_date, id) < cursor en lugar de OFFSET, por lo que cada
+    página cuesta lo mismo sin importar su profundidad, y pide una fila de más
+    para saber si hay siguiente página sin contar
+    
+    Args:
+        conditions (list): Condiciones SQL sobre r
+        params (list): Parámetros de las condiciones
+        limit (int): Tamaño de la página
+        cursor (str): Cursor de la página anterior (None para la primera)
+        with_user (bool): Incluir nombre y email del dueño
+        
+    Returns:
+        dict: {'recordings': list, 'next_cursor': str o None}
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    conditions = list(conditions)
+    params = list(params)
+    
+    if cursor:
+        conditions.append("(r.upload_date, r.id) < (%s, %s)")
+        params.extend(decode_cursor(cursor))
+    
+    query = _list_query(conditions, with_user, pagination="LIMIT %s")
+    params.append(limit + 1)
+    
+    results = execute_query(query, tuple(params), fetch_all=True) or []
+    recordings = [dict(r) for r in results[:limit]]
+    next_cursor = encode_cursor(recordings[-1]) if len(results) > limit else None
+    
+    return {'recordings': recordings, 'next_cursor': next_cursor}
+
+
+def get_user_recordings_page(user_id, limit=DEFAULT_PAGE_SIZE, cursor=None, status=None):
+    """
+    Obtiene una página de las grabaciones de un usuario (paginación por cursor)
+    
+    Args:
+        user_id (int): ID del usuario
+        limit (int): Tamaño de la página (máximo MAX_PAGE_SIZE)
+        cursor (str): next_cursor de la página anterior (None para la primera)
+        status (str): Filtrar por estado (opcional)
+        
+    Returns:
+        dict: {'recordings': list, 'next_cursor': str o None}
+    """
+    try:
+        conditions = ["r.user_id = %s"]
+        params = [user_id]
+        
+        if status:
+            conditions.append("r.status = %s")
+            params.append(status)
+        
+        return _get_recordings_page(conditions, params, limit, cursor, with_user=False)
+        
+    except Exception as e:
+        logger.error(f"Error al obtener página de grabaciones del usuario {user_id}: {e}")
+        return {'recordings': [], 'next_cursor': None}
+
+
+def get_supervisor_recordings_page(supervisor_id, limit=DEFAULT_PAGE_SIZE, cursor=None):
+    """
+    Obtiene una página de las grabaciones accesibles por un supervisor
+    (paginación por cursor)
+    
+    Args:
+        supervisor_id (int): ID del supervisor
+        limit (int): Tamaño de la página (máximo MAX_PAGE_SIZE)
+        cursor (str): next_cursor de la página anterior (None para la primera)
+        
+    Returns:
+        dict: {'recordings': list, 'next_cursor': str o None}
+    """
+    try:
+        owner_ids = _supervisor_owner_ids(supervisor_id)
+        if owner_ids is None:
+            return {'recordings': [], 'next_cursor': None}
+        
+        return _get_recordings_page(["r.user_id = ANY(%s)"], [owner_ids], limit, cursor, with_user=True)
+        
+    except Exception as e:
+        logger.error(f"Error al obtener página de grabaciones del supervisor {supervisor_id}: {e}")
+        return {'recordings': [], 'next_cursor': None}
+
+
+def get_all_recordings_page(limit=DEFAULT_PAGE_SIZE, cursor=None):
+    """
+    Obtiene una página de todas las grabaciones (solo Admin, paginación por cursor)
+    
+    Args:
+        limit (int): Tamaño de la página (máximo MAX_PAGE_SIZE)
+        cursor (str): next_cursor de la página anterior (None para la primera)
+        
+    Returns:
+        dict: {'recordings': list, 'next_cursor': str o None}
+    """
+    try:
+        return _get_recordings_page([], [], limit, cursor, with_user=True)
+        
+    except Exception as e:
+        logger.error(f"Error al obtener página de todas las grabaciones: {e}")
+        return {'recordings': [], 'next_cursor': None}
+
+
 # ==================== UPDATE ====================
 
 def update_recording_status(recording_id, status):
@@ -276,7 +505,7 @@ def update_recording_duration(recording_id, duration):
 
 def delete_recording(recording_id):
     """
-    Elimina una grabación de la base de datos
+    Elimina una grabación de la base de datos y sus fragmentos del índice vectorial
     NOTA: Esto también eliminará automáticamente (CASCADE):
     - transcriptions
     - summaries
@@ -294,6 +523,7 @@ def delete_recording(recording_id):
         
         if rows and rows > 0:
             logger.info(f"Grabación {recording_id} eliminada de la base de datos")
+            remove_recording(recording_id)
             return True
         return False
         
@@ -304,7 +534,8 @@ def delete_recording(recording_id):
 
 def delete_recording_file(file_path):
     """
-    Elimina el archivo físico de una grabación
+    Elimina el archivo de una grabación (su handle en el almacén de blobs; el
+    contenido se borra cuando ninguna otra grabación lo usa)
     
     Args:
         file_path (str): Ruta del archivo
@@ -313,8 +544,7 @@ def delete_recording_file(file_path):
         bool: True si se eliminó correctamente
     """
     try:
-        if file_path and os.path.exists(file_path):
-            os.remove(file_path)
+        if file_path and liberar_archivo(file_path):
             logger.info(f"Archivo eliminado: {file_path}")
             return True
         return False
@@ -358,9 +588,9 @@ def get_recording_with_content(recording_id):
         dict: Grabación completa con transcripción y resumen
     """
     try:
-        query = """
+        query = f"""
             SELECT 
-                r.*,
+                {_COLUMNS},
                 u.first_name, u.last_name, u.email,
                 t.transcription_text, t.dialogues, t.language,
                 s.summary, s.keywords
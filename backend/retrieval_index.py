@@ -0,0 +1,383 @@
+"""
+Índice de recuperación (BM25) sobre los turnos de hablante de una transcripción
+Cada transcripción se indexa una sola vez en el servidor y se identifica por un
+transcript_id; el chat envía al modelo solo los turnos relevantes para cada
+pregunta en lugar de la transcripción completa.
+Si CHAT_SEMANTIC_RETRIEVAL está activo, los resultados de BM25 se combinan con
+los de los embeddings de los turnos (embedding_service) por fusión de rankings,
+para encontrar también los turnos que responden con otras palabras. Los
+embeddings se calculan en segundo plano al registrar la transcripción; hasta
+que están listos el chat usa solo BM25.
+"""
+
+import os
+import re
+import math
+import time
+import heapq
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+from embedding_service import dividir_en_fragmentos, generar_embeddings, texto_fragmento
+
+logger = logging.getLogger(__name__)
+
+# Turnos más relevantes que se incluyen en el prompt
+TOP_K = int(os.environ.get('CHAT_TOP_K', 8))
+
+# Turnos vecinos que se añaden alrededor de cada resultado para dar contexto
+NEIGHBOR_TURNS = int(os.environ.get('CHAT_NEIGHBOR_TURNS', 1))
+
+# Transcripciones indexadas en memoria y tiempo de vida sin uso (segundos)
+MAX_INDEXES = int(os.environ.get('CHAT_INDEX_MAX_TRANSCRIPTS', 200))
+INDEX_TTL_SECONDS = int(os.environ.get('CHAT_INDEX_TTL', 6 * 3600))
+
+# Parámetros de BM25
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Combinar BM25 con la similitud de embeddings
+CHAT_SEMANTIC_RETRIEVAL = os.environ.get('CHAT_SEMANTIC_RETRIEVAL', 'false').lower() == 'true'
+
+# Tiempo antes de reintentar los embeddings de una transcripción que fallaron (segundos)
+EMBEDDINGS_RETRY_SECONDS = 600
+
+# Similitud mínima para usar un turno cuando BM25 no encuentra nada; por debajo
+# se considera una pregunta general y el chat usa la transcripción completa
+CHAT_SEMANTIC_MIN_SCORE = float(os.environ.get('CHAT_SEMANTIC_MIN_SCORE', 0.6))
+
+# Constante de la fusión de rankings (Reciprocal Rank Fusion)
+RRF_K = 60
+
+_PALABRA = re.compile(r'\w+', re.UNICODE)
+_TURNO = re.compile(r'\[SPEAKER_([^\]]+)\]')
+
+_indices = OrderedDict()
+_lock = threading.Lock()
+
+
+def tokenizar(texto):
+    """
+    Convierte un texto en términos normalizados (minúsculas y sin acentos)
+
+    Args:
+        texto (str): Texto a tokenizar
+
+    Returns:
+        list: Términos
+    """
+    normalizado = unicodedata.normalize('NFKD', (texto or '').lower())
+    sin_acentos = ''.join(c for c in normalizado if not unicodedata.combining(c))
+    return _PALABRA.findall(sin_acentos)
+
+
+class IndiceTranscripcion:
+    """
+    Índice BM25 de los turnos de una transcripción
+
+    Atributos:
+        dialogos (list): Turnos [{'speaker': str, 'text': str}] en orden
+    """
+
+    def __init__(self, dialogos):
+        self.dialogos = dialogos
+        self.ultimo_uso = time.time()
+        self._postings = {}
+        self._longitudes = []
+        # Embeddings de los fragmentos (se calculan en segundo plano)
+        self._fragmentos = None
+        self._vectores = None
+        self._calculando = False
+        self._fallo_embeddings = None
+        self._lock_embeddings = threading.Lock()
+
+        for i, dialogo in enumerate(dialogos):
+            terminos = tokenizar(dialogo.get('text', ''))
+            self._longitudes.append(len(terminos))
+
+            frecuencias = {}
+            for termino in terminos:
+                frecuencias[termino] = frecuencias.get(termino, 0) + 1
+            for termino, tf in frecuencias.items():
+                self._postings.setdefault(termino, []).append((i, tf))
+
+        total = len(self._longitudes)
+        self._longitud_media = (sum(self._longitudes) / total) if total else 0.0
+
+    def buscar(self, consulta, k=TOP_K):
+        """
+        Obtiene los turnos más relevantes para una consulta combinando BM25 y
+        embeddings (si CHAT_SEMANTIC_RETRIEVAL está activo)
+
+        Args:
+            consulta (str): Pregunta del usuario
+            k (int): Número de turnos a devolver
+
+        Returns:
+            list: Tuplas (índice del turno, puntuación) ordenadas por relevancia
+        """
+        lexicos = self._buscar_bm25(consulta, k)
+        semanticos = self._buscar_semantico(consulta, k) if CHAT_SEMANTIC_RETRIEVAL else None
+
+        if not semanticos:
+            return lexicos
+        if not lexicos:
+            return [(i, puntuacion) for i, puntuacion in semanticos if puntuacion >= CHAT_SEMANTIC_MIN_SCORE]
+
+        fusion = {}
+        for resultados in (lexicos, semanticos):
+            for posicion, (i, _) in enumerate(resultados):
+                fusion[i] = fusion.get(i, 0.0) + 1.0 / (RRF_K + posicion + 1)
+
+        return heapq.nlargest(k, fusion.items(), key=lambda item: item[1])
+
+    def preparar_embeddings(self):
+        """
+        Lanza en segundo plano el cálculo de los embeddings de los turnos, salvo
+        que ya existan, se estén calculando o hayan fallado hace menos de
+        EMBEDDINGS_RETRY_SECONDS
+        """
+        with self._lock_embeddings:
+            if self._vectores is not None or self._calculando:
+                return
+            if self._fallo_embeddings is not None and time.time() - self._fallo_embeddings < EMBEDDINGS_RETRY_SECONDS:
+                return
+            self._calculando = True
+
+        threading.Thread(target=self._calcular_embeddings, name='chat-embeddings', daemon=True).start()
+
+    def _calcular_embeddings(self):
+        """
+        Calcula los embeddings de los fragmentos de los turnos (thread de preparar_embeddings)
+        """
+        fragmentos = dividir_en_fragmentos(self.dialogos)
+        vectores = None
+
+        try:
+            if fragmentos:
+                vectores = generar_embeddings([texto_fragmento(f) for f in fragmentos], 'documento')
+        except Exception as e:
+            logger.error(f"Error al calcular los embeddings de la transcripción: {e}")
+
+        with self._lock_embeddings:
+            self._calculando = False
+            if vectores is None:
+                self._fallo_embeddings = time.time()
+            else:
+                self._fragmentos = np.array([f['turn'] for f in fragmentos])
+                self._vectores = vectores
+                self._fallo_embeddings = None
+
+    def _buscar_semantico(self, consulta, k):
+        """
+        Turnos más parecidos a la consulta según sus embeddings (la mejor
+        similitud de sus fragmentos)
+
+        Returns:
+            list: Tuplas (índice del turno, similitud) o None si los embeddings
+                  aún no están listos o fallan
+        """
+        with self._lock_embeddings:
+            fragmentos, vectores = self._fragmentos, self._vectores
+
+        if vectores is None:
+            self.preparar_embeddings()
+            return None
+
+        vector = generar_embeddings([consulta], 'consulta')
+        if vector is None:
+            return None
+
+        mejores = np.full(len(self.dialogos), -np.inf, dtype=np.float32)
+        np.maximum.at(mejores, fragmentos, vectores @ vector[0])
+
+        turnos = np.flatnonzero(np.isfinite(mejores))
+        turnos = turnos[np.argsort(-mejores[turnos], kind='stable')][:k]
+        return [(int(i), float(mejores[i])) for i in turnos]
+
+    def _buscar_bm25(self, consulta, k=TOP_K):
+        """
+        Obtiene los turnos más relevantes para una consulta según BM25
+
+        Args:
+            consulta (str): Pregunta del usuario
+            k (int): Número de turnos a devolver
+
+        Returns:
+            list: Tuplas (índice del turno, puntuación) ordenadas por relevancia
+        """
+        total = len(self._longitudes)
+        if not total:
+            return []
+
+        puntuaciones = {}
+
+        for termino in set(tokenizar(consulta)):
+            postings = self._postings.get(termino)
+            if not postings:
+                continue
+
+            df = len(postings)
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+
+            for i, tf in postings:
+                norma = BM25_K1 * (1 - BM25_B + BM25_B * self._longitudes[i] / self._longitud_media)
+                puntuaciones[i] = puntuaciones.get(i, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norma)
+
+        return heapq.nlargest(k, puntuaciones.items(), key=lambda item: item[1])
+
+    def extracto(self, consulta, k=TOP_K, vecinos=NEIGHBOR_TURNS):
+        """
+        Construye el contexto para el prompt con los turnos relevantes y sus vecinos,
+        en orden cronológico y con el número de turno
+
+        Args:
+            consulta (str): Pregunta del usuario
+            k (int): Número de turnos relevantes
+            vecinos (int): Turnos añadidos antes y después de cada resultado
+
+        Returns:
+            str: Extracto de la transcripción (vacío si no hay coincidencias)
+        """
+        self.ultimo_uso = time.time()
+        seleccionados = set()
+
+        for i, _ in self.buscar(consulta, k):
+            inicio = max(i - vecinos, 0)
+            fin = min(i + vecinos, len(self.dialogos) - 1)
+            seleccionados.update(range(inicio, fin + 1))
+
+        partes = []
+        anterior = None
+
+        for i in sorted(seleccionados):
+            if anterior is not None and i != anterior + 1:
+                partes.append("[...]")
+            dialogo = self.dialogos[i]
+            partes.append(f"(turn {i + 1}) [SPEAKER_{dialogo['speaker']}] {dialogo['text']}")
+            anterior = i
+
+        return "\n\n".join(partes)
+
+
+def dialogos_desde_texto(transcripcion):
+    """
+    Reconstruye los diálogos a partir del texto con marcas [SPEAKER_x]
+
+    Args:
+        transcripcion (str): Texto de procesar_transcripcion_para_texto
+
+    Returns:
+        list: Diálogos [{'speaker': str, 'text': str}]
+    """
+    dialogos = []
+    partes = _TURNO.split(transcripcion or '')
+
+    # partes = [texto previo, hablante, texto, hablante, texto, ...]
+    if partes[0].strip():
+        dialogos.append({'speaker': 'UU', 'text': partes[0].strip()})
+
+    for hablante, texto in zip(partes[1::2], partes[2::2]):
+        if texto.strip():
+            dialogos.append({'speaker': hablante, 'text': texto.strip()})
+
+    return dialogos
+
+
+def calcular_transcript_id(dialogos):
+    """
+    Calcula el identificador de una transcripción a partir de su contenido
+
+    Args:
+        dialogos (list): Diálogos de la transcripción
+
+    Returns:
+        str: Identificador (hexadecimal)
+    """
+    sha256 = hashlib.sha256()
+    for dialogo in dialogos:
+        sha256.update(f"{dialogo.get('speaker')}\x1f{dialogo.get('text')}\x1e".encode('utf-8'))
+    return sha256.hexdigest()[:32]
+
+
+def registrar_transcripcion(dialogos=None, transcripcion=None):
+    """
+    Indexa una transcripción (si no lo estaba ya) y devuelve su identificador
+
+    Args:
+        dialogos (list): Diálogos por hablante (preferido)
+        transcripcion (str): Texto con marcas [SPEAKER_x], si no hay diálogos
+
+    Returns:
+        str: transcript_id o None si la transcripción está vacía
+    """
+    if not dialogos:
+        dialogos = dialogos_desde_texto(transcripcion)
+    if not dialogos:
+        return None
+
+    transcript_id = calcular_transcript_id(dialogos)
+
+    with _lock:
+        if transcript_id in _indices:
+            _indices.move_to_end(transcript_id)
+            return transcript_id
+
+    indice = IndiceTranscripcion(dialogos)
+
+    with _lock:
+        _indices[transcript_id] = indice
+        _purgar_indices()
+
+    if CHAT_SEMANTIC_RETRIEVAL:
+        indice.preparar_embeddings()
+
+    logger.info(f"Transcripción indexada para chat: {transcript_id} ({len(dialogos)} turnos)")
+    return transcript_id
+
+
+def obtener_indice(transcript_id):
+    """
+    Obtiene el índice de una transcripción registrada
+
+    Args:
+        transcript_id (str): Identificador de la transcripción
+
+    Returns:
+        IndiceTranscripcion: Índice o None si no existe o expiró
+    """
+    with _lock:
+        indice = _indices.get(transcript_id)
+        if indice is not None:
+            _indices.move_to_end(transcript_id)
+        return indice
+
+
+def get_index_stats():
+    """
+    Obtiene el número de transcripciones indexadas
+
+    Returns:
+        dict: Transcripciones y turnos indexados
+    """
+    with _lock:
+        return {
+            'transcripts': len(_indices),
+            'turns': sum(len(indice.dialogos) for indice in _indices.values())
+        }
+
+
+def _purgar_indices():
+    """
+    Elimina los índices expirados y los menos usados si se supera MAX_INDEXES
+    (debe llamarse con _lock adquirido)
+    """
+    limite = time.time() - INDEX_TTL_SECONDS
+    for transcript_id in [k for k, v in _indices.items() if v.ultimo_uso < limite]:
+        del _indices[transcript_id]
+
+    while len(_indices) > MAX_INDEXES:
+        _indices.popitem(last=False)
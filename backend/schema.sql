@@ -1,5 +1,8 @@
 -- Script SQL para crear las tablas en Supabase
 -- Ejecuta este script en el SQL Editor de Supabase si las tablas no existen
+-- NOTA: el esquema completo (equipos, grabaciones, transcripciones, resúmenes
+-- y sus índices) está en backend/migrations; aplicar con:
+--   python schema_migrations.py upgrade
 
 -- Tabla de usuarios
 CREATE TABLE IF NOT EXISTS users (
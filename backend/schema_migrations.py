@@ -0,0 +1,415 @@
+"""
+Migraciones versionadas del esquema de la base de datos
+Las migraciones son archivos NNNN_nombre.sql en backend/migrations y se aplican
+en orden, cada una en su propia transacción, registrándolas en la tabla
+schema_migrations. También incluye una verificación que crea un fixture grande
+en un esquema temporal y falla si alguna consulta frecuente hace un Seq Scan.
+
+Uso (desde backend/):
+    python schema_migrations.py upgrade   # aplica las migraciones pendientes
+    python schema_migrations.py status    # muestra las aplicadas y pendientes
+    python schema_migrations.py check     # EXPLAIN de las consultas frecuentes
+"""
+
+import os
+import re
+import sys
+import json
+import hashlib
+import logging
+from database import get_pool, transaction
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), 'migrations')
+
+# Clave del advisory lock que evita que dos procesos migren a la vez
+MIGRATION_LOCK_KEY = 727274
+
+_NOMBRE_MIGRACION = re.compile(r'^(\d+)_(\w+)\.sql$')
+
+
+# ==================== MIGRACIONES ====================
+
+def load_migrations():
+    """
+    Lee las migraciones disponibles en MIGRATIONS_DIR
+
+    Returns:
+        list: Diccionarios {'version', 'name', 'sql', 'checksum'} ordenados por versión
+    """
+    migraciones = []
+
+    for archivo in sorted(os.listdir(MIGRATIONS_DIR)):
+        coincidencia = _NOMBRE_MIGRACION.match(archivo)
+        if not coincidencia:
+            continue
+
+        with open(os.path.join(MIGRATIONS_DIR, archivo), 'r', encoding='utf-8') as f:
+            sql = f.read()
+
+        migraciones.append({
+            'version': int(coincidencia.group(1)),
+            'name': coincidencia.group(2),
+            'sql': sql,
+            'checksum': hashlib.sha256(sql.encode('utf-8')).hexdigest()
+        })
+
+    migraciones.sort(key=lambda m: m['version'])
+    return migraciones
+
+
+def _crear_tabla_migraciones(cursor):
+    """Crea la tabla schema_migrations si no existe"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            checksum VARCHAR(64) NOT NULL,
+            applied_at TIMESTAMPTZ DEFAULT NOW()
+        )
+    """)
+
+
+def _aplicadas(cursor):
+    """Obtiene las migraciones aplicadas: versión -> checksum"""
+    cursor.execute("SELECT version, checksum FROM schema_migrations")
+    return {row['version']: row['checksum'] for row in cursor.fetchall()}
+
+
+def apply_migrations():
+    """
+    Aplica las migraciones pendientes en orden, cada una en su transacción
+    Un advisory lock impide que varios procesos las apliquen a la vez
+
+    Returns:
+        list: Versiones aplicadas (None si alguna falla; las anteriores quedan aplicadas)
+    """
+    aplicadas_ahora = []
+
+    try:
+        for migracion in load_migrations():
+            with transaction() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_KEY,))
+                _crear_tabla_migraciones(cursor)
+                aplicadas = _aplicadas(cursor)
+
+                if migracion['version'] in aplicadas:
+                    if aplicadas[migracion['version']] != migracion['checksum']:
+                        logger.warning(
+                            f"La migración {migracion['version']:04d}_{migracion['name']} "
+                            f"cambió después de aplicarse"
+                        )
+                    continue
+
+                cursor.execute(migracion['sql'])
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                    (migracion['version'], migracion['name'], migracion['checksum'])
+                )
+
+            logger.info(f"Migración aplicada: {migracion['version']:04d}_{migracion['name']}")
+            aplicadas_ahora.append(migracion['version'])
+
+        return aplicadas_ahora
+
+    except Exception as e:
+        logger.error(f"Error al aplicar migraciones: {e}")
+        return None
+
+
+def get_migration_status():
+    """
+    Obtiene el estado de las migraciones
+
+    Returns:
+        dict: {'applied': [versiones], 'pending': [versiones], 'modified': [versiones]}
+              o None si no se pudo consultar
+    """
+    try:
+        with transaction() as cursor:
+            _crear_tabla_migraciones(cursor)
+            aplicadas = _aplicadas(cursor)
+
+        migraciones = load_migrations()
+        return {
+            'applied': sorted(aplicadas),
+            'pending': [m['version'] for m in migraciones if m['version'] not in aplicadas],
+            'modified': [m['version'] for m in migraciones
+                         if m['version'] in aplicadas and aplicadas[m['version']] != m['checksum']]
+        }
+
+    except Exception as e:
+        logger.error(f"Error al obtener el estado de las migraciones: {e}")
+        return None
+
+
+# ==================== VERIFICACIÓN DE PLANES ====================
+
+# Tablas del fixture; un Seq Scan sobre cualquiera de ellas es un fallo
+FIXTURE_TABLES = ('users', 'agents', 'teams', 'team_members', 'recordings', 'transcriptions', 'summaries')
+
+# Filas del fixture por tabla (proporcionales al número de grabaciones)
+_FIXTURE_SQL = """
+    INSERT INTO users (first_name, last_name, email, password, role)
+    SELECT 'User', 'N' || g, 'user' || g || '@manuelsolis.com', md5(g::text), 1 + (g % 2)
+    FROM generate_series(1, {usuarios}) g;
+
+    INSERT INTO agents (user_id, name, provider, prompt_template)
+    SELECT 1 + (g % {usuarios}), 'Agent ' || g, 'gemini', 'prompt'
+    FROM generate_series(1, {usuarios}) g;
+
+    INSERT INTO teams (name, supervisor_id)
+    SELECT 'Team ' || g, g
+    FROM generate_series(1, {equipos}) g;
+
+    INSERT INTO team_members (team_id, user_id)
+    SELECT 1 + (g % {equipos}), 1 + (g % {usuarios})
+    FROM generate_series(1, {usuarios}) g;
+
+    INSERT INTO recordings (user_id, filename, original_filename, file_path, file_size, status, upload_date)
+    SELECT 1 + (g % {usuarios}), 'rec_' || g, 'rec.wav', '/tmp/rec', 1000, 'completed',
+           NOW() - g * INTERVAL '1 minute'
+    FROM generate_series(1, {grabaciones}) g;
+
+    INSERT INTO transcriptions (recording_id, transcription_text)
+    SELECT id, 'texto' FROM recordings WHERE id % 3 <> 0;
+
+    INSERT INTO summaries (recording_id, summary)
+    SELECT id, 'resumen' FROM recordings WHERE id % 2 = 0;
+
+    ANALYZE;
+"""
+
+
+def _hot_queries():
+    """
+    Consultas frecuentes de los servicios con parámetros de ejemplo para el fixture
+
+    Returns:
+        list: Tuplas (nombre, sql, params)
+    """
+    from recording_service import _list_query
+    from search_service import _search_query, _OPCIONES_FRAGMENTO
+    from permission_service import ROLE_ADMIN, ROLE_SUPERVISOR, ROLE_USER
+
+    cursor_fecha = "NOW() - INTERVAL '30 days'"
+    propietarios = list(range(1, 40))
+    busqueda = {'q': 'presupuesto cliente', 'user_id': 42, 'candidates': 1000,
+                'limit': 20, 'offset': 0, 'options': _OPCIONES_FRAGMENTO}
+
+    return [
+        ('auth.authenticate_user', """
+            SELECT id, first_name, last_name, email, role, created_at
+            FROM users
+            WHERE LOWER(email) = %s AND password = %s
+        """, ('user42@manuelsolis.com', 'x')),
+        ('auth.get_user_by_id', """
+            SELECT id, first_name, last_name, email, role, created_at
+            FROM users
+            WHERE id = %s
+        """, (42,)),
+        ('agents.get_agent_by_id', """
+            SELECT id, user_id, name, description, provider, prompt_template,
+                   model_name, is_active, created_at, updated_at
+            FROM agents
+            WHERE id = %s AND user_id = %s
+        """, (42, 42)),
+        ('agents.get_agents_by_user', """
+            SELECT id, user_id, name, description, provider, prompt_template,
+                   model_name, is_active, created_at, updated_at
+            FROM agents
+            WHERE user_id = %s AND is_active = TRUE
+            ORDER BY created_at DESC
+        """, (42,)),
+        ('permission.recording_owner', "SELECT user_id FROM recordings WHERE id = %s", (4242,)),
+        ('permission.user_in_supervisor_teams', """
+            SELECT EXISTS(
+                SELECT 1
+                FROM team_members tm
+                JOIN teams t ON tm.team_id = t.id
+                WHERE t.supervisor_id = %s
+                AND tm.user_id = %s
+            ) as is_in_team
+        """, (7, 42)),
+        ('permission.filter_accessible_recordings',
+         "SELECT id FROM recordings WHERE id = ANY(%s) AND user_id = ANY(%s)",
+         (list(range(1000, 1200)), propietarios)),
+        ('access_cache.supervisor_members', """
+            SELECT t.id AS team_id, tm.user_id
+            FROM teams t
+            LEFT JOIN team_members tm ON tm.team_id = t.id
+            WHERE t.supervisor_id = %s
+        """, (7,)),
+        ('recordings.user_page',
+         _list_query(["r.user_id = %s", f"(r.upload_date, r.id) < ({cursor_fecha}, %s)"], False, "LIMIT %s"),
+         (42, 2 ** 62, 51)),
+        ('recordings.supervisor_page',
+         _list_query(["r.user_id = ANY(%s)", f"(r.upload_date, r.id) < ({cursor_fecha}, %s)"], True, "LIMIT %s"),
+         (propietarios, 2 ** 62, 51)),
+        ('recordings.all_page',
+         _list_query([f"(r.upload_date, r.id) < ({cursor_fecha}, %s)"], True, "LIMIT %s"),
+         (2 ** 62, 51)),
+        ('recordings.with_content', """
+            SELECT r.id, r.user_id, r.filename, r.upload_date, u.first_name, u.last_name, u.email,
+                   t.transcription_text, t.dialogues, t.language,
+                   s.summary, s.keywords
+            FROM recordings r
+            JOIN users u ON r.user_id = u.id
+            LEFT JOIN transcriptions t ON r.id = t.recording_id
+            LEFT JOIN summaries s ON r.id = s.recording_id
+            WHERE r.id = %s
+        """, (4242,)),
+        ('recordings.count_user', "SELECT COUNT(*) as count FROM recordings WHERE user_id = %s", (42,)),
+        ('teams.by_supervisor', """
+            SELECT t.*, COUNT(tm.id) as member_count
+            FROM teams t
+            LEFT JOIN team_members tm ON t.id = tm.team_id
+            WHERE t.supervisor_id = %s
+            GROUP BY t.id
+            ORDER BY t.name
+        """, (7,)),
+        ('teams.members', """
+            SELECT u.id, u.first_name, u.last_name, u.email, u.role, tm.joined_at
+            FROM team_members tm
+            JOIN users u ON tm.user_id = u.id
+            WHERE tm.team_id = %s
+            ORDER BY tm.joined_at DESC
+        """, (7,)),
+        ('teams.user_teams', """
+            SELECT t.id, t.name, t.description, t.created_at, tm.joined_at
+            FROM team_members tm
+            JOIN teams t ON tm.team_id = t.id
+            JOIN users u ON t.supervisor_id = u.id
+            WHERE tm.user_id = %s
+            ORDER BY t.name
+        """, (42,)),
+        ('teams.is_user_in_team', """
+            SELECT EXISTS(
+                SELECT 1 FROM team_members
+                WHERE user_id = %s AND team_id = %s
+            ) as is_member
+        """, (42, 7)),
+        ('persistence.find_transcription', """
+            SELECT r.id AS recording_id, t.transcription_text, t.dialogues, t.language,
+                   s.summary, s.keywords
+            FROM recordings r
+            JOIN transcriptions t ON t.recording_id = r.id
+            LEFT JOIN summaries s ON s.recording_id = r.id
+            WHERE r.user_id = %s AND r.content_key = %s
+            ORDER BY r.upload_date DESC, r.id DESC
+            LIMIT 1
+        """, (42, 'a' * 64)),
+        ('search.user', _search_query(ROLE_USER, 'es'), busqueda),
+        ('search.supervisor', _search_query(ROLE_SUPERVISOR, None), busqueda),
+        ('search.admin', _search_query(ROLE_ADMIN, None), busqueda),
+    ]
+
+
+def _seq_scans(plan, tablas):
+    """Recorre un plan de EXPLAIN (FORMAT JSON) y devuelve las tablas con Seq Scan"""
+    encontradas = []
+
+    if plan.get('Node Type') == 'Seq Scan' and plan.get('Relation Name') in tablas:
+        encontradas.append(plan['Relation Name'])
+
+    for subplan in plan.get('Plans', []):
+        encontradas.extend(_seq_scans(subplan, tablas))
+
+    return encontradas
+
+
+def check_query_plans(recordings=100000):
+    """
+    Crea las tablas de las migraciones en un esquema temporal, las llena con
+    un fixture grande y ejecuta EXPLAIN sobre las consultas frecuentes
+    Todo ocurre en una transacción que se revierte al final, así que no toca
+    los datos reales
+
+    Args:
+        recordings (int): Grabaciones del fixture (usuarios y equipos son proporcionales)
+
+    Returns:
+        list: Fallos [{'query': str, 'seq_scans': [tablas]}] (vacía si todo usa índices)
+              o None si la verificación no pudo ejecutarse
+    """
+    # Todas las tablas deben ser grandes: con pocas filas un Seq Scan es el plan correcto
+    usuarios = max(recordings // 5, 1000)
+    equipos = max(usuarios // 10, 100)
+
+    with get_pool().connection() as connection:
+        if connection is None:
+            return None
+
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("CREATE SCHEMA plan_check")
+                cursor.execute("SET LOCAL search_path TO plan_check")
+
+                for migracion in load_migrations():
+                    cursor.execute(migracion['sql'])
+
+                cursor.execute(_FIXTURE_SQL.format(
+                    usuarios=usuarios, equipos=equipos, grabaciones=recordings
+                ))
+
+                fallos = []
+
+                for nombre, query, params in _hot_queries():
+                    cursor.execute("EXPLAIN (FORMAT JSON) " + query, params)
+                    plan = cursor.fetchone()['QUERY PLAN']
+                    if isinstance(plan, str):
+                        plan = json.loads(plan)
+
+                    tablas = _seq_scans(plan[0]['Plan'], FIXTURE_TABLES)
+                    if tablas:
+                        fallos.append({'query': nombre, 'seq_scans': tablas})
+                        logger.error(f"Seq Scan en {nombre}: {', '.join(tablas)}")
+                    else:
+                        logger.info(f"Plan correcto: {nombre}")
+
+            return fallos
+
+        except Exception as e:
+            logger.error(f"Error al verificar los planes de consulta: {e}")
+            return None
+
+        finally:
+            connection.rollback()
+
+
+def main(argv):
+    """Punto de entrada de la línea de comandos"""
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s %(message)s')
+    comando = argv[1] if len(argv) > 1 else 'status'
+
+    if comando == 'upgrade':
+        aplicadas = apply_migrations()
+        if aplicadas is None:
+            return 1
+        print(f"Migraciones aplicadas: {aplicadas or 'ninguna'}")
+        return 0
+
+    if comando == 'status':
+        estado = get_migration_status()
+        if estado is None:
+            return 1
+        print(json.dumps(estado, indent=2))
+        return 0
+
+    if comando == 'check':
+        recordings = int(argv[2]) if len(argv) > 2 else 100000
+        fallos = check_query_plans(recordings)
+        if fallos is None:
+            return 1
+        for fallo in fallos:
+            print(f"SEQ SCAN  {fallo['query']}: {', '.join(fallo['seq_scans'])}")
+        print(f"{len(fallos)} consultas con Seq Scan")
+        return 1 if fallos else 0
+
+    print(f"Comando desconocido: {comando} (upgrade, status, check)")
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,303 @@
+"""
+Búsqueda de texto completo sobre las transcripciones y resúmenes guardados
+Usa recordings.search_vector (migración 0005) con su índice GIN; el filtro de
+permisos por rol forma parte de la misma consulta SQL, así que no hace falta
+filtrar los resultados después con filter_accessible_recordings.
+La búsqueda semántica usa el índice vectorial local (vector_index) filtrando
+por los dueños visibles para el rol.
+"""
+
+import os
+import html
+import logging
+from database import execute_query
+from permission_service import is_admin, is_supervisor
+from access_cache import get_supervised_user_ids
+from vector_index import search_similar
+
+logger = logging.getLogger(__name__)
+
+# Resultados por página por defecto y máximo
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+MAX_SEARCH_OFFSET = 500
+
+# Coincidencias más recientes que se ordenan por relevancia. Con términos muy
+# frecuentes PostgreSQL recorre las grabaciones por fecha y se detiene al
+# llegar a este número en lugar de calcular el ranking de todas
+SEARCH_MAX_CANDIDATES = int(os.environ.get('SEARCH_MAX_CANDIDATES', 1000))
+
+# Configuraciones de texto de PostgreSQL por idioma (igual que recording_search_config)
+SEARCH_CONFIGS = {
+    'es': 'spanish',
+    'en': 'english',
+    'pt': 'portuguese',
+    'fr': 'french',
+    'de': 'german',
+    'it': 'italian'
+}
+
+# Idiomas con los que se busca si no se indica uno. Cada grabación está indexada
+# con la configuración de su idioma; cada idioma extra añade una rama OR a la
+# consulta y empeora la estimación de filas de PostgreSQL
+SEARCH_LANGUAGES = [
+    idioma.strip() for idioma in os.environ.get('SEARCH_LANGUAGES', 'es,en').split(',') if idioma.strip()
+]
+
+# Marcas de los fragmentos: se escapa el HTML del texto y luego se sustituyen por <mark>
+_INICIO_MARCA = '\x02'
+_FIN_MARCA = '\x03'
+_OPCIONES_FRAGMENTO = (
+    f"StartSel={_INICIO_MARCA}, StopSel={_FIN_MARCA}, "
+    "MaxFragments=2, MaxWords=25, MinWords=8, FragmentDelimiter=\" … \""
+)
+
+
+def _configs(language):
+    """Configuraciones de texto con las que se interpreta la búsqueda"""
+    idiomas = [language] if language else SEARCH_LANGUAGES
+    configs = []
+
+    for idioma in idiomas:
+        config = SEARCH_CONFIGS.get(idioma.lower().split('-')[0], 'simple')
+        if config not in configs:
+            configs.append(config)
+
+    return configs
+
+
+def _tsquery(configs):
+    """Expresión tsquery de la búsqueda (los nombres vienen de SEARCH_CONFIGS)"""
+    return " || ".join(f"websearch_to_tsquery('{config}', %(q)s)" for config in configs)
+
+
+def _permission_join(user_role):
+    """
+    JOIN con los dueños de las grabaciones visibles, con las mismas reglas que
+    can_access_recording: admin ve todo, supervisor lo suyo y lo de los
+    miembros de sus equipos, usuario general solo lo suyo
+    Partir de los dueños permite usar el índice (user_id, upload_date, id)
+    en lugar de recorrer todas las coincidencias y descartar las ajenas
+    """
+    if is_admin(user_role):
+        return ""
+
+    if is_supervisor(user_role):
+        return """JOIN (
+                SELECT %(user_id)s::bigint AS user_id
+                UNION
+                SELECT tm.user_id
+                FROM team_members tm
+                JOIN teams t ON tm.team_id = t.id
+                WHERE t.supervisor_id = %(user_id)s
+            ) acceso ON acceso.user_id = r.user_id"""
+
+    return "JOIN (SELECT %(user_id)s::bigint AS user_id) acceso ON acceso.user_id = r.user_id"
+
+
+def _search_query(user_role, language):
+    """
+    Construye la consulta de búsqueda
+    Se eligen las coincidencias más recientes (SEARCH_MAX_CANDIDATES), se
+    ordenan por ts_rank_cd y solo para la página se generan los fragmentos
+    con ts_headline, que es la parte más costosa
+    """
+    tsquery = _tsquery(_configs(language))
+
+    return f"""
+        WITH candidatos AS (
+            SELECT r.id, r.search_vector
+            FROM recordings r
+            {_permission_join(user_role)}
+            WHERE r.search_vector @@ ({tsquery})
+            ORDER BY r.upload_date DESC, r.id DESC
+            LIMIT %(candidates)s
+        ),
+        pagina AS (
+            SELECT c.id, ts_rank_cd(c.search_vector, {tsquery}) AS rank
+            FROM candidatos c
+            ORDER BY rank DESC, c.id DESC
+            LIMIT %(limit)s OFFSET %(offset)s
+        )
+        SELECT r.id, r.user_id, r.filename, r.original_filename, r.duration, r.status, r.upload_date,
+               u.first_name, u.last_name, u.email,
+               t.language, p.rank,
+               ts_headline(recording_search_config(t.language), s.summary,
+                           {tsquery}, %(options)s) AS summary_snippet,
+               ts_headline(recording_search_config(t.language), t.transcription_text,
+                           {tsquery}, %(options)s) AS transcription_snippet
+        FROM pagina p
+        JOIN recordings r ON r.id = p.id
+        JOIN users u ON r.user_id = u.id
+        LEFT JOIN LATERAL (
+            SELECT transcription_text, language FROM transcriptions
+            WHERE recording_id = r.id ORDER BY id DESC LIMIT 1
+        ) t ON TRUE
+        LEFT JOIN LATERAL (
+            SELECT summary FROM summaries
+            WHERE recording_id = r.id ORDER BY id DESC LIMIT 1
+        ) s ON TRUE
+        ORDER BY p.rank DESC, r.id DESC
+    """
+
+
+def _fragmento(texto):
+    """Escapa el HTML de un fragmento y resalta las coincidencias con <mark>"""
+    if not texto:
+        return None
+
+    return html.escape(texto).replace(_INICIO_MARCA, '<mark>').replace(_FIN_MARCA, '</mark>')
+
+
+def search_recordings(user_id, user_role, query, language=None, limit=DEFAULT_SEARCH_LIMIT, offset=0):
+    """
+    Busca grabaciones por el texto de su transcripción y su resumen
+    Acepta la sintaxis de websearch_to_tsquery: "frase exacta", -excluir, OR
+
+    Args:
+        user_id (int): ID del usuario que busca
+        user_role (int): Rol del usuario
+        query (str): Texto a buscar
+        language (str): Idioma de la búsqueda (opcional; por defecto SEARCH_LANGUAGES)
+        limit (int): Resultados por página
+        offset (int): Desplazamiento dentro de los resultados ordenados
+
+    Returns:
+        list: Grabaciones con rank, summary_snippet y transcription_snippet
+              (ordenadas por relevancia) o None si falla
+    """
+    if not query or not query.strip():
+        return []
+
+    params = {
+        'q': query.strip(),
+        'user_id': user_id,
+        'candidates': SEARCH_MAX_CANDIDATES,
+        'limit': max(1, min(int(limit), MAX_SEARCH_LIMIT)),
+        'offset': max(0, min(int(offset), MAX_SEARCH_OFFSET)),
+        'options': _OPCIONES_FRAGMENTO
+    }
+
+    try:
+        results = execute_query(_search_query(user_role, language), params, fetch_all=True)
+        if results is None:
+            return None
+
+        recordings = []
+        for row in results:
+            recording = dict(row)
+            recording['rank'] = float(recording['rank'])
+            recording['summary_snippet'] = _fragmento(recording['summary_snippet'])
+            recording['transcription_snippet'] = _fragmento(recording['transcription_snippet'])
+            recordings.append(recording)
+
+        return recordings
+
+    except Exception as e:
+        logger.error(f"Error al buscar grabaciones: {e}")
+        return None
+
+
+# ==================== BÚSQUEDA SEMÁNTICA ====================
+
+# Fragmentos que se piden al índice vectorial por cada grabación devuelta
+SEMANTIC_HITS_PER_RESULT = 5
+
+# Fragmentos que se devuelven como coincidencias de cada grabación
+SEMANTIC_MATCHES = 3
+
+
+def _usuarios_visibles(user_id, user_role):
+    """
+    Dueños de las grabaciones visibles (mismas reglas que _permission_join)
+
+    Returns:
+        set: IDs de usuario, None si puede ver todas (admin), o False si falla
+    """
+    if is_admin(user_role):
+        return None
+
+    if is_supervisor(user_role):
+        miembros = get_supervised_user_ids(user_id)
+        if miembros is None:
+            return False
+        return {user_id} | set(miembros)
+
+    return {user_id}
+
+
+def semantic_search_recordings(user_id, user_role, query, limit=DEFAULT_SEARCH_LIMIT):
+    """
+    Busca grabaciones por el significado de su transcripción (índice vectorial
+    local de vector_index), aunque no compartan palabras con la búsqueda
+
+    Args:
+        user_id (int): ID del usuario que busca
+        user_role (int): Rol del usuario
+        query (str): Texto a buscar
+        limit (int): Número máximo de grabaciones
+
+    Returns:
+        list: Grabaciones con score y matches [{'turn', 'speaker', 'text', 'score'}]
+              (ordenadas por similitud) o None si falla
+    """
+    if not query or not query.strip():
+        return []
+
+    limit = max(1, min(int(limit), MAX_SEARCH_LIMIT))
+
+    usuarios = _usuarios_visibles(user_id, user_role)
+    if usuarios is False:
+        return None
+
+    fragmentos = search_similar(query.strip(), k=limit * SEMANTIC_HITS_PER_RESULT, user_ids=usuarios)
+    if fragmentos is None:
+        return None
+
+    # Agrupar por grabación; los fragmentos ya vienen ordenados por similitud
+    por_grabacion = {}
+    for fragmento in fragmentos:
+        coincidencias = por_grabacion.setdefault(fragmento['recording_id'], [])
+        if len(coincidencias) < SEMANTIC_MATCHES:
+            coincidencias.append({
+                'turn': fragmento['turn'],
+                'speaker': fragmento['speaker'],
+                'text': fragmento['text'],
+                'score': fragmento['score']
+            })
+
+    ids = list(por_grabacion)[:limit]
+    if not ids:
+        return []
+
+    try:
+        results = execute_query(
+            """
+            SELECT r.id, r.user_id, r.filename, r.original_filename, r.duration, r.status, r.upload_date,
+                   u.first_name, u.last_name, u.email
+            FROM recordings r
+            JOIN users u ON r.user_id = u.id
+            WHERE r.id = ANY(%s)
+            """,
+            (ids,),
+            fetch_all=True
+        )
+        if results is None:
+            return None
+
+        por_id = {row['id']: dict(row) for row in results}
+        recordings = []
+        # Las grabaciones borradas que aún estén en el índice no aparecen en la consulta
+        for recording_id in ids:
+            recording = por_id.get(recording_id)
+            if recording is None:
+                continue
+            recording['score'] = por_grabacion[recording_id][0]['score']
+            recording['matches'] = por_grabacion[recording_id]
+            recordings.append(recording)
+
+        return recordings
+
+    except Exception as e:
+        logger.error(f"Error en la búsqueda semántica: {e}")
+        return None
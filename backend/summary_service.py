@@ -4,6 +4,8 @@ Adaptado de generar_resumen.py para uso como servicio
 """
 
 from datetime import datetime
+from hierarchical_summary import condensar_transcripcion
+from ai_stream import ErrorStream, textos_gemini
 import logging
 import os
 
@@ -108,38 +110,33 @@ def _get_gemini_model(api_key):
     
     return _gemini_cache['model']
 
-def editar_resumen_con_gemini(instruccion, resumen_actual, contexto_transcripcion, api_key=None):
+def _condensar_contexto(model, contexto_transcripcion):
     """
-    Edita o regenera el resumen basándose en las instrucciones del usuario
+    Obtiene el contexto de la transcripción para el prompt: completo si cabe,
+    o resumido por bloques (map-reduce) si es demasiado largo
     
     Args:
-        instruccion (str): Instrucción de edición del usuario
-        resumen_actual (str): Resumen actual que se desea editar
+        model (GenerativeModel): Modelo de Gemini configurado
         contexto_transcripcion (str): Texto de la transcripción completa
-        api_key (str): API key de Google AI Studio
     
     Returns:
-        str: Nuevo resumen editado según las instrucciones
+        str: Contexto a incluir en el prompt
     """
-    if not api_key:
-        logger.warning("No se proporcionó API key de Gemini para editar resumen")
-        return "Error: API key no configurada"
-    
-    if not GEMINI_AVAILABLE:
-        logger.error("google-generativeai no está instalado")
-        return "Error: Gemini no está disponible"
-    
-    # Obtener modelo desde caché
-    model = _get_gemini_model(api_key)
-    if not model:
-        return "Error: No se pudo configurar Gemini"
+    def generar(prompt):
+        return model.generate_content(prompt).text
     
-    try:
-        # Construir prompt específico para edición
-        prompt = f"""You are an expert assistant that helps edit and improve summaries of meeting transcriptions.
+    return condensar_transcripcion(
+        contexto_transcripcion,
+        generar,
+        clave_modelo=f"gemini:{_gemini_cache['model_name']}"
+    )
+
+def _prompt_edicion(instruccion, resumen_actual, contexto):
+    """Construye el prompt de edición de resumen"""
+    return f"""You are an expert assistant that helps edit and improve summaries of meeting transcriptions.
 
 ORIGINAL TRANSCRIPTION:
-{contexto_transcripcion[:8000]}
+{contexto}
 
 CURRENT SUMMARY:
 {resumen_actual}
@@ -160,59 +157,143 @@ GUIDELINES:
 
 EDITED SUMMARY:"""
 
-        response = model.generate_content(prompt)
-        return response.text
+
+def _prompt_chat(mensaje, contexto, es_extracto):
+    """Construye el prompt del chat sobre la transcripción"""
+    if es_extracto:
+        encabezado = "RELEVANT TRANSCRIPTION EXCERPTS (turns not related to the question are omitted as [...]):"
+    else:
+        encabezado = "TRANSCRIPTION CONTEXT:"
     
-    except Exception as e:
-        logger.error(f"Error al editar resumen con Gemini: {str(e)}")
-        return f"Error al editar el resumen: {str(e)}"
+    return f"""You are an expert assistant who helps analyze and answer questions about meeting transcriptions.
 
+{encabezado}
+{contexto}
 
-def chat_con_gemini(mensaje, contexto_transcripcion, api_key=None, historial_chat=None):
+INSTRUCTIONS:
+- Respond in a clear, concise, and professional manner
+- Base your answers on the transcription content
+- If the question cannot be answered with the available information, indicate so
+- Use markdown format to structure long responses
+- Be specific and cite relevant parts when appropriate
+- Do not use emojis, use bullet points instead if necessary
+
+USER QUESTION:
+{mensaje}
+
+Answer:"""
+
+
+def _preparar_modelo(api_key, operacion):
     """
-    Maneja conversaciones sobre la transcripción usando Gemini
+    Valida la configuración y obtiene el modelo de Gemini
     
     Args:
-        mensaje (str): Mensaje del usuario
-        contexto_transcripcion (str): Texto de la transcripción completa
         api_key (str): API key de Google AI Studio
-        historial_chat (list): Historial previo de mensajes (opcional)
+        operacion (str): Descripción para el log ('chat', 'editar resumen')
     
     Returns:
-        str: Respuesta de Gemini
+        tuple: (modelo, None) o (None, mensaje "Error: ...")
     """
     if not api_key:
-        logger.warning("No se proporcionó API key de Gemini para chat")
-        return "Error: API key no configurada"
+        logger.warning(f"No se proporcionó API key de Gemini para {operacion}")
+        return None, "Error: API key no configurada"
     
     if not GEMINI_AVAILABLE:
         logger.error("google-generativeai no está instalado")
-        return "Error: Gemini no está disponible"
+        return None, "Error: Gemini no está disponible"
     
     # Obtener modelo desde caché
     model = _get_gemini_model(api_key)
     if not model:
-        return "Error: No se pudo configurar Gemini"
+        return None, "Error: No se pudo configurar Gemini"
+    
+    return model, None
+
+def editar_resumen_con_gemini(instruccion, resumen_actual, contexto_transcripcion, api_key=None):
+    """
+    Edita o regenera el resumen basándose en las instrucciones del usuario
+    
+    Args:
+        instruccion (str): Instrucción de edición del usuario
+        resumen_actual (str): Resumen actual que se desea editar
+        contexto_transcripcion (str): Texto de la transcripción completa
+        api_key (str): API key de Google AI Studio
+    
+    Returns:
+        str: Nuevo resumen editado según las instrucciones
+    """
+    model, error = _preparar_modelo(api_key, 'editar resumen')
+    if error:
+        return error
     
     try:
-        # Build the prompt with context
-        prompt = f"""You are an expert assistant who helps analyze and answer questions about meeting transcriptions.
+        contexto = _condensar_contexto(model, contexto_transcripcion)
+        
+        # Construir prompt específico para edición
+        prompt = _prompt_edicion(instruccion, resumen_actual, contexto)
 
-TRANSCRIPTION CONTEXT:
-{contexto_transcripcion[:8000]}  # Limit context to avoid exceeding limits
+        response = model.generate_content(prompt)
+        return response.text
+    
+    except Exception as e:
+        logger.error(f"Error al editar resumen con Gemini: {str(e)}")
+        return f"Error al editar el resumen: {str(e)}"
 
-INSTRUCTIONS:
-- Respond in a clear, concise, and professional manner
-- Base your answers on the transcription content
-- If the question cannot be answered with the available information, indicate so
-- Use markdown format to structure long responses
-- Be specific and cite relevant parts when appropriate
-- Do not use emojis, use bullet points instead if necessary
 
-USER QUESTION:
-{mensaje}
+def editar_resumen_con_gemini_stream(instruccion, resumen_actual, contexto_transcripcion, api_key=None):
+    """
+    Igual que editar_resumen_con_gemini, pero entrega el resumen a medida que se genera
+    
+    Args:
+        instruccion (str): Instrucción de edición del usuario
+        resumen_actual (str): Resumen actual que se desea editar
+        contexto_transcripcion (str): Texto de la transcripción completa
+        api_key (str): API key de Google AI Studio
+    
+    Yields:
+        str: Fragmentos del resumen editado (ErrorStream si falla)
+    """
+    model, error = _preparar_modelo(api_key, 'editar resumen')
+    if error:
+        yield ErrorStream(error)
+        return
+    
+    try:
+        contexto = _condensar_contexto(model, contexto_transcripcion)
+        prompt = _prompt_edicion(instruccion, resumen_actual, contexto)
+        
+        yield from textos_gemini(model.generate_content(prompt, stream=True))
+    
+    except Exception as e:
+        logger.error(f"Error al editar resumen con Gemini: {str(e)}")
+        yield ErrorStream(f"Error al editar el resumen: {str(e)}")
 
-Answer:"""
+
+def chat_con_gemini(mensaje, contexto_transcripcion, api_key=None, historial_chat=None, es_extracto=False):
+    """
+    Maneja conversaciones sobre la transcripción usando Gemini
+    
+    Args:
+        mensaje (str): Mensaje del usuario
+        contexto_transcripcion (str): Texto de la transcripción completa, o los turnos
+                                      relevantes para la pregunta si es_extracto es True
+        api_key (str): API key de Google AI Studio
+        historial_chat (list): Historial previo de mensajes (opcional)
+        es_extracto (bool): El contexto contiene solo algunos turnos de la transcripción
+    
+    Returns:
+        str: Respuesta de Gemini
+    """
+    model, error = _preparar_modelo(api_key, 'chat')
+    if error:
+        return error
+    
+    try:
+        contexto = _condensar_contexto(model, contexto_transcripcion)
+        
+        # Build the prompt with context
+        prompt = _prompt_chat(mensaje, contexto, es_extracto)
 
         response = model.generate_content(prompt)
         return response.text
@@ -222,6 +303,36 @@ Answer:"""
         return f"Lo siento, ocurrió un error al procesar tu pregunta: {str(e)}"
 
 
+def chat_con_gemini_stream(mensaje, contexto_transcripcion, api_key=None, historial_chat=None, es_extracto=False):
+    """
+    Igual que chat_con_gemini, pero entrega la respuesta a medida que se genera
+    
+    Args:
+        mensaje (str): Mensaje del usuario
+        contexto_transcripcion (str): Transcripción completa o turnos relevantes
+        api_key (str): API key de Google AI Studio
+        historial_chat (list): Historial previo de mensajes (opcional)
+        es_extracto (bool): El contexto contiene solo algunos turnos de la transcripción
+    
+    Yields:
+        str: Fragmentos de la respuesta (ErrorStream si falla)
+    """
+    model, error = _preparar_modelo(api_key, 'chat')
+    if error:
+        yield ErrorStream(error)
+        return
+    
+    try:
+        contexto = _condensar_contexto(model, contexto_transcripcion)
+        prompt = _prompt_chat(mensaje, contexto, es_extracto)
+        
+        yield from textos_gemini(model.generate_content(prompt, stream=True))
+    
+    except Exception as e:
+        logger.error(f"Error en chat con Gemini: {str(e)}")
+        yield ErrorStream(f"Lo siento, ocurrió un error al procesar tu pregunta: {str(e)}")
+
+
 def generar_resumen_con_agente(transcription, agent_config, gemini_api_key=None, openai_api_key=None):
     """
     Genera un resumen usando un agente personalizado
@@ -250,4 +361,32 @@ def generar_resumen_con_agente(transcription, agent_config, gemini_api_key=None,
         return "Error: Servicio de agentes no disponible"
     except Exception as e:
         logger.error(f"Error al generar resumen con agente: {str(e)}")
-        return f"Error: {str(e)}"
\ No newline at end of file
+        return f"Error: {str(e)}"
+
+
+def generar_resumen_con_agente_stream(transcription, agent_config, gemini_api_key=None, openai_api_key=None):
+    """
+    Igual que generar_resumen_con_agente, pero entrega el resumen a medida que se genera
+    
+    Args:
+        transcription (str): Texto de la transcripción
+        agent_config (dict): Configuración del agente personalizado
+        gemini_api_key (str): API key de Gemini (opcional)
+        openai_api_key (str): API key de OpenAI (opcional)
+    
+    Yields:
+        str: Fragmentos del resumen (ErrorStream si falla)
+    """
+    try:
+        from agents.agents_service import generate_with_agent_stream
+    except ImportError:
+        logger.error("agents.agents_service no está disponible")
+        yield ErrorStream("Error: Servicio de agentes no disponible")
+        return
+    
+    yield from generate_with_agent_stream(
+        agent_config=agent_config,
+        transcription=transcription,
+        gemini_api_key=gemini_api_key,
+        openai_api_key=openai_api_key
+    )
\ No newline at end of file
@@ -7,10 +7,14 @@ import soundcard as sc
 import soundfile as sf
 import os
 import uuid
+import queue
 import logging
+import tempfile
 import threading
-import numpy as np
 import warnings
+from concurrent.futures import CancelledError
+from audio_mixing import guardar_grabacion, abrir_pista, muestras_pista
+from media_pool import run_media_task
  
 logger = logging.getLogger(__name__)
 
@@ -26,8 +30,11 @@ recording_state = {
     'active': False,
     'system_thread': None,
     'mic_thread': None,
-    'system_data': [],
-    'mic_data': [],
+    # Pistas en disco (audio_mixing.abrir_pista) y bloques de 1 segundo escritos
+    'system_path': None,
+    'mic_path': None,
+    'system_chunks': 0,
+    'mic_chunks': 0,
     'file_id': None,
     'start_time': None,
     'type': None  # 'microphone', 'system', 'both'
@@ -98,14 +105,15 @@ def _grabar_sistema_thread():
         with sc.get_microphone(id=str(default_speaker.name), include_loopback=True).recorder(
             samplerate=SAMPLE_RATE,
             blocksize=BLOCKSIZE
-        ) as mic:
+        ) as mic, abrir_pista(recording_state['system_path'], SAMPLE_RATE, 'w') as pista:
             while recording_state['active']:
                 # Grabar 1 segundo de audio
                 chunk = mic.record(numframes=SAMPLE_RATE)
                
-                # Guardar el chunk en la lista (solo canal mono)
+                # Escribir el chunk en la pista (solo canal mono)
                 if chunk.shape[1] > 0:
-                    recording_state['system_data'].append(chunk[:, 0])
+                    pista.write(chunk[:, 0])
+                    recording_state['system_chunks'] += 1
        
         logger.info("Thread de grabación del sistema detenido")
        
@@ -129,16 +137,18 @@ def _grabar_microfono_thread():
             return
        
         # Grabar en chunks de 1 segundo con buffer más grande
-        with default_mic.recorder(samplerate=SAMPLE_RATE, blocksize=BLOCKSIZE) as mic:
+        with default_mic.recorder(samplerate=SAMPLE_RATE, blocksize=BLOCKSIZE) as mic, \
+                abrir_pista(recording_state['mic_path'], SAMPLE_RATE, 'w') as pista:
             while recording_state['active']:
                 # Grabar 1 segundo de audio
                 chunk = mic.record(numframes=SAMPLE_RATE)
                
-                # Guardar el chunk en la lista (solo canal mono)
+                # Escribir el chunk en la pista (solo canal mono)
                 if len(chunk.shape) > 1 and chunk.shape[1] > 0:
-                    recording_state['mic_data'].append(chunk[:, 0])
+                    pista.write(chunk[:, 0])
                 else:
-                    recording_state['mic_data'].append(chunk)
+                    pista.write(chunk)
+                recording_state['mic_chunks'] += 1
        
         logger.info("Thread de grabación del micrófono detenido")
        
@@ -146,6 +156,32 @@ def _grabar_microfono_thread():
         logger.error(f"Error en thread de grabación del micrófono: {str(e)}")
  
  
+def _crear_pista(fuente):
+    """
+    Crea el archivo temporal donde el thread de grabación escribe una fuente
+   
+    Args:
+        fuente (str): 'system' o 'mic'
+   
+    Returns:
+        str: Ruta del archivo
+    """
+    fd, ruta = tempfile.mkstemp(prefix=f"grabacion_{fuente}_", suffix='.f32')
+    os.close(fd)
+    return ruta
+ 
+ 
+def _eliminar_pistas():
+    """Borra las pistas temporales de la grabación"""
+    for clave in ('system_path', 'mic_path'):
+        if recording_state[clave]:
+            try:
+                os.remove(recording_state[clave])
+            except OSError:
+                pass
+            recording_state[clave] = None
+ 
+ 
 def iniciar_grabacion_sistema(output_dir='uploads', recording_type='both'):
     """
     Inicia la grabación continua del audio según el tipo especificado
@@ -171,8 +207,10 @@ def iniciar_grabacion_sistema(output_dir='uploads', recording_type='both'):
        
         # Reiniciar el estado
         recording_state['active'] = True
-        recording_state['system_data'] = []
-        recording_state['mic_data'] = []
+        recording_state['system_path'] = _crear_pista('system') if recording_type in ['system', 'both'] else None
+        recording_state['mic_path'] = _crear_pista('mic') if recording_type in ['microphone', 'both'] else None
+        recording_state['system_chunks'] = 0
+        recording_state['mic_chunks'] = 0
         recording_state['file_id'] = unique_name
         recording_state['start_time'] = None
         recording_state['type'] = recording_type
@@ -205,53 +243,10 @@ def iniciar_grabacion_sistema(output_dir='uploads', recording_type='both'):
     except Exception as e:
         logger.error(f"Error al iniciar grabación: {str(e)}")
         recording_state['active'] = False
+        _eliminar_pistas()
         return None
  
  
-def _mezclar_audios(system_data, mic_data, system_volume=0.6, mic_volume=0.4):
-    """
-    Mezcla dos arrays de audio con volúmenes ajustables
-   
-    Args:
-        system_data (numpy.array): Array con datos del sistema
-        mic_data (numpy.array): Array con datos del micrófono
-        system_volume (float): Volumen del sistema (0.0 a 1.0)
-        mic_volume (float): Volumen del micrófono (0.0 a 1.0)
-   
-    Returns:
-        numpy.array: Audio mezclado
-    """
-    # Igualar longitudes tomando la menor
-    min_length = min(len(system_data), len(mic_data))
-   
-    if min_length == 0:
-        # Si uno está vacío, devolver el otro
-        if len(system_data) > 0:
-            logger.warning("No hay datos del micrófono, usando solo audio del sistema")
-            return system_data
-        elif len(mic_data) > 0:
-            logger.warning("No hay datos del sistema, usando solo audio del micrófono")
-            return mic_data
-        else:
-            return np.array([])
-   
-    # Truncar al tamaño mínimo
-    system_truncated = system_data[:min_length]
-    mic_truncated = mic_data[:min_length]
-   
-    # Mezclar con los volúmenes especificados
-    mixed = (system_truncated * system_volume) + (mic_truncated * mic_volume)
-   
-    # Normalizar para evitar clipping
-    max_val = np.abs(mixed).max()
-    if max_val > 1.0:
-        mixed = mixed / max_val
-   
-    logger.info(f"Audio mezclado: {min_length} muestras ({min_length/SAMPLE_RATE:.2f}s), sistema={system_volume}, mic={mic_volume}")
-   
-    return mixed
- 
- 
 def detener_grabacion_sistema(output_dir='uploads', system_volume=0.6, mic_volume=0.4):
     """
     Detiene la grabación del audio (sistema, micrófono o ambos) y guarda el archivo
@@ -282,35 +277,30 @@ def detener_grabacion_sistema(output_dir='uploads', system_volume=0.6, mic_volum
         if recording_state['mic_thread'] and recording_state['mic_thread'].is_alive():
             recording_state['mic_thread'].join(timeout=2)
        
-        # Concatenar todos los chunks de cada fuente
-        system_audio = np.concatenate(recording_state['system_data']) if recording_state['system_data'] else np.array([])
-        mic_audio = np.concatenate(recording_state['mic_data']) if recording_state['mic_data'] else np.array([])
-       
         # Verificar que hay datos grabados
-        if len(system_audio) == 0 and len(mic_audio) == 0:
+        if not muestras_pista(recording_state['system_path']) and not muestras_pista(recording_state['mic_path']):
             logger.error("No se grabaron datos de audio")
+            _eliminar_pistas()
             return None
        
-        # Procesar audio según el tipo de grabación
-        if recording_type == 'system':
-            final_audio = system_audio
-            logger.info(f"Audio del sistema procesado: {len(final_audio)} muestras")
-        elif recording_type == 'microphone':
-            final_audio = mic_audio
-            logger.info(f"Audio del micrófono procesado: {len(final_audio)} muestras")
-        else:  # 'both'
-            final_audio = _mezclar_audios(system_audio, mic_audio, system_volume, mic_volume)
-            if len(final_audio) == 0:
-                logger.error("Error al mezclar los audios")
-                return None
-       
-        # Guardar el archivo
+        # Mezclar y guardar en el pool de medios (fuera del thread HTTP): solo
+        # se envían las rutas de las pistas, no el audio
         output_path = os.path.join(output_dir, recording_state['file_id'])
-        sf.write(file=output_path, data=final_audio, samplerate=SAMPLE_RATE)
+        argumentos = (output_path, recording_state['system_path'], recording_state['mic_path'],
+                      recording_type, SAMPLE_RATE, system_volume, mic_volume)
+        try:
+            duration = run_media_task('guardar_grabacion', *argumentos)
+        except (queue.Full, TimeoutError, CancelledError, RuntimeError) as e:
+            # La grabación no se puede perder (pool lleno, tarea vencida o cancelada,
+            # worker caído): guardarla en este thread
+            logger.warning(f"No se pudo guardar la grabación en el pool de medios ({e}), guardando en este thread")
+            duration = guardar_grabacion(*argumentos)
+       
+        if duration is None:
+            return None
        
         # Obtener información del archivo
         file_size = os.path.getsize(output_path)
-        duration = len(final_audio) / SAMPLE_RATE
        
         logger.info(f"Audio guardado exitosamente: {output_path} ({duration:.2f} segundos)")
        
@@ -321,13 +311,12 @@ def detener_grabacion_sistema(output_dir='uploads', system_volume=0.6, mic_volum
             'duration': duration,
             'status': 'completed',
             'type': recording_type,
-            'system_chunks': len(recording_state['system_data']),
-            'mic_chunks': len(recording_state['mic_data'])
+            'system_chunks': recording_state['system_chunks'],
+            'mic_chunks': recording_state['mic_chunks']
         }
        
         # Limpiar el estado
-        recording_state['system_data'] = []
-        recording_state['mic_data'] = []
+        _eliminar_pistas()
         recording_state['file_id'] = None
         recording_state['system_thread'] = None
         recording_state['mic_thread'] = None
@@ -338,8 +327,7 @@ def detener_grabacion_sistema(output_dir='uploads', system_volume=0.6, mic_volum
     except Exception as e:
         logger.error(f"Error al detener grabación: {str(e)}")
         recording_state['active'] = False
-        recording_state['system_data'] = []
-        recording_state['mic_data'] = []
+        _eliminar_pistas()
         return None
  
  
@@ -3,7 +3,8 @@ Servicio para operaciones CRUD de equipos (teams)
 """
 
 import logging
-from database import execute_query
+from database import execute_query, execute_values, transaction
+from access_cache import invalidate_supervisor, invalidate_team
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +35,7 @@ def create_team(name, supervisor_id, description=None):
         )
         
         if result:
+            invalidate_supervisor(supervisor_id)
             logger.info(f"Equipo creado: ID={result['id']}, supervisor={supervisor_id}")
             return result['id']
         return None
@@ -74,6 +76,7 @@ def add_user_to_team(team_id, user_id):
         result = execute_query(query, (team_id, user_id), fetch_one=True)
         
         if result:
+            invalidate_team(team_id)
             logger.info(f"Usuario {user_id} agregado al equipo {team_id}")
             return True
         return False
@@ -83,6 +86,94 @@ def add_user_to_team(team_id, user_id):
         return False
 
 
+def create_team_with_members(name, supervisor_id, member_ids, description=None):
+    """
+    Crea un equipo y agrega sus miembros en una sola transacción
+    Si falla cualquier paso no se guarda nada
+    
+    Args:
+        name (str): Nombre del equipo
+        supervisor_id (int): ID del supervisor
+        member_ids (list): IDs de los usuarios a agregar
+        description (str): Descripción del equipo (opcional)
+        
+    Returns:
+        int: ID del equipo creado o None si falla
+    """
+    try:
+        # Sin duplicados, conservando el orden
+        member_ids = list(dict.fromkeys(member_ids or []))
+        
+        with transaction() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO teams (name, supervisor_id, description)
+                VALUES (%s, %s, %s)
+                RETURNING id
+                """,
+                (name, supervisor_id, description)
+            )
+            team_id = cursor.fetchone()['id']
+            
+            execute_values(
+                "INSERT INTO team_members (team_id, user_id) VALUES %s",
+                [(team_id, user_id) for user_id in member_ids],
+                cursor=cursor
+            )
+        
+        invalidate_supervisor(supervisor_id)
+        logger.info(f"Equipo creado: ID={team_id}, supervisor={supervisor_id}, miembros={len(member_ids)}")
+        return team_id
+        
+    except Exception as e:
+        logger.error(f"Error al crear equipo con miembros: {e}")
+        return None
+
+
+def add_users_to_team(team_id, user_ids):
+    """
+    Agrega varios usuarios a un equipo con una sola sentencia,
+    ignorando los que ya son miembros
+    
+    Args:
+        team_id (int): ID del equipo
+        user_ids (list): IDs de los usuarios
+        
+    Returns:
+        list: IDs de los usuarios agregados (vacía si falla)
+    """
+    try:
+        query = """
+            INSERT INTO team_members (team_id, user_id)
+            SELECT v.team_id, v.user_id
+            FROM (VALUES %s) AS v(team_id, user_id)
+            WHERE NOT EXISTS (
+                SELECT 1 FROM team_members tm
+                WHERE tm.team_id = v.team_id AND tm.user_id = v.user_id
+            )
+            RETURNING user_id
+        """
+        rows = execute_values(
+            query,
+            [(team_id, user_id) for user_id in dict.fromkeys(user_ids or [])],
+            template="(%s::bigint, %s::bigint)",
+            fetch=True
+        )
+        
+        if rows is None:
+            return []
+        
+        added = [r['user_id'] for r in rows]
+        if added:
+            invalidate_team(team_id)
+        logger.info(f"{len(added)} usuarios agregados al equipo {team_id}")
+        return added
+        
+    except Exception as e:
+        logger.error(f"Error al agregar usuarios al equipo {team_id}: {e}")
+        return []
+
+
 # ==================== READ ====================
 
 def get_team_by_id(team_id):
@@ -314,6 +405,9 @@ def update_team(team_id, name=None, description=None, supervisor_id=None):
         rows = execute_query(query, tuple(params))
         
         if rows and rows > 0:
+            invalidate_team(team_id)
+            if supervisor_id is not None:
+                invalidate_supervisor(supervisor_id)
             logger.info(f"Equipo {team_id} actualizado")
             return True
         return False
@@ -344,6 +438,7 @@ def remove_user_from_team(team_id, user_id):
         rows = execute_query(query, (team_id, user_id))
         
         if rows and rows > 0:
+            invalidate_team(team_id)
             logger.info(f"Usuario {user_id} removido del equipo {team_id}")
             return True
         return False
@@ -370,6 +465,7 @@ def delete_team(team_id):
         rows = execute_query(query, (team_id,))
         
         if rows and rows > 0:
+            invalidate_team(team_id)
             logger.info(f"Equipo {team_id} eliminado")
             return True
         return False
@@ -0,0 +1,334 @@
+"""
+Caché persistente de transcripciones
+Guarda el resultado json-v2 de Speechmatics en disco, indexado por el SHA-256
+del audio y la configuración de transcripción, para no pagar de nuevo por
+transcribir el mismo archivo con la misma configuración
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Directorio de la caché (configurable por variable de entorno)
+CACHE_DIR = os.environ.get(
+    'TRANSCRIPTION_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'transcriptions')
+)
+
+# Tiempo de vida de una entrada (segundos, por defecto 30 días)
+CACHE_TTL_SECONDS = int(os.environ.get('TRANSCRIPTION_CACHE_TTL', 30 * 24 * 3600))
+
+# Tamaño máximo de la caché en disco (bytes, por defecto 2GB)
+CACHE_MAX_BYTES = int(os.environ.get('TRANSCRIPTION_CACHE_MAX_BYTES', 2 * 1024 * 1024 * 1024))
+
+# Intervalo mínimo entre dos purgas automáticas (segundos)
+CACHE_PURGE_INTERVAL = int(os.environ.get('TRANSCRIPTION_CACHE_PURGE_INTERVAL', 3600))
+
+# Tamaño de bloque para calcular el hash del audio
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Hashes calculados al recibir los archivos (no se vuelven a leer del disco)
+MAX_KNOWN_HASHES = 1024
+
+_stats = {
+    'hits': 0,
+    'misses': 0,
+    'stores': 0,
+    'evictions': 0
+}
+_lock = threading.Lock()
+_estado = {'ultima_purga': None, 'purgando': False}
+# (ruta, tamaño, mtime) -> SHA-256
+_hashes_conocidos = OrderedDict()
+
+
+def _identidad_archivo(archivo_audio):
+    """Ruta, tamaño y fecha de modificación (cambian si se reescribe el archivo)"""
+    info = os.stat(archivo_audio)
+    return (os.path.realpath(archivo_audio), info.st_size, info.st_mtime_ns)
+
+
+def registrar_hash_audio(archivo_audio, audio_hash):
+    """
+    Registra el SHA-256 de un archivo calculado mientras se recibía, para que
+    calcular_hash_audio no tenga que volver a leerlo
+
+    Args:
+        archivo_audio (str): Ruta al archivo
+        audio_hash (str): Hash hexadecimal del contenido
+    """
+    identidad = _identidad_archivo(archivo_audio)
+
+    with _lock:
+        _hashes_conocidos[identidad] = audio_hash
+        _hashes_conocidos.move_to_end(identidad)
+        while len(_hashes_conocidos) > MAX_KNOWN_HASHES:
+            _hashes_conocidos.popitem(last=False)
+
+
+def calcular_hash_audio(archivo_audio):
+    """
+    Calcula el SHA-256 del contenido de un archivo leyéndolo por bloques
+    (salvo que se registrara al recibirlo con registrar_hash_audio)
+
+    Args:
+        archivo_audio (str): Ruta al archivo
+
+    Returns:
+        str: Hash hexadecimal del contenido
+    """
+    identidad = _identidad_archivo(archivo_audio)
+    with _lock:
+        audio_hash = _hashes_conocidos.get(identidad)
+    if audio_hash is not None:
+        return audio_hash
+
+    sha256 = hashlib.sha256()
+
+    with open(archivo_audio, 'rb') as f:
+        for bloque in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            sha256.update(bloque)
+
+    return sha256.hexdigest()
+
+
+def construir_clave_cache(audio_hash, config):
+    """
+    Construye la clave de caché a partir del hash del audio y la configuración
+
+    Args:
+        audio_hash (str): SHA-256 del audio
+        config (dict): Configuración del trabajo de Speechmatics
+
+    Returns:
+        str: Clave de caché (hexadecimal)
+    """
+    # Solo las partes de la configuración que afectan al resultado
+    relevante = {
+        'transcription_config': config.get('transcription_config'),
+        'summarization_config': config.get('summarization_config')
+    }
+    config_serializada = json.dumps(relevante, sort_keys=True)
+
+    return hashlib.sha256(f"{audio_hash}:{config_serializada}".encode()).hexdigest()
+
+
+def _ruta_entrada(clave):
+    """Ruta del archivo de una entrada (directorios repartidos por prefijo)"""
+    return os.path.join(CACHE_DIR, clave[:2], f"{clave}.json")
+
+
+def obtener_transcripcion_cache(clave):
+    """
+    Obtiene un resultado de la caché
+
+    Args:
+        clave (str): Clave de caché
+
+    Returns:
+        dict: Resultado json-v2 de Speechmatics o None si no está o expiró
+    """
+    ruta = _ruta_entrada(clave)
+
+    try:
+        if not os.path.exists(ruta):
+            with _lock:
+                _stats['misses'] += 1
+            return None
+
+        # Entrada expirada
+        if time.time() - os.path.getmtime(ruta) > CACHE_TTL_SECONDS:
+            os.remove(ruta)
+            with _lock:
+                _stats['misses'] += 1
+                _stats['evictions'] += 1
+            return None
+
+        with open(ruta, 'r', encoding='utf-8') as f:
+            resultado = json.load(f)
+
+        # Actualizar la fecha de acceso para el desalojo por tamaño (LRU)
+        os.utime(ruta, (time.time(), os.path.getmtime(ruta)))
+
+        with _lock:
+            _stats['hits'] += 1
+
+        logger.info(f"Transcripción obtenida de caché: {clave[:12]}")
+        return resultado
+
+    except Exception as e:
+        logger.error(f"Error al leer caché de transcripción {clave[:12]}: {e}")
+        with _lock:
+            _stats['misses'] += 1
+        return None
+
+
+def guardar_transcripcion_cache(clave, resultado):
+    """
+    Guarda un resultado en la caché y aplica el desalojo por tamaño y TTL
+
+    Args:
+        clave (str): Clave de caché
+        resultado (dict): Resultado json-v2 de Speechmatics
+
+    Returns:
+        bool: True si se guardó correctamente
+    """
+    if not resultado:
+        return False
+
+    ruta = _ruta_entrada(clave)
+
+    try:
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+
+        # Escritura atómica: archivo temporal + rename
+        ruta_tmp = f"{ruta}.{threading.get_ident()}.tmp"
+        with open(ruta_tmp, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, ensure_ascii=False)
+        os.replace(ruta_tmp, ruta)
+
+        with _lock:
+            _stats['stores'] += 1
+
+        _purgar_si_toca()
+        return True
+
+    except Exception as e:
+        logger.error(f"Error al guardar caché de transcripción {clave[:12]}: {e}")
+        return False
+
+
+def guardar_transcripcion_cache_en_stream(clave, fragmentos):
+    """
+    Copia a la caché los fragmentos de un resultado json-v2 mientras se consumen,
+    sin tener el documento completo en memoria. La entrada solo se publica si
+    el stream se consume hasta el final
+    
+    Args:
+        clave (str): Clave de caché
+        fragmentos (iterable): Fragmentos del resultado (bytes)
+    
+    Yields:
+        bytes: Los mismos fragmentos recibidos
+    """
+    ruta = _ruta_entrada(clave)
+    ruta_tmp = f"{ruta}.{threading.get_ident()}.tmp"
+    
+    try:
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        f = open(ruta_tmp, 'wb')
+    except Exception as e:
+        logger.error(f"Error al abrir caché de transcripción {clave[:12]}: {e}")
+        yield from fragmentos
+        return
+    
+    completo = False
+    try:
+        with f:
+            for fragmento in fragmentos:
+                f.write(fragmento)
+                yield fragmento
+        completo = True
+    finally:
+        if completo:
+            os.replace(ruta_tmp, ruta)
+            with _lock:
+                _stats['stores'] += 1
+            _purgar_si_toca()
+        elif os.path.exists(ruta_tmp):
+            os.remove(ruta_tmp)
+
+
+def purgar_cache():
+    """
+    Elimina las entradas expiradas y, si la caché supera CACHE_MAX_BYTES,
+    las menos usadas recientemente
+
+    Returns:
+        int: Número de entradas eliminadas
+    """
+    if not os.path.isdir(CACHE_DIR):
+        return 0
+
+    ahora = time.time()
+    entradas = []
+    eliminadas = 0
+
+    for directorio, _, archivos in os.walk(CACHE_DIR):
+        for nombre in archivos:
+            if not nombre.endswith('.json'):
+                continue
+            ruta = os.path.join(directorio, nombre)
+            try:
+                info = os.stat(ruta)
+                if ahora - info.st_mtime > CACHE_TTL_SECONDS:
+                    os.remove(ruta)
+                    eliminadas += 1
+                else:
+                    entradas.append((info.st_atime, info.st_size, ruta))
+            except OSError:
+                continue
+
+    total = sum(size for _, size, _ in entradas)
+
+    if total > CACHE_MAX_BYTES:
+        # Eliminar primero las de acceso más antiguo
+        for _, size, ruta in sorted(entradas):
+            if total <= CACHE_MAX_BYTES:
+                break
+            try:
+                os.remove(ruta)
+                total -= size
+                eliminadas += 1
+            except OSError:
+                continue
+
+    if eliminadas:
+        with _lock:
+            _stats['evictions'] += eliminadas
+        logger.info(f"{eliminadas} entradas eliminadas de la caché de transcripciones")
+
+    return eliminadas
+
+
+def _purgar_si_toca():
+    """Lanza una purga en segundo plano si pasó CACHE_PURGE_INTERVAL desde la última"""
+    with _lock:
+        ultima = _estado['ultima_purga']
+        if _estado['purgando'] or (ultima is not None and time.monotonic() - ultima < CACHE_PURGE_INTERVAL):
+            return
+        _estado['purgando'] = True
+        _estado['ultima_purga'] = time.monotonic()
+
+    def ejecutar():
+        try:
+            purgar_cache()
+        except Exception as e:
+            logger.error(f"Error al purgar la caché de transcripciones: {e}", exc_info=True)
+        finally:
+            with _lock:
+                _estado['purgando'] = False
+
+    threading.Thread(target=ejecutar, name='transcription-cache-purge', daemon=True).start()
+
+
+def get_cache_stats():
+    """
+    Obtiene los contadores de la caché
+
+    Returns:
+        dict: Aciertos, fallos, escrituras, desalojos y tasa de aciertos
+    """
+    with _lock:
+        stats = dict(_stats)
+
+    consultas = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / consultas, 3) if consultas else 0.0
+    return stats
@@ -6,31 +6,42 @@ Adaptado de ejemplo_speechmatics.py para uso como servicio
 from speechmatics.models import ConnectionSettings
 from speechmatics.batch_client import BatchClient
 from httpx import HTTPStatusError
+from transcription_cache import (calcular_hash_audio, construir_clave_cache,
+                                 obtener_transcripcion_cache, guardar_transcripcion_cache)
+from audio_chunking import obtener_duracion_audio, dividir_audio_en_silencios, eliminar_segmentos
+from json_stream import iterar_json_v2
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from bisect import bisect_left
 import logging
 import json
+import os
 
 logger = logging.getLogger(__name__)
 
-def transcribir_audio_service(archivo_audio, api_key, idioma, enable_summarization=True):
+# URL de la API batch (configurable para apuntar a un servidor local de pruebas)
+SPEECHMATICS_URL = os.environ.get('SPEECHMATICS_URL', "https://asr.api.speechmatics.com/v2")
+
+# Número de segmentos para transcribir en paralelo grabaciones largas (1 = un solo trabajo)
+PARALLEL_SEGMENTS = int(os.environ.get('TRANSCRIPTION_PARALLEL_SEGMENTS', 1))
+
+# Duración mínima (segundos) para dividir una grabación en segmentos
+CHUNK_MIN_SECONDS = float(os.environ.get('TRANSCRIPTION_CHUNK_MIN_SECONDS', 20 * 60))
+
+
+def _construir_config(idioma, enable_summarization=True, notification_url=None, notification_auth_header=None):
     """
-    Transcribe un archivo de audio usando Speechmatics API (modo batch)
+    Construye la configuración del trabajo de transcripción
     
     Args:
-        archivo_audio (str): Ruta al archivo de audio (mp3, wav, m4a, etc.)
-        api_key (str): Tu clave API de Speechmatics
         idioma (str): Código del idioma ('es', 'en', etc.)
         enable_summarization (bool): Habilitar resumen automático de Speechmatics
+        notification_url (str): URL a la que Speechmatics notificará al terminar (opcional)
+        notification_auth_header (str): Cabecera de autenticación para la notificación (opcional)
     
     Returns:
-        dict: Diccionario con la transcripción, resumen y metadatos, o None si hay error
+        dict: Configuración del trabajo
     """
-    
-    # Configurar la conexión
-    settings = ConnectionSettings(
-        url="https://asr.api.speechmatics.com/v2",
-        auth_token=api_key,
-    )
-    
     # Configuración de la transcripción
     # Documentación diarization: https://docs.speechmatics.com/features/speaker-diarization
     config = {
@@ -52,6 +63,91 @@ def transcribir_audio_service(archivo_audio, api_key, idioma, enable_summarizati
             "summary_type": "bullets"  # bullets, paragraphs
         }
     
+    # Agregar notificación de finalización si está configurada
+    # Documentación: https://docs.speechmatics.com/speech-to-text/batch/notifications
+    if notification_url:
+        # Sin "contents": la notificación solo avisa (id y status en la URL) y la
+        # transcripción se descarga una vez, en stream (notification_service)
+        notification = {
+            "url": notification_url
+        }
+        if notification_auth_header:
+            notification["auth_headers"] = [notification_auth_header]
+        config["notification_config"] = [notification]
+    
+    return config
+
+
+def clave_cache_transcripcion(archivo_audio, idioma, enable_summarization=True):
+    """
+    Calcula la clave de caché de un audio (SHA-256 del contenido + configuración)
+    
+    Args:
+        archivo_audio (str): Ruta al archivo de audio
+        idioma (str): Código del idioma ('es', 'en', etc.)
+        enable_summarization (bool): Habilitar resumen automático de Speechmatics
+    
+    Returns:
+        str: Clave de caché o None si no se pudo leer el archivo
+    """
+    try:
+        audio_hash = calcular_hash_audio(archivo_audio)
+    except OSError as e:
+        logger.error(f"No se pudo calcular el hash de '{archivo_audio}': {e}")
+        return None
+    
+    return construir_clave_cache(audio_hash, _construir_config(idioma, enable_summarization))
+
+
+def transcribir_audio_service(archivo_audio, api_key, idioma, enable_summarization=True, use_cache=True,
+                              num_segmentos=None):
+    """
+    Transcribe un archivo de audio usando Speechmatics API (modo batch)
+    
+    Args:
+        archivo_audio (str): Ruta al archivo de audio (mp3, wav, m4a, etc.)
+        api_key (str): Tu clave API de Speechmatics
+        idioma (str): Código del idioma ('es', 'en', etc.)
+        enable_summarization (bool): Habilitar resumen automático de Speechmatics
+        use_cache (bool): Reutilizar una transcripción previa del mismo audio y configuración
+        num_segmentos (int): Dividir grabaciones largas en N segmentos transcritos en paralelo
+                             (opcional, por defecto TRANSCRIPTION_PARALLEL_SEGMENTS)
+    
+    Returns:
+        dict: Diccionario con la transcripción, resumen y metadatos, o None si hay error
+    """
+    
+    # Buscar una transcripción previa del mismo audio con la misma configuración
+    clave_cache = clave_cache_transcripcion(archivo_audio, idioma, enable_summarization) if use_cache else None
+    if clave_cache:
+        transcript = obtener_transcripcion_cache(clave_cache)
+        if transcript:
+            return transcript
+    
+    # Grabaciones largas: dividir en silencios y transcribir los segmentos en paralelo
+    num_segmentos = PARALLEL_SEGMENTS if num_segmentos is None else num_segmentos
+    segmentos = _preparar_segmentos(archivo_audio, num_segmentos) if num_segmentos > 1 else None
+    if segmentos:
+        try:
+            transcript = transcribir_segmentos_en_paralelo(
+                segmentos, api_key, idioma, enable_summarization, use_cache
+            )
+        finally:
+            eliminar_segmentos(segmentos)
+        
+        if transcript and clave_cache:
+            guardar_transcripcion_cache(clave_cache, transcript)
+        
+        return transcript
+    
+    # Configurar la conexión
+    settings = ConnectionSettings(
+        url=SPEECHMATICS_URL,
+        auth_token=api_key,
+    )
+    
+    config = _construir_config(idioma, enable_summarization)
+    
     try:
         # Abrir el cliente usando context manager
         with BatchClient(settings) as client:
@@ -63,10 +159,13 @@ def transcribir_audio_service(archivo_audio, api_key, idioma, enable_summarizati
                 )
                 
                 # Esperar a que se complete y obtener el resultado en formato JSON
-                # Nota: En producción, se recomienda configurar notificaciones en lugar de polling
-                # Documentación: https://docs.speechmatics.com/speech-to-text/batch/notifications
+                # Nota: Si SPEECHMATICS_NOTIFICATION_URL está configurada, /api/process usa
+                # notificaciones (ver notification_service) en lugar de este polling
                 transcript = client.wait_for_completion(job_id, transcription_format="json-v2")
                 
+                if clave_cache:
+                    guardar_transcripcion_cache(clave_cache, transcript)
+                
                 return transcript
                 
             except HTTPStatusError as e:
@@ -89,6 +188,311 @@ def transcribir_audio_service(archivo_audio, api_key, idioma, enable_summarizati
         return None
 
 
+def _preparar_segmentos(archivo_audio, num_segmentos):
+    """
+    Divide el audio en segmentos si es lo bastante largo y el formato lo permite
+    
+    Args:
+        archivo_audio (str): Ruta al archivo de audio
+        num_segmentos (int): Número de segmentos deseado
+    
+    Returns:
+        list: Segmentos (ver audio_chunking.dividir_audio_en_silencios) o None
+              para transcribir el archivo en un solo trabajo
+    """
+    duracion = obtener_duracion_audio(archivo_audio)
+    
+    if duracion is None or duracion < CHUNK_MIN_SECONDS:
+        return None
+    
+    return dividir_audio_en_silencios(archivo_audio, num_segmentos)
+
+
+def transcribir_segmentos_en_paralelo(segmentos, api_key, idioma, enable_summarization=True, use_cache=True):
+    """
+    Transcribe los segmentos de una grabación en trabajos simultáneos y une los resultados
+    
+    Args:
+        segmentos (list): Segmentos (ver audio_chunking.dividir_audio_en_silencios)
+        api_key (str): Tu clave API de Speechmatics
+        idioma (str): Código del idioma ('es', 'en', etc.)
+        enable_summarization (bool): Habilitar resumen automático de Speechmatics
+        use_cache (bool): Reutilizar transcripciones previas de cada segmento
+    
+    Returns:
+        dict: Resultado json-v2 unido, o None si falló algún segmento
+    """
+    logger.info(f"Transcribiendo {len(segmentos)} segmentos en paralelo")
+    
+    with ThreadPoolExecutor(max_workers=len(segmentos), thread_name_prefix='segmento') as executor:
+        resultados = list(executor.map(
+            lambda segmento: transcribir_audio_service(
+                segmento['path'], api_key, idioma, enable_summarization, use_cache, num_segmentos=1
+            ),
+            segmentos
+        ))
+    
+    if not all(resultados):
+        logger.error("Falló la transcripción de al menos un segmento")
+        return None
+    
+    return unir_resultados_segmentos(resultados, segmentos)
+
+
+def unir_resultados_segmentos(resultados, segmentos):
+    """
+    Une los resultados json-v2 de varios segmentos en uno solo
+    
+    Corrige los tiempos con el desplazamiento de cada segmento, empareja los
+    hablantes de cada segmento con los del anterior usando el tramo solapado
+    y descarta las palabras duplicadas de ese tramo.
+    
+    Args:
+        resultados (list): Resultados json-v2 de cada segmento (en orden)
+        segmentos (list): Segmentos correspondientes
+    
+    Returns:
+        dict: Resultado json-v2 unido
+    """
+    unido = {k: v for k, v in resultados[0].items() if k not in ('results', 'summary')}
+    items_unidos = []
+    hablantes_usados = set()
+    resumenes = []
+    
+    for indice, (resultado, segmento) in enumerate(zip(resultados, segmentos)):
+        desplazamiento = segmento['inicio']
+        items = []
+        
+        for item in resultado.get('results', []):
+            item = dict(item)
+            item['start_time'] = item.get('start_time', 0.0) + desplazamiento
+            item['end_time'] = item.get('end_time', 0.0) + desplazamiento
+            items.append(item)
+        
+        if indice == 0:
+            mapa = {}
+        else:
+            # Tramo solapado con el segmento anterior: [inicio, corte)
+            previos = [it for it in items_unidos if it['start_time'] >= segmento['inicio']]
+            solapados = [it for it in items if it['start_time'] < segmento['corte']]
+            mapa = _emparejar_hablantes(previos, solapados)
+            items = [it for it in items if it['start_time'] >= segmento['corte']]
+        
+        for item in items:
+            alternatives = item.get('alternatives')
+            if alternatives and 'speaker' in alternatives[0]:
+                hablante = alternatives[0]['speaker']
+                if hablante not in mapa:
+                    mapa[hablante] = _nueva_etiqueta_hablante(hablante, hablantes_usados, indice)
+                hablantes_usados.add(mapa[hablante])
+                item['alternatives'] = [dict(alternatives[0], speaker=mapa[hablante])] + alternatives[1:]
+            items_unidos.append(item)
+        
+        contenido_resumen = resultado.get('summary', {}).get('content')
+        if contenido_resumen:
+            resumenes.append(contenido_resumen)
+    
+    unido['results'] = items_unidos
+    
+    if resumenes:
+        unido['summary'] = dict(resultados[0].get('summary') or {}, content="\n\n".join(resumenes))
+    
+    return unido
+
+
+def _emparejar_hablantes(previos, solapados, tolerancia=0.5):
+    """
+    Empareja los hablantes de un segmento con los del anterior comparando las
+    palabras del tramo solapado (mismo contenido en el mismo instante)
+    
+    Args:
+        previos (list): Items ya unidos dentro del tramo solapado
+        solapados (list): Items del segmento nuevo dentro del tramo solapado
+        tolerancia (float): Diferencia máxima de tiempo entre palabras (segundos)
+    
+    Returns:
+        dict: Mapa hablante_nuevo -> hablante_ya_unido
+    """
+    palabras_previas = [
+        (it['start_time'], it['alternatives'][0].get('content', '').lower(), it['alternatives'][0].get('speaker'))
+        for it in previos
+        if it.get('type') == 'word' and it.get('alternatives')
+    ]
+    tiempos = [p[0] for p in palabras_previas]
+    coincidencias = {}
+    
+    for item in solapados:
+        if item.get('type') != 'word' or not item.get('alternatives'):
+            continue
+        alternative = item['alternatives'][0]
+        hablante = alternative.get('speaker')
+        contenido = alternative.get('content', '').lower()
+        if hablante is None:
+            continue
+        
+        # Buscar palabras previas con el mismo contenido cerca del mismo instante
+        pos = bisect_left(tiempos, item['start_time'] - tolerancia)
+        while pos < len(palabras_previas) and palabras_previas[pos][0] <= item['start_time'] + tolerancia:
+            _, contenido_previo, hablante_previo = palabras_previas[pos]
+            if contenido_previo == contenido and hablante_previo is not None:
+                par = (hablante, hablante_previo)
+                coincidencias[par] = coincidencias.get(par, 0) + 1
+                break
+            pos += 1
+    
+    # Asignación voraz uno a uno por número de coincidencias
+    mapa = {}
+    asignados = set()
+    for (nuevo, previo), _ in sorted(coincidencias.items(), key=lambda x: -x[1]):
+        if nuevo not in mapa and previo not in asignados:
+            mapa[nuevo] = previo
+            asignados.add(previo)
+    
+    return mapa
+
+
+def _nueva_etiqueta_hablante(hablante, hablantes_usados, indice_segmento):
+    """
+    Obtiene una etiqueta para un hablante de un segmento que no se pudo emparejar
+    
+    Args:
+        hablante (str): Etiqueta original en el segmento ('S1', 'S2', 'UU', ...)
+        hablantes_usados (set): Etiquetas ya asignadas en el resultado unido
+        indice_segmento (int): Índice del segmento
+    
+    Returns:
+        str: Etiqueta en el resultado unido
+    """
+    # 'UU' (hablante desconocido) se conserva tal cual
+    if hablante == 'UU' or (indice_segmento == 0 and hablante not in hablantes_usados):
+        return hablante
+    
+    numero = 1
+    while f"S{numero}" in hablantes_usados:
+        numero += 1
+    return f"S{numero}"
+
+
+def enviar_trabajo_transcripcion(archivo_audio, api_key, idioma, enable_summarization=True,
+                                 notification_url=None, notification_auth_header=None):
+    """
+    Envía un trabajo de transcripción sin esperar a que termine
+    
+    Args:
+        archivo_audio (str): Ruta al archivo de audio
+        api_key (str): Tu clave API de Speechmatics
+        idioma (str): Código del idioma ('es', 'en', etc.)
+        enable_summarization (bool): Habilitar resumen automático de Speechmatics
+        notification_url (str): URL de notificación de finalización (opcional)
+        notification_auth_header (str): Cabecera de autenticación para la notificación (opcional)
+    
+    Returns:
+        str: ID del trabajo en Speechmatics, o None si hay error
+    """
+    settings = ConnectionSettings(
+        url=SPEECHMATICS_URL,
+        auth_token=api_key,
+    )
+    
+    config = _construir_config(idioma, enable_summarization, notification_url, notification_auth_header)
+    
+    try:
+        with BatchClient(settings) as client:
+            return client.submit_job(
+                audio=archivo_audio,
+                transcription_config=config,
+            )
+    
+    except HTTPStatusError as e:
+        if e.response.status_code == 401:
+            logger.error("API key inválida - Verifica tu SPEECHMATICS_API_KEY")
+        else:
+            logger.error(f"Error HTTP {e.response.status_code} al enviar trabajo: {str(e)}")
+        return None
+    except FileNotFoundError:
+        logger.error(f"No se encontró el archivo '{archivo_audio}'")
+        return None
+    except Exception as e:
+        logger.error(f"Error inesperado al enviar trabajo: {str(e)}")
+        return None
+
+
+def consultar_estado_trabajo(job_id, api_key):
+    """
+    Consulta el estado de un trabajo de transcripción
+    
+    Args:
+        job_id (str): ID del trabajo en Speechmatics
+        api_key (str): Tu clave API de Speechmatics
+    
+    Returns:
+        str: Estado del trabajo ('running', 'done', 'rejected', ...) o None si hay error
+    """
+    settings = ConnectionSettings(
+        url=SPEECHMATICS_URL,
+        auth_token=api_key,
+    )
+    
+    try:
+        with BatchClient(settings) as client:
+            info = client.check_job_status(job_id)
+            return info.get('job', {}).get('status')
+    
+    except Exception as e:
+        logger.error(f"Error al consultar estado del trabajo {job_id}: {str(e)}")
+        return None
+
+
+def obtener_resultado_trabajo(job_id, api_key):
+    """
+    Descarga el resultado JSON de un trabajo de transcripción terminado
+    
+    Args:
+        job_id (str): ID del trabajo en Speechmatics
+        api_key (str): Tu clave API de Speechmatics
+    
+    Returns:
+        dict: Resultado JSON de Speechmatics o None si hay error
+    """
+    settings = ConnectionSettings(
+        url=SPEECHMATICS_URL,
+        auth_token=api_key,
+    )
+    
+    try:
+        with BatchClient(settings) as client:
+            return client.get_job_result(job_id, transcription_format="json-v2")
+    
+    except Exception as e:
+        logger.error(f"Error al obtener resultado del trabajo {job_id}: {str(e)}")
+        return None
+
+
+def descargar_resultado_en_stream(job_id, api_key, chunk_size=64 * 1024):
+    """
+    Descarga el resultado json-v2 de un trabajo por fragmentos, sin cargarlo completo
+    
+    Args:
+        job_id (str): ID del trabajo en Speechmatics
+        api_key (str): Tu clave API de Speechmatics
+        chunk_size (int): Tamaño de cada fragmento en bytes
+    
+    Yields:
+        bytes: Fragmentos del cuerpo de la respuesta
+    """
+    url = f"{SPEECHMATICS_URL.rstrip('/')}/jobs/{job_id}/transcript"
+    
+    with httpx.stream(
+        'GET', url,
+        params={'format': 'json-v2'},
+        headers={'Authorization': f"Bearer {api_key}"},
+        timeout=httpx.Timeout(30.0, read=300.0)
+    ) as response:
+        response.raise_for_status()
+        for fragmento in response.iter_bytes(chunk_size):
+            yield fragmento
+
+
 def extraer_resumen_speechmatics(resultado):
     """
     Extrae el resumen generado por Speechmatics (si está disponible)
@@ -115,106 +519,158 @@ def extraer_resumen_speechmatics(resultado):
     }
 
 
-def procesar_transcripcion_para_texto(resultado):
+class _AcumuladorTranscripcion:
     """
-    Procesa el resultado de la transcripción y lo convierte en texto plano
+    Acumula los items json-v2 uno por uno y genera el texto, los diálogos y las
+    estadísticas por hablante. Las palabras se guardan en listas que se unen al
+    final, de modo que el coste es lineal en el número de palabras.
+    """
+    
+    def __init__(self):
+        self.partes_texto = []
+        self.dialogos = []
+        self.hablantes = {}
+        self.hablante_actual = None
+        self.partes_dialogo = []
+    
+    def agregar(self, resultado_item):
+        """Procesa un item de 'results'"""
+        if resultado_item['type'] != 'word':
+            return
+        
+        # El speaker está dentro de alternatives[0] en el formato json-v2
+        alternative = resultado_item.get('alternatives', [{}])[0]
+        
+        # Cambio de hablante
+        if 'speaker' in alternative:
+            hablante = alternative['speaker']
+            
+            if hablante != self.hablante_actual:
+                # Guardar el diálogo anterior si existe
+                if self.hablante_actual is not None:
+                    _agregar_dialogo(self.dialogos, self.hablante_actual, self.partes_dialogo)
+                
+                # Iniciar nuevo diálogo
+                self.hablante_actual = hablante
+                self.partes_dialogo = []
+                self.partes_texto.append(f"\n\n[SPEAKER_{hablante}]")
+                
+                stats = self.hablantes.setdefault(hablante, {'words': 0, 'turns': 0, 'speaking_time': 0.0})
+                stats['turns'] += 1
+        
+        # Añadir palabra y espacio (o fin de frase)
+        palabra = alternative.get('content', '') + (". " if resultado_item.get('is_eos', False) else " ")
+        self.partes_texto.append(palabra)
+        self.partes_dialogo.append(palabra)
+        
+        if self.hablante_actual is not None:
+            stats = self.hablantes[self.hablante_actual]
+            stats['words'] += 1
+            stats['speaking_time'] += max(
+                resultado_item.get('end_time', 0.0) - resultado_item.get('start_time', 0.0), 0.0
+            )
+    
+    def resultado(self):
+        """
+        Cierra el último diálogo y devuelve lo acumulado
+        
+        Returns:
+            dict: {'texto', 'dialogos', 'hablantes'}
+        """
+        # Guardar el último diálogo
+        if self.hablante_actual is not None:
+            _agregar_dialogo(self.dialogos, self.hablante_actual, self.partes_dialogo)
+            self.hablante_actual = None
+        
+        for stats in self.hablantes.values():
+            stats['speaking_time'] = round(stats['speaking_time'], 2)
+        
+        return {
+            'texto': "".join(self.partes_texto).strip(),
+            'dialogos': self.dialogos,
+            'hablantes': self.hablantes
+        }
+
+
+def procesar_transcripcion_completa(resultado):
+    """
+    Procesa el resultado de la transcripción en una sola pasada y devuelve a la vez
+    el texto plano, los diálogos por hablante y estadísticas de cada hablante
     
     Args:
         resultado (dict): Resultado JSON de Speechmatics
     
     Returns:
-        str: Texto completo de la transcripción con hablantes identificados
+        dict: {
+            'texto': str con hablantes identificados (igual que procesar_transcripcion_para_texto),
+            'dialogos': list de diálogos (igual que procesar_transcripcion_estructurada),
+            'hablantes': dict hablante -> {'words', 'turns', 'speaking_time'}
+        }
     """
     
     if not resultado:
-        return ""
-    
-    # Extraer el texto completo
-    resultados = resultado.get('results', [])
+        return {'texto': "", 'dialogos': [], 'hablantes': {}}
     
-    texto_completo = ""
-    hablante_actual = None
+    acumulador = _AcumuladorTranscripcion()
     
-    for resultado_item in resultados:
-        if resultado_item['type'] == 'word':
-            # El speaker está dentro de alternatives[0] en el formato json-v2
-            alternative = resultado_item.get('alternatives', [{}])[0]
-            
-            # Cambio de hablante
-            if 'speaker' in alternative:
-                hablante = alternative['speaker']
-                if hablante != hablante_actual:
-                    hablante_actual = hablante
-                    texto_completo += f"\n\n[SPEAKER_{hablante}]"
-            
-            # Añadir palabra
-            texto_completo += alternative.get('content', '')
-            
-            # Añadir espacio si es necesario
-            if resultado_item.get('is_eos', False):
-                texto_completo += ". "
-            else:
-                texto_completo += " "
+    for resultado_item in resultado.get('results', []):
+        acumulador.agregar(resultado_item)
     
-    return texto_completo.strip()
+    return acumulador.resultado()
 
 
-def procesar_transcripcion_estructurada(resultado):
+def procesar_transcripcion_en_stream(fragmentos):
     """
-    Procesa el resultado de la transcripción y lo convierte en una estructura de diálogos
+    Procesa un resultado json-v2 a medida que llega, sin cargarlo completo en memoria
     
     Args:
-        resultado (dict): Resultado JSON de Speechmatics
+        fragmentos (iterable): Fragmentos del JSON (str o bytes), por ejemplo el
+                               cuerpo de la respuesta HTTP de Speechmatics
     
     Returns:
-        list: Lista de diálogos con información de hablante y texto
+        dict: Igual que procesar_transcripcion_completa, más 'resultado' (el JSON sin
+              'results': metadata, summary, ...)
     """
+    acumulador = _AcumuladorTranscripcion()
     
-    if not resultado:
-        return []
+    documento = iterar_json_v2(fragmentos, acumulador.agregar)
     
-    # Extraer el texto completo
-    resultados = resultado.get('results', [])
-    
-    dialogos = []
-    hablante_actual = None
-    texto_actual = ""
-    
-    for resultado_item in resultados:
-        if resultado_item['type'] == 'word':
-            # El speaker está dentro de alternatives[0] en el formato json-v2
-            alternative = resultado_item.get('alternatives', [{}])[0]
-            
-            # Cambio de hablante
-            if 'speaker' in alternative:
-                hablante = alternative['speaker']
-                
-                if hablante != hablante_actual:
-                    # Guardar el diálogo anterior si existe
-                    if hablante_actual is not None and texto_actual.strip():
-                        dialogos.append({
-                            'speaker': hablante_actual,
-                            'text': texto_actual.strip()
-                        })
-                    
-                    # Iniciar nuevo diálogo
-                    hablante_actual = hablante
-                    texto_actual = ""
-            
-            # Añadir palabra
-            texto_actual += alternative.get('content', '')
-            
-            # Añadir espacio si es necesario
-            if resultado_item.get('is_eos', False):
-                texto_actual += ". "
-            else:
-                texto_actual += " "
-    
-    # Guardar el último diálogo
-    if hablante_actual is not None and texto_actual.strip():
+    procesado = acumulador.resultado()
+    procesado['resultado'] = documento
+    return procesado
+
+
+def _agregar_dialogo(dialogos, hablante, partes):
+    """Agrega un diálogo a la lista si tiene texto"""
+    texto = "".join(partes).strip()
+    if texto:
         dialogos.append({
-            'speaker': hablante_actual,
-            'text': texto_actual.strip()
+            'speaker': hablante,
+            'text': texto
         })
+
+
+def procesar_transcripcion_para_texto(resultado):
+    """
+    Procesa el resultado de la transcripción y lo convierte en texto plano
     
-    return dialogos
\ No newline at end of file
+    Args:
+        resultado (dict): Resultado JSON de Speechmatics
+    
+    Returns:
+        str: Texto completo de la transcripción con hablantes identificados
+    """
+    return procesar_transcripcion_completa(resultado)['texto']
+
+
+def procesar_transcripcion_estructurada(resultado):
+    """
+    Procesa el resultado de la transcripción y lo convierte en una estructura de diálogos
+    
+    Args:
+        resultado (dict): Resultado JSON de Speechmatics
+    
+    Returns:
+        list: Lista de diálogos con información de hablante y texto
+    """
+    return procesar_transcripcion_completa(resultado)['dialogos']
\ No newline at end of file
@@ -0,0 +1,535 @@
+"""
+Recepción de archivos subidos en streaming
+El cuerpo multipart de la petición se lee por bloques de UPLOAD_CHUNK_SIZE y
+el archivo se escribe directamente en su ubicación final mientras se calcula su
+SHA-256, sin que Werkzeug lo guarde antes en un archivo temporal ni lo cargue en
+memoria. El límite de tamaño se comprueba a medida que llegan los datos.
+Los archivos grandes se suben por fragmentos reanudables: iniciar_subida,
+recibir_fragmento (en cualquier orden y repetibles), estado_subida con los
+rangos recibidos y finalizar_subida.
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import errno
+import shutil
+import hashlib
+import logging
+import threading
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import MultipartDecoder, Field, File, Data, Epilogue, NeedData
+from transcription_cache import registrar_hash_audio, calcular_hash_audio
+
+logger = logging.getLogger(__name__)
+
+# Bytes que se leen de la petición en cada bloque
+UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 256 * 1024))
+
+# Tamaño máximo de un archivo subido (bytes, por defecto 100MB)
+UPLOAD_MAX_FILE_SIZE = int(os.environ.get('UPLOAD_MAX_FILE_SIZE', 100 * 1024 * 1024))
+
+# Tamaño máximo de los campos de texto del formulario
+MAX_FORM_FIELD_SIZE = 64 * 1024
+
+# Sufijo del archivo mientras se recibe (no es visible como file_id hasta completarse)
+PARTIAL_SUFFIX = '.part'
+
+
+def recibir_archivo(stream, content_type, directorio, nombre_destino, campo='audio',
+                    max_bytes=UPLOAD_MAX_FILE_SIZE):
+    """
+    Lee un cuerpo multipart/form-data y guarda el archivo del campo indicado
+
+    Args:
+        stream: Stream de la petición (request.stream)
+        content_type (str): Cabecera Content-Type de la petición
+        directorio (str): Carpeta de destino
+        nombre_destino (callable): Recibe el nombre original del archivo y devuelve
+                                   el nombre con el que se guarda (lanza ValueError si
+                                   el archivo no es válido)
+        campo (str): Campo del formulario con el archivo
+        max_bytes (int): Tamaño máximo del archivo
+
+    Returns:
+        dict: {'path', 'file_id', 'filename' (original), 'size', 'sha256', 'form'}
+
+    Raises:
+        ValueError: Si la petición no es multipart o no incluye el archivo
+        RequestEntityTooLarge: Si el archivo supera max_bytes
+    """
+    mimetype, opciones = parse_options_header(content_type or '')
+    boundary = opciones.get('boundary')
+    if mimetype != 'multipart/form-data' or not boundary:
+        raise ValueError('No audio file provided')
+
+    decoder = MultipartDecoder(boundary.encode('latin-1'))
+    form = {}
+    resultado = None
+
+    # Parte actual: ('archivo', f, sha256) para el archivo, ('campo', nombre, bytes) para
+    # un campo de texto o None para otros archivos, que se descartan
+    parte = None
+    destino = None
+    terminado = False
+
+    try:
+        while not terminado:
+            bloque = stream.read(UPLOAD_CHUNK_SIZE)
+            decoder.receive_data(bloque or None)
+
+            evento = decoder.next_event()
+            while not isinstance(evento, NeedData):
+                if isinstance(evento, File):
+                    if evento.name == campo and resultado is None:
+                        file_id = nombre_destino(evento.filename or '')
+                        destino = os.path.join(directorio, file_id)
+                        resultado = {
+                            'path': destino,
+                            'file_id': file_id,
+                            'filename': evento.filename,
+                            'size': 0,
+                            'sha256': None,
+                            'form': form
+                        }
+                        parte = ('archivo', open(destino + PARTIAL_SUFFIX, 'wb'), hashlib.sha256())
+                    else:
+                        parte = None
+
+                elif isinstance(evento, Field):
+                    parte = ('campo', evento.name, bytearray())
+
+                elif isinstance(evento, Data):
+                    if parte is not None and parte[0] == 'archivo':
+                        resultado['size'] += len(evento.data)
+                        if resultado['size'] > max_bytes:
+                            raise RequestEntityTooLarge(f'File exceeds {max_bytes} bytes')
+                        parte[1].write(evento.data)
+                        parte[2].update(evento.data)
+
+                    elif parte is not None:
+                        parte[2].extend(evento.data)
+                        if len(parte[2]) > MAX_FORM_FIELD_SIZE:
+                            raise RequestEntityTooLarge(f'Form field {parte[1]} is too large')
+
+                    if not evento.more_data and parte is not None:
+                        if parte[0] == 'archivo':
+                            parte[1].close()
+                            resultado['sha256'] = parte[2].hexdigest()
+                        else:
+                            form[parte[1]] = parte[2].decode('utf-8', 'replace')
+                        parte = None
+
+                elif isinstance(evento, Epilogue):
+                    terminado = True
+                    break
+
+                evento = decoder.next_event()
+
+            if not bloque and not terminado:
+                raise ValueError('Incomplete multipart body')
+
+        if resultado is None or resultado['sha256'] is None:
+            raise ValueError('No audio file provided')
+
+        os.replace(destino + PARTIAL_SUFFIX, destino)
+        registrar_hash_audio(destino, resultado['sha256'])
+        return resultado
+
+    except Exception:
+        if parte is not None and parte[0] == 'archivo':
+            parte[1].close()
+        if destino is not None and os.path.exists(destino + PARTIAL_SUFFIX):
+            os.remove(destino + PARTIAL_SUFFIX)
+        raise
+
+
+# ==================== SUBIDAS REANUDABLES ====================
+
+# Directorio de las subidas en curso (en el mismo sistema de archivos que
+# uploads/ para que al finalizar el archivo se mueva sin copiarlo)
+RESUMABLE_UPLOAD_DIR = os.environ.get(
+    'RESUMABLE_UPLOAD_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'resumable_uploads')
+)
+
+# Tamaño máximo de un archivo subido por fragmentos (bytes, por defecto 4GB)
+UPLOAD_RESUMABLE_MAX_SIZE = int(os.environ.get('UPLOAD_RESUMABLE_MAX_SIZE', 4 * 1024 * 1024 * 1024))
+
+# Tamaño de fragmento recomendado a los clientes
+UPLOAD_RESUMABLE_CHUNK_SIZE = int(os.environ.get('UPLOAD_RESUMABLE_CHUNK_SIZE', 8 * 1024 * 1024))
+
+# Espacio libre que debe quedar en disco además del archivo (extracción de audio, caché)
+UPLOAD_DISK_RESERVE = int(os.environ.get('UPLOAD_DISK_RESERVE', 1024 * 1024 * 1024))
+
+# Tiempo tras el que se descarta una subida sin actividad (segundos, por defecto 24h)
+UPLOAD_RESUMABLE_TTL = int(os.environ.get('UPLOAD_RESUMABLE_TTL', 24 * 3600))
+
+_UPLOAD_ID = re.compile(r'^[0-9a-f]{32}$')
+
+_lock = threading.Lock()
+# upload_id -> [sha256, bytes ya incluidos]: hash de los fragmentos recibidos en orden
+_hashes = {}
+# Subidas que se están finalizando o cancelando: ya no admiten fragmentos
+_cerrando = set()
+# upload_id -> bloques que se están escribiendo en este momento
+_escrituras = {}
+_sin_escrituras = threading.Condition(_lock)
+
+
+class SubidaCerrada(Exception):
+    """La subida se está finalizando o cancelando y no admite cambios"""
+
+
+def _rutas_subida(upload_id):
+    """Archivo de datos y de metadatos de una subida (valida el ID)"""
+    if not _UPLOAD_ID.match(upload_id or ''):
+        raise KeyError(upload_id)
+    base = os.path.join(RESUMABLE_UPLOAD_DIR, upload_id)
+    return base + '.data', base + '.json'
+
+
+def _leer_meta(upload_id):
+    """Metadatos de una subida (KeyError si no existe)"""
+    _, ruta_meta = _rutas_subida(upload_id)
+    try:
+        with open(ruta_meta, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise KeyError(upload_id)
+
+
+def _guardar_meta(upload_id, meta):
+    """Guarda los metadatos de una subida (escritura atómica)"""
+    _, ruta_meta = _rutas_subida(upload_id)
+    temporal = f"{ruta_meta}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(temporal, ruta_meta)
+
+
+def _agregar_rango(rangos, inicio, fin):
+    """Añade [inicio, fin) a una lista ordenada de rangos y une los que se solapan"""
+    resultado = []
+    for a, b in sorted(rangos + [[inicio, fin]]):
+        if resultado and a <= resultado[-1][1]:
+            resultado[-1][1] = max(resultado[-1][1], b)
+        else:
+            resultado.append([a, b])
+    return resultado
+
+
+def _estado(upload_id, meta):
+    """Estado público de una subida"""
+    recibidos = sum(b - a for a, b in meta['ranges'])
+    return {
+        'upload_id': upload_id,
+        'filename': meta['filename'],
+        'size': meta['size'],
+        'received': meta['ranges'],
+        'received_bytes': recibidos,
+        'complete': recibidos == meta['size']
+    }
+
+
+def _purgar_subidas():
+    """Elimina las subidas sin actividad durante más de UPLOAD_RESUMABLE_TTL"""
+    limite = time.time() - UPLOAD_RESUMABLE_TTL
+
+    for nombre in os.listdir(RESUMABLE_UPLOAD_DIR):
+        if not nombre.endswith('.json'):
+            continue
+        upload_id = nombre[:-len('.json')]
+        try:
+            if os.path.getmtime(os.path.join(RESUMABLE_UPLOAD_DIR, nombre)) < limite:
+                cancelar_subida(upload_id)
+                logger.info(f"Subida {upload_id} descartada por inactividad")
+        except (OSError, KeyError, SubidaCerrada):
+            continue
+
+
+def iniciar_subida(filename, size, nombre_destino):
+    """
+    Crea una subida por fragmentos; el archivo se reserva con su tamaño final
+    y cada fragmento se escribe en su posición
+
+    Args:
+        filename (str): Nombre original del archivo
+        size (int): Tamaño total en bytes
+        nombre_destino (callable): Igual que en recibir_archivo
+
+    Returns:
+        dict: Estado de la subida (upload_id, size, received, ...)
+
+    Raises:
+        ValueError: Si el nombre o el tamaño no son válidos
+        RequestEntityTooLarge: Si supera UPLOAD_RESUMABLE_MAX_SIZE o no hay espacio en disco
+    """
+    size = int(size)
+    if size <= 0:
+        raise ValueError('size must be positive')
+    if size > UPLOAD_RESUMABLE_MAX_SIZE:
+        raise RequestEntityTooLarge(f'File exceeds {UPLOAD_RESUMABLE_MAX_SIZE} bytes')
+
+    file_id = nombre_destino(filename or '')
+
+    os.makedirs(RESUMABLE_UPLOAD_DIR, exist_ok=True)
+    _purgar_subidas()
+
+    if shutil.disk_usage(RESUMABLE_UPLOAD_DIR).free < size + UPLOAD_DISK_RESERVE:
+        raise RequestEntityTooLarge('Not enough disk space for this upload')
+
+    upload_id = uuid.uuid4().hex
+    ruta_datos, _ = _rutas_subida(upload_id)
+
+    # Archivo disperso: no ocupa disco hasta que llegan los datos
+    with open(ruta_datos, 'wb') as f:
+        f.truncate(size)
+
+    meta = {'filename': filename, 'file_id': file_id, 'size': size, 'ranges': [], 'created': time.time()}
+    _guardar_meta(upload_id, meta)
+
+    with _lock:
+        _hashes[upload_id] = [hashlib.sha256(), 0]
+
+    logger.info(f"Subida por fragmentos iniciada: {upload_id} ({filename}, {size} bytes)")
+    return _estado(upload_id, meta)
+
+
+def recibir_fragmento(upload_id, offset, stream):
+    """
+    Escribe un fragmento en su posición leyendo la petición por bloques
+    Si la conexión se corta, lo recibido hasta entonces queda registrado y el
+    cliente puede continuar desde ahí
+
+    Args:
+        upload_id (str): ID de la subida
+        offset (int): Posición del primer byte del fragmento
+        stream: Stream de la petición con los bytes del fragmento
+
+    Returns:
+        dict: Estado de la subida
+
+    Raises:
+        KeyError: Si la subida no existe
+        ValueError: Si el fragmento se sale del archivo
+        SubidaCerrada: Si la subida se está finalizando o cancelando
+    """
+    ruta_datos, _ = _rutas_subida(upload_id)
+    meta = _leer_meta(upload_id)
+
+    offset = int(offset)
+    if offset < 0 or offset > meta['size']:
+        raise ValueError('offset out of range')
+
+    posicion = offset
+    try:
+        fd = os.open(ruta_datos, os.O_WRONLY)
+    except FileNotFoundError:
+        raise KeyError(upload_id)
+
+    try:
+        while True:
+            bloque = stream.read(UPLOAD_CHUNK_SIZE)
+            if not bloque:
+                break
+            if posicion + len(bloque) > meta['size']:
+                raise ValueError('Chunk exceeds the declared file size')
+
+            _escribir_bloque(upload_id, fd, bloque, posicion)
+            posicion += len(bloque)
+
+    finally:
+        os.close(fd)
+
+        if posicion > offset:
+            with _lock:
+                try:
+                    meta = _leer_meta(upload_id)
+                    meta['ranges'] = _agregar_rango(meta['ranges'], offset, posicion)
+                    _guardar_meta(upload_id, meta)
+                except KeyError:
+                    # Cancelada o finalizada mientras llegaba el fragmento
+                    pass
+
+    return _estado(upload_id, meta)
+
+
+def _escribir_bloque(upload_id, fd, bloque, posicion):
+    """
+    Escribe un bloque de un fragmento salvo que la subida se esté cerrando o ya
+    no exista (el descriptor seguiría apuntando al archivo movido a uploads/);
+    finalizar_subida y cancelar_subida esperan a que terminen los bloques en curso
+    """
+    _, ruta_meta = _rutas_subida(upload_id)
+
+    with _lock:
+        if upload_id in _cerrando:
+            raise SubidaCerrada(upload_id)
+        if not os.path.exists(ruta_meta):
+            raise KeyError(upload_id)
+        _escrituras[upload_id] = _escrituras.get(upload_id, 0) + 1
+
+    try:
+        os.pwrite(fd, bloque, posicion)
+        _actualizar_hash(upload_id, posicion, bloque)
+    finally:
+        with _lock:
+            _escrituras[upload_id] -= 1
+            if not _escrituras[upload_id]:
+                del _escrituras[upload_id]
+                _sin_escrituras.notify_all()
+
+
+def _cerrar_subida(upload_id):
+    """
+    Impide que lleguen más fragmentos a una subida y espera a que terminen los
+    bloques que se están escribiendo (debe llamarse con _lock adquirido)
+    """
+    if upload_id in _cerrando:
+        raise SubidaCerrada(upload_id)
+    _cerrando.add(upload_id)
+
+    while _escrituras.get(upload_id):
+        _sin_escrituras.wait()
+
+
+def _actualizar_hash(upload_id, posicion, bloque):
+    """
+    Añade al hash el bloque que continúa lo ya calculado; si el bloque
+    reescribe bytes que ya están en el hash (un fragmento repetido, quizá con
+    otro contenido) el hash se descarta y finalizar_subida lee el archivo
+    """
+    with _lock:
+        estado = _hashes.get(upload_id)
+        if estado is None:
+            return
+
+        sha256, calculado = estado
+        if posicion < calculado:
+            del _hashes[upload_id]
+        elif posicion == calculado:
+            sha256.update(bloque)
+            estado[1] = posicion + len(bloque)
+
+
+def estado_subida(upload_id):
+    """
+    Obtiene los rangos recibidos de una subida
+
+    Args:
+        upload_id (str): ID de la subida
+
+    Returns:
+        dict: Estado de la subida (KeyError si no existe)
+    """
+    return _estado(upload_id, _leer_meta(upload_id))
+
+
+def finalizar_subida(upload_id, directorio, sha256=None):
+    """
+    Completa una subida: mueve el archivo a su ubicación final (sin copiarlo)
+
+    Args:
+        upload_id (str): ID de la subida
+        directorio (str): Carpeta de destino (uploads/)
+        sha256 (str): Hash esperado del archivo (opcional)
+
+    Returns:
+        dict: {'path', 'file_id', 'filename', 'size', 'sha256'}
+
+    Raises:
+        KeyError: Si la subida no existe
+        ValueError: Si faltan rangos por recibir o el hash no coincide
+        SubidaCerrada: Si la subida ya se está finalizando o cancelando
+    """
+    ruta_datos, _ = _rutas_subida(upload_id)
+
+    with _lock:
+        meta = _leer_meta(upload_id)
+        estado = _estado(upload_id, meta)
+        if not estado['complete']:
+            raise ValueError(f"Upload incomplete: {estado['received_bytes']} of {meta['size']} bytes received")
+
+        _cerrar_subida(upload_id)
+
+        hash_en_curso = _hashes.get(upload_id)
+        calculado = hash_en_curso[0].hexdigest() if hash_en_curso and hash_en_curso[1] == meta['size'] else None
+
+    try:
+        # Fragmentos recibidos fuera de orden o en otro proceso: leer el archivo una vez
+        if calculado is None:
+            calculado = calcular_hash_audio(ruta_datos)
+
+        if sha256 and sha256.lower() != calculado:
+            _eliminar_subida(upload_id)
+            raise ValueError('sha256 mismatch: the upload was corrupted, start it again')
+
+        destino = os.path.join(directorio, meta['file_id'])
+        try:
+            os.replace(ruta_datos, destino)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            # RESUMABLE_UPLOAD_DIR en otro sistema de archivos
+            shutil.move(ruta_datos, destino)
+
+        registrar_hash_audio(destino, calculado)
+        _eliminar_subida(upload_id)
+
+    finally:
+        with _lock:
+            _cerrando.discard(upload_id)
+
+    logger.info(f"Subida por fragmentos completada: {upload_id} -> {meta['file_id']}")
+    return {
+        'path': destino,
+        'file_id': meta['file_id'],
+        'filename': meta['filename'],
+        'size': meta['size'],
+        'sha256': calculado
+    }
+
+
+def cancelar_subida(upload_id):
+    """
+    Elimina una subida y sus datos
+
+    Args:
+        upload_id (str): ID de la subida
+
+    Returns:
+        bool: True si existía
+
+    Raises:
+        SubidaCerrada: Si la subida se está finalizando
+    """
+    _rutas_subida(upload_id)
+
+    with _lock:
+        _cerrar_subida(upload_id)
+
+    try:
+        return _eliminar_subida(upload_id)
+    finally:
+        with _lock:
+            _cerrando.discard(upload_id)
+
+
+def _eliminar_subida(upload_id):
+    """Borra los datos y metadatos de una subida"""
+    ruta_datos, ruta_meta = _rutas_subida(upload_id)
+
+    with _lock:
+        _hashes.pop(upload_id, None)
+
+    existia = os.path.exists(ruta_meta)
+    for ruta in (ruta_datos, ruta_meta):
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+    return existia
@@ -0,0 +1,739 @@
+"""
+Índice vectorial local de los fragmentos de las transcripciones guardadas
+Cada grabación se divide por turno de hablante (embedding_service) y sus
+vectores se guardan en un índice IVF sobre NumPy: los vectores se agrupan
+alrededor de centroides (k-means) y una búsqueda solo compara la consulta con
+las listas de los IVF_NPROBE centroides más cercanos. Con pocos vectores la
+búsqueda es exacta. Las grabaciones se agregan y eliminan por recording_id sin
+reconstruir el índice, que se guarda en disco periódicamente.
+
+Uso (desde backend/):
+    python vector_index.py sync    # indexa las grabaciones guardadas que faltan
+    python vector_index.py stats   # tamaño y estado del índice
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import logging
+import threading
+from collections import deque
+import numpy as np
+from embedding_service import (
+    dividir_en_fragmentos, generar_embeddings, texto_fragmento,
+    firma_embeddings, EMBEDDING_DIMENSIONS
+)
+
+logger = logging.getLogger(__name__)
+
+# Archivo del índice (configurable por variable de entorno)
+VECTOR_INDEX_PATH = os.environ.get(
+    'VECTOR_INDEX_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'vector_index.npz')
+)
+
+# Tiempo mínimo entre dos guardados del índice en disco (segundos)
+VECTOR_INDEX_SAVE_INTERVAL = float(os.environ.get('VECTOR_INDEX_SAVE_INTERVAL', 60))
+
+# Vectores a partir de los cuales se entrena el IVF (por debajo, búsqueda exacta)
+IVF_MIN_TRAIN = int(os.environ.get('IVF_MIN_TRAIN', 50000))
+
+# Listas que se recorren en cada búsqueda (más listas: mejor recall, más lento)
+IVF_NPROBE = int(os.environ.get('IVF_NPROBE', 32))
+
+# Se vuelve a entrenar cuando el índice crece este factor desde el último entrenamiento
+IVF_RETRAIN_FACTOR = 4
+
+# Vectores de muestra por centroide e iteraciones de k-means
+IVF_TRAIN_PER_LIST = 32
+IVF_KMEANS_ITERATIONS = 10
+
+# Con filtro por usuarios, hasta este número de vectores se busca de forma exacta
+FILTER_EXACT_MAX = 50000
+
+# Fracción de vectores eliminados a partir de la cual se compacta el índice
+COMPACT_RATIO = 0.25
+
+# Intentos de indexar una grabación si falla el proveedor de embeddings
+INDEX_RETRIES = 3
+
+# Filas que se multiplican en cada bloque al asignar vectores a centroides
+_BLOQUE = 8192
+
+
+class IndiceVectorial:
+    """
+    Índice IVF de fragmentos con identificador de grabación y de usuario
+
+    Args:
+        dimension (int): Dimensión de los vectores
+        firma (str): Proveedor y modelo de los vectores (firma_embeddings)
+    """
+
+    def __init__(self, dimension, firma):
+        self.dimension = dimension
+        self.firma = firma
+
+        self._n = 0
+        self._eliminados = 0
+        self._vectores = np.zeros((1024, dimension), dtype=np.float32)
+        self._recording_ids = np.zeros(1024, dtype=np.int64)
+        self._user_ids = np.zeros(1024, dtype=np.int64)
+        self._turnos = np.zeros(1024, dtype=np.int32)
+        self._vivos = np.zeros(1024, dtype=bool)
+        self._asignacion = np.full(1024, -1, dtype=np.int32)
+        self._hablantes = []
+        self._textos = []
+
+        # recording_id -> filas; user_id -> recording_ids
+        self._filas_por_grabacion = {}
+        self._grabaciones_por_usuario = {}
+
+        # Centroides y filas de cada lista (con caché como array)
+        self._centroides = None
+        self._listas = []
+        self._listas_np = []
+        self._n_entrenado = 0
+
+        self._lock = threading.RLock()
+
+    # ==================== ALTAS Y BAJAS ====================
+
+    def _reservar(self, extra):
+        """Amplía los arrays (duplicando la capacidad) para extra filas más"""
+        capacidad = len(self._vivos)
+        if self._n + extra <= capacidad:
+            return
+
+        nueva = max(capacidad * 2, self._n + extra)
+
+        def ampliar(array, relleno=0):
+            ampliado = np.full((nueva,) + array.shape[1:], relleno, dtype=array.dtype)
+            ampliado[:self._n] = array[:self._n]
+            return ampliado
+
+        self._vectores = ampliar(self._vectores)
+        self._recording_ids = ampliar(self._recording_ids)
+        self._user_ids = ampliar(self._user_ids)
+        self._turnos = ampliar(self._turnos)
+        self._vivos = ampliar(self._vivos, False)
+        self._asignacion = ampliar(self._asignacion, -1)
+
+    def agregar(self, recording_id, user_id, fragmentos, vectores):
+        """
+        Agrega (o reemplaza) los fragmentos de una grabación
+
+        Args:
+            recording_id (int): ID de la grabación
+            user_id (int): ID del dueño de la grabación
+            fragmentos (list): Fragmentos de dividir_en_fragmentos
+            vectores (np.ndarray): Vectores normalizados de los fragmentos
+        """
+        with self._lock:
+            self.eliminar(recording_id)
+
+            total = len(fragmentos)
+            if not total:
+                return
+
+            self._reservar(total)
+            filas = np.arange(self._n, self._n + total)
+
+            self._vectores[filas] = vectores
+            self._recording_ids[filas] = recording_id
+            self._user_ids[filas] = user_id
+            self._turnos[filas] = [f['turn'] for f in fragmentos]
+            self._vivos[filas] = True
+            self._hablantes.extend(str(f['speaker']) for f in fragmentos)
+            self._textos.extend(f['text'] for f in fragmentos)
+            self._n += total
+
+            self._filas_por_grabacion[recording_id] = filas
+            self._grabaciones_por_usuario.setdefault(user_id, set()).add(recording_id)
+
+            if self._centroides is not None:
+                self._asignar_a_listas(filas)
+
+    def eliminar(self, recording_id):
+        """
+        Elimina los fragmentos de una grabación (quedan marcados hasta compactar)
+
+        Args:
+            recording_id (int): ID de la grabación
+
+        Returns:
+            bool: True si la grabación estaba indexada
+        """
+        with self._lock:
+            filas = self._filas_por_grabacion.pop(recording_id, None)
+            if filas is None:
+                return False
+
+            user_id = int(self._user_ids[filas[0]])
+            grabaciones = self._grabaciones_por_usuario.get(user_id)
+            if grabaciones is not None:
+                grabaciones.discard(recording_id)
+                if not grabaciones:
+                    del self._grabaciones_por_usuario[user_id]
+
+            self._vivos[filas] = False
+            self._eliminados += len(filas)
+            return True
+
+    def contiene(self, recording_id):
+        """Indica si una grabación está indexada"""
+        with self._lock:
+            return recording_id in self._filas_por_grabacion
+
+    # ==================== LISTAS IVF ====================
+
+    def _asignar_a_listas(self, filas):
+        """Asigna filas nuevas a la lista de su centroide más cercano"""
+        listas = np.argmax(self._vectores[filas] @ self._centroides.T, axis=1)
+        self._asignacion[filas] = listas
+
+        for fila, lista in zip(filas.tolist(), listas.tolist()):
+            self._listas[lista].append(fila)
+            self._listas_np[lista] = None
+
+    def _construir_listas(self, total_listas):
+        """Reconstruye las listas a partir de _asignacion (filas vivas)"""
+        filas = np.flatnonzero(self._vivos[:self._n] & (self._asignacion[:self._n] >= 0))
+        orden = filas[np.argsort(self._asignacion[filas], kind='stable')]
+        cortes = np.searchsorted(self._asignacion[orden], np.arange(total_listas + 1))
+
+        self._listas_np = [orden[cortes[i]:cortes[i + 1]] for i in range(total_listas)]
+        self._listas = [lista.tolist() for lista in self._listas_np]
+
+    def _lista(self, lista):
+        """Filas de una lista como array (con caché)"""
+        filas = self._listas_np[lista]
+        if filas is None:
+            filas = np.asarray(self._listas[lista], dtype=np.int64)
+            self._listas_np[lista] = filas
+        return filas
+
+    def necesita_entrenar(self):
+        """Indica si hay suficientes vectores nuevos para (re)entrenar el IVF"""
+        with self._lock:
+            vivos = self._n - self._eliminados
+            return vivos >= IVF_MIN_TRAIN and vivos >= IVF_RETRAIN_FACTOR * self._n_entrenado
+
+    def entrenar(self, semilla=None):
+        """
+        Entrena los centroides con k-means sobre una muestra y asigna todas las
+        filas a su lista. El cálculo se hace sin bloquear las búsquedas; solo
+        el cambio de listas final toma el lock
+        """
+        rng = np.random.default_rng(semilla)
+
+        with self._lock:
+            total = self._n
+            vectores = self._vectores
+            vivas = np.flatnonzero(self._vivos[:total])
+
+        if not len(vivas):
+            return
+
+        total_listas = int(min(max(np.sqrt(len(vivas)), 16), 4096))
+        muestra = vectores[rng.choice(vivas, min(len(vivas), total_listas * IVF_TRAIN_PER_LIST), replace=False)]
+        centroides = muestra[rng.choice(len(muestra), total_listas, replace=False)].copy()
+
+        for _ in range(IVF_KMEANS_ITERATIONS):
+            asignacion = _mas_cercano(muestra, centroides)
+            conteos = np.bincount(asignacion, minlength=total_listas)
+
+            orden = np.argsort(asignacion, kind='stable')
+            inicios = np.searchsorted(asignacion[orden], np.arange(total_listas))
+            sumas = np.add.reduceat(muestra[orden], np.minimum(inicios, len(orden) - 1), axis=0)
+            sumas[conteos == 0] = muestra[rng.choice(len(muestra), int((conteos == 0).sum()))]
+
+            centroides = sumas / np.maximum(np.linalg.norm(sumas, axis=1, keepdims=True), 1e-12)
+
+        # Las filas anteriores a total no cambian aunque se agreguen otras mientras tanto
+        asignacion = _mas_cercano(vectores[:total], centroides)
+
+        with self._lock:
+            self._centroides = centroides.astype(np.float32)
+            self._asignacion[:total] = asignacion
+            self._construir_listas(total_listas)
+            self._n_entrenado = len(vivas)
+
+            if self._n > total:
+                self._asignar_a_listas(np.arange(total, self._n))
+
+        logger.info(f"Índice vectorial entrenado: {len(vivas)} vectores en {total_listas} listas")
+
+    def necesita_compactar(self):
+        """Indica si conviene eliminar físicamente las filas borradas"""
+        with self._lock:
+            return self._eliminados > 0 and self._eliminados >= COMPACT_RATIO * self._n
+
+    def compactar(self):
+        """Elimina físicamente las filas borradas y renumera las listas"""
+        with self._lock:
+            vivas = np.flatnonzero(self._vivos[:self._n])
+
+            self._vectores = self._vectores[vivas]
+            self._recording_ids = self._recording_ids[vivas]
+            self._user_ids = self._user_ids[vivas]
+            self._turnos = self._turnos[vivas]
+            self._asignacion = self._asignacion[vivas]
+            self._vivos = np.ones(len(vivas), dtype=bool)
+            self._hablantes = [self._hablantes[i] for i in vivas.tolist()]
+            self._textos = [self._textos[i] for i in vivas.tolist()]
+            self._n = len(vivas)
+            self._eliminados = 0
+
+            self._reconstruir_mapas()
+            if self._centroides is not None:
+                self._construir_listas(len(self._centroides))
+
+    def _reconstruir_mapas(self):
+        """Reconstruye recording_id -> filas y user_id -> recording_ids"""
+        filas = np.flatnonzero(self._vivos[:self._n])
+        orden = filas[np.argsort(self._recording_ids[filas], kind='stable')]
+        ids, inicios = np.unique(self._recording_ids[orden], return_index=True)
+
+        self._filas_por_grabacion = dict(zip(ids.tolist(), np.split(orden, inicios[1:])))
+        self._grabaciones_por_usuario = {}
+        for recording_id, grupo in self._filas_por_grabacion.items():
+            self._grabaciones_por_usuario.setdefault(int(self._user_ids[grupo[0]]), set()).add(recording_id)
+
+    # ==================== BÚSQUEDA ====================
+
+    def buscar(self, consulta, k=10, nprobe=IVF_NPROBE, user_ids=None):
+        """
+        Obtiene los fragmentos más similares a un vector de consulta
+
+        Args:
+            consulta (np.ndarray): Vector normalizado de la consulta
+            k (int): Número de fragmentos
+            nprobe (int): Listas que se recorren (si el IVF está entrenado)
+            user_ids (iterable): Restringir a las grabaciones de estos usuarios (opcional)
+
+        Returns:
+            list: Fragmentos [{'recording_id', 'user_id', 'turn', 'speaker', 'text', 'score'}]
+                  ordenados por similitud
+        """
+        with self._lock:
+            puntuaciones = None
+
+            if user_ids is not None:
+                grupos = [
+                    self._filas_por_grabacion[recording_id]
+                    for user_id in user_ids
+                    for recording_id in self._grabaciones_por_usuario.get(user_id, ())
+                ]
+                if not grupos:
+                    return []
+                candidatas = np.concatenate(grupos)
+
+                if len(candidatas) > FILTER_EXACT_MAX and self._centroides is not None:
+                    candidatas = self._candidatas_ivf(consulta, nprobe)
+                    candidatas = candidatas[np.isin(self._user_ids[candidatas], list(user_ids))]
+
+            elif self._centroides is not None:
+                candidatas = self._candidatas_ivf(consulta, nprobe)
+
+            else:
+                # Búsqueda exacta: se puntúan todas las filas sin copiarlas y se descartan las borradas
+                candidatas = np.arange(self._n)
+                puntuaciones = self._vectores[:self._n] @ consulta
+                if self._eliminados:
+                    puntuaciones[~self._vivos[:self._n]] = -np.inf
+                    vivas = self._n - self._eliminados
+                    if not vivas:
+                        return []
+                    k = min(k, vivas)
+
+            if not len(candidatas):
+                return []
+
+            if puntuaciones is None:
+                puntuaciones = self._vectores[candidatas] @ consulta
+            k = min(k, len(candidatas))
+            mejores = np.argpartition(-puntuaciones, k - 1)[:k]
+            mejores = mejores[np.argsort(-puntuaciones[mejores])]
+
+            return [
+                {
+                    'recording_id': int(self._recording_ids[fila]),
+                    'user_id': int(self._user_ids[fila]),
+                    'turn': int(self._turnos[fila]),
+                    'speaker': self._hablantes[fila],
+                    'text': self._textos[fila],
+                    'score': float(puntuaciones[i])
+                }
+                for i, fila in ((i, candidatas[i]) for i in mejores.tolist())
+            ]
+
+    def _candidatas_ivf(self, consulta, nprobe):
+        """Filas vivas de las nprobe listas más cercanas a la consulta"""
+        cercania = self._centroides @ consulta
+        nprobe = min(nprobe, len(cercania))
+        listas = np.argpartition(-cercania, nprobe - 1)[:nprobe]
+
+        candidatas = np.concatenate([self._lista(lista) for lista in listas.tolist()])
+        return candidatas[self._vivos[candidatas]]
+
+    # ==================== DISCO ====================
+
+    def guardar(self, ruta):
+        """Guarda el índice en disco (escritura atómica)"""
+        with self._lock:
+            total = self._n
+            datos = {
+                'firma': np.array(self.firma),
+                'vectores': self._vectores[:total].copy(),
+                'recording_ids': self._recording_ids[:total].copy(),
+                'user_ids': self._user_ids[:total].copy(),
+                'turnos': self._turnos[:total].copy(),
+                'vivos': self._vivos[:total].copy(),
+                'asignacion': self._asignacion[:total].copy(),
+                'centroides': self._centroides if self._centroides is not None else np.zeros((0, self.dimension), np.float32),
+                'n_entrenado': np.array(self._n_entrenado)
+            }
+            textos = json.dumps([self._hablantes[:total], self._textos[:total]], ensure_ascii=False)
+
+        datos['textos'] = np.frombuffer(textos.encode('utf-8'), dtype=np.uint8)
+
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        temporal = f"{ruta}.tmp.npz"
+        np.savez(temporal, **datos)
+        os.replace(temporal, ruta)
+
+    @classmethod
+    def cargar(cls, ruta, firma):
+        """
+        Carga un índice guardado
+
+        Args:
+            ruta (str): Archivo del índice
+            firma (str): Firma de los embeddings actuales
+
+        Returns:
+            IndiceVectorial: Índice o None si no existe o usa otros embeddings
+        """
+        if not os.path.exists(ruta):
+            return None
+
+        with np.load(ruta, allow_pickle=False) as datos:
+            if str(datos['firma']) != firma:
+                logger.warning(f"El índice vectorial usa otros embeddings ({datos['firma']}), se descarta")
+                return None
+
+            indice = cls(datos['vectores'].shape[1], firma)
+            indice._vectores = datos['vectores']
+            indice._recording_ids = datos['recording_ids']
+            indice._user_ids = datos['user_ids']
+            indice._turnos = datos['turnos']
+            indice._vivos = datos['vivos']
+            indice._asignacion = datos['asignacion']
+            indice._n_entrenado = int(datos['n_entrenado'])
+            indice._hablantes, indice._textos = json.loads(datos['textos'].tobytes().decode('utf-8'))
+            centroides = datos['centroides']
+
+        indice._n = len(indice._vivos)
+        indice._eliminados = int(indice._n - indice._vivos.sum())
+        indice._reconstruir_mapas()
+
+        if len(centroides):
+            indice._centroides = centroides
+            indice._construir_listas(len(centroides))
+
+        return indice
+
+    def stats(self):
+        """Tamaño y estado del índice"""
+        with self._lock:
+            return {
+                'vectors': self._n - self._eliminados,
+                'deleted': self._eliminados,
+                'recordings': len(self._filas_por_grabacion),
+                'lists': len(self._centroides) if self._centroides is not None else 0,
+                'dimension': self.dimension,
+                'embeddings': self.firma
+            }
+
+
+def _mas_cercano(vectores, centroides):
+    """Índice del centroide más cercano (mayor producto escalar) de cada vector"""
+    asignacion = np.empty(len(vectores), dtype=np.int32)
+    for inicio in range(0, len(vectores), _BLOQUE):
+        asignacion[inicio:inicio + _BLOQUE] = np.argmax(vectores[inicio:inicio + _BLOQUE] @ centroides.T, axis=1)
+    return asignacion
+
+
+# ==================== ÍNDICE DEL SERVIDOR ====================
+
+_indice = None
+_cola = deque()
+_cond = threading.Condition()
+_worker_thread = None
+_estado = {'sucio': False, 'ultimo_guardado': time.monotonic(), 'indexed': 0, 'failed': 0}
+
+
+def obtener_indice_vectorial():
+    """
+    Obtiene el índice del servidor (lo carga del disco la primera vez)
+
+    Returns:
+        IndiceVectorial: Índice
+    """
+    global _indice
+
+    with _cond:
+        if _indice is None:
+            try:
+                _indice = IndiceVectorial.cargar(VECTOR_INDEX_PATH, firma_embeddings())
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f"No se pudo cargar el índice vectorial, se crea uno nuevo: {e}")
+            if _indice is None:
+                _indice = IndiceVectorial(EMBEDDING_DIMENSIONS, firma_embeddings())
+        return _indice
+
+
+def index_recording(recording_id, user_id, dialogos):
+    """
+    Genera los embeddings de una grabación y la agrega al índice
+
+    Args:
+        recording_id (int): ID de la grabación
+        user_id (int): ID del dueño
+        dialogos (list): Turnos de la transcripción
+
+    Returns:
+        bool: True si se indexó (o no tiene texto), False si fallaron los embeddings
+    """
+    fragmentos = dividir_en_fragmentos(dialogos)
+    vectores = np.zeros((0, EMBEDDING_DIMENSIONS), dtype=np.float32)
+
+    if fragmentos:
+        vectores = generar_embeddings([texto_fragmento(f) for f in fragmentos], 'documento')
+        if vectores is None:
+            return False
+
+    obtener_indice_vectorial().agregar(recording_id, user_id, fragmentos, vectores)
+
+    with _cond:
+        _estado['sucio'] = True
+        _estado['indexed'] += 1
+    return True
+
+
+def queue_recording(recording_id, user_id, dialogos):
+    """
+    Encola una grabación para indexarla en segundo plano
+
+    Args:
+        recording_id (int): ID de la grabación
+        user_id (int): ID del dueño
+        dialogos (list): Turnos de la transcripción
+    """
+    with _cond:
+        _cola.append((recording_id, user_id, dialogos, 0))
+        _cond.notify()
+
+    _asegurar_worker()
+
+
+def remove_recording(recording_id):
+    """
+    Elimina una grabación del índice
+
+    Args:
+        recording_id (int): ID de la grabación
+
+    Returns:
+        bool: True si estaba indexada
+    """
+    eliminada = obtener_indice_vectorial().eliminar(recording_id)
+
+    if eliminada:
+        with _cond:
+            _estado['sucio'] = True
+            _cond.notify()
+    return eliminada
+
+
+def search_similar(consulta, k=10, user_ids=None):
+    """
+    Busca los fragmentos más similares a un texto
+
+    Args:
+        consulta (str): Texto de la búsqueda
+        k (int): Número de fragmentos
+        user_ids (iterable): Restringir a las grabaciones de estos usuarios (opcional)
+
+    Returns:
+        list: Fragmentos (ver IndiceVectorial.buscar) o None si fallan los embeddings
+    """
+    vector = generar_embeddings([consulta], 'consulta')
+    if vector is None:
+        return None
+
+    return obtener_indice_vectorial().buscar(vector[0], k=k, user_ids=user_ids)
+
+
+def save_vector_index():
+    """Guarda el índice en disco si tiene cambios"""
+    with _cond:
+        if not _estado['sucio'] or _indice is None:
+            return
+        _estado['sucio'] = False
+        _estado['ultimo_guardado'] = time.monotonic()
+
+    try:
+        _indice.guardar(VECTOR_INDEX_PATH)
+    except OSError as e:
+        logger.error(f"No se pudo guardar el índice vectorial: {e}")
+        with _cond:
+            _estado['sucio'] = True
+
+
+def _mantenimiento():
+    """Entrena, compacta y guarda el índice cuando corresponde"""
+    indice = obtener_indice_vectorial()
+
+    if indice.necesita_compactar():
+        indice.compactar()
+    if indice.necesita_entrenar():
+        indice.entrenar()
+
+    with _cond:
+        guardar = _estado['sucio'] and time.monotonic() - _estado['ultimo_guardado'] >= VECTOR_INDEX_SAVE_INTERVAL
+    if guardar:
+        save_vector_index()
+
+
+def _worker_loop():
+    """Thread que indexa las grabaciones encoladas"""
+    while True:
+        with _cond:
+            while not _cola:
+                _cond.wait(VECTOR_INDEX_SAVE_INTERVAL)
+                if not _cola:
+                    break
+            tarea = _cola.popleft() if _cola else None
+
+        try:
+            if tarea is not None:
+                recording_id, user_id, dialogos, intentos = tarea
+
+                if not index_recording(recording_id, user_id, dialogos):
+                    if intentos + 1 < INDEX_RETRIES:
+                        time.sleep(2 ** intentos)
+                        with _cond:
+                            _cola.append((recording_id, user_id, dialogos, intentos + 1))
+                    else:
+                        logger.error(f"Grabación {recording_id} sin indexar tras {INDEX_RETRIES} intentos")
+                        with _cond:
+                            _estado['failed'] += 1
+
+            _mantenimiento()
+
+        except Exception as e:
+            logger.error(f"Error en el indexado vectorial: {e}", exc_info=True)
+
+
+def _asegurar_worker():
+    """Inicia el thread de indexado si no está en marcha"""
+    global _worker_thread
+
+    with _cond:
+        if _worker_thread is None or not _worker_thread.is_alive():
+            _worker_thread = threading.Thread(target=_worker_loop, name='vector-indexer', daemon=True)
+            _worker_thread.start()
+
+
+def sync_from_database(lote=100):
+    """
+    Indexa las grabaciones guardadas que no están en el índice
+
+    Args:
+        lote (int): Grabaciones leídas por consulta
+
+    Returns:
+        int: Grabaciones indexadas
+    """
+    from database import execute_query
+
+    indice = obtener_indice_vectorial()
+    indexadas = 0
+    ultimo_id = 0
+
+    while True:
+        filas = execute_query(
+            """
+            SELECT r.id, r.user_id, t.dialogues, t.transcription_text
+            FROM recordings r
+            JOIN transcriptions t ON t.recording_id = r.id
+            WHERE r.id > %s
+            ORDER BY r.id
+            LIMIT %s
+            """,
+            (ultimo_id, lote),
+            fetch_all=True
+        )
+        if not filas:
+            break
+
+        for fila in filas:
+            ultimo_id = fila['id']
+            if indice.contiene(fila['id']):
+                continue
+
+            dialogos = fila['dialogues']
+            if not dialogos:
+                from retrieval_index import dialogos_desde_texto
+                dialogos = dialogos_desde_texto(fila['transcription_text'])
+
+            if index_recording(fila['id'], fila['user_id'], dialogos):
+                indexadas += 1
+
+        _mantenimiento()
+
+    save_vector_index()
+    return indexadas
+
+
+def get_vector_index_stats():
+    """
+    Obtiene el estado del índice vectorial
+
+    Returns:
+        dict: Vectores, grabaciones, listas, pendientes de indexar y fallos
+    """
+    stats = obtener_indice_vectorial().stats()
+    with _cond:
+        stats['pending'] = len(_cola)
+        stats['indexed'] = _estado['indexed']
+        stats['failed'] = _estado['failed']
+    return stats
+
+
+atexit.register(save_vector_index)
+
+
+def main(argv):
+    """Punto de entrada de la línea de comandos"""
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s %(message)s')
+    comando = argv[1] if len(argv) > 1 else 'stats'
+
+    if comando == 'sync':
+        print(f"Grabaciones indexadas: {sync_from_database()}")
+        return 0
+
+    if comando == 'stats':
+        print(json.dumps(get_vector_index_stats(), indent=2))
+        return 0
+
+    print(f"Comando desconocido: {comando} (sync, stats)")
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
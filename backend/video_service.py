@@ -1,37 +1,187 @@
 """
 Servicio de procesamiento de video para extraer audio
-Usa moviepy para extraer la pista de audio de archivos de video
+Extrae la pista de audio con una sola llamada a ffmpeg: si Speechmatics acepta
+el códec, copia la pista sin recodificarla (AAC en m4a, Opus en ogg...) y si
+no, la convierte en una pasada a 16 kHz mono (FLAC u Opus). moviepy queda como
+motor alternativo. Las pistas, códecs y duración salen de media_probe (una
+sola inspección por archivo)
 """
  
 import os
 import logging
+import subprocess
 from pathlib import Path
+from media_probe import inspeccionar_medio
+from transcription_service import PARALLEL_SEGMENTS, CHUNK_MIN_SECONDS
  
 logger = logging.getLogger(__name__)
  
 try:
     # moviepy v2.x expone las clases en el nivel del paquete
-    from moviepy import VideoFileClip
+    from moviepy import AudioFileClip
+    # Ejecutable de ffmpeg de moviepy (FFMPEG_BINARY o el de imageio-ffmpeg)
+    from moviepy.config import FFMPEG_BINARY
     MOVIEPY_AVAILABLE = True
 except ImportError as e:
+    FFMPEG_BINARY = os.environ.get('FFMPEG_BINARY', 'ffmpeg')
     MOVIEPY_AVAILABLE = False
     logger.warning(f"moviepy no está disponible ({e}). Funciones de video deshabilitadas.")
  
+# Motor de extracción: 'ffmpeg' (copia o conversión en una pasada) o 'moviepy'
+AUDIO_EXTRACT_ENGINE = os.environ.get('AUDIO_EXTRACT_ENGINE', 'ffmpeg').lower()
  
-def extraer_audio_de_video(video_path, output_path=None, audio_format='mp3'):
+# Códecs que se copian sin recodificar (todos los acepta Speechmatics)
+AUDIO_EXTRACT_COPY_CODECS = [
+    codec.strip() for codec in os.environ.get('AUDIO_EXTRACT_COPY_CODECS', 'aac,opus,vorbis,mp3,flac').split(',')
+    if codec.strip()
+]
+ 
+# Formato al convertir el resto ('flac' u 'opus'), siempre a 16 kHz mono
+AUDIO_EXTRACT_FORMAT = os.environ.get('AUDIO_EXTRACT_FORMAT', 'flac').lower()
+ 
+# Hilos de ffmpeg por extracción (0 = los que decida ffmpeg)
+AUDIO_EXTRACT_THREADS = int(os.environ.get('AUDIO_EXTRACT_THREADS', 1))
+ 
+# Contenedor de la pista copiada según su códec
+_CONTENEDORES_COPIA = {'aac': 'm4a', 'opus': 'ogg', 'vorbis': 'ogg', 'mp3': 'mp3', 'flac': 'flac'}
+ 
+# Formatos que la segmentación en silencios (soundfile) puede leer
+_FORMATOS_SEGMENTABLES = {'ogg', 'mp3', 'flac', 'wav'}
+ 
+# Argumentos de ffmpeg para convertir a cada formato
+_CONVERSIONES = {
+    'flac': ['-c:a', 'flac'],
+    'opus': ['-c:a', 'libopus', '-b:a', '32k', '-application', 'voip'],
+    'mp3': ['-c:a', 'libmp3lame', '-q:a', '4'],
+    'wav': ['-c:a', 'pcm_s16le']
+}
+ 
+_EXTENSIONES = {'opus': 'ogg'}
+ 
+ 
+def _ejecutar_ffmpeg(argumentos):
+    """Ejecuta ffmpeg y lanza RuntimeError con su salida de error si falla"""
+    resultado = subprocess.run(
+        [FFMPEG_BINARY, '-nostdin', '-hide_banner', '-loglevel', 'error', '-y'] + argumentos,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    if resultado.returncode != 0:
+        raise RuntimeError(resultado.stderr.decode('utf-8', 'replace').strip()[-500:])
+ 
+ 
+def _extension_copia(info):
+    """
+    Contenedor al que se puede copiar la pista de audio sin recodificarla
+   
+    Args:
+        info (MediaInfo): Inspección del video
+   
+    Returns:
+        str: Extensión ('m4a', 'ogg'...) o None si hay que convertir
+    """
+    if info is None or not info.has_audio:
+        return None
+   
+    codec = info.audio.codec
+    if codec not in AUDIO_EXTRACT_COPY_CODECS or codec not in _CONTENEDORES_COPIA:
+        return None
+    extension = _CONTENEDORES_COPIA[codec]
+   
+    # Las grabaciones que se van a dividir en segmentos necesitan un formato que soundfile lea
+    if (extension not in _FORMATOS_SEGMENTABLES and PARALLEL_SEGMENTS > 1
+            and (info.duration is None or info.duration >= CHUNK_MIN_SECONDS)):
+        return None
+   
+    return extension
+ 
+ 
+def _extraer_con_ffmpeg(video_path, base_salida, info, audio_format=None):
+    """
+    Extrae la primera pista de audio copiándola o convirtiéndola en una sola pasada
+   
+    Args:
+        video_path (str): Ruta al archivo de video
+        base_salida (str): Ruta de salida sin extensión
+        info (MediaInfo): Inspección del video (o None)
+        audio_format (str): Formato forzado (None = copiar si se puede)
+   
+    Returns:
+        str: Ruta al archivo de audio extraído
+    """
+    extension = None if audio_format else _extension_copia(info)
+   
+    if extension:
+        output_path = f"{base_salida}.{extension}"
+        try:
+            opciones = ['-movflags', '+faststart'] if extension == 'm4a' else []
+            _ejecutar_ffmpeg(['-i', video_path, '-map', '0:a:0', '-vn', '-sn', '-dn',
+                              '-c:a', 'copy'] + opciones + [output_path])
+            logger.info(f"Pista {info.audio.codec} copiada sin recodificar: {output_path}")
+            return output_path
+        except RuntimeError as e:
+            logger.warning(f"No se pudo copiar la pista de audio, se convierte: {e}")
+            if os.path.exists(output_path):
+                os.remove(output_path)
+   
+    formato = audio_format or AUDIO_EXTRACT_FORMAT
+    output_path = f"{base_salida}.{_EXTENSIONES.get(formato, formato)}"
+    hilos = str(AUDIO_EXTRACT_THREADS)
+   
+    _ejecutar_ffmpeg(['-threads', hilos, '-i', video_path, '-map', '0:a:0', '-vn', '-sn', '-dn',
+                      '-ac', '1', '-ar', '16000'] + _CONVERSIONES.get(formato, []) +
+                     ['-threads', hilos, output_path])
+    return output_path
+ 
+ 
+def _extraer_con_moviepy(video_path, base_salida, audio_format=None):
+    """
+    Extrae el audio decodificándolo con moviepy y recodificándolo (por defecto a mp3)
+   
+    Args:
+        video_path (str): Ruta al archivo de video
+        base_salida (str): Ruta de salida sin extensión
+        audio_format (str): Formato del audio de salida
+   
+    Returns:
+        str: Ruta al archivo de audio extraído
+    """
+    audio_format = audio_format or 'mp3'
+    output_path = f"{base_salida}.{audio_format}"
+   
+    # Abrir solo la pista de audio (sin decodificar la imagen)
+    audio = AudioFileClip(video_path)
+   
+    try:
+        audio.write_audiofile(
+            output_path,
+            codec='libmp3lame' if audio_format == 'mp3' else None,
+            logger=None  # Silenciar logs de moviepy
+        )
+    finally:
+        audio.close()
+   
+    return output_path
+ 
+ 
+def extraer_audio_de_video(video_path, output_path=None, audio_format=None, info=None):
     """
     Extrae el audio de un archivo de video y lo guarda como archivo de audio
    
     Args:
         video_path (str): Ruta al archivo de video
-        output_path (str): Ruta donde guardar el audio extraído (opcional)
-        audio_format (str): Formato del audio de salida ('mp3', 'wav', etc.)
+        output_path (str): Ruta donde guardar el audio extraído (opcional; la
+                           extensión se ajusta al formato elegido)
+        audio_format (str): Formato del audio de salida ('flac', 'opus', 'mp3', 'wav');
+                            None para copiar la pista si Speechmatics acepta su
+                            códec o convertirla a AUDIO_EXTRACT_FORMAT
+        info (MediaInfo): Inspección ya hecha del video (opcional; en los workers de
+                          media_pool no está en la caché del proceso que la hizo)
    
     Returns:
         str: Ruta al archivo de audio extraído, o None si hay error
     """
    
-    if not MOVIEPY_AVAILABLE:
+    if not MOVIEPY_AVAILABLE and AUDIO_EXTRACT_ENGINE == 'moviepy':
         logger.error("moviepy no está instalado. Instala con: pip install moviepy")
         return None
    
@@ -41,36 +191,27 @@ def extraer_audio_de_video(video_path, output_path=None, audio_format='mp3'):
             logger.error(f"Archivo de video no encontrado: {video_path}")
             return None
        
-        # Generar ruta de salida si no se proporciona
+        # Generar ruta de salida (sin extensión: la decide el motor)
         if output_path is None:
             video_dir = os.path.dirname(video_path)
             video_name = Path(video_path).stem
-            output_path = os.path.join(video_dir, f"{video_name}.{audio_format}")
-       
-        logger.info(f"Extrayendo audio de {video_path}")
-       
-        # Cargar el video
-        video = VideoFileClip(video_path)
+            base_salida = os.path.join(video_dir, video_name)
+        else:
+            base_salida = os.path.splitext(output_path)[0]
        
-        # Verificar que el video tiene audio
-        if video.audio is None:
+        # Verificar que el video tiene audio (con la inspección ya hecha al verificarlo)
+        if info is None:
+            info = inspeccionar_medio(video_path)
+        if info is not None and not info.has_audio:
             logger.error(f"El video no contiene pista de audio: {video_path}")
-            video.close()
             return None
        
-        # Extraer el audio
-        audio = video.audio
+        logger.info(f"Extrayendo audio de {video_path} ({AUDIO_EXTRACT_ENGINE})")
        
-        # Guardar el audio
-        audio.write_audiofile(
-            output_path,
-            codec='libmp3lame' if audio_format == 'mp3' else None,
-            logger=None  # Silenciar logs de moviepy
-        )
-       
-        # Cerrar los recursos
-        audio.close()
-        video.close()
+        if AUDIO_EXTRACT_ENGINE == 'moviepy':
+            output_path = _extraer_con_moviepy(video_path, base_salida, audio_format)
+        else:
+            output_path = _extraer_con_ffmpeg(video_path, base_salida, info, audio_format)
        
         logger.info(f"Audio extraído exitosamente: {output_path}")
         return output_path
@@ -115,24 +256,16 @@ def verificar_es_video_real(file_path):
     Returns:
         bool: True si es un video con pista de video, False si no
     """
-    if not MOVIEPY_AVAILABLE:
-        # Fallback a verificación por extensión
-        return es_archivo_video(os.path.basename(file_path))
+    info = inspeccionar_medio(file_path)
    
-    try:
-        # Intentar abrir como video
-        video = VideoFileClip(file_path)
-       
-        # Verificar que tenga pista de video (fps y size deben existir)
-        has_video = hasattr(video, 'fps') and video.fps is not None and video.size is not None
-       
-        video.close()
-       
-        return has_video
-       
-    except Exception as e:
-        logger.debug(f"El archivo no es un video válido: {str(e)}")
+    if info is None:
+        if not MOVIEPY_AVAILABLE:
+            # Fallback a verificación por extensión
+            return es_archivo_video(os.path.basename(file_path))
+        logger.debug(f"El archivo no es un video válido: {file_path}")
         return False
+   
+    return info.has_video
  
  
 def obtener_info_video(video_path):
@@ -143,27 +276,24 @@ def obtener_info_video(video_path):
         video_path (str): Ruta al archivo de video
    
     Returns:
-        dict: Información del video (duración, fps, resolución, etc.)
+        dict: Información del video (duración, fps, resolución, códecs, etc.)
     """
    
-    if not MOVIEPY_AVAILABLE:
-        logger.error("moviepy no está instalado")
+    info = inspeccionar_medio(video_path)
+    if info is None:
+        logger.error(f"Error al obtener información del video: {video_path}")
         return None
    
-    try:
-        video = VideoFileClip(video_path)
-       
-        info = {
-            'duration': video.duration,
-            'fps': video.fps,
-            'size': video.size,
-            'has_audio': video.audio is not None
-        }
-       
-        video.close()
-       
-        return info
-       
-    except Exception as e:
-        logger.error(f"Error al obtener información del video: {str(e)}")
-        return None
\ No newline at end of file
+    video = info.video
+    audio = info.audio
+   
+    return {
+        'duration': info.duration,
+        'fps': video.fps if video else None,
+        'size': [video.width, video.height] if video else None,
+        'has_audio': audio is not None,
+        'video_codec': video.codec if video else None,
+        'audio_codec': audio.codec if audio else None,
+        'sample_rate': audio.sample_rate if audio else None,
+        'channels': audio.channels if audio else None
+    }
\ No newline at end of file
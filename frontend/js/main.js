@@ -681,10 +681,10 @@ async function handleAudioFile(file) {
         return;
     }
     
-    // Validar tamaño (máximo 100MB)
-    const maxSize = 100 * 1024 * 1024; // 100MB
+    // Validar tamaño (máximo 4GB; los archivos grandes se suben por fragmentos)
+    const maxSize = 4 * 1024 * 1024 * 1024; // 4GB
     if (file.size > maxSize) {
-        showError('File is too large. Maximum size is 100MB.');
+        showError('File is too large. Maximum size is 4GB.');
         return;
     }
     
@@ -1109,6 +1109,176 @@ function handleSystemRecordButtonClick() {
     }
 }
 
+/* Lee una respuesta Server-Sent Events: llama a onText con cada fragmento y
+   devuelve los datos del evento 'done' (lanza un Error con el evento 'error') */
+async function readEventStream(response, onText) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        
+        let separator;
+        while ((separator = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, separator);
+            buffer = buffer.slice(separator + 2);
+            
+            let eventName = 'message';
+            let payload = '';
+            for (const line of rawEvent.split('\n')) {
+                if (line.startsWith('event: ')) eventName = line.slice(7);
+                else if (line.startsWith('data: ')) payload += line.slice(6);
+            }
+            
+            const data = payload ? JSON.parse(payload) : {};
+            if (eventName === 'error') throw new Error(data.error || 'Stream error');
+            if (eventName === 'done') return data;
+            if (data.text) onText(data.text);
+        }
+    }
+    
+    throw new Error('Stream ended unexpectedly');
+}
+
+/* Espera a que termine un trabajo de procesamiento consultando su estado */
+async function waitForJobResult(jobId, intervalMs = 2000) {
+    const progressMessages = {
+        queued: 'Waiting in queue...',
+        transcribing: 'Transcribing audio...',
+        parsing: 'Analyzing dialogues...',
+        summarizing: 'Generating summary...'
+    };
+    
+    while (true) {
+        const statusResponse = await fetch(`http://localhost:5000/api/jobs/${jobId}`);
+        const status = await statusResponse.json();
+        
+        if (!statusResponse.ok) {
+            throw new Error(status.error || 'Failed to get job status');
+        }
+        
+        if (status.status === 'failed') {
+            throw new Error(status.error || 'Failed to process audio');
+        }
+        
+        if (status.status === 'completed') {
+            const resultResponse = await fetch(`http://localhost:5000/api/jobs/${jobId}/result`);
+            const result = await resultResponse.json();
+            
+            if (!resultResponse.ok) {
+                throw new Error(result.error || 'Failed to get job result');
+            }
+            
+            return result;
+        }
+        
+        if (progressMessages[status.progress]) {
+            updateLoadingMessage(progressMessages[status.progress]);
+        }
+        
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+}
+
+/* Archivos a partir de este tamaño se suben por fragmentos reanudables */
+const RESUMABLE_UPLOAD_THRESHOLD = 32 * 1024 * 1024;
+const RESUMABLE_UPLOAD_MAX_RETRIES = 8;
+
+/* Sube un archivo con /api/upload o, si es grande, por fragmentos reanudables */
+async function uploadFile(file) {
+    if (file.size < RESUMABLE_UPLOAD_THRESHOLD) {
+        const formData = new FormData();
+        formData.append('audio', file);
+        
+        const uploadResponse = await fetch('http://localhost:5000/api/upload', {
+            method: 'POST',
+            body: formData
+        });
+        
+        if (!uploadResponse.ok) {
+            const error = await uploadResponse.json();
+            throw new Error(error.error || 'Failed to upload file');
+        }
+        
+        return uploadResponse.json();
+    }
+    
+    return uploadFileResumable(file);
+}
+
+/* Sube un archivo por fragmentos; si la conexión falla consulta los rangos
+   recibidos y continúa desde el primer hueco */
+async function uploadFileResumable(file) {
+    const initResponse = await fetch('http://localhost:5000/api/uploads', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ filename: file.name, size: file.size })
+    });
+    const upload = await initResponse.json();
+    
+    if (!initResponse.ok) {
+        throw new Error(upload.error || 'Failed to start upload');
+    }
+    
+    const uploadUrl = `http://localhost:5000${upload.upload_url}`;
+    let offset = 0;
+    let retries = 0;
+    
+    while (offset < file.size) {
+        const end = Math.min(offset + upload.chunk_size, file.size);
+        
+        try {
+            const chunkResponse = await fetch(`${uploadUrl}?offset=${offset}`, {
+                method: 'PUT',
+                headers: { 'Content-Type': 'application/octet-stream' },
+                body: file.slice(offset, end)
+            });
+            
+            if (!chunkResponse.ok && chunkResponse.status < 500) {
+                const error = await chunkResponse.json();
+                throw new Error(error.error || 'Failed to upload file');
+            }
+            if (!chunkResponse.ok) {
+                throw new TypeError('Server error');
+            }
+            
+            offset = end;
+            retries = 0;
+            updateLoadingMessage(`Uploading file... ${Math.round(offset * 100 / file.size)}%`);
+            
+        } catch (error) {
+            // Errores de red o del servidor: esperar y reanudar desde lo recibido
+            if (!(error instanceof TypeError) || ++retries > RESUMABLE_UPLOAD_MAX_RETRIES) {
+                throw error;
+            }
+            await new Promise(resolve => setTimeout(resolve, Math.min(1000 * 2 ** retries, 30000)));
+            
+            try {
+                const statusResponse = await fetch(uploadUrl);
+                const status = await statusResponse.json();
+                const first = status.received && status.received[0];
+                offset = first && first[0] === 0 ? first[1] : 0;
+            } catch (statusError) {
+                // Sin conexión todavía: se reintenta el mismo fragmento
+            }
+        }
+    }
+    
+    updateLoadingMessage('Processing uploaded file...');
+    
+    const finalizeResponse = await fetch(`${uploadUrl}/finalize`, { method: 'POST' });
+    const result = await finalizeResponse.json();
+    
+    if (!finalizeResponse.ok) {
+        throw new Error(result.error || 'Failed to upload file');
+    }
+    
+    return result;
+}
+
 /* Procesa el audio/video (envía al backend) */
 async function processAudio() {
     if (!AppState.currentAudioFile) {
@@ -1129,20 +1299,7 @@ async function processAudio() {
     
     try {
         // Subir el archivo
-        const formData = new FormData();
-        formData.append('audio', AppState.currentAudioFile);
-        
-        const uploadResponse = await fetch('http://localhost:5000/api/upload', {
-            method: 'POST',
-            body: formData
-        });
-        
-        if (!uploadResponse.ok) {
-            const error = await uploadResponse.json();
-            throw new Error(error.error || 'Failed to upload file');
-        }
-        
-        const uploadData = await uploadResponse.json();
+        const uploadData = await uploadFile(AppState.currentAudioFile);
         const fileId = uploadData.file_id;
         
         console.log('File uploaded successfully:', fileId);
@@ -1169,7 +1326,8 @@ async function processAudio() {
                 file_id: fileId,
                 language: selectedLanguage,
                 agent_id: AppState.selectedAgent.id,
-                user_id: user.id
+                user_id: user.id,
+                filename: uploadData.filename
             };
             updateLoadingMessage(`Processing with ${AppState.selectedAgent.name}...`);
         } else {
@@ -1177,7 +1335,9 @@ async function processAudio() {
             endpoint = 'http://localhost:5000/api/process';
             processData = {
                 file_id: fileId,
-                language: selectedLanguage
+                language: selectedLanguage,
+                user_id: user ? user.id : undefined,
+                filename: uploadData.filename
             };
         }
         
@@ -1211,7 +1371,12 @@ async function processAudio() {
         updateLoadingMessage('Finalizing summary...');
         await new Promise(resolve => setTimeout(resolve, 500));
         
-        const result = await processResponse.json();
+        let result = await processResponse.json();
+        
+        // El endpoint estándar encola un trabajo y responde 202 con su job_id
+        if (processResponse.status === 202 && result.job_id) {
+            result = await waitForJobResult(result.job_id);
+        }
         
         console.log('Processing completed:', result);
         
@@ -1724,26 +1889,45 @@ async function handleChatMessage() {
             
         } else {
             // Es una pregunta normal - usar el chat estándar
-            const response = await fetch('http://localhost:5000/api/chat', {
+            // Con transcript_id el servidor ya tiene la transcripción indexada
+            const sendChat = (includeContext) => fetch('http://localhost:5000/api/chat/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json'
                 },
                 body: JSON.stringify({
                     message: message,
-                    context: AppState.lastResult.transcription
+                    transcript_id: AppState.lastResult.transcript_id,
+                    context: includeContext ? AppState.lastResult.transcription : undefined
                 })
             });
             
-            const data = await response.json();
+            let response = await sendChat(!AppState.lastResult.transcript_id);
+            
+            // El servidor ya no tiene el índice: reenviar la transcripción una vez
+            if (response.status === 404) {
+                response = await sendChat(true);
+            }
             
             if (!response.ok) {
+                const data = await response.json();
                 throw new Error(data.error || 'Error al procesar mensaje');
             }
             
-            // Mostrar respuesta de la IA
-            const aiMessage = createChatMessage(data.response, 'assistant');
+            // Mostrar la respuesta de la IA a medida que llega
+            const aiMessage = createChatMessage('', 'assistant');
+            const aiBubble = aiMessage.querySelector('.chat-bubble');
             appendChatMessage(aiMessage);
+            
+            let answer = '';
+            const done = await readEventStream(response, (text) => {
+                answer += text;
+                aiBubble.innerHTML = markdownToHtml(answer);
+            });
+            
+            if (done.transcript_id) {
+                AppState.lastResult.transcript_id = done.transcript_id;
+            }
         }
         
     } catch (error) {